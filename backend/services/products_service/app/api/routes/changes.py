@@ -0,0 +1,129 @@
+# Em api/routes/changes.py
+
+import asyncio
+from typing import List, Optional
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from core.config import settings
+from core.database import get_async_session_factory
+from core.serialization import dumps
+from models.change_log_model import ChangeTopic
+from services.change_feed import fetch_changes, get_change_feed, head_seq, oldest_seq
+
+SSE_MEDIA_TYPE = "text/event-stream"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Próximo 'after' do long-poll, mesmo quando a resposta vem vazia
+SEQ_HEADER = "X-Change-Seq"
+RESET_DETAIL = "O cursor é anterior aos eventos retidos. Recarregue os dados e retome a partir de 'seq'."
+
+router = APIRouter(
+    prefix="/changes",
+    tags=["Changes"],
+)
+
+
+def _sse(event: dict) -> bytes:
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (event["seq"], event["topic"].encode(), dumps(event))
+
+
+async def _is_expired(session_factory: async_sessionmaker, after: int) -> bool:
+    oldest = await oldest_seq(session_factory)
+    return oldest is not None and after + 1 < oldest
+
+
+@router.get("", responses={200: {"content": {SSE_MEDIA_TYPE: {}, NDJSON_MEDIA_TYPE: {}}}})
+async def read_changes(
+    *, session_factory: async_sessionmaker = Depends(get_async_session_factory), request: Request,
+    after: Optional[int] = Query(None, ge=0, description="Último 'seq' recebido; sem ele, só alterações a partir de agora"),
+    topic: Optional[List[ChangeTopic]] = Query(None, description="Filtra por tabela (repetível)"),
+    wait: float = Query(25.0, ge=0, description="Long-poll: segundos esperando se não houver alterações"),
+    limit: int = Query(500, ge=1, le=5000),
+):
+    """
+    Alterações de produtos e cupons, em ordem de 'seq'.
+
+    Com 'Accept: text/event-stream', abre um stream SSE (o navegador retoma sozinho
+    pelo header Last-Event-ID). Sem ele, responde em NDJSON no modo long-poll: devolve
+    o que houver depois de 'after' ou espera até 'wait' segundos pela próxima alteração;
+    o header X-Change-Seq traz o 'after' da chamada seguinte. Eventos com 'data' nulo
+    indicam uma alteração em massa: recarregue a coleção inteira.
+    """
+    topics = [item.value for item in topic] if topic else None
+    if SSE_MEDIA_TYPE in request.headers.get("accept", ""):
+        last_event_id = request.headers.get("last-event-id", "")
+        if last_event_id.isdigit():
+            after = int(last_event_id)
+        return StreamingResponse(
+            _stream(session_factory, after, topics),
+            media_type=SSE_MEDIA_TYPE,
+            # Sem buffer em proxies (nginx) e sem cache no caminho
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    return await _long_poll(session_factory, after, topics, wait, limit)
+
+
+async def _long_poll(
+    session_factory: async_sessionmaker, after: Optional[int], topics: Optional[List[str]], wait: float, limit: int,
+) -> Response:
+    if after is not None and await _is_expired(session_factory, after):
+        raise HTTPException(status_code=410, detail=RESET_DETAIL, headers={SEQ_HEADER: str(await head_seq(session_factory))})
+
+    feed = get_change_feed(session_factory)
+    # Inscreve antes de consultar: o que for gravado depois da consulta chega pela fila
+    subscription = await feed.subscribe(topics)
+    try:
+        if after is None:
+            after = await head_seq(session_factory)
+        events = await fetch_changes(session_factory, after, limit, topics)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + min(wait, settings.change_feed_long_poll_max_seconds)
+        while not events and not subscription.overflowed and loop.time() < deadline:
+            events = [event for event in await subscription.get(deadline - loop.time()) if event["seq"] > after][:limit]
+        if subscription.overflowed:
+            events = await fetch_changes(session_factory, after, limit, topics)
+    finally:
+        feed.unsubscribe(subscription)
+
+    next_after = events[-1]["seq"] if events else after
+    body = b"".join(dumps(event, orjson.OPT_APPEND_NEWLINE) for event in events)
+    return Response(content=body, media_type=NDJSON_MEDIA_TYPE, headers={SEQ_HEADER: str(next_after)})
+
+
+async def _stream(session_factory: async_sessionmaker, after: Optional[int], topics: Optional[List[str]]):
+    feed = get_change_feed(session_factory)
+    subscription = await feed.subscribe(topics)
+    try:
+        # O cliente reconecta em 1 s se o stream cair ou atingir o tempo máximo
+        yield b"retry: 1000\n\n"
+        if after is not None and await _is_expired(session_factory, after):
+            after = None
+            yield b"event: reset\ndata: {}\n\n"
+        cursor = after if after is not None else await head_seq(session_factory)
+
+        # Atrasados primeiro, direto do banco; o que chegar durante a leitura fica na fila
+        batch_size = settings.change_feed_batch_size
+        while True:
+            events = await fetch_changes(session_factory, cursor, batch_size, topics)
+            if events:
+                yield b"".join(_sse(event) for event in events)
+                cursor = events[-1]["seq"]
+            if len(events) < batch_size:
+                break
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.change_feed_sse_max_seconds
+        while not subscription.overflowed and loop.time() < deadline:
+            timeout = min(settings.change_feed_heartbeat_seconds, deadline - loop.time())
+            events = [event for event in await subscription.get(timeout) if event["seq"] > cursor]
+            if not events:
+                # Comentário SSE: mantém a conexão viva em proxies que derrubam conexões ociosas
+                yield b": keepalive\n\n"
+                continue
+            yield b"".join(_sse(event) for event in events)
+            cursor = events[-1]["seq"]
+    finally:
+        feed.unsubscribe(subscription)
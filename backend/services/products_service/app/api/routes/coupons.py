@@ -1,22 +1,38 @@
 # Em api/routes/coupons.py
 
 import math
-from typing import List
+from typing import List, Optional
 from datetime import datetime # Importação necessária para o soft delete
 
 # Adicionamos Response e status para o retorno 204
-from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.exc import IntegrityError
-from sqlmodel import Session, select, func
+from sqlalchemy.orm.exc import StaleDataError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from core.database import get_session
+from core.cache import CachedResponse, coupon_cache_key, response_cache
+from core.coalescing import single_flight
+from core.counting import CountMode, count_items
+from core.database import get_async_session
+from core.etag import (
+    PRECONDITION_FAILED_DETAIL, check_if_match, collection_etag, get_collection_version, if_none_match,
+    json_response, not_modified, row_etag, set_etag_headers,
+)
+from core.pagination import apply_keyset, decode_cursor, encode_cursor, order_by_keyset
+from core.replicas import get_read_session, is_cacheable_read, is_replica_read, written_at
+from core.serialization import respond
+from core.utils import column_in, map_coupons_to_read_rows
 from models.coupon_model import Coupon
+from services.coupon_code_filter import coupon_filter
 from schemas.coupon_schemas import (
     CouponCreate, 
+    CouponLookup,
+    CouponLookupResult,
     CouponRead, 
     CouponUpdate,
-    CouponPage, 
-    PaginatedMetadata
+    CouponPage,
+    normalize_coupon_code,
 )
 
 router = APIRouter(
@@ -24,92 +40,199 @@ router = APIRouter(
     tags=["Coupons"],
 )
 
+coupon_list_flight = single_flight("coupons.list", {Coupon.__tablename__})
+
 # ... (as rotas POST, GET/{code}, PATCH/{code} continuam aqui, sem alterações)
 @router.post("/", response_model=CouponRead, status_code=201)
-def create_coupon(*, session: Session = Depends(get_session), coupon: CouponCreate):
+async def create_coupon(*, session: AsyncSession = Depends(get_async_session), coupon: CouponCreate):
     """Cria um novo cupom de desconto."""
-    db_coupon = Coupon.from_orm(coupon)
+    db_coupon = Coupon.model_validate(coupon)
     try:
         session.add(db_coupon)
-        session.commit()
-        session.refresh(db_coupon)
+        await session.commit()
+        await session.refresh(db_coupon)
         return db_coupon
     except IntegrityError:
-        session.rollback()
+        await session.rollback()
         raise HTTPException(status_code=409, detail=f"O cupom com o código '{coupon.code}' já existe.")
 
+@router.post("/lookup", response_model=CouponLookupResult)
+async def lookup_coupons(
+    *, session: AsyncSession = Depends(get_read_session), request: Request, response: Response, lookup: CouponLookup,
+):
+    """
+    Vários cupons por código numa única consulta. Os códigos são normalizados como no
+    cadastro; os que nem têm um formato válido voltam em 'invalid', como enviados.
+    Códigos que o filtro sabe que nunca existiram não entram na consulta.
+    """
+    codes, invalid = [], []
+    for raw_code in lookup.codes:
+        try:
+            codes.append(normalize_coupon_code(raw_code))
+        except ValueError:
+            invalid.append(raw_code)
+    codes = list(dict.fromkeys(codes))
+
+    found = {}
+    client_written_at = written_at(request)
+    candidates = [code for code in codes if coupon_filter.might_exist(code, client_written_at)]
+    if candidates:
+        filter_generation = None if is_replica_read(session) else coupon_filter.generation
+        query = select(Coupon).where(column_in(Coupon.code, candidates, session.get_bind().dialect.name))
+        found = {coupon.code: coupon for coupon in (await session.exec(query)).all()}
+        for code in candidates:
+            coupon_filter.record_lookup(code, code in found, filter_generation)
+    active = [found[code] for code in codes if code in found and found[code].deleted_at is None]
+    return respond({
+        "data": map_coupons_to_read_rows(active),
+        "missing": [code for code in codes if code not in found],
+        "deleted": [code for code in codes if code in found and found[code].deleted_at is not None],
+        "invalid": invalid,
+    }, response)
+
 @router.get("/{code}", response_model=CouponRead)
-def read_coupon(*, session: Session = Depends(get_session), code: str):
+async def read_coupon(*, session: AsyncSession = Depends(get_read_session), request: Request, code: str):
     """Retorna os detalhes de um cupom específico pelo seu código."""
     normalized_code = code.lower()
-    query = select(Coupon).where(Coupon.code == normalized_code, Coupon.deleted_at == None)
-    coupon = session.exec(query).first()
-    if not coupon:
-        raise HTTPException(status_code=404, detail="Cupom não encontrado")
-    return coupon
+    cache_key = coupon_cache_key(normalized_code)
+    cached = await response_cache.get(cache_key)
+    if cached is None:
+        # Código inexistente ou deletado já conhecido: 404 sem consultar o banco
+        if coupon_filter.is_known_absent(normalized_code, written_at(request)):
+            raise HTTPException(status_code=404, detail="Cupom não encontrado")
+        cache_token, filter_generation = await response_cache.begin_read(), coupon_filter.generation
+        query = select(Coupon).where(Coupon.code == normalized_code, Coupon.deleted_at == None)
+        coupon = (await session.exec(query)).first()
+        coupon_filter.record_lookup(
+            normalized_code, coupon is not None, None if is_replica_read(session) else filter_generation,
+        )
+        if not coupon:
+            raise HTTPException(status_code=404, detail="Cupom não encontrado")
+        etag = row_etag("coupon", coupon.id, coupon.version)
+        if if_none_match(request, etag):
+            return not_modified(etag)
+        body = CouponRead.model_validate(coupon, from_attributes=True).model_dump_json().encode()
+        cached = CachedResponse(etag, body)
+        if is_cacheable_read(session):
+            await response_cache.set(cache_key, cached, cache_token)
+    elif if_none_match(request, cached.etag):
+        return not_modified(cached.etag)
+    return json_response(cached.etag, cached.body)
 
 @router.patch("/{code}", response_model=CouponRead)
-def update_coupon(*, session: Session = Depends(get_session), code: str, coupon_update: CouponUpdate):
-    """Atualiza parcialmente um cupom existente."""
+async def update_coupon(
+    *, session: AsyncSession = Depends(get_async_session), request: Request, response: Response,
+    code: str, coupon_update: CouponUpdate
+):
+    """Atualiza parcialmente um cupom existente. Com 'If-Match', só atualiza se o ETag ainda for o atual."""
     normalized_code = code.lower()
     query = select(Coupon).where(Coupon.code == normalized_code, Coupon.deleted_at == None)
-    db_coupon = session.exec(query).first()
+    db_coupon = (await session.exec(query)).first()
     if not db_coupon:
         raise HTTPException(status_code=404, detail="Cupom não encontrado")
-    update_data = coupon_update.dict(exclude_unset=True)
+    check_if_match(request, row_etag("coupon", db_coupon.id, db_coupon.version))
+    update_data = coupon_update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_coupon, key, value)
+    if "valid_until" in update_data:
+        # Validade nova: a varredura de expiração volta a acompanhar o cupom
+        db_coupon.discounts_released_at = None
     session.add(db_coupon)
-    session.commit()
-    session.refresh(db_coupon)
+    try:
+        await session.commit()
+    except StaleDataError:
+        await session.rollback()
+        raise HTTPException(status_code=412, detail=PRECONDITION_FAILED_DETAIL)
+    await session.refresh(db_coupon)
+    set_etag_headers(response, row_etag("coupon", db_coupon.id, db_coupon.version))
     return db_coupon
 
 # --- NOVA ROTA PARA FAZER O SOFT DELETE DE UM CUPOM ---
 @router.delete("/{code}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_coupon(*, session: Session = Depends(get_session), code: str):
+async def delete_coupon(*, session: AsyncSession = Depends(get_async_session), code: str):
     """Marca um cupom como deletado (soft delete)."""
     normalized_code = code.lower()
     query = select(Coupon).where(Coupon.code == normalized_code, Coupon.deleted_at == None)
-    coupon = session.exec(query).first()
+    coupon = (await session.exec(query)).first()
 
     if not coupon:
         raise HTTPException(status_code=404, detail="Cupom não encontrado ou já deletado")
 
     coupon.deleted_at = datetime.utcnow()
     session.add(coupon)
-    session.commit()
+    await session.commit()
     
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 @router.get("/", response_model=CouponPage)
-def read_coupons(
+async def read_coupons(
     *,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
+    request: Request,
+    response: Response,
     page: int = Query(1, ge=1, description="Número da página"),
     limit: int = Query(10, ge=1, le=50, description="Itens por página"),
-    search: str = Query(None, description="Busca textual no código do cupom")
+    search: str = Query(None, description="Busca textual no código do cupom"),
+    count: CountMode = Query(CountMode.exact, description="exact: COUNT(*) em cache; estimated: estimativa do planejador; none: sem total"),
+    cursor: str = Query(None, description="Cursor opaco ('nextCursor' da página anterior); quando enviado, 'page' é ignorado")
 ):
     """Retorna uma lista paginada e filtrada de cupons ativos."""
+    if "if-none-match" in request.headers:
+        collection_version = await get_collection_version(session, Coupon.__tablename__)
+        etag = None if collection_version is None else collection_etag("coupon", collection_version, request)
+        if etag and if_none_match(request, etag):
+            return not_modified(etag)
+
+    search = search.lower() if search else None
+    key = (is_replica_read(session), page, limit, search, count, cursor)
+    collection_version, content = await coupon_list_flight.run(
+        key, lambda: _coupon_page(session, page, limit, search, count, cursor),
+        hold=is_cacheable_read(session), not_before=written_at(request),
+    )
+
+    etag = None if collection_version is None else collection_etag("coupon", collection_version, request)
+    if etag and if_none_match(request, etag):
+        return not_modified(etag)
+    if etag:
+        set_etag_headers(response, etag)
+    return respond(content, response)
+
+
+async def _coupon_page(
+    session: AsyncSession, page: int, limit: int, search: Optional[str], count: CountMode, cursor: Optional[str],
+) -> tuple:
+    """Versão da coleção e corpo da listagem (compartilhados por todos os pedidos iguais)."""
+    collection_version = await get_collection_version(session, Coupon.__tablename__)
+
     query = select(Coupon).where(Coupon.deleted_at == None)
     if search:
-        query = query.where(Coupon.code.contains(search.lower()))
+        query = query.where(Coupon.code.contains(search))
     
-    count_query = select(func.count()).select_from(query.subquery())
-    total_items = session.exec(count_query).scalar_one()
+    total_items = await count_items(session, query, count, Coupon.__tablename__, {"search": search})
 
-    offset = (page - 1) * limit
-    paginated_query = query.order_by(Coupon.created_at.desc()).offset(offset).limit(limit)
+    sort_column = Coupon.__table__.c.created_at
+    query = order_by_keyset(query, sort_column, Coupon.id, descending=True)
+    if cursor:
+        try:
+            last_value, last_id = decode_cursor(cursor, sort_column.name, "desc", sort_column)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        paginated_query = apply_keyset(query, sort_column, Coupon.id, True, last_value, last_id)
+    else:
+        offset = (page - 1) * limit
+        paginated_query = query.offset(offset)
     
-    coupons = session.exec(paginated_query).all()
+    coupons = (await session.exec(paginated_query.limit(limit))).all()
+
+    next_cursor = None
+    if len(coupons) == limit:
+        next_cursor = encode_cursor(sort_column.name, "desc", coupons[-1].created_at, coupons[-1].id)
     
-    total_pages = math.ceil(total_items / limit) if total_items > 0 else 0
-    return CouponPage(
-        data=coupons,
-        meta=PaginatedMetadata(
-            page=page,
-            limit=limit,
-            totalItems=total_items,
-            totalPages=total_pages
-        )
-    )
\ No newline at end of file
+    total_pages = None if total_items is None else math.ceil(total_items / limit)
+    return collection_version, {
+        "data": map_coupons_to_read_rows(coupons),
+        "meta": {
+            "page": page, "limit": limit, "totalItems": total_items, "totalPages": total_pages, "nextCursor": next_cursor,
+        },
+    }
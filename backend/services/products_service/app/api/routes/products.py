@@ -1,19 +1,40 @@
 import math
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 from decimal import Decimal
 
-from fastapi import APIRouter, Depends, Query, HTTPException, Response, status
-from pydantic import BaseModel, Field as PydanticField
-from sqlmodel import Session, select, func
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field as PydanticField, model_validator
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm.exc import StaleDataError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from core.database import get_session
-from core.utils import map_product_to_read_schema
-from models.product_model import Product, CouponType
-from models.coupon_model import Coupon
+from core.cache import CachedResponse, product_cache_key, response_cache
+from core.coalescing import single_flight
+from core.counting import CountMode, count_items
+from core.database import get_async_session, get_async_session_factory
+from core.etag import (
+    PRECONDITION_FAILED_DETAIL, check_if_match, collection_etag, get_collection_version, if_none_match,
+    json_response, not_modified, row_etag, set_etag_headers,
+)
+from core.pagination import apply_keyset, decode_cursor, encode_cursor, order_by_keyset
+from core.replicas import get_read_session, is_cacheable_read, is_replica_read, written_at
+from core.search import apply_product_filters, search_relevance
+from core.serialization import respond
+from core.utils import column_in, map_product_to_read_schema, map_products_to_read_rows
+from models.product_model import Product, ProductSortBy
+from models.coupon_model import Coupon, CouponType
+from services.coupon_code_filter import coupon_filter
+from services.coupon_redemption import CouponAlreadyRedeemedError, redeem_coupon
+from services.discount_batch import apply_discount_batch, remove_discount_batch
 from schemas.product_schemas import (
-    ProductCreate, ProductRead, ProductUpdate, ProductPage, PaginatedMetadata
+    ProductCreate, ProductLookup, ProductLookupResult, ProductRead, ProductUpdate, ProductPage
 )
+from schemas.reservation_schemas import ReservationRead, StockReserve
+from api.routes.reservations import create_reservation
 
 class PercentDiscountApply(BaseModel):
     value: Decimal = PydanticField(..., gt=0, le=80)
@@ -21,87 +42,386 @@ class PercentDiscountApply(BaseModel):
 class CouponDiscountApply(BaseModel):
     code: str = PydanticField(..., min_length=4, max_length=20)
 
+class ProductFilter(BaseModel):
+    """Mesmos filtros da listagem (GET /products), sempre sobre produtos ativos."""
+    search: Optional[str] = None
+    minPrice: Optional[float] = PydanticField(None, ge=0)
+    maxPrice: Optional[float] = PydanticField(None, ge=0)
+
+class ProductSelection(BaseModel):
+    """Seleciona os produtos por lista de ids OU por filtro (um dos dois)."""
+    productIds: Optional[List[int]] = PydanticField(None, min_length=1, max_length=50_000)
+    filter: Optional[ProductFilter] = None
+
+    @model_validator(mode="after")
+    def check_single_selector(self):
+        if (self.productIds is None) == (self.filter is None):
+            raise ValueError("Informe 'productIds' ou 'filter' (apenas um deles).")
+        return self
+
+class BatchDiscountApply(ProductSelection):
+    """Desconto percentual ('percent') OU cupom ('couponCode') para todos os selecionados."""
+    percent: Optional[Decimal] = PydanticField(None, gt=0, le=80)
+    couponCode: Optional[str] = PydanticField(None, min_length=4, max_length=20)
+
+    @model_validator(mode="after")
+    def check_single_discount(self):
+        if (self.percent is None) == (self.couponCode is None):
+            raise ValueError("Informe 'percent' ou 'couponCode' (apenas um deles).")
+        return self
+
+COUPON_REDEEMED_DETAIL = "Este cupom é de uso único e já foi utilizado."
+
+BULK_CONTENT_TYPES = {"text/csv": "csv", "application/x-ndjson": "ndjson", "application/jsonl": "ndjson"}
+
 router = APIRouter(prefix="/products", tags=["Products"])
 
+product_list_flight = single_flight("products.list", {Product.__tablename__})
+
 # --- ORDEM CORRETA DAS ROTAS ---
 
 @router.get("/", response_model=ProductPage)
-def read_products(
-    *, session: Session = Depends(get_session), page: int = Query(1, ge=1),
+async def read_products(
+    *, session: AsyncSession = Depends(get_read_session), request: Request, response: Response, page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=50), search: str = Query(None),
-    minPrice: float = Query(None, ge=0), maxPrice: float = Query(None, ge=0),
-    sortBy: str = Query("created_at"), sortOrder: str = Query("desc"),
-    includeDeleted: bool = Query(False)
+    minPrice: float = Query(None, ge=0, description="Preço final mínimo (já com desconto)"),
+    maxPrice: float = Query(None, ge=0, description="Preço final máximo (já com desconto)"),
+    sortBy: ProductSortBy = Query(ProductSortBy.created_at, description="Coluna de ordenação, ou 'relevance' junto com 'search'"),
+    sortOrder: str = Query("desc"),
+    includeDeleted: bool = Query(False),
+    count: CountMode = Query(CountMode.exact, description="exact: COUNT(*) em cache; estimated: estimativa do planejador; none: sem total"),
+    cursor: str = Query(None, description="Cursor opaco ('nextCursor' da página anterior); quando enviado, 'page' é ignorado")
 ):
-    query = select(Product)
-    if search:
-        query = query.where(Product.name.contains(search) | Product.description.contains(search))
-    if minPrice is not None:
-        query = query.where(Product.price >= minPrice)
-    if maxPrice is not None:
-        query = query.where(Product.price <= maxPrice)
-    if not includeDeleted:
+    if "if-none-match" in request.headers:
+        # Revalidação: lida antes das linhas (ver core/etag.py); se bater, nem consulta a página
+        collection_version = await get_collection_version(session, Product.__tablename__)
+        etag = None if collection_version is None else collection_etag("product", collection_version, request)
+        if etag and if_none_match(request, etag):
+            return not_modified(etag)
+
+    search = search or None
+    sort_order = "desc" if sortOrder.lower() == "desc" else "asc"
+    # Sem busca, 'relevance' não faz sentido: cai na ordenação padrão
+    if sortBy == ProductSortBy.relevance and not search:
+        sortBy = ProductSortBy.created_at
+    # Pedidos iguais ao mesmo tempo dividem uma execução (core/coalescing.py); réplica e
+    # primário não se misturam, e quem escreveu só aproveita execuções posteriores à escrita
+    key = (
+        is_replica_read(session), page, limit, search, minPrice, maxPrice,
+        sortBy, sort_order, includeDeleted, count, cursor,
+    )
+    collection_version, content = await product_list_flight.run(key, lambda: _product_page(
+        session, page, limit, search, minPrice, maxPrice, sortBy, sort_order, includeDeleted, count, cursor,
+    ), hold=is_cacheable_read(session), not_before=written_at(request))
+
+    etag = None if collection_version is None else collection_etag("product", collection_version, request)
+    if etag and if_none_match(request, etag):
+        return not_modified(etag)
+    if etag:
+        set_etag_headers(response, etag)
+    # Dicionário simples no formato de ProductPage (ver core/serialization.py)
+    return respond(content, response)
+
+async def _product_page(
+    session: AsyncSession, page: int, limit: int, search: Optional[str], min_price: Optional[float],
+    max_price: Optional[float], sort_by: ProductSortBy, sort_order: str, include_deleted: bool,
+    count: CountMode, cursor: Optional[str],
+) -> tuple:
+    """Versão da coleção e corpo da listagem (compartilhados por todos os pedidos iguais)."""
+    collection_version = await get_collection_version(session, Product.__tablename__)
+
+    dialect_name = session.get_bind().dialect.name
+    relevance = search_relevance(dialect_name, search) if sort_by == ProductSortBy.relevance else None
+
+    query = select(Product) if relevance is None else select(Product, relevance)
+    query = apply_product_filters(query, dialect_name, search, min_price, max_price)
+    if not include_deleted:
         query = query.where(Product.deleted_at == None)
 
-    count_query = select(func.count()).select_from(query.subquery())
-    total_items = session.exec(count_query).one()
+    filters = {"search": search, "minPrice": min_price, "maxPrice": max_price, "includeDeleted": include_deleted}
+    total_items = await count_items(session, query, count, Product.__tablename__, filters)
+
+    if relevance is not None:
+        sort_column, sort_name = relevance, "relevance"
+    else:
+        sort_column = Product.__table__.c[sort_by.value]
+        sort_name = sort_column.name
+    query = order_by_keyset(query, sort_column, Product.id, descending=sort_order == "desc")
+
+    if cursor:
+        try:
+            last_value, last_id = decode_cursor(cursor, sort_name, sort_order, sort_column)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        paginated_query = apply_keyset(query, sort_column, Product.id, sort_order == "desc", last_value, last_id)
+    else:
+        offset = (page - 1) * limit
+        paginated_query = query.offset(offset)
+    rows = (await session.exec(paginated_query.limit(limit))).all()
+
+    # Com relevância cada linha vem como (Product, relevance)
+    products = rows if relevance is None else [row[0] for row in rows]
+    product_rows = map_products_to_read_rows(products)
+
+    next_cursor = None
+    if len(rows) == limit:
+        last_sort_value = getattr(rows[-1], sort_name) if relevance is None else rows[-1][1]
+        next_cursor = encode_cursor(sort_name, sort_order, last_sort_value, products[-1].id)
+
+    total_pages = None if total_items is None else math.ceil(total_items / limit)
+    return collection_version, {
+        "data": product_rows,
+        "meta": {
+            "page": page, "limit": limit, "totalItems": total_items, "totalPages": total_pages, "nextCursor": next_cursor,
+        },
+    }
 
-    sort_column = getattr(Product, sortBy, Product.created_at)
-    if sortOrder.lower() == "desc":
-        query = query.order_by(sort_column.desc())
+@router.post("/discounts/apply")
+async def apply_discount_to_many(*, session: AsyncSession = Depends(get_async_session), batch: BatchDiscountApply):
+    """
+    Aplica um desconto percentual ou um cupom a vários produtos, em blocos com UPDATE
+    único por bloco. Produtos que já têm desconto ficam em 'conflicted'; inexistentes
+    ou deletados, em 'skipped'.
+    """
+    coupon = None
+    if batch.couponCode is not None:
+        normalized_code = batch.couponCode.strip().lower()
+        coupon = await _find_active_coupon(session, normalized_code)
+        if not coupon:
+            raise HTTPException(status_code=404, detail="Cupom não encontrado")
+        now = datetime.utcnow()
+        if not (coupon.valid_from <= now <= coupon.valid_until):
+            raise HTTPException(status_code=400, detail="O cupom está fora do período de validade.")
+        if coupon.one_shot:
+            raise HTTPException(status_code=400, detail="Cupons de uso único não podem ser aplicados em lote.")
+        discount_type, discount_value = coupon.type, coupon.value
     else:
-        query = query.order_by(sort_column.asc())
-
-    offset = (page - 1) * limit
-    paginated_query = query.offset(offset).limit(limit)
-    products = session.exec(paginated_query).all()
-
-    product_reads = [map_product_to_read_schema(p) for p in products]
-    
-    total_pages = math.ceil(total_items / limit) if total_items > 0 else 0
-    return ProductPage(
-        data=product_reads,
-        meta=PaginatedMetadata(page=page, limit=limit, totalItems=total_items, totalPages=total_pages)
+        discount_type, discount_value = CouponType.percent, batch.percent
+
+    product_filter = batch.filter or ProductFilter()
+    return await apply_discount_batch(
+        session, discount_type=discount_type, discount_value=discount_value, coupon=coupon,
+        product_ids=batch.productIds, search=product_filter.search,
+        min_price=product_filter.minPrice, max_price=product_filter.maxPrice,
+    )
+
+@router.post("/discounts/remove")
+async def remove_discount_from_many(*, session: AsyncSession = Depends(get_async_session), selection: ProductSelection):
+    """Remove o desconto de vários produtos; os que não têm desconto ficam em 'skipped'."""
+    product_filter = selection.filter or ProductFilter()
+    return await remove_discount_batch(
+        session, product_ids=selection.productIds, search=product_filter.search,
+        min_price=product_filter.minPrice, max_price=product_filter.maxPrice,
+    )
+
+@router.post("/lookup", response_model=ProductLookupResult)
+async def lookup_products(*, session: AsyncSession = Depends(get_read_session), response: Response, lookup: ProductLookup):
+    """
+    Vários produtos por id numa única consulta, em vez de um GET /products/{id} por
+    item (carrinhos, pedidos). 'data' segue a ordem pedida, sem repetições; ids que
+    não existem vão em 'missing' e os deletados em 'deleted'.
+    """
+    ids = list(dict.fromkeys(lookup.ids))
+    query = select(Product).where(column_in(Product.id, ids, session.get_bind().dialect.name))
+    found = {product.id: product for product in (await session.exec(query)).all()}
+    active = [found[product_id] for product_id in ids if product_id in found and found[product_id].deleted_at is None]
+    return respond({
+        "data": map_products_to_read_rows(active),
+        "missing": [product_id for product_id in ids if product_id not in found],
+        "deleted": [product_id for product_id in ids if product_id in found and found[product_id].deleted_at is not None],
+    }, response)
+
+@router.post("/bulk")
+async def bulk_import_products(*, session: AsyncSession = Depends(get_async_session), request: Request):
+    """
+    Importa/atualiza produtos em massa a partir de CSV (text/csv, com cabeçalho) ou
+    NDJSON (application/x-ndjson). Produtos com o mesmo nome são atualizados (e
+    restaurados, se estavam deletados). Retorna o resumo com os erros de cada linha rejeitada.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    content_format = BULK_CONTENT_TYPES.get(content_type)
+    if content_format is None:
+        raise HTTPException(
+            status_code=415, detail="Envie o arquivo como text/csv ou application/x-ndjson."
+        )
+    # Importação tardia: o serviço em massa (CSV, INSERT por dialeto) só carrega no primeiro uso
+    from services.product_service import import_products
+    return await import_products(session, request.stream(), content_format)
+
+@router.get("/export")
+async def export_products_stream(
+    *, session_factory: async_sessionmaker = Depends(get_async_session_factory),
+    format: str = Query("ndjson", pattern="^(csv|ndjson)$"), includeDeleted: bool = Query(False)
+):
+    """Exporta o catálogo inteiro em streaming (CSV ou NDJSON), com memória constante."""
+    from services.product_service import export_products
+
+    async def stream():
+        # A sessão precisa viver enquanto o corpo é enviado, por isso não vem de Depends
+        async with session_factory() as session:
+            async for chunk in export_products(session, format, includeDeleted):
+                yield chunk
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream(), media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="products.{format}"'},
     )
 
 @router.post("/", response_model=ProductRead, status_code=201)
-def create_product(*, session: Session = Depends(get_session), product: ProductCreate):
+async def create_product(*, session: AsyncSession = Depends(get_async_session), product: ProductCreate):
     db_product = Product.model_validate(product)
     try:
         session.add(db_product)
-        session.commit()
-        session.refresh(db_product)
+        await session.commit()
+        await session.refresh(db_product)
         return map_product_to_read_schema(db_product)
     except IntegrityError:
-        session.rollback()
+        await session.rollback()
         raise HTTPException(status_code=409, detail=f"Produto com nome '{product.name}' já existe.")
 
 @router.post("/{product_id}/restore", response_model=ProductRead)
-def restore_product(*, session: Session = Depends(get_session), product_id: int):
-    # ... (código existente)
-    pass
+async def restore_product(*, session: AsyncSession = Depends(get_async_session), product_id: int):
+    db_product = await session.get(Product, product_id)
+    if not db_product:
+        raise HTTPException(status_code=404, detail="Produto não encontrado")
+    if db_product.deleted_at is None:
+        raise HTTPException(status_code=400, detail="O produto não está deletado.")
+    db_product.deleted_at = None
+    session.add(db_product)
+    await session.commit()
+    await session.refresh(db_product)
+    return map_product_to_read_schema(db_product)
 
-# ... (outras rotas como apply_discount, etc.)
+@router.post("/{product_id}/discount/percent", response_model=ProductRead)
+async def apply_percent_discount(*, session: AsyncSession = Depends(get_async_session), product_id: int, discount: PercentDiscountApply):
+    db_product = await _get_product_without_discount(session, product_id)
+    db_product.discount_type = CouponType.percent
+    db_product.discount_value = discount.value
+    db_product.coupon_id = None
+    session.add(db_product)
+    await session.commit()
+    await session.refresh(db_product)
+    return map_product_to_read_schema(db_product)
+
+@router.post("/{product_id}/discount/coupon", response_model=ProductRead)
+async def apply_coupon_discount(*, session: AsyncSession = Depends(get_async_session), product_id: int, discount: CouponDiscountApply):
+    db_product = await _get_product_without_discount(session, product_id)
+    normalized_code = discount.code.strip().lower()
+    coupon = await _find_active_coupon(session, normalized_code)
+    if not coupon:
+        raise HTTPException(status_code=404, detail="Cupom não encontrado")
+    now = datetime.utcnow()
+    if not (coupon.valid_from <= now <= coupon.valid_until):
+        raise HTTPException(status_code=400, detail="O cupom está fora do período de validade.")
+    if coupon.one_shot and coupon.redeemed_at is not None:
+        raise HTTPException(status_code=409, detail=COUPON_REDEEMED_DETAIL)
+    # A checagem acima é só um atalho: quem garante o uso único é o UPDATE condicional
+    try:
+        await redeem_coupon(session, coupon, db_product.id)
+    except CouponAlreadyRedeemedError:
+        await session.rollback()
+        raise HTTPException(status_code=409, detail=COUPON_REDEEMED_DETAIL)
+    db_product.discount_type = coupon.type
+    db_product.discount_value = coupon.value
+    db_product.coupon_id = coupon.id
+    session.add(db_product)
+    await session.commit()
+    await session.refresh(db_product)
+    return map_product_to_read_schema(db_product)
+
+@router.post("/{product_id}/reserve", response_model=ReservationRead, status_code=status.HTTP_201_CREATED)
+async def reserve_product_stock(*, session: AsyncSession = Depends(get_async_session), product_id: int, reservation: StockReserve):
+    """
+    Reserva 'quantity' unidades com uma baixa atômica no estoque (409 se não houver).
+    Confirme ou libere em /reservations/{id}; sem isso, a reserva vence e o estoque volta.
+    """
+    return await create_reservation(session, [(product_id, reservation.quantity)], reservation.ttl_seconds)
+
+@router.delete("/{product_id}/discount", status_code=status.HTTP_204_NO_CONTENT)
+async def remove_discount(*, session: AsyncSession = Depends(get_async_session), product_id: int):
+    db_product = await _get_active_product(session, product_id)
+    if db_product.discount_type is None:
+        raise HTTPException(status_code=404, detail="O produto não possui desconto ativo.")
+    db_product.discount_type = None
+    db_product.discount_value = None
+    db_product.coupon_id = None
+    session.add(db_product)
+    await session.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 # ADIÇÃO DA ROTA PATCH QUE ESTAVA FALTANDO
 @router.patch("/{product_id}", response_model=ProductRead)
-def update_product(*, session: Session = Depends(get_session), product_id: int, product_update: ProductUpdate):
-    db_product = session.get(Product, product_id)
+async def update_product(
+    *, session: AsyncSession = Depends(get_async_session), request: Request, response: Response,
+    product_id: int, product_update: ProductUpdate
+):
+    """Atualiza parcialmente um produto. Com 'If-Match', só atualiza se o ETag ainda for o atual."""
+    db_product = await session.get(Product, product_id)
     if not db_product or db_product.deleted_at:
         raise HTTPException(status_code=404, detail="Produto não encontrado")
+    check_if_match(request, row_etag("product", db_product.id, db_product.version))
     update_data = product_update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_product, key, value)
     session.add(db_product)
-    session.commit()
-    session.refresh(db_product)
+    try:
+        await session.commit()
+    except StaleDataError:
+        # Outra requisição alterou o produto entre a leitura e o UPDATE ("WHERE version = ...")
+        await session.rollback()
+        raise HTTPException(status_code=412, detail=PRECONDITION_FAILED_DETAIL)
+    await session.refresh(db_product)
+    set_etag_headers(response, row_etag("product", db_product.id, db_product.version))
     return map_product_to_read_schema(db_product)
 
-# ... (outras rotas como delete, etc.)
+@router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_product(*, session: AsyncSession = Depends(get_async_session), product_id: int):
+    """Marca um produto como deletado (soft delete)."""
+    db_product = await _get_active_product(session, product_id)
+    db_product.deleted_at = datetime.utcnow()
+    session.add(db_product)
+    await session.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 @router.get("/{product_id}", response_model=ProductRead)
-def read_product(*, session: Session = Depends(get_session), product_id: int):
-    product = session.get(Product, product_id)
+async def read_product(*, session: AsyncSession = Depends(get_read_session), request: Request, product_id: int):
+    cache_key = product_cache_key(product_id)
+    cached = await response_cache.get(cache_key)
+    if cached is None:
+        cache_token = await response_cache.begin_read()
+        product = await session.get(Product, product_id)
+        if not product or product.deleted_at:
+            raise HTTPException(status_code=404, detail="Produto não encontrado")
+        etag = row_etag("product", product.id, product.version)
+        if if_none_match(request, etag):
+            return not_modified(etag)
+        cached = CachedResponse(etag, map_product_to_read_schema(product).model_dump_json().encode())
+        if is_cacheable_read(session):
+            await response_cache.set(cache_key, cached, cache_token)
+    elif if_none_match(request, cached.etag):
+        return not_modified(cached.etag)
+    return json_response(cached.etag, cached.body)
+
+async def _get_active_product(session: AsyncSession, product_id: int) -> Product:
+    product = await session.get(Product, product_id)
     if not product or product.deleted_at:
         raise HTTPException(status_code=404, detail="Produto não encontrado")
-    return map_product_to_read_schema(product)
\ No newline at end of file
+    return product
+
+async def _get_product_without_discount(session: AsyncSession, product_id: int) -> Product:
+    product = await _get_active_product(session, product_id)
+    if product.discount_type is not None:
+        raise HTTPException(status_code=409, detail="O produto já possui um desconto ativo. Remova-o antes de aplicar outro.")
+    return product
+
+async def _find_active_coupon(session: AsyncSession, normalized_code: str) -> Optional[Coupon]:
+    """
+    Cupom ativo pelo código, sempre consultado no banco: o filtro de códigos pode ainda
+    não ter um cupom recém-criado em outro worker, e uma escrita não pode recusá-lo.
+    """
+    generation = coupon_filter.generation
+    query = select(Coupon).where(Coupon.code == normalized_code, Coupon.deleted_at == None)
+    coupon = (await session.exec(query)).first()
+    coupon_filter.record_lookup(normalized_code, coupon is not None, generation)
+    return coupon
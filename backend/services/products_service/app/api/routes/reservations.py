@@ -0,0 +1,109 @@
+# Em api/routes/reservations.py
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.database import get_async_session
+from models.stock_reservation_model import StockReservation, StockReservationItem
+from schemas.reservation_schemas import ReservationCreate, ReservationItemRead, ReservationRead
+from services.stock_reservation import (
+    InsufficientStockError, ProductUnavailableError, ReservationNotFoundError, ReservationNotPendingError,
+    commit_reservation, get_reservation, release_reservation, reserve_stock,
+)
+
+RESERVATION_NOT_FOUND_DETAIL = "Reserva não encontrada"
+
+NOT_PENDING_DETAILS = {
+    "committed": "A reserva já foi confirmada.",
+    "released": "A reserva já foi liberada.",
+    "expired": "A reserva venceu e o estoque foi devolvido.",
+}
+
+router = APIRouter(
+    prefix="/reservations",
+    tags=["Reservations"],
+)
+
+
+def _to_read(
+    reservation: StockReservation, items: List[StockReservationItem], remaining: Optional[Dict[int, int]] = None,
+) -> ReservationRead:
+    remaining = remaining or {}
+    return ReservationRead(
+        id=reservation.id, status=reservation.status, created_at=reservation.created_at,
+        expires_at=reservation.expires_at, closed_at=reservation.closed_at,
+        items=[
+            ReservationItemRead(product_id=item.product_id, quantity=item.quantity, remaining_stock=remaining.get(item.product_id))
+            for item in items
+        ],
+    )
+
+
+async def create_reservation(
+    session: AsyncSession, items: Iterable[Tuple[int, int]], ttl_seconds: Optional[int],
+) -> ReservationRead:
+    """Reserva e confirma a transação; compartilhada com POST /products/{id}/reserve."""
+    try:
+        reservation, remaining = await reserve_stock(session, items, ttl_seconds)
+    except ProductUnavailableError as exc:
+        await session.rollback()
+        raise HTTPException(status_code=404, detail=f"Produto {exc.product_id} não encontrado")
+    except InsufficientStockError as exc:
+        await session.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail=f"Estoque insuficiente para o produto {exc.product_id} (disponível: {exc.available}).",
+        )
+    await session.commit()
+    _, reserved_items = await get_reservation(session, reservation.id)
+    return _to_read(reservation, reserved_items, remaining)
+
+
+async def _read(session: AsyncSession, reservation_id: str) -> ReservationRead:
+    try:
+        reservation, items = await get_reservation(session, reservation_id)
+    except ReservationNotFoundError:
+        raise HTTPException(status_code=404, detail=RESERVATION_NOT_FOUND_DETAIL)
+    return _to_read(reservation, items)
+
+
+@router.post("/", response_model=ReservationRead, status_code=status.HTTP_201_CREATED)
+async def create_batch_reservation(*, session: AsyncSession = Depends(get_async_session), reservation: ReservationCreate):
+    """Reserva vários produtos numa só transação: se um item não couber no estoque, nada é reservado (409)."""
+    items = [(item.product_id, item.quantity) for item in reservation.items]
+    return await create_reservation(session, items, reservation.ttl_seconds)
+
+
+@router.get("/{reservation_id}", response_model=ReservationRead)
+async def read_reservation(*, session: AsyncSession = Depends(get_async_session), reservation_id: str):
+    return await _read(session, reservation_id)
+
+
+@router.post("/{reservation_id}/commit", response_model=ReservationRead)
+async def commit_stock_reservation(*, session: AsyncSession = Depends(get_async_session), reservation_id: str):
+    """Confirma a baixa do estoque. Confirmar de novo devolve a reserva sem alterá-la."""
+    try:
+        await commit_reservation(session, reservation_id)
+    except ReservationNotFoundError:
+        raise HTTPException(status_code=404, detail=RESERVATION_NOT_FOUND_DETAIL)
+    except ReservationNotPendingError as exc:
+        # Uma reserva vencida é encerrada nesta mesma chamada: o estoque devolvido é gravado
+        await session.commit()
+        raise HTTPException(status_code=409, detail=NOT_PENDING_DETAILS[exc.status.value])
+    await session.commit()
+    return await _read(session, reservation_id)
+
+
+@router.post("/{reservation_id}/release", response_model=ReservationRead)
+async def release_stock_reservation(*, session: AsyncSession = Depends(get_async_session), reservation_id: str):
+    """Cancela a reserva e devolve o estoque. Liberar de novo, ou uma reserva vencida, não muda nada."""
+    try:
+        await release_reservation(session, reservation_id)
+    except ReservationNotFoundError:
+        raise HTTPException(status_code=404, detail=RESERVATION_NOT_FOUND_DETAIL)
+    except ReservationNotPendingError as exc:
+        raise HTTPException(status_code=409, detail=NOT_PENDING_DETAILS[exc.status.value])
+    await session.commit()
+    return await _read(session, reservation_id)
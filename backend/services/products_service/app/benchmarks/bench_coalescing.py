@@ -0,0 +1,103 @@
+"""
+Benchmark: listagem sob "manada" (muitas requisições idênticas ao mesmo tempo).
+
+Sobe o serviço (um worker) três vezes sobre o mesmo banco, mudando só
+COALESCING_ROUTES (core/coalescing.py):
+
+- sem: nenhuma rota coalescida, cada requisição faz as suas consultas;
+- coalescido: requisições simultâneas dividem uma execução;
+- retido: além disso, o resultado serve por '--hold' segundos depois de pronto.
+
+Em cada modo dispara '--waves' ondas de '--clients' GETs idênticos, todos de uma vez,
+e imprime quantas consultas SQL o servidor fez (somadas do header Server-Timing),
+consultas por requisição, p50 e p99. Uma onda de aquecimento antes de medir deixa o
+cache de contagens (core/counting.py) igual em todos os modos.
+
+Uso (a partir de app/):
+    python -m benchmarks.bench_coalescing
+    BENCH_DATABASE_URL=postgresql+psycopg://... python -m benchmarks.bench_coalescing --clients 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.bench_lookup import _queries
+from benchmarks.bench_workers import _free_port, _seed, _start_server, _wait_ready
+from benchmarks.load_test import percentile
+
+MODES = {
+    "sem": {},
+    "coalescido": {"products.list": 0.0},
+}
+
+
+async def _wave(client: httpx.AsyncClient, path: str, clients: int) -> tuple:
+    async def fetch() -> tuple:
+        started = time.perf_counter()
+        response = await client.get(path)
+        response.raise_for_status()
+        return time.perf_counter() - started, _queries(response)
+
+    results = await asyncio.gather(*(fetch() for _ in range(clients)))
+    return [latency for latency, _ in results], sum(queries for _, queries in results)
+
+
+async def _measure(base_url: str, path: str, clients: int, waves: int) -> dict:
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        # Aquecimento: conexões abertas e o COUNT em cache
+        await _wave(client, path, clients)
+        latencies, queries = [], 0
+        started = time.perf_counter()
+        for _ in range(waves):
+            wave_latencies, wave_queries = await _wave(client, path, clients)
+            latencies.extend(wave_latencies)
+            queries += wave_queries
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "queries": queries,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def main(path: str, clients: int, waves: int, hold: float) -> None:
+    database_url = os.environ.get("BENCH_DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp()}/bench_coalescing.db"
+    modes = {**MODES, "retido": {"products.list": hold}}
+    print(f"banco: {database_url.split('@')[-1]}  |  {clients} clientes x {waves} ondas  |  {path}")
+    print(f"{'modo':>11} | {'reqs':>6} | {'queries':>8} | {'q/req':>6} | {'req/s':>8} | {'p50 (ms)':>9} | {'p99 (ms)':>9}")
+    for index, (mode, routes) in enumerate(modes.items()):
+        port = _free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        server = _start_server(1, port, database_url, {"COALESCING_ROUTES": json.dumps(routes)})
+        try:
+            _wait_ready(base_url)
+            if index == 0 and "BENCH_DATABASE_URL" not in os.environ:
+                _seed(base_url)
+            result = asyncio.run(_measure(base_url, path, clients, waves))
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+        print(
+            f"{mode:>11} | {result['requests']:>6} | {result['queries']:>8} | {result['queries'] / result['requests']:>6.2f} "
+            f"| {result['rps']:>8.1f} | {result['p50_ms']:>9.2f} | {result['p99_ms']:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default="/api/v1/products/?limit=20&sortBy=price&sortOrder=asc")
+    parser.add_argument("--clients", type=int, default=200, help="requisições idênticas por onda")
+    parser.add_argument("--waves", type=int, default=20)
+    parser.add_argument("--hold", type=float, default=0.3, help="retenção do modo 'retido', em segundos")
+    args = parser.parse_args()
+    main(args.path, args.clients, args.waves, args.hold)
@@ -0,0 +1,114 @@
+"""
+Estresse do resgate de cupons: uso único garantido e vazão dos demais cupons.
+
+Contra um serviço já rodando (de preferência com Postgres), cria produtos e cupons
+novos e mede, em duas fases com o mesmo número de aplicações de cupons comuns:
+
+1. só aplicações de cupons comuns (linha de base);
+2. as mesmas aplicações misturadas a milhares de tentativas simultâneas de usar o
+   MESMO cupom 'one_shot'.
+
+Imprime req/s dos cupons comuns em cada fase e quantas tentativas do cupom de uso
+único venceram (tem que ser exatamente 1). Com o UPDATE condicional, a disputa
+fica restrita à linha daquele cupom e a vazão dos comuns praticamente não muda.
+
+Uso (a partir de app/):
+    python -m benchmarks.bench_coupon_redemption --base-url http://localhost:8001 --applications 2000
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+import httpx
+
+
+async def _create_coupon(client: httpx.AsyncClient, code: str, one_shot: bool) -> None:
+    now = datetime.utcnow()
+    response = await client.post("/api/v1/coupons/", json={
+        "code": code, "type": "fixed", "value": 1, "one_shot": one_shot,
+        "valid_from": (now - timedelta(days=1)).isoformat(), "valid_until": (now + timedelta(days=1)).isoformat(),
+    })
+    response.raise_for_status()
+
+
+async def _create_products(client: httpx.AsyncClient, prefix: str, count: int) -> List[int]:
+    body = "name,price,stock\n" + "".join(f"{prefix}-{i},100.00,10\n" for i in range(count))
+    response = await client.post("/api/v1/products/bulk", content=body, headers={"Content-Type": "text/csv"})
+    response.raise_for_status()
+    # Os produtos recém-importados são os de id mais alto: percorre do fim com cursor
+    ids, cursor = [], None
+    while len(ids) < count:
+        params = {"limit": 50, "count": "none", "sortBy": "id", "sortOrder": "desc"}
+        if cursor:
+            params["cursor"] = cursor
+        page = (await client.get("/api/v1/products/", params=params)).json()
+        ids.extend(row["id"] for row in page["data"] if row["name"].startswith(f"{prefix}-"))
+        cursor = page["meta"]["nextCursor"]
+        if not cursor:
+            break
+    return ids
+
+
+async def _apply_all(client: httpx.AsyncClient, jobs: List[Tuple[int, str]], concurrency: int) -> List[Tuple[str, int]]:
+    queue: asyncio.Queue = asyncio.Queue()
+    for job in jobs:
+        queue.put_nowait(job)
+    results: List[Tuple[str, int]] = []
+
+    async def worker():
+        while not queue.empty():
+            product_id, code = queue.get_nowait()
+            response = await client.post(f"/api/v1/products/{product_id}/discount/coupon", json={"code": code})
+            results.append((code, response.status_code))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
+
+
+async def main(base_url: str, applications: int, contenders: int, concurrency: int) -> None:
+    run = uuid.uuid4().hex[:6]
+    common_codes = [f"com{run}{i}" for i in range(4)]
+    one_shot_code = f"uni{run}"
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        for code in common_codes:
+            await _create_coupon(client, code, one_shot=False)
+        await _create_coupon(client, one_shot_code, one_shot=True)
+        baseline_ids = await _create_products(client, f"base{run}", applications)
+        mixed_ids = await _create_products(client, f"mix{run}", applications)
+        contender_ids = await _create_products(client, f"uni{run}", contenders)
+
+        baseline_jobs = [(pid, common_codes[i % len(common_codes)]) for i, pid in enumerate(baseline_ids)]
+        started = time.perf_counter()
+        await _apply_all(client, baseline_jobs, concurrency)
+        baseline_rps = len(baseline_jobs) / (time.perf_counter() - started)
+
+        common_jobs = [(pid, common_codes[i % len(common_codes)]) for i, pid in enumerate(mixed_ids)]
+        contender_jobs = [(pid, one_shot_code) for pid in contender_ids]
+        # Intercala as duas cargas para que disputem o servidor ao mesmo tempo
+        mixed_jobs = [job for pair in zip(common_jobs, contender_jobs) for job in pair]
+        mixed_jobs += common_jobs[len(contender_jobs):] + contender_jobs[len(common_jobs):]
+        started = time.perf_counter()
+        results = await _apply_all(client, mixed_jobs, concurrency)
+        elapsed = time.perf_counter() - started
+
+    common_ok = sum(1 for code, status in results if code != one_shot_code and status == 200)
+    winners = sum(1 for code, status in results if code == one_shot_code and status == 200)
+    print(f"cupons comuns, sozinhos:        {baseline_rps:9.1f} req/s")
+    print(f"cupons comuns, com disputa:     {common_ok / elapsed:9.1f} req/s (aprox.; {common_ok} sucessos)")
+    print(f"tentativas no cupom one_shot:   {len(contender_jobs):9d} (vencedoras: {winners})")
+    if winners != 1:
+        raise SystemExit("ERRO: o cupom de uso único não foi consumido exatamente uma vez")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--applications", type=int, default=2000, help="aplicações de cupons comuns por fase")
+    parser.add_argument("--contenders", type=int, default=2000, help="tentativas simultâneas no cupom one_shot")
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.base_url, args.applications, args.contenders, args.concurrency))
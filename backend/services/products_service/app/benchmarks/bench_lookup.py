@@ -0,0 +1,112 @@
+"""
+Benchmark: um GET por item x uma busca em lote (/lookup).
+
+Contra um serviço já rodando e populado (benchmarks/generate_catalog.py), monta
+"carrinhos" de 10, 100 e 1000 itens e busca os produtos (e, em separado, cupons) de
+três jeitos:
+
+- get_sequencial: um GET /products/{id} atrás do outro, como os serviços de carrinho
+  e pedido fazem hoje;
+- get_paralelo: os mesmos GETs com '--concurrency' requisições simultâneas;
+- lookup: um único POST /products/lookup (ou /coupons/lookup).
+
+Imprime a mediana do tempo por carrinho e quantas consultas SQL o servidor fez (lido
+do header Server-Timing). Cada rodada sorteia outro carrinho, mas os GETs
+individuais ainda podem acertar o cache de leituras do servidor: para comparar só o
+banco, suba o serviço com CACHE_BACKEND=none.
+
+Uso (a partir de app/):
+    python -m benchmarks.bench_lookup --base-url http://localhost:8001
+    python -m benchmarks.bench_lookup --base-url http://localhost:8001 --sizes 100 --rounds 20
+"""
+import argparse
+import asyncio
+import random
+import re
+import statistics
+import time
+from typing import Callable, List
+
+import httpx
+
+from benchmarks.load_scenarios import API, load_context
+
+_QUERIES = re.compile(r'db;desc="(\d+) queries"')
+
+
+def _queries(response: httpx.Response) -> int:
+    match = _QUERIES.search(response.headers.get("server-timing", ""))
+    return int(match.group(1)) if match else 0
+
+
+async def _get_each(client: httpx.AsyncClient, paths: List[str], concurrency: int) -> int:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(path: str) -> int:
+        async with semaphore:
+            response = await client.get(path)
+            response.raise_for_status()
+            return _queries(response)
+
+    return sum(await asyncio.gather(*(fetch(path) for path in paths)))
+
+
+async def _lookup(client: httpx.AsyncClient, path: str, body: dict) -> int:
+    response = await client.post(path, json=body)
+    response.raise_for_status()
+    return _queries(response)
+
+
+async def _measure(run: Callable, rounds: int) -> tuple:
+    timings, queries = [], 0
+    for _ in range(rounds):
+        started = time.perf_counter()
+        queries = await run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), queries
+
+
+async def main(base_url: str, sizes: List[int], rounds: int, concurrency: int, seed: int) -> None:
+    rng = random.Random(seed)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        context = await load_context(client, seed)
+        print(f"{'recurso':>8} | {'itens':>6} | {'método':>15} | {'ms/carrinho':>12} | {'idas':>6} | {'queries':>8}")
+        for resource, keys, single_path, lookup_path, body_key in (
+            ("produtos", context.product_ids, "/products/{}", "/products/lookup", "ids"),
+            ("cupons", context.coupon_codes, "/coupons/{}", "/coupons/lookup", "codes"),
+        ):
+            for size in sizes:
+                if size > len(keys):
+                    print(f"{resource:>8} | {size:>6} | amostra com só {len(keys)} chaves, pulando")
+                    continue
+
+                def cart() -> list:
+                    return rng.sample(keys, size)
+
+                methods = {
+                    "get_sequencial": (lambda: _get_each(client, [API + single_path.format(k) for k in cart()], 1), size),
+                    "get_paralelo": (
+                        lambda: _get_each(client, [API + single_path.format(k) for k in cart()], concurrency), size,
+                    ),
+                    "lookup": (lambda: _lookup(client, API + lookup_path, {body_key: cart()}), 1),
+                }
+                baseline = None
+                for name, (run, round_trips) in methods.items():
+                    median_ms, queries = await _measure(run, rounds)
+                    baseline = baseline or median_ms
+                    print(
+                        f"{resource:>8} | {size:>6} | {name:>15} | {median_ms:>12.2f} | {round_trips:>6} | {queries:>8}"
+                        f"   ({baseline / median_ms:.1f}x)"
+                    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    asyncio.run(main(args.base_url, args.sizes, args.rounds, args.concurrency, args.seed))
@@ -0,0 +1,86 @@
+"""
+Micro-benchmark: mapeamento por linha x mapeamento em lote de produtos.
+
+Compara 'map_product_to_read_schema' (Decimal + validação de um ProductRead por
+linha) com 'map_products_to_read_rows' (centavos inteiros + dicionários) em 50
+linhas (uma página), 10 mil e 1 milhão (exportação grande). Mede o mapeamento
+sozinho e o caminho completo até o JSON, imitando o que o FastAPI faz com o
+retorno da rota (dump do modelo, validação contra o response_model e serialização).
+Os produtos são montados em memória, sem banco.
+
+Uso (a partir de app/):
+    python -m benchmarks.bench_mapping
+    python -m benchmarks.bench_mapping --sizes 50 10000
+"""
+import argparse
+import random
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from core.utils import map_product_to_read_schema, map_products_to_read_rows
+from models.coupon_model import CouponType
+from models.product_model import Product
+from schemas.product_schemas import PaginatedMetadata, ProductPage
+
+
+def build_products(total: int, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    products = []
+    for i in range(total):
+        discount_type = rng.choice([None, CouponType.percent, CouponType.fixed])
+        discount_value = None
+        if discount_type == CouponType.percent:
+            discount_value = Decimal(rng.randint(100, 8000)).scaleb(-2)
+        elif discount_type == CouponType.fixed:
+            discount_value = Decimal(rng.randint(100, 5000)).scaleb(-2)
+        products.append(Product(
+            id=i + 1, name=f"Produto {i}", description="Descrição", price=Decimal(rng.randint(100, 100000)).scaleb(-2),
+            stock=rng.randint(0, 50), created_at=now, discount_type=discount_type, discount_value=discount_value,
+        ))
+    return products
+
+
+def _best_of(function, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _per_row_response(products: list, meta: PaginatedMetadata) -> bytes:
+    page = ProductPage(data=[map_product_to_read_schema(p) for p in products], meta=meta)
+    return ProductPage.model_validate(page.model_dump()).model_dump_json().encode()
+
+
+def _batch_response(products: list, meta: PaginatedMetadata) -> bytes:
+    content = {"data": map_products_to_read_rows(products), "meta": meta.model_dump()}
+    return ProductPage.model_validate(content).model_dump_json().encode()
+
+
+def run(sizes) -> None:
+    print(
+        f"{'linhas':>9} | {'map por linha':>14} | {'map em lote':>12} | "
+        f"{'JSON por linha':>15} | {'JSON em lote':>13} | {'ganho':>6}"
+    )
+    for size in sizes:
+        products = build_products(size)
+        meta = PaginatedMetadata(page=1, limit=size, totalItems=size, totalPages=1)
+        repeat = 5 if size <= 10_000 else 1
+        map_per_row = _best_of(lambda: [map_product_to_read_schema(p) for p in products], repeat)
+        map_batch = _best_of(lambda: map_products_to_read_rows(products), repeat)
+        json_per_row = _best_of(lambda: _per_row_response(products, meta), repeat)
+        json_batch = _best_of(lambda: _batch_response(products, meta), repeat)
+        print(
+            f"{size:>9} | {map_per_row * 1000:>11.2f} ms | {map_batch * 1000:>9.2f} ms | "
+            f"{json_per_row * 1000:>12.2f} ms | {json_batch * 1000:>10.2f} ms | {json_per_row / json_batch:>5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do mapeamento de produtos")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 10_000, 1_000_000])
+    run(parser.parse_args().sizes)
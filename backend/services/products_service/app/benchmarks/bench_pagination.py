@@ -0,0 +1,87 @@
+"""
+Benchmark: paginação por OFFSET x paginação por cursor (keyset).
+
+Popula um banco com produtos suficientes para 10.000 páginas e mede a latência
+da consulta da página em vários pontos do catálogo. Com OFFSET o tempo cresce
+com o número da página; com o cursor ele deve ficar plano.
+
+Uso (a partir de app/):
+    python -m benchmarks.bench_pagination                      # SQLite em arquivo temporário
+    BENCH_DATABASE_URL=postgresql+psycopg://... python -m benchmarks.bench_pagination
+"""
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import insert
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from core.pagination import apply_keyset, order_by_keyset
+from models.coupon_model import Coupon  # noqa: F401  (registra a tabela referenciada pela FK)
+from models.product_model import Product
+
+LIMIT = 10
+PAGES = [1, 10, 100, 1_000, 10_000]
+REPEAT = 20
+
+
+def seed(engine, total: int) -> None:
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    start = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        batch = []
+        for i in range(total):
+            batch.append({
+                "name": f"Produto {i:07d}",
+                "description": None,
+                "price": Decimal(10 + i % 500),
+                "stock": i % 100,
+                # Timestamps repetidos de propósito, para exercitar o desempate por id
+                "created_at": start + timedelta(seconds=i // 3),
+            })
+            if len(batch) == 10_000:
+                conn.execute(insert(Product.__table__), batch)
+                batch.clear()
+        if batch:
+            conn.execute(insert(Product.__table__), batch)
+
+
+def _timed(session: Session, query) -> float:
+    samples = []
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        session.exec(query).all()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def run(engine) -> None:
+    column = Product.__table__.c.created_at
+    base = order_by_keyset(select(Product).where(Product.deleted_at == None), column, Product.id, True)
+    print(f"{'página':>8} | {'offset (ms)':>12} | {'cursor (ms)':>12}")
+    with Session(engine) as session:
+        for page in PAGES:
+            offset = (page - 1) * LIMIT
+            offset_ms = _timed(session, base.offset(offset).limit(LIMIT))
+            if page == 1:
+                cursor_ms = _timed(session, base.limit(LIMIT))
+            else:
+                # Última linha da página anterior = o que viria codificado no 'nextCursor'
+                last = session.exec(base.offset(offset - 1).limit(1)).one()
+                cursor_ms = _timed(
+                    session, apply_keyset(base, column, Product.id, True, last.created_at, last.id).limit(LIMIT)
+                )
+            print(f"{page:>8} | {offset_ms:>12.3f} | {cursor_ms:>12.3f}")
+
+
+if __name__ == "__main__":
+    url = os.environ.get("BENCH_DATABASE_URL")
+    if not url:
+        url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_pagination.db')}"
+    bench_engine = create_engine(url)
+    seed(bench_engine, PAGES[-1] * LIMIT)
+    run(bench_engine)
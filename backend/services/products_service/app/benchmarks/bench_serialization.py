@@ -0,0 +1,79 @@
+"""
+Micro-benchmark: serialização das listagens e da exportação.
+
+Compara, sobre as mesmas linhas de 'map_products_to_read_rows':
+
+- página (50 itens): o caminho padrão do FastAPI (validação contra o ProductPage,
+  dump em modo JSON e json.dumps do JSONResponse) x orjson direto, sem a segunda
+  validação (API_SKIP_RESPONSE_VALIDATION, core/serialization.py);
+- exportação NDJSON (10 mil linhas): getattr + json.dumps por linha com conversão
+  manual de Decimal/datetime/enum x leitura do __dict__ + orjson por linha.
+
+Os dois caminhos precisam produzir o mesmo JSON; o benchmark confere antes de medir.
+
+Uso (a partir de app/):
+    python -m benchmarks.bench_serialization
+    python -m benchmarks.bench_serialization --page-size 50 --export-rows 100000
+"""
+import argparse
+import json
+
+import orjson
+
+from benchmarks.bench_mapping import _best_of, build_products
+from core.serialization import dumps
+from core.utils import map_products_to_read_rows
+from schemas.product_schemas import ProductPage
+from services.product_service import EXPORT_COLUMNS, _export_value, export_row
+
+
+def _validated_page(content: dict) -> bytes:
+    # O que o FastAPI faz com o retorno da rota quando há response_model + JSONResponse
+    data = ProductPage.model_validate(content).model_dump(mode="json")
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def _stdlib_export(products: list) -> bytes:
+    return "".join(
+        json.dumps({column: _export_value(getattr(product, column)) for column in EXPORT_COLUMNS}, ensure_ascii=False)
+        + "\n"
+        for product in products
+    ).encode()
+
+
+def _orjson_export(products: list) -> bytes:
+    return b"".join(dumps(export_row(product), orjson.OPT_APPEND_NEWLINE) for product in products)
+
+
+def main(page_size: int, export_rows: int, repeat: int) -> None:
+    page_products = build_products(page_size)
+    meta = {"page": 1, "limit": page_size, "totalItems": 10_000, "totalPages": 200, "nextCursor": "abc"}
+    content = {"data": map_products_to_read_rows(page_products), "meta": meta}
+    assert json.loads(_validated_page(content)) == orjson.loads(dumps(content))
+
+    export_products = build_products(export_rows)
+    for product in export_products:
+        product.final_price = product.price
+    stdlib_lines = _stdlib_export(export_products).splitlines()
+    orjson_lines = _orjson_export(export_products).splitlines()
+    assert [json.loads(line) for line in stdlib_lines] == [orjson.loads(line) for line in orjson_lines]
+
+    print(f"{'caso':<34} | {'padrão (ms)':>11} | {'orjson (ms)':>11} | {'ganho':>6}")
+    cases = [
+        (f"página de {page_size} itens", lambda: _validated_page(content), lambda: dumps(content)),
+        (f"exportação NDJSON de {export_rows} linhas",
+         lambda: _stdlib_export(export_products), lambda: _orjson_export(export_products)),
+    ]
+    for name, baseline, fast in cases:
+        baseline_seconds, fast_seconds = _best_of(baseline, repeat), _best_of(fast, repeat)
+        print(f"{name:<34} | {baseline_seconds * 1000:>11.3f} | {fast_seconds * 1000:>11.3f} "
+              f"| {baseline_seconds / fast_seconds:>5.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--export-rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.page_size, args.export_rows, args.repeat)
@@ -0,0 +1,75 @@
+"""
+Benchmark: boot a frio de um worker (importações + lifespan).
+
+Migra um banco novo (ou usa BENCH_DATABASE_URL, já migrado) e sobe o app '--runs'
+vezes, cada uma num processo Python novo, medindo o tempo das importações e do
+lifespan até o worker estar pronto. Imprime cada rodada e a melhor delas, que
+descarta o ruído de uma máquina ocupada, não o custo do boot. A maior parte do
+tempo é importar FastAPI/SQLAlchemy/Pydantic; o lifespan só confere a revisão do
+schema (ver core/schema.py).
+
+Uso (a partir de app/):
+    python -m benchmarks.bench_startup
+    BENCH_DATABASE_URL=postgresql+psycopg://... python -m benchmarks.bench_startup --runs 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from core.schema import APP_DIR, upgrade_schema
+
+_STARTUP_SCRIPT = """
+import json, time
+started = time.perf_counter()
+from fastapi.testclient import TestClient
+import main
+imported = time.perf_counter()
+with TestClient(main.app) as client:
+    ready = time.perf_counter()
+    assert client.get("/").status_code == 200
+print(json.dumps({"import": imported - started, "lifespan": ready - imported, "total": ready - started}))
+"""
+
+
+def _boot(database_url: str) -> dict:
+    env = {**os.environ, "DATABASE_URL": database_url, "COUPON_SWEEP_ENABLED": "false"}
+    completed = subprocess.run(
+        [sys.executable, "-c", _STARTUP_SCRIPT], cwd=APP_DIR, env=env, capture_output=True, text=True, timeout=60,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main(runs: int) -> None:
+    database_url = os.environ.get("BENCH_DATABASE_URL")
+    if database_url is None:
+        database_url = f"sqlite:///{tempfile.mkdtemp()}/bench_startup.db"
+        # As configurações exigem DATABASE_URL mesmo com a URL passada explicitamente
+        os.environ.setdefault("DATABASE_URL", database_url)
+        upgrade_schema(database_url)
+    print(f"banco: {database_url.split('@')[-1]}  |  {runs} rodadas")
+    print(f"{'rodada':>7} | {'import (ms)':>11} | {'lifespan (ms)':>13} | {'total (ms)':>10}")
+    timings = []
+    for index in range(runs):
+        timing = _boot(database_url)
+        timings.append(timing)
+        print(
+            f"{index + 1:>7} | {timing['import'] * 1000:>11.1f} | {timing['lifespan'] * 1000:>13.1f} "
+            f"| {timing['total'] * 1000:>10.1f}"
+        )
+    best = min(timings, key=lambda timing: timing["total"])
+    print(
+        f"{'melhor':>7} | {best['import'] * 1000:>11.1f} | {best['lifespan'] * 1000:>13.1f} "
+        f"| {best['total'] * 1000:>10.1f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    main(args.runs)
@@ -0,0 +1,86 @@
+"""
+Estresse das reservas de estoque num único produto "quente".
+
+Contra um serviço já rodando (de preferência com Postgres), cria um produto com
+'--stock' unidades e dispara '--attempts' reservas de uma unidade com '--concurrency'
+requisições simultâneas, todas disputando a mesma linha. Imprime:
+
+- reservas por segundo (aceitas e recusadas, que também custam uma ida ao banco);
+- quantas foram aceitas: tem que ser exatamente min(stock, attempts), e o estoque
+  final tem que fechar com elas (sem venda além do estoque nem baixa perdida).
+
+Depois confirma metade das reservas aceitas e libera a outra metade, conferindo que
+o estoque volta na medida certa.
+
+Uso (a partir de app/):
+    python -m benchmarks.bench_stock_reservation --base-url http://localhost:8001 --stock 1000 --attempts 5000
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from typing import List, Tuple
+
+import httpx
+
+
+async def _run_all(client: httpx.AsyncClient, paths: List[str], concurrency: int, body=None) -> List[Tuple[int, dict]]:
+    queue: asyncio.Queue = asyncio.Queue()
+    for path in paths:
+        queue.put_nowait(path)
+    results: List[Tuple[int, dict]] = []
+
+    async def worker():
+        while not queue.empty():
+            path = queue.get_nowait()
+            response = await client.post(path, json=body)
+            results.append((response.status_code, response.json()))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
+
+
+async def main(base_url: str, stock: int, attempts: int, concurrency: int) -> None:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        created = await client.post("/api/v1/products/", json={
+            "name": f"Hot {uuid.uuid4().hex[:8]}", "price": "99.90", "stock": stock,
+        })
+        created.raise_for_status()
+        product_id = created.json()["id"]
+
+        started = time.perf_counter()
+        results = await _run_all(
+            client, [f"/api/v1/products/{product_id}/reserve"] * attempts, concurrency, body={"quantity": 1},
+        )
+        elapsed = time.perf_counter() - started
+
+        accepted = [body["id"] for status, body in results if status == 201]
+        rejected = sum(1 for status, _ in results if status == 409)
+        errors = len(results) - len(accepted) - rejected
+        remaining = (await client.get(f"/api/v1/products/{product_id}")).json()["stock"]
+
+        print(f"produto {product_id}: estoque inicial {stock}, {attempts} tentativas, concorrência {concurrency}")
+        print(f"reservas por segundo:     {attempts / elapsed:9.1f} req/s ({len(accepted) / elapsed:.1f} aceitas/s)")
+        print(f"aceitas / recusadas:      {len(accepted):9d} / {rejected} (erros: {errors})")
+        print(f"estoque restante:         {remaining:9d}")
+        if len(accepted) != min(stock, attempts) or remaining != stock - len(accepted):
+            raise SystemExit("ERRO: o número de reservas aceitas não fecha com o estoque")
+
+        half = len(accepted) // 2
+        await _run_all(client, [f"/api/v1/reservations/{rid}/commit" for rid in accepted[:half]], concurrency)
+        await _run_all(client, [f"/api/v1/reservations/{rid}/release" for rid in accepted[half:]], concurrency)
+        restored = (await client.get(f"/api/v1/products/{product_id}")).json()["stock"]
+        print(f"após confirmar {half} e liberar {len(accepted) - half}: estoque {restored}")
+        if restored != stock - half:
+            raise SystemExit("ERRO: a liberação não devolveu o estoque esperado")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--stock", type=int, default=1000)
+    parser.add_argument("--attempts", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.base_url, args.stock, args.attempts, args.concurrency))
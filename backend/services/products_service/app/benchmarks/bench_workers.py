@@ -0,0 +1,110 @@
+"""
+Benchmark: vazão do serve.py com 1..N workers.
+
+Para cada número de workers sobe o serviço com 'python serve.py' numa porta
+livre, espera ficar de pé, mede req/s e p99 com o harness de carga
+(benchmarks/load_test.py) e derruba o processo. A listagem é limitada por CPU
+(serialização do JSON, validação), então com um worker a vazão para em um núcleo;
+com N workers ela deve crescer quase linearmente até o número de núcleos ou até
+o banco virar o gargalo.
+
+Use o Postgres para um resultado representativo (o SQLite serializa as escritas
+e compartilha um arquivo entre os processos) e rode o gerador de carga em outra
+máquina, ou reserve núcleos para ele, para que não dispute CPU com o servidor.
+
+Uso (a partir de app/):
+    BENCH_DATABASE_URL=postgresql+psycopg://... python -m benchmarks.bench_workers --workers 1 2 4 8
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+import httpx
+
+from benchmarks.load_test import run_level
+
+SEED_PRODUCTS = 500
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(workers: int, port: int, database_url: str, extra_env: Optional[dict] = None) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "SERVER_HOST": "127.0.0.1",
+        "SERVER_PORT": str(port),
+        "SERVER_WORKERS": str(workers),
+        "COUPON_SWEEP_ENABLED": "false",
+        "DB_MIGRATE_ON_START": "true",
+        **(extra_env or {}),
+    }
+    app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return subprocess.Popen(
+        [sys.executable, "serve.py"], cwd=app_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def _wait_ready(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"o serviço em {base_url} não subiu em {timeout:.0f}s")
+
+
+def _seed(base_url: str) -> None:
+    body = "name,price,stock\n" + "".join(f"Bench {i:05d},{10 + i % 90}.90,{i % 50}\n" for i in range(SEED_PRODUCTS))
+    httpx.post(
+        f"{base_url}/api/v1/products/bulk", content=body, headers={"Content-Type": "text/csv"}, timeout=60,
+    ).raise_for_status()
+
+
+def main(worker_counts: List[int], path: str, concurrency: int, duration: float) -> None:
+    database_url = os.environ.get("BENCH_DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp()}/bench_workers.db"
+    print(f"núcleos disponíveis: {os.cpu_count()}  |  banco: {database_url.split('@')[-1]}")
+    print(f"{'workers':>7} | {'req/s':>9} | {'x 1 worker':>10} | {'p50 (ms)':>9} | {'p99 (ms)':>9} | {'erros':>6}")
+    baseline = None
+    for index, workers in enumerate(worker_counts):
+        port = _free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        server = _start_server(workers, port, database_url)
+        try:
+            _wait_ready(base_url)
+            if index == 0:
+                _seed(base_url)
+            # Aquecimento: conexões do pool abertas e caminhos quentes carregados em todos os workers
+            asyncio.run(run_level(base_url, path, concurrency, min(duration, 2.0)))
+            result = asyncio.run(run_level(base_url, path, concurrency, duration))
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+        baseline = baseline or result["rps"]
+        print(
+            f"{workers:>7} | {result['rps']:>9.1f} | {result['rps'] / baseline:>10.2f} | {result['p50_ms']:>9.2f} "
+            f"| {result['p99_ms']:>9.2f} | {result['errors']:>6}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--path", default="/api/v1/products/?limit=20&count=none")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=10.0, help="segundos por medição")
+    args = parser.parse_args()
+    main(args.workers, args.path, args.concurrency, args.duration)
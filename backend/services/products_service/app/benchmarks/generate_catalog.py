@@ -0,0 +1,404 @@
+"""
+Gerador de catálogo sintético para benchmarks: produtos e cupons em volume.
+
+Popula o banco (já migrado, ou migrado aqui com 'alembic upgrade head') com
+10 mil, 1 milhão ou 10 milhões de produtos e os cupons correspondentes, com
+distribuições parecidas com as de um catálogo real:
+
+- nomes "categoria + marca + linha + modelo", com categorias e marcas em
+  distribuição de Zipf (poucas muito comuns, muitas raras): buscas por termo têm
+  seletividades bem diferentes, como em produção;
+- descrições de tamanho variável (15% vazias), montadas de frases-modelo;
+- preços log-normais (mediana ~R$ 60, cauda até milhares), 12% sem estoque,
+  ~30% com desconto (percentual, fixo ou de cupom) e 3% deletados;
+- cupons percentuais e fixos, com parte vencida, parte de uso único e parte deletada.
+
+É determinístico ('--seed'): o mesmo comando gera o mesmo catálogo, então números
+de rodadas diferentes são comparáveis. No Postgres usa COPY (ordem de 10^5
+linhas/s); nos outros bancos, INSERTs em lote numa única transação. Os ids
+continuam a partir dos existentes, então dá para rodar de novo sobre o mesmo banco
+(com outro '--seed' para não repetir nomes e códigos).
+
+Uso (a partir de app/):
+    python -m benchmarks.generate_catalog --products 10k
+    BENCH_DATABASE_URL=postgresql+psycopg://... python -m benchmarks.generate_catalog --products 1M
+    BENCH_DATABASE_URL=postgresql+psycopg://... python -m benchmarks.generate_catalog --products 10M --coupons 50k
+"""
+import argparse
+import math
+import os
+import random
+import time
+from contextlib import contextmanager
+from bisect import bisect
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import accumulate
+from typing import Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy import func, select, text
+from sqlalchemy.engine import Engine
+from sqlmodel import create_engine
+
+from core.schema import upgrade_schema
+from core.search import SQLITE_SEARCH_DDL
+from models.collection_version_model import VERSIONED_COLLECTIONS, CollectionVersion
+from models.coupon_model import Coupon, CouponType
+from models.product_model import Product
+
+BATCH_SIZE = 10_000
+DESCRIPTION_VARIANTS = 16
+SIZE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+CATEGORIES = [
+    "Camiseta", "Tênis", "Fone de Ouvido", "Notebook", "Smartphone", "Cafeteira", "Mochila", "Relógio",
+    "Cadeira", "Luminária", "Livro", "Panela", "Teclado", "Mouse", "Monitor", "Garrafa Térmica", "Jaqueta",
+    "Perfume", "Carregador", "Caixa de Som", "Tablet", "Bicicleta", "Barraca", "Liquidificador", "Aspirador",
+    "Câmera", "Impressora", "Travesseiro", "Toalha", "Óculos de Sol", "Bermuda", "Vestido", "Sandália",
+    "Boné", "Carteira", "Controle", "Roteador", "Ventilador", "Fritadeira", "Micro-ondas",
+]
+BRANDS = [
+    "Aurora", "Boreal", "Cardeal", "Delta", "Estrela", "Faro", "Gaia", "Horizonte", "Iguaçu", "Jade",
+    "Kairós", "Lume", "Maré", "Norte", "Orion", "Prisma", "Quartzo", "Rubi", "Sertão", "Tupã", "Urbe",
+    "Vértice", "Xingu", "Zênite", "Alvorada", "Brisa", "Cobalto", "Duna", "Eco", "Fênix",
+]
+LINES = ["", "", "Pro", "Max", "Lite", "Plus", "Ultra", "Mini", "Slim", "Sport", "Classic", "Air", "Neo", "X"]
+COLORS = ["preto", "branco", "azul", "vermelho", "cinza", "verde", "grafite", "rosa", "bege", "prata"]
+MATERIALS = ["algodão", "alumínio", "aço inox", "plástico reciclado", "couro", "bambu", "vidro temperado", "nylon"]
+SENTENCES = [
+    "Produto {brand} na cor {color}, com acabamento em {material}.",
+    "Ideal para o dia a dia: leve, resistente e fácil de limpar.",
+    "Garantia de {months} meses contra defeitos de fabricação.",
+    "Acompanha manual em português e embalagem reciclável.",
+    "Modelo {line} com desempenho superior ao da geração anterior.",
+    "Compatível com os principais acessórios da linha {brand}.",
+    "Dimensões compactas, ótimo para espaços pequenos.",
+    "Feito em {material}, pensado para durar anos de uso intenso.",
+    "Mais vendido da categoria {category} no último trimestre.",
+    "Disponível também em outras cores; confira as variações.",
+]
+
+
+def parse_size(value: str) -> int:
+    """'10k' -> 10000, '1M' -> 1000000, '2500' -> 2500."""
+    value = value.strip().lower().replace("_", "")
+    if value and value[-1] in SIZE_SUFFIXES:
+        return int(float(value[:-1]) * SIZE_SUFFIXES[value[-1]])
+    return int(value)
+
+
+def _zipf_cumulative(count: int, exponent: float = 1.1) -> List[float]:
+    """Pesos acumulados de uma distribuição de Zipf, para sortear com bisect."""
+    return list(accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+def _to_base36(number: int) -> str:
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    encoded = ""
+    while True:
+        number, remainder = divmod(number, 36)
+        encoded = digits[remainder] + encoded
+        if number == 0:
+            return encoded
+
+
+def _final_price_cents(price_cents: int, discount_type: Optional[str], discount_cents: Optional[int]) -> int:
+    """Mesmas regras de 'calculate_final_price' (ROUND_HALF_UP e piso de 0.01), em centavos inteiros."""
+    if discount_type == CouponType.percent.value:
+        # price - price * pct / 100, com pct em centésimos: tudo em múltiplos de 1/10000 de centavo
+        final = (price_cents * 10_000 - price_cents * discount_cents + 5_000) // 10_000
+    elif discount_type == CouponType.fixed.value:
+        final = price_cents - discount_cents
+    else:
+        final = price_cents
+    return max(1, final)
+
+
+def _cents(value: int) -> Decimal:
+    return Decimal(value).scaleb(-2)
+
+
+class CatalogGenerator:
+    """Gera as linhas (dicionários prontos para o INSERT) de forma determinística."""
+
+    def __init__(self, seed: int, now: datetime):
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.now = now
+        self._category_weights = _zipf_cumulative(len(CATEGORIES))
+        self._brand_weights = _zipf_cumulative(len(BRANDS), exponent=0.9)
+        # Descrições variam por categoria e marca; montar cada uma do zero custaria mais
+        # que o resto da linha, então cada par reaproveita algumas variações sorteadas
+        self._descriptions: Dict[tuple, List[Optional[str]]] = {}
+
+    def _pick(self, items: List[str], cumulative: List[float]) -> str:
+        return items[bisect(cumulative, self.rng.random() * cumulative[-1])]
+
+    def coupons(self, first_id: int, total: int) -> Iterator[dict]:
+        rng = self.rng
+        for offset in range(total):
+            coupon_id = first_id + offset
+            is_percent = rng.random() < 0.7
+            value_cents = rng.choice([500, 1000, 1000, 1500, 2000, 2500, 3000, 5000]) if is_percent \
+                else rng.choice([500, 1000, 2000, 2500, 5000, 10_000])
+            # 20% vencidos, o resto válido por mais 1 a 180 dias; sempre com início antes do fim
+            if rng.random() < 0.2:
+                valid_until = self.now - timedelta(days=rng.randint(1, 30))
+                valid_from = valid_until - timedelta(days=rng.randint(1, 365))
+            else:
+                valid_until = self.now + timedelta(days=rng.randint(1, 180))
+                valid_from = self.now - timedelta(days=rng.randint(1, 365))
+            deleted = rng.random() < 0.03
+            yield {
+                "id": coupon_id,
+                # Único por id e por seed; até 20 caracteres alfanuméricos
+                "code": f"c{_to_base36(self.seed)}x{_to_base36(coupon_id)}"[:20],
+                "type": CouponType.percent.value if is_percent else CouponType.fixed.value,
+                "value": _cents(value_cents),
+                "one_shot": rng.random() < 0.1,
+                "valid_from": valid_from,
+                "valid_until": valid_until,
+                "created_at": valid_from - timedelta(hours=rng.randint(0, 72)),
+                "deleted_at": self.now - timedelta(days=rng.randint(0, 30)) if deleted else None,
+                "redeemed_at": None,
+                "discounts_released_at": None,
+                "version": 1,
+            }
+
+    def _description(self, category: str, brand: str, line: str) -> Optional[str]:
+        rng = self.rng
+        if rng.random() < 0.15:
+            return None
+        variants = self._descriptions.setdefault((category, brand), [])
+        if len(variants) >= DESCRIPTION_VARIANTS:
+            return variants[rng.randrange(DESCRIPTION_VARIANTS)]
+        # 1 a 6 frases, a maioria curta
+        sentences = rng.sample(SENTENCES, k=min(len(SENTENCES), 1 + int(rng.expovariate(0.7))))
+        description = " ".join(sentence.format(
+            brand=brand, color=rng.choice(COLORS), material=rng.choice(MATERIALS), months=rng.choice([3, 6, 12, 24]),
+            line=line or "padrão", category=category.lower(),
+        ) for sentence in sentences)
+        variants.append(description)
+        return description
+
+    def products(self, first_id: int, total: int, coupons: List[dict]) -> Iterator[dict]:
+        rng = self.rng
+        active_coupons = [coupon for coupon in coupons if coupon["deleted_at"] is None]
+        # Datas de criação crescentes com o id, espalhadas pelos últimos 2 anos
+        start = self.now - timedelta(days=730)
+        step = timedelta(days=730) / max(total, 1)
+        for offset in range(total):
+            product_id = first_id + offset
+            category = self._pick(CATEGORIES, self._category_weights)
+            brand = self._pick(BRANDS, self._brand_weights)
+            line = LINES[rng.randrange(len(LINES))]
+            # O sufixo (id em base 36) garante nomes únicos sem pesar na busca
+            name = " ".join(part for part in (category, brand, line, _to_base36(product_id).upper()) if part)
+
+            price_cents = min(9_999_999, max(100, int(math.exp(rng.gauss(8.7, 1.2)))))
+            stock = 0 if rng.random() < 0.12 else min(10_000, int(rng.expovariate(1 / 40)) + 1)
+
+            discount_type = discount_cents = coupon_id = None
+            roll = rng.random()
+            if roll < 0.05 and active_coupons:
+                coupon = rng.choice(active_coupons)
+                discount_type, coupon_id = coupon["type"], coupon["id"]
+                discount_cents = int(coupon["value"] * 100)
+            elif roll < 0.22:
+                discount_type, discount_cents = CouponType.percent.value, rng.randint(1, 80) * 100
+            elif roll < 0.30:
+                discount_type, discount_cents = CouponType.fixed.value, rng.randint(1, max(1, price_cents // 2))
+
+            created_at = start + step * offset
+            yield {
+                "id": product_id,
+                "name": name,
+                "description": self._description(category, brand, line),
+                "price": _cents(price_cents),
+                "stock": stock,
+                "created_at": created_at,
+                "deleted_at": created_at + timedelta(days=rng.randint(1, 60)) if rng.random() < 0.03 else None,
+                "discount_type": discount_type,
+                "discount_value": _cents(discount_cents) if discount_cents is not None else None,
+                "coupon_id": coupon_id,
+                "final_price": _cents(_final_price_cents(price_cents, discount_type, discount_cents)),
+                "version": 1,
+            }
+
+
+def _batches(rows: Iterator[dict], size: int) -> Iterator[List[dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _write_copy(engine: Engine, table, rows: Iterator[dict], progress: Callable[[int], None]) -> None:
+    """COPY ... FROM STDIN pela conexão psycopg por baixo do engine."""
+    columns = [column.name for column in table.columns]
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            with cursor.copy(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN") as copy:
+                for written, row in enumerate(rows, start=1):
+                    copy.write_row([row[column] for column in columns])
+                    if written % BATCH_SIZE == 0:
+                        progress(written)
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def _write_inserts(engine: Engine, table, rows: Iterator[dict], progress: Callable[[int], None]) -> None:
+    """
+    INSERTs em lote direto no driver (executemany), com as mesmas conversões de tipo
+    que o SQLAlchemy aplicaria (Decimal, datetime...), sem o custo dele por linha.
+    """
+    dialect = engine.dialect
+    columns = list(table.columns)
+    processors = [column.type.dialect_impl(dialect).bind_processor(dialect) for column in columns]
+    placeholder = "?" if dialect.paramstyle == "qmark" else "%s"
+    statement = (
+        f"INSERT INTO {table.name} ({', '.join(column.name for column in columns)}) "
+        f"VALUES ({', '.join([placeholder] * len(columns))})"
+    )
+
+    def to_tuple(row: dict) -> tuple:
+        return tuple(
+            value if value is None or process is None else process(value)
+            for value, process in zip((row[column.name] for column in columns), processors)
+        )
+
+    with engine.begin() as connection:
+        if dialect.name == "sqlite":
+            # Só para a carga: o banco de benchmark pode ser recriado se algo falhar
+            connection.exec_driver_sql("PRAGMA synchronous = OFF")
+        cursor = connection.connection.cursor()
+        written = 0
+        for batch in _batches(rows, BATCH_SIZE):
+            cursor.executemany(statement, [to_tuple(row) for row in batch])
+            written += len(batch)
+            progress(written)
+        cursor.close()
+
+
+@contextmanager
+def _indexes_deferred(engine: Engine, table, enabled: bool):
+    """
+    Tira os índices secundários da tabela durante a carga e os recria no fim: montar
+    um índice de uma vez (ordenando) é bem mais rápido que atualizá-lo linha a linha.
+    """
+    indexes = sorted(table.indexes, key=lambda index: index.name) if enabled else []
+    # No SQLite o mesmo vale para o FTS5 da busca: sem o gatilho, um 'rebuild' no fim
+    fts_trigger = enabled and engine.dialect.name == "sqlite" and _has_sqlite_object(engine, "product_fts_ai")
+    with engine.begin() as connection:
+        for index in indexes:
+            index.drop(connection)
+        if fts_trigger:
+            connection.exec_driver_sql("DROP TRIGGER product_fts_ai")
+    yield
+    with engine.begin() as connection:
+        for index in indexes:
+            index.create(connection)
+        if fts_trigger:
+            connection.exec_driver_sql(next(ddl for ddl in SQLITE_SEARCH_DDL if "product_fts_ai" in ddl))
+            connection.exec_driver_sql("INSERT INTO product_fts(product_fts) VALUES ('rebuild')")
+
+
+def _has_sqlite_object(engine: Engine, name: str) -> bool:
+    with engine.connect() as connection:
+        return connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE name = ?", (name,)
+        ).first() is not None
+
+
+def _next_id(engine: Engine, table) -> int:
+    with engine.connect() as connection:
+        return (connection.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+
+
+def _after_load(engine: Engine) -> None:
+    with engine.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            # Os ids vieram explícitos: as sequências precisam continuar depois deles
+            for table in ("product", "coupon"):
+                connection.exec_driver_sql(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"
+                )
+        # Listagens e ETags já emitidos deixam de valer (a carga não passou pelo ORM)
+        columns = CollectionVersion.__table__.c
+        connection.execute(
+            CollectionVersion.__table__.update()
+            .where(columns.name.in_(VERSIONED_COLLECTIONS), columns.slot == 0)
+            .values(version=columns.version + 1)
+        )
+    # Estatísticas atualizadas: sem elas o planejador escolhe planos para tabelas vazias
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("ANALYZE"))
+
+
+def generate(database_url: str, products: int, coupons: int, seed: int = 42, migrate: bool = True) -> Dict[str, float]:
+    """Gera e grava o catálogo. Devolve contagens e tempos (segundos)."""
+    if migrate:
+        upgrade_schema(database_url)
+    engine = create_engine(database_url)
+    write = _write_copy if engine.dialect.name == "postgresql" else _write_inserts
+    generator = CatalogGenerator(seed, datetime.utcnow().replace(microsecond=0))
+    result = {"products": products, "coupons": coupons}
+
+    def progress_for(label: str, total: int) -> Callable[[int], None]:
+        started = time.perf_counter()
+
+        def report(done: int) -> None:
+            if done % (BATCH_SIZE * 10) == 0 or done == total:
+                rate = done / max(time.perf_counter() - started, 1e-9)
+                print(f"  {label}: {done:>11,} / {total:,}  ({rate:,.0f} linhas/s)", flush=True)
+        return report
+
+    started = time.perf_counter()
+    coupon_rows = list(generator.coupons(_next_id(engine, Coupon.__table__), coupons))
+    write(engine, Coupon.__table__, iter(coupon_rows), progress_for("cupons", coupons))
+    result["coupons_seconds"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    first_product_id = _next_id(engine, Product.__table__)
+    # Só num catálogo vazio: com dados, a recriação poderia esbarrar num nome repetido
+    with _indexes_deferred(engine, Product.__table__, enabled=first_product_id == 1):
+        product_rows = generator.products(first_product_id, products, coupon_rows)
+        write(engine, Product.__table__, product_rows, progress_for("produtos", products))
+        load_seconds = time.perf_counter() - started
+    result["products_seconds"] = time.perf_counter() - started
+    result["index_seconds"] = result["products_seconds"] - load_seconds
+
+    started = time.perf_counter()
+    _after_load(engine)
+    result["analyze_seconds"] = time.perf_counter() - started
+    engine.dispose()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=parse_size, default=parse_size("10k"), help="ex.: 10k, 1M, 10M")
+    parser.add_argument("--coupons", type=parse_size, default=None, help="padrão: 1 para cada 100 produtos (mín. 100)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-migrate", action="store_true", help="não roda 'alembic upgrade head' antes")
+    args = parser.parse_args()
+
+    url = os.environ.get("BENCH_DATABASE_URL") or os.environ.get("DATABASE_URL")
+    if not url:
+        raise SystemExit("Defina BENCH_DATABASE_URL (ou DATABASE_URL) com o banco a popular")
+    # upgrade_schema lê as configurações do serviço, que exigem DATABASE_URL
+    os.environ.setdefault("DATABASE_URL", url)
+    coupon_total = args.coupons if args.coupons is not None else max(100, args.products // 100)
+    print(f"banco: {url.split('@')[-1]}  |  produtos: {args.products:,}  |  cupons: {coupon_total:,}  |  seed: {args.seed}")
+    summary = generate(url, args.products, coupon_total, seed=args.seed, migrate=not args.no_migrate)
+    total_seconds = summary["coupons_seconds"] + summary["products_seconds"] + summary["analyze_seconds"]
+    print(
+        f"concluído em {total_seconds:.1f}s (produtos: {summary['products_seconds']:.1f}s, dos quais "
+        f"{summary['index_seconds']:.1f}s recriando índices; {args.products / max(summary['products_seconds'], 1e-9):,.0f} linhas/s)"
+    )
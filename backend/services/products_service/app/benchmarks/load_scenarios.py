@@ -0,0 +1,303 @@
+"""
+Cenários de carga HTTP por endpoint, com linha de base em JSON para comparação.
+
+Contra um serviço já rodando e populado (benchmarks/generate_catalog.py), roda
+cada cenário com N clientes em laço fechado por alguns segundos e imprime, por
+endpoint: requisições, RPS, p50, p95, p99 e erros. Os cenários imitam o uso real:
+
+- products_list / products_search / products_price_range: a listagem, com termos
+  de busca tirados dos próprios nomes do catálogo (mesma distribuição dos dados);
+- product_get / coupon_get: leituras individuais por id e por código;
+- coupons_list: a listagem de cupons;
+- discount_flow: aplica um desconto percentual e o remove (duas medições:
+  discount_apply e discount_remove). Cada cliente usa produtos só seus, sem
+  disputar linhas com os outros.
+
+'--save' grava os números num JSON; '--compare' compara com um JSON anterior e sai
+com código 1 se algum endpoint piorou além de '--max-regression' (p95 maior ou RPS
+menor), o que permite usá-lo num pipeline. Compare sempre rodadas com o mesmo
+catálogo, a mesma máquina e os mesmos parâmetros.
+
+Uso (a partir de app/):
+    python -m benchmarks.load_scenarios --base-url http://localhost:8001 --save baseline.json
+    python -m benchmarks.load_scenarios --base-url http://localhost:8001 --compare baseline.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.load_test import percentile
+
+API = "/api/v1"
+CONTEXT_PRODUCTS = 2_000
+CONTEXT_COUPONS = 500
+
+
+@dataclass
+class Context:
+    """Amostra do catálogo usada para montar as requisições."""
+    product_ids: List[int] = field(default_factory=list)
+    # Produtos ativos sem desconto: os únicos que aceitam o fluxo de desconto
+    undiscounted_ids: List[int] = field(default_factory=list)
+    coupon_codes: List[str] = field(default_factory=list)
+    search_terms: List[str] = field(default_factory=list)
+    price_bounds: List[float] = field(default_factory=list)
+
+
+class Recorder:
+    """Latências (só respostas < 400) e erros por rótulo."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Counter = Counter()
+
+    async def request(self, client: httpx.AsyncClient, label: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[label] += 1
+            return None
+        if response.status_code >= 400:
+            self.errors[label] += 1
+        else:
+            self.latencies[label].append(time.perf_counter() - started)
+        return response
+
+
+Step = Callable[[httpx.AsyncClient, Recorder, Context, random.Random, int, int], Awaitable[None]]
+
+
+async def _products_list(client, recorder, context, rng, worker, workers):
+    await recorder.request(client, "products_list", "GET", f"{API}/products/", params={"page": rng.randint(1, 5)})
+
+
+async def _products_search(client, recorder, context, rng, worker, workers):
+    params = {"search": rng.choice(context.search_terms), "limit": 10}
+    await recorder.request(client, "products_search", "GET", f"{API}/products/", params=params)
+
+
+async def _products_price_range(client, recorder, context, rng, worker, workers):
+    low, high = sorted(rng.sample(context.price_bounds, 2))
+    params = {"minPrice": low, "maxPrice": high, "sortBy": "final_price", "sortOrder": "asc"}
+    await recorder.request(client, "products_price_range", "GET", f"{API}/products/", params=params)
+
+
+async def _product_get(client, recorder, context, rng, worker, workers):
+    await recorder.request(client, "product_get", "GET", f"{API}/products/{rng.choice(context.product_ids)}")
+
+
+async def _coupons_list(client, recorder, context, rng, worker, workers):
+    await recorder.request(client, "coupons_list", "GET", f"{API}/coupons/", params={"page": rng.randint(1, 5)})
+
+
+async def _coupon_get(client, recorder, context, rng, worker, workers):
+    await recorder.request(client, "coupon_get", "GET", f"{API}/coupons/{rng.choice(context.coupon_codes)}")
+
+
+async def _discount_flow(client, recorder, context, rng, worker, workers):
+    own = context.undiscounted_ids[worker::workers]
+    if not own:
+        raise SystemExit("produtos sem desconto insuficientes para o discount_flow (diminua --concurrency)")
+    product_id = rng.choice(own)
+    await recorder.request(
+        client, "discount_apply", "POST", f"{API}/products/{product_id}/discount/percent", json={"value": 10},
+    )
+    await recorder.request(client, "discount_remove", "DELETE", f"{API}/products/{product_id}/discount")
+
+
+SCENARIOS: Dict[str, Step] = {
+    "products_list": _products_list,
+    "products_search": _products_search,
+    "products_price_range": _products_price_range,
+    "product_get": _product_get,
+    "coupons_list": _coupons_list,
+    "coupon_get": _coupon_get,
+    "discount_flow": _discount_flow,
+}
+
+
+async def load_context(client: httpx.AsyncClient, seed: int) -> Context:
+    """Percorre o início do catálogo (por cursor) e dos cupons para montar a amostra."""
+    context = Context()
+    params = {"limit": 50, "count": "none", "sortBy": "id", "sortOrder": "asc"}
+    while len(context.product_ids) < CONTEXT_PRODUCTS:
+        page = (await client.get(f"{API}/products/", params=params)).raise_for_status().json()
+        for row in page["data"]:
+            context.product_ids.append(row["id"])
+            if row["discount"] is None:
+                context.undiscounted_ids.append(row["id"])
+            context.search_terms.append(row["name"].split()[0])
+            context.price_bounds.append(float(row["final_price"]))
+        if not page["meta"]["nextCursor"]:
+            break
+        params["cursor"] = page["meta"]["nextCursor"]
+
+    page_number = 1
+    while len(context.coupon_codes) < CONTEXT_COUPONS:
+        page = (await client.get(
+            f"{API}/coupons/", params={"page": page_number, "limit": 50, "count": "none"},
+        )).raise_for_status().json()
+        context.coupon_codes += [row["code"] for row in page["data"]]
+        if len(page["data"]) < 50:
+            break
+        page_number += 1
+
+    if not context.product_ids or not context.coupon_codes:
+        raise SystemExit("catálogo vazio: popule o banco com 'python -m benchmarks.generate_catalog'")
+    random.Random(seed).shuffle(context.undiscounted_ids)
+    return context
+
+
+async def run_scenario(
+    base_url: str, step: Step, context: Context, concurrency: int, duration: float, seed: int,
+) -> Recorder:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker_loop(worker: int):
+            rng = random.Random(seed * 10_000 + worker)
+            while time.perf_counter() < deadline:
+                await step(client, recorder, context, rng, worker, concurrency)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker_loop(worker) for worker in range(concurrency)))
+        recorder.elapsed = time.perf_counter() - started
+    return recorder
+
+
+def summarize(recorder: Recorder) -> Dict[str, dict]:
+    results = {}
+    for label in sorted(set(recorder.latencies) | set(recorder.errors)):
+        latencies = sorted(recorder.latencies[label])
+
+        def milliseconds(fraction: float) -> Optional[float]:
+            # None (e não NaN, que não é JSON válido) quando nenhuma requisição deu certo
+            return round(percentile(latencies, fraction) * 1000, 3) if latencies else None
+
+        results[label] = {
+            "requests": len(latencies),
+            "errors": recorder.errors[label],
+            "rps": round(len(latencies) / recorder.elapsed, 2),
+            "p50_ms": milliseconds(0.50),
+            "p95_ms": milliseconds(0.95),
+            "p99_ms": milliseconds(0.99),
+        }
+    return results
+
+
+def _ms(value: Optional[float]) -> str:
+    return f"{value:>9.2f}" if value is not None else f"{'-':>9}"
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], max_regression: float) -> List[str]:
+    """Imprime a variação de p95 e RPS e devolve os endpoints que pioraram além do limite."""
+    regressions = []
+    print(f"\n{'endpoint':>22} | {'p95 base':>9} | {'p95 agora':>9} | {'Δ p95':>7} | {'rps base':>9} | {'rps agora':>9} | {'Δ rps':>7}")
+    for label, current in results.items():
+        previous = baseline.get(label)
+        if previous is None:
+            continue
+        if current["p95_ms"] is None:
+            # Só erros nesta rodada: regressão, qualquer que seja a linha de base
+            regressions.append(label)
+            print(f"{label:>22} | sem respostas com sucesso  <-- piorou")
+            continue
+        p95_delta = current["p95_ms"] / previous["p95_ms"] - 1 if previous["p95_ms"] else 0.0
+        rps_delta = current["rps"] / previous["rps"] - 1 if previous["rps"] else 0.0
+        regressed = p95_delta > max_regression or rps_delta < -max_regression
+        if regressed:
+            regressions.append(label)
+        print(
+            f"{label:>22} | {_ms(previous['p95_ms'])} | {_ms(current['p95_ms'])} | {p95_delta:>+7.1%} "
+            f"| {previous['rps']:>9.1f} | {current['rps']:>9.1f} | {rps_delta:>+7.1%}{'  <-- piorou' if regressed else ''}"
+        )
+    return regressions
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args) -> int:
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60) as client:
+        context = await load_context(client, args.seed)
+    print(
+        f"amostra: {len(context.product_ids)} produtos, {len(context.coupon_codes)} cupons  |  "
+        f"{args.concurrency} clientes, {args.duration:.0f}s por cenário"
+    )
+    print(f"{'endpoint':>22} | {'req':>7} | {'req/s':>9} | {'p50 (ms)':>9} | {'p95 (ms)':>9} | {'p99 (ms)':>9} | {'erros':>6}")
+
+    results: Dict[str, dict] = {}
+    for name in args.scenarios:
+        if args.warmup:
+            await run_scenario(args.base_url, SCENARIOS[name], context, args.concurrency, args.warmup, args.seed + 1)
+        recorder = await run_scenario(args.base_url, SCENARIOS[name], context, args.concurrency, args.duration, args.seed)
+        for label, row in summarize(recorder).items():
+            results[label] = row
+            print(
+                f"{label:>22} | {row['requests']:>7} | {row['rps']:>9.1f} | {_ms(row['p50_ms'])} "
+                f"| {_ms(row['p95_ms'])} | {_ms(row['p99_ms'])} | {row['errors']:>6}"
+            )
+
+    if args.save:
+        document = {
+            "meta": {
+                "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+                "git_revision": _git_revision(),
+                "base_url": args.base_url,
+                "concurrency": args.concurrency,
+                "duration_seconds": args.duration,
+                "seed": args.seed,
+                "python": sys.version.split()[0],
+                "machine": platform.platform(),
+            },
+            "results": results,
+        }
+        with open(args.save, "w", encoding="utf-8") as output:
+            json.dump(document, output, indent=2, ensure_ascii=False)
+        print(f"\nlinha de base gravada em {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        meta = baseline.get("meta", {})
+        if (meta.get("concurrency"), meta.get("duration_seconds")) != (args.concurrency, args.duration):
+            print("aviso: a linha de base foi gravada com outros --concurrency/--duration")
+        regressions = compare(results, baseline["results"], args.max_regression)
+        if regressions:
+            print(f"\nPIOROU além de {args.max_regression:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10.0, help="segundos por cenário")
+    parser.add_argument("--warmup", type=float, default=2.0, help="segundos de aquecimento por cenário (0 desliga)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save", metavar="ARQUIVO.json", help="grava os resultados como linha de base")
+    parser.add_argument("--compare", metavar="ARQUIVO.json", help="compara com uma linha de base gravada antes")
+    parser.add_argument("--max-regression", type=float, default=0.15, help="piora tolerada (0.15 = 15%%)")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,85 @@
+"""
+Harness de carga HTTP: requisições por segundo e latência p99 por nível de concorrência.
+
+Dispara N clientes concorrentes (padrão: 50, 200 e 1000) contra um ou mais alvos
+durante alguns segundos e imprime RPS, p50 e p99 de cada combinação. Serve para
+comparar o modo síncrono (rotas 'def' no threadpool) com o assíncrono (rotas
+'async def' + AsyncEngine): suba um serviço em cada modo — por exemplo, a imagem
+anterior à migração para async na porta 8002 — e passe os dois como alvos.
+
+Uso (a partir de app/):
+    python -m benchmarks.load_test --target async=http://localhost:8001 \\
+        --target sync=http://localhost:8002 --path "/api/v1/products/?limit=10"
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+
+import httpx
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Percentil por posição (sem interpolação) de uma lista já ordenada; NaN se vazia."""
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+async def _client_loop(client: httpx.AsyncClient, url: str, deadline: float, latencies: List[float], errors: List[int]):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await client.get(url)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+        except httpx.HTTPError:
+            errors.append(0)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+async def run_level(base_url: str, path: str, concurrency: int, duration: float) -> Dict[str, float]:
+    """Mantém 'concurrency' clientes em laço fechado durante 'duration' segundos."""
+    latencies: List[float] = []
+    errors: List[int] = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(_client_loop(client, path, deadline, latencies, errors) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else float("nan"),
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+async def main(targets: Dict[str, str], path: str, levels: List[int], duration: float) -> None:
+    print(f"{'alvo':>8} | {'clientes':>8} | {'req/s':>9} | {'p50 (ms)':>9} | {'p99 (ms)':>9} | {'erros':>6}")
+    for name, base_url in targets.items():
+        for concurrency in levels:
+            result = await run_level(base_url, path, concurrency, duration)
+            print(
+                f"{name:>8} | {concurrency:>8} | {result['rps']:>9.1f} | {result['p50_ms']:>9.2f} "
+                f"| {result['p99_ms']:>9.2f} | {result['errors']:>6}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", action="append", required=True, help="nome=url_base (pode repetir)")
+    parser.add_argument("--path", default="/api/v1/products/?limit=10")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--duration", type=float, default=10.0, help="segundos por nível")
+    args = parser.parse_args()
+
+    parsed_targets = dict(target.split("=", 1) for target in args.target)
+    asyncio.run(main(parsed_targets, args.path, args.concurrency, args.duration))
@@ -0,0 +1,101 @@
+# Em benchmarks/test_micro_benchmarks.py
+"""
+Micro-benchmarks (pytest-benchmark) das funções quentes da leitura e da escrita:
+cálculo do preço final, mapeamento de produtos para a resposta e validação dos
+schemas de entrada. Ficam fora da suíte padrão (pytest.ini só coleta tests/).
+
+Uso (a partir de app/):
+    python -m pytest benchmarks/test_micro_benchmarks.py
+    python -m pytest benchmarks/test_micro_benchmarks.py --benchmark-autosave
+    python -m pytest benchmarks/test_micro_benchmarks.py --benchmark-compare --benchmark-compare-fail=mean:15%
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from pydantic import ValidationError
+
+pytest.importorskip("pytest_benchmark")
+
+from benchmarks.bench_mapping import build_products  # noqa: E402
+from core.utils import calculate_final_price, map_product_to_read_schema, map_products_to_read_rows  # noqa: E402
+from models.coupon_model import CouponType  # noqa: E402
+from models.product_model import Product  # noqa: E402
+from schemas.coupon_schemas import CouponCreate  # noqa: E402
+from schemas.product_schemas import ProductCreate, ProductUpdate  # noqa: E402
+
+NOW = datetime(2026, 1, 1)
+
+
+def _product(discount_type=None, discount_value=None) -> Product:
+    return Product(
+        id=1, name="Teclado Mecânico", description="Switches marrons", price=Decimal("349.90"), stock=12,
+        created_at=NOW, discount_type=discount_type, discount_value=discount_value,
+    )
+
+
+@pytest.mark.parametrize("discount_type, discount_value", [
+    (None, None),
+    (CouponType.percent, Decimal("15")),
+    (CouponType.fixed, Decimal("50.00")),
+], ids=["sem_desconto", "percentual", "fixo"])
+def test_calculate_final_price(benchmark, discount_type, discount_value):
+    product = _product(discount_type, discount_value)
+    final_price, _ = benchmark(calculate_final_price, product)
+    assert final_price > 0
+
+
+def test_map_product_to_read_schema(benchmark):
+    product = _product(CouponType.percent, Decimal("15"))
+    result = benchmark(map_product_to_read_schema, product)
+    assert result.final_price == Decimal("297.42")
+
+
+def test_map_products_to_read_rows_page(benchmark):
+    products = build_products(50)
+    rows = benchmark(map_products_to_read_rows, products)
+    assert len(rows) == 50
+
+
+def test_map_product_to_read_schema_page(benchmark):
+    products = build_products(50)
+    rows = benchmark(lambda: [map_product_to_read_schema(p) for p in products])
+    assert len(rows) == 50
+
+
+def test_product_create_validation(benchmark):
+    payload = {"name": "Teclado Mecânico", "description": "Switches marrons", "price": "349.90", "stock": 12}
+    result = benchmark(ProductCreate.model_validate, payload)
+    assert result.price == Decimal("349.90")
+
+
+def test_product_update_validation(benchmark):
+    payload = {"price": "299.90", "stock": 3}
+    result = benchmark(ProductUpdate.model_validate, payload)
+    assert result.model_dump(exclude_unset=True) == {"price": Decimal("299.90"), "stock": 3}
+
+
+def test_coupon_create_validation(benchmark):
+    payload = {
+        "code": "PROMO2026", "type": "percent", "value": "15", "one_shot": False,
+        "valid_from": NOW, "valid_until": NOW + timedelta(days=30),
+    }
+    result = benchmark(CouponCreate.model_validate, payload)
+    assert result.code == "promo2026"
+
+
+def test_coupon_create_validation_rejected(benchmark):
+    # O caminho de erro também é quente: formulários mandam muito código inválido
+    payload = {
+        "code": "admin", "type": "percent", "value": "95", "one_shot": False,
+        "valid_from": NOW, "valid_until": NOW + timedelta(days=30),
+    }
+
+    def validate():
+        try:
+            CouponCreate.model_validate(payload)
+        except ValidationError as exc:
+            return exc.error_count()
+        return 0
+
+    assert benchmark(validate) == 2
@@ -0,0 +1,266 @@
+"""
+Módulo de Cache de Leituras (read-through)
+
+As leituras individuais (GET /products/{id} e GET /coupons/{code}) se repetem muito
+para os mesmos produtos e cupons, que mudam pouco. Aqui guardamos o JSON já
+serializado da resposta (junto com o ETag), com chaves 'product:{id}' e
+'coupon:{code}'.
+
+- Backends: LRU+TTL em memória (por processo) ou um servidor que fale o protocolo
+  do Redis (compartilhado entre workers). O cliente Redis é injetável, então
+  testes e ambientes locais podem usar um substituto com a mesma interface.
+- Invalidação: a cada commit, o WriteSet de core/invalidation.py diz exatamente
+  quais produtos/cupons mudaram e só essas chaves são apagadas. Escritas em massa
+  (ex.: importação) apagam todas as chaves da tabela.
+- Um contador de geração impede que uma leitura feita antes de uma escrita grave
+  no cache um valor que a escrita acabou de invalidar. No Redis o contador fica no
+  próprio servidor (INCR antes de apagar as chaves) e a gravação só acontece se ele
+  não mudou (script Lua), então a proteção vale também entre workers; em memória,
+  cada worker tem o seu cache e o seu contador.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, NamedTuple, Optional
+
+from sqlalchemy.util.concurrency import await_only, in_greenlet
+
+from core import invalidation
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Tabela -> (prefixo da chave, coluna que identifica a linha na chave)
+CACHED_TABLES = {"product": ("product:", "id"), "coupon": ("coupon:", "code")}
+CACHED_TABLES_PREFIXES = [prefix for prefix, _ in CACHED_TABLES.values()]
+
+
+class CachedResponse(NamedTuple):
+    etag: str
+    body: bytes
+
+
+def product_cache_key(product_id: int) -> str:
+    return f"product:{product_id}"
+
+
+def coupon_cache_key(code: str) -> str:
+    return f"coupon:{code}"
+
+
+class MemoryCacheBackend:
+    """LRU com TTL em memória; cada worker tem o seu."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self.expirations = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def generation(self) -> Optional[str]:
+        # Cache do próprio processo: o contador de ResponseCache já basta
+        return None
+
+    async def set(self, key: str, value: bytes, ttl_seconds: float, generation: Optional[str] = None) -> bool:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return True
+
+    def delete(self, keys: Iterable[str], prefixes: Iterable[str] = ()) -> None:
+        prefixes = tuple(prefixes)
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+            if prefixes:
+                for key in [k for k in self._entries if k.startswith(prefixes)]:
+                    del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class RedisCacheBackend:
+    """
+    Backend para qualquer servidor que fale o protocolo do Redis.
+
+    'client' deve oferecer a interface assíncrona do redis-py (get, eval, incr,
+    delete e scan_iter). Evicções e expirações ficam a cargo do servidor
+    (maxmemory-policy / TTL), por isso não são contadas aqui.
+    """
+
+    # Grava KEYS[1] só se a geração (KEYS[2]) ainda é a lida antes da consulta ao banco
+    SET_IF_GENERATION = (
+        "if (redis.call('GET', KEYS[2]) or '') == ARGV[3] then "
+        "redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2]) return 1 end return 0"
+    )
+
+    def __init__(self, client, namespace: str = "products-service:"):
+        self.client = client
+        self.namespace = namespace
+        self.generation_key = namespace + "generation"
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self.namespace + key)
+
+    async def generation(self) -> Optional[str]:
+        value = await self.client.get(self.generation_key)
+        return value.decode() if isinstance(value, bytes) else str(value or "")
+
+    async def set(self, key: str, value: bytes, ttl_seconds: float, generation: Optional[str] = None) -> bool:
+        stored = await self.client.eval(
+            self.SET_IF_GENERATION, 2, self.namespace + key, self.generation_key,
+            value, max(1, int(ttl_seconds)), generation or "",
+        )
+        return bool(stored)
+
+    def delete(self, keys: Iterable[str], prefixes: Iterable[str] = ()) -> None:
+        # Chamado de dentro do hook síncrono 'after_commit'. Nas sessões assíncronas
+        # ele roda num greenlet do SQLAlchemy, que permite aguardar o cliente ali mesmo.
+        coroutine = self._delete(list(keys), list(prefixes))
+        if in_greenlet():
+            await_only(coroutine)
+            return
+        try:
+            asyncio.get_running_loop().create_task(coroutine)
+        except RuntimeError:
+            coroutine.close()
+            logger.warning("Invalidação do cache ignorada fora de um event loop; as chaves expiram pelo TTL.")
+
+    async def _delete(self, keys: list, prefixes: list) -> None:
+        # Antes de apagar: uma leitura que grave depois disto encontra a geração nova e desiste
+        await self.client.incr(self.generation_key)
+        names = [self.namespace + key for key in keys]
+        for prefix in prefixes:
+            names.extend([name async for name in self.client.scan_iter(match=f"{self.namespace}{prefix}*")])
+        if names:
+            await self.client.delete(*names)
+
+    def clear(self) -> None:
+        self.delete([], CACHED_TABLES_PREFIXES)
+
+    def stats(self) -> dict:
+        return {"backend": "redis", "namespace": self.namespace}
+
+
+class ResponseCache:
+    """Fachada usada pelas rotas: conta acertos/faltas e aplica a proteção de geração."""
+
+    def __init__(self, backend, ttl_seconds: float):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale_writes_skipped = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        if not self.enabled:
+            return None
+        value = await self.backend.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Formato armazenado: ETag, quebra de linha, corpo JSON (o ETag nunca tem '\n')
+        etag, _, body = value.partition(b"\n")
+        return CachedResponse(etag.decode(), body)
+
+    async def begin_read(self) -> tuple:
+        """Marca o início de uma leitura no banco; o resultado vai para 'set'."""
+        shared = await self.backend.generation() if self.enabled else None
+        return self.generation, shared
+
+    async def set(self, key: str, response: CachedResponse, token: tuple) -> None:
+        """Grava o valor lido se nenhuma escrita foi confirmada desde 'begin_read' (neste ou, no Redis, em qualquer worker)."""
+        if not self.enabled:
+            return
+        generation, shared = token
+        if generation != self.generation or not await self.backend.set(
+            key, response.etag.encode() + b"\n" + response.body, self.ttl_seconds, shared,
+        ):
+            # Alguma escrita foi confirmada durante a leitura: o valor pode estar velho
+            self.stale_writes_skipped += 1
+
+    def invalidate(self, written: invalidation.WriteSet) -> None:
+        keys, prefixes = [], []
+        for table in written.tables & CACHED_TABLES.keys():
+            prefix, key_column = CACHED_TABLES[table]
+            if table in written.bulk_tables:
+                prefixes.append(prefix)
+                continue
+            for row in written.rows.get(table, []):
+                if row.get(key_column) is not None:
+                    keys.append(f"{prefix}{row[key_column]}")
+        if not keys and not prefixes:
+            return
+        self.generation += 1
+        self.invalidations += len(keys) + len(prefixes)
+        if self.enabled:
+            self.backend.delete(keys, prefixes)
+
+    def clear(self) -> None:
+        self.generation += 1
+        if self.enabled:
+            self.backend.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        backend_stats = self.backend.stats() if self.enabled else {"backend": "none"}
+        return {
+            **backend_stats,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRatio": round(self.hits / lookups, 4) if lookups else None,
+            "invalidations": self.invalidations,
+            "staleWritesSkipped": self.stale_writes_skipped,
+        }
+
+
+def _build_backend():
+    if settings.cache_backend == "none":
+        return None
+    if settings.cache_backend == "redis":
+        # Dependência opcional: só é necessária quando CACHE_BACKEND=redis
+        import redis.asyncio as redis
+
+        return RedisCacheBackend(redis.Redis.from_url(settings.cache_redis_url))
+    return MemoryCacheBackend(settings.cache_max_entries)
+
+
+response_cache = ResponseCache(_build_backend(), settings.cache_ttl_seconds)
+invalidation.subscribe(response_cache.invalidate)
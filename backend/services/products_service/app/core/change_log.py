@@ -0,0 +1,112 @@
+"""
+Módulo do Outbox de Alterações
+
+Grava em 'change_log', na MESMA transação da escrita, uma linha por produto ou cupom
+alterado. Não há o que esquecer nas rotas: o evento 'before_commit' lê o mesmo
+registro de escritas usado para invalidar os caches (core/invalidation.py), que
+cobre o ORM e os comandos em massa avisados com 'touch_rows' (core/etag.py).
+Se a transação for desfeita, as linhas do outbox também são.
+
+O 'id' da linha é o número de sequência do feed (services/change_feed.py), tirado de
+uma sequência comum: as escritas não esperam umas pelas outras para gravá-lo. Por isso
+um id menor pode ser confirmado DEPOIS de um maior (A pega 10, B pega 11, B confirma
+antes de A), e um leitor que avançasse o cursor até 11 nunca entregaria o 10. Quem lê
+usa 'settled_seq': um buraco na sequência logo antes de uma linha recente (gravada há
+menos de CHANGE_FEED_SETTLE_SECONDS) segura a leitura até ele ser preenchido ou
+envelhecer; buracos velhos são transações desfeitas (a sequência não volta atrás). No
+SQLite as escritas já são serializadas e os ids seguem a ordem dos commits.
+
+No Postgres a transação também emite um NOTIFY, entregue só após o commit: é o que
+acorda os feeds de todos os workers.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import event, func, insert, text
+from sqlalchemy.orm import Session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.config import settings
+from core.invalidation import pending_write_set
+from models.change_log_model import ChangeLog, ChangeTopic
+
+# Campos de cada tabela que identificam o registro para o cliente
+FEED_KEYS: Dict[str, tuple] = {ChangeTopic.product.value: ("id",), ChangeTopic.coupon.value: ("id", "code")}
+NOTIFY_CHANNEL = "change_feed"
+
+
+def _entries(topic: str, rows: List[dict], bulk: bool, now: datetime) -> List[dict]:
+    keys = FEED_KEYS[topic]
+    unique: Dict[int, dict] = {}
+    for row in rows:
+        if row.get("id") is None:
+            bulk = True
+            break
+        unique.setdefault(row["id"], {key: row[key] for key in keys if key in row})
+    # Muitas linhas (ou linhas desconhecidas): um único evento de "recarregue a coleção"
+    if bulk or len(unique) > settings.change_feed_max_rows_per_transaction:
+        return [{"topic": topic, "data": None, "created_at": now}]
+    return [{"topic": topic, "data": data, "created_at": now} for data in unique.values()]
+
+
+@event.listens_for(Session, "before_commit")
+def _write_change_log(session: Session) -> None:
+    if not settings.change_feed_enabled or not session.in_transaction():
+        return
+    # O commit só faz o último flush depois deste evento: adianta-o para o registro
+    # de escritas ficar completo
+    session.flush()
+    write_set = pending_write_set(session)
+    if write_set is None or not write_set.tables.intersection(FEED_KEYS):
+        return
+
+    now = datetime.utcnow()
+    entries = []
+    for topic in FEED_KEYS:
+        if topic in write_set.tables:
+            entries += _entries(topic, write_set.rows.get(topic, []), topic in write_set.bulk_tables, now)
+
+    connection = session.connection()
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_notify(:channel, '')"), {"channel": NOTIFY_CHANNEL})
+    connection.execute(insert(ChangeLog.__table__), entries)
+
+
+# --- Leituras sem buracos ---
+
+def needs_settling(dialect_name: str) -> bool:
+    """Se os ids podem ser confirmados fora de ordem (escritas concorrentes de verdade)."""
+    return dialect_name == "postgresql"
+
+
+def gap_safe_horizon(after: int, rows: Iterable[tuple]) -> int:
+    """
+    Maior 'seq' que pode ser entregue a partir de 'after'. 'rows' são os (id, recente)
+    seguintes, em ordem: a leitura para antes do primeiro buraco seguido de uma linha
+    recente, que pode ser uma transação ainda aberta.
+    """
+    horizon = after
+    for seq, recent in rows:
+        if recent and seq != horizon + 1:
+            break
+        horizon = seq
+    return horizon
+
+
+async def settled_seq(session: AsyncSession, after: int) -> Optional[int]:
+    """Teto das leituras depois de 'after' (None = nenhuma linha recente, sem teto)."""
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.change_feed_settle_seconds)
+    first_recent = (await session.exec(
+        select(func.min(ChangeLog.id)).where(ChangeLog.id > after, ChangeLog.created_at > cutoff)
+    )).first()
+    if first_recent is None:
+        return None
+    previous = (await session.exec(
+        select(func.max(ChangeLog.id)).where(ChangeLog.id > after, ChangeLog.id < first_recent)
+    )).first()
+    rows = (await session.exec(
+        select(ChangeLog.id, ChangeLog.created_at > cutoff)
+        .where(ChangeLog.id >= first_recent).order_by(ChangeLog.id).limit(settings.change_feed_batch_size)
+    )).all()
+    return gap_safe_horizon(previous or after, rows)
@@ -0,0 +1,179 @@
+"""
+Módulo de Coalescência de Requisições (single-flight)
+
+Quando uma promoção entra no ar, centenas de clientes pedem a MESMA página da
+listagem em poucos milissegundos, e cada um rodava o seu COUNT, a sua consulta da
+página e o seu mapeamento das linhas. Aqui, requisições idênticas simultâneas (mesma
+chave: os parâmetros já normalizados) compartilham uma única execução: a primeira
+consulta o banco e as outras esperam pelo resultado dela.
+
+- Configuração por rota: COALESCING_ROUTES é um JSON {"rota": segundos}. Só as rotas
+  listadas são coalescidas; 'segundos' é quanto o resultado ainda serve depois de
+  pronto (0 = só quem chegou durante a execução). Ex.: '{"products.list": 0.3}'.
+- Invalidação: uma escrita confirmada por este processo nas tabelas da rota descarta
+  os resultados guardados e desliga as execuções em andamento, e quem chegar depois
+  dela começa uma nova. Escritas de outros workers só são vistas quando o resultado
+  guardado vence, por isso o tempo de retenção deve ficar em centenas de ms.
+- Leia-o-que-escreveu: a escrita pode ter sido confirmada por OUTRO worker, sem
+  invalidar nada aqui. Um cliente com o cookie 'rw_after' (core/replicas.py) só
+  aproveita execuções que começaram depois da escrita dele.
+- Se a requisição que está executando for cancelada, as que esperavam por ela
+  executam por conta própria.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from core import invalidation
+from core.config import settings
+
+# Resultados guardados por rota (os mais antigos saem primeiro)
+MAX_HELD_RESULTS = 1024
+
+
+class SingleFlight:
+    """Uma execução por chave de cada vez; as requisições simultâneas dividem o resultado."""
+
+    def __init__(self, name: str, tables: set):
+        self.name = name
+        self.tables = set(tables)
+        self.generation = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.held_hits = 0
+        self.invalidations = 0
+        # chave -> (futuro, início da execução em epoch)
+        self._flights: Dict[Hashable, tuple] = {}
+        # chave -> (vence em (monotônico), início da execução em epoch, resultado)
+        self._held: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.name in settings.coalescing_routes
+
+    @property
+    def hold_seconds(self) -> float:
+        return settings.coalescing_routes.get(self.name, 0.0)
+
+    async def run(
+        self, key: Hashable, execute: Callable[[], Awaitable[Any]], hold: bool = True,
+        not_before: Optional[float] = None,
+    ) -> Any:
+        """
+        Resultado de 'execute()' para 'key', compartilhado com as chamadas simultâneas.
+        Com 'hold', o resultado fica guardado por 'hold_seconds' (passe False quando ele
+        não puder ser reaproveitado, ex.: lido de uma réplica atrasada). Com
+        'not_before' (epoch da última escrita do cliente), só aproveita execuções que
+        começaram depois dele.
+        """
+        if not self.enabled:
+            return await execute()
+        held = self._held.get(key)
+        if held is not None:
+            expires_at, started_at, result = held
+            if time.monotonic() >= expires_at:
+                del self._held[key]
+            elif not_before is None or started_at >= not_before:
+                self.held_hits += 1
+                return result
+
+        current = self._flights.get(key)
+        if current is not None and (not_before is None or current[1] >= not_before):
+            flight = current[0]
+            try:
+                # shield: o cancelamento de quem espera não cancela a execução dos outros
+                result = await asyncio.shield(flight)
+                self.coalesced += 1
+                return result
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise
+                # Quem executava foi cancelado: esta requisição executa por conta própria
+
+        flight = asyncio.get_running_loop().create_future()
+        started_at = time.time()
+        self._flights[key] = (flight, started_at)
+        generation = self.generation
+        self.executions += 1
+        try:
+            result = await execute()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except BaseException as exc:
+            # Mesmos parâmetros, mesmo erro (ex.: cursor inválido)
+            flight.set_exception(exc)
+            # Marca a exceção como lida: sem ninguém esperando, o asyncio não a loga
+            flight.exception()
+            raise
+        finally:
+            if self._flights.get(key, (None,))[0] is flight:
+                del self._flights[key]
+        flight.set_result(result)
+        if hold and self.hold_seconds > 0 and generation == self.generation:
+            self._hold(key, started_at, result)
+        return result
+
+    def _hold(self, key: Hashable, started_at: float, result: Any) -> None:
+        now = time.monotonic()
+        self._held[key] = (now + self.hold_seconds, started_at, result)
+        self._held.move_to_end(key)
+        # O tempo de retenção é o mesmo para todos: os vencidos estão no começo
+        while self._held and (len(self._held) > MAX_HELD_RESULTS or next(iter(self._held.values()))[0] <= now):
+            self._held.popitem(last=False)
+
+    def invalidate(self, written: invalidation.WriteSet) -> None:
+        if not written.tables & self.tables:
+            return
+        self.generation += 1
+        self.invalidations += 1
+        self._held.clear()
+        # As execuções em andamento terminam para quem já esperava; quem chegar agora começa outra
+        self._flights.clear()
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._held.clear()
+        self._flights.clear()
+
+    def status(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "holdSeconds": self.hold_seconds,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "heldHits": self.held_hits,
+            "invalidations": self.invalidations,
+            "inFlight": len(self._flights),
+            "held": len(self._held),
+        }
+
+
+_flights: List[SingleFlight] = []
+
+
+def single_flight(name: str, tables: set) -> SingleFlight:
+    """Cria o coalescedor de uma rota e o inscreve na invalidação das suas tabelas."""
+    flight = SingleFlight(name, tables)
+    _flights.append(flight)
+    invalidation.subscribe(flight.invalidate)
+    return flight
+
+
+def clear() -> None:
+    for flight in _flights:
+        flight.clear()
+
+
+def coalescing_status() -> dict:
+    return {flight.name: flight.status() for flight in _flights}
+
+
+def collect() -> List[tuple]:
+    executions = sum(flight.executions for flight in _flights)
+    shared = sum(flight.coalesced + flight.held_hits for flight in _flights)
+    return [
+        ("coalescing_executions_total", "counter", "Execuções das rotas coalescidas.", executions),
+        ("coalescing_shared_total", "counter", "Requisições atendidas pelo resultado de outra.", shared),
+    ]
@@ -0,0 +1,134 @@
+"""
+Módulo de Configuração
+
+Centraliza as configurações do serviço em um único objeto tipado. Os valores vêm
+de variáveis de ambiente (ex.: DB_POOL_SIZE=20) e são validados na inicialização,
+então um valor inválido derruba o processo logo no boot em vez de falhar no meio
+de uma requisição.
+"""
+from functools import lru_cache
+from typing import Dict, Literal, Optional
+
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+
+class Settings(BaseSettings):
+    # --- Banco de dados ---
+    database_url: str = Field(..., description="URL SQLAlchemy do banco (ex.: postgresql+psycopg://...)")
+    db_echo: bool = Field(False, description="Loga todo SQL executado (apenas para depuração)")
+
+    # --- Pool de conexões (por processo/worker) ---
+    db_pool_size: int = Field(5, ge=1)
+    db_max_overflow: int = Field(10, ge=0)
+    db_pool_timeout: float = Field(30.0, gt=0, description="Segundos esperando uma conexão livre")
+    db_pool_pre_ping: bool = Field(True, description="Testa a conexão antes de entregá-la ao request")
+    db_pool_recycle: int = Field(1800, description="Recicla conexões mais velhas que N segundos (-1 desliga)")
+    db_statement_timeout_ms: Optional[int] = Field(None, ge=1, description="statement_timeout do Postgres")
+
+    # PgBouncer em modo 'transaction' não suporta prepared statements nem o parâmetro
+    # de inicialização 'options'; configure o statement_timeout na role do banco nesse caso.
+    db_pgbouncer: bool = False
+    # Teto de conexões do serviço inteiro (somando os workers). Quando definido, o
+    # pool de cada worker é reduzido para caber nele (ver core/database.py)
+    db_max_connections: Optional[int] = Field(None, ge=1)
+    # O schema é das migrações (core/schema.py): os workers só conferem a revisão.
+    # Com DB_MIGRATE_ON_START o serve.py roda 'alembic upgrade head' antes de subi-los
+    db_migrate_on_start: bool = False
+    db_check_schema: bool = Field(True, description="Recusa subir se o banco não estiver na revisão esperada")
+
+    # --- Réplicas de leitura (core/replicas.py) ---
+    # URLs separadas por vírgula; vazio = tudo no primário
+    db_replica_urls: str = ""
+    db_replica_max_lag_seconds: float = Field(5.0, gt=0, description="Acima disso a réplica sai do rodízio")
+    db_replica_check_interval_seconds: float = Field(2.0, gt=0)
+    db_replica_check_timeout_seconds: float = Field(2.0, gt=0)
+    # Depois de uma escrita, o cliente só lê de réplicas que já a tenham (na prática, do primário)
+    db_read_your_writes_seconds: float = Field(10.0, ge=0)
+
+    # --- Log de queries lentas (core/instrumentation.py) ---
+    slow_query_threshold_ms: Optional[float] = Field(500.0, gt=0, description="None desliga o log")
+    slow_query_log_parameters: bool = Field(True, description="Desligue se os parâmetros puderem ter dados sensíveis")
+    slow_query_explain_sample_rate: float = Field(0.1, ge=0, le=1, description="Fração dos SELECTs lentos com EXPLAIN")
+
+    # --- Respostas (core/serialization.py) ---
+    # As listagens já montam as linhas a partir de colunas tipadas: pula a segunda
+    # validação contra o response_model e serializa direto com o orjson
+    api_skip_response_validation: bool = True
+
+    # --- Servidor de produção (serve.py) ---
+    server_host: str = "0.0.0.0"
+    server_port: int = Field(8001, ge=1, le=65535)
+    server_workers: int = Field(0, ge=0, description="Processos de worker; 0 = um por núcleo")
+    server_backlog: int = Field(2048, ge=1, description="Fila de conexões pendentes do socket")
+    server_keepalive_seconds: int = Field(5, ge=1, description="Tempo de uma conexão keep-alive ociosa")
+    server_graceful_shutdown_seconds: int = Field(30, ge=1, description="Espera pelas requisições em andamento")
+    server_limit_concurrency: Optional[int] = Field(None, ge=1, description="Acima disso o worker responde 503")
+    server_reload: bool = Field(False, description="Recarrega ao mudar o código (só desenvolvimento; 1 processo)")
+
+    # --- Coalescência de listagens idênticas simultâneas (core/coalescing.py) ---
+    # Rota -> segundos que o resultado ainda serve depois de pronto (0 = só quem esperava);
+    # rotas fora do dicionário não são coalescidas. Env: COALESCING_ROUTES='{"products.list": 0.3}'
+    coalescing_routes: Dict[str, float] = {"products.list": 0.0, "coupons.list": 0.0}
+
+    # --- Cache de contagens das listagens (core/counting.py) ---
+    count_cache_max_entries: int = Field(1024, ge=1)
+    count_cache_ttl_seconds: float = Field(30.0, ge=0)
+
+    # --- Cache de leituras individuais de produtos/cupons (core/cache.py) ---
+    cache_backend: Literal["memory", "redis", "none"] = "memory"
+    cache_redis_url: str = "redis://localhost:6379/0"
+    cache_ttl_seconds: float = Field(60.0, gt=0)
+    cache_max_entries: int = Field(10_000, ge=1)
+
+    # --- Varredura de cupons vencidos/deletados (services/coupon_expiry.py) ---
+    coupon_sweep_enabled: bool = Field(True, description="Roda a varredura dentro do processo da API")
+    coupon_sweep_interval_seconds: float = Field(60.0, gt=0)
+    coupon_sweep_batch_size: int = Field(500, ge=1)
+    # Folga após o vencimento/deleção: uma aplicação que validou o cupom no último
+    # instante já terá confirmado antes de a varredura olhar para ele
+    coupon_sweep_grace_seconds: float = Field(30.0, ge=0)
+
+    # --- Filtro de códigos de cupom inexistentes (services/coupon_code_filter.py) ---
+    coupon_filter_enabled: bool = Field(True, description="Responde 404 a códigos inexistentes sem consultar o banco")
+    coupon_filter_false_positive_rate: float = Field(0.01, gt=0, lt=1)
+    # Sem ler o outbox por mais que isso, o filtro é ignorado e toda consulta vai ao banco
+    coupon_filter_max_sync_lag_seconds: float = Field(5.0, gt=0)
+    coupon_negative_cache_max_entries: int = Field(100_000, ge=1)
+    coupon_negative_cache_ttl_seconds: float = Field(30.0, gt=0)
+
+    # --- Reservas de estoque (services/stock_reservation.py) ---
+    stock_reservation_ttl_seconds: int = Field(900, ge=1, description="Validade padrão de uma reserva")
+    stock_reservation_max_ttl_seconds: int = Field(86_400, ge=1)
+    stock_reservation_sweep_enabled: bool = Field(True, description="Devolve o estoque das reservas vencidas")
+    stock_reservation_sweep_interval_seconds: float = Field(30.0, gt=0)
+    stock_reservation_sweep_batch_size: int = Field(500, ge=1)
+
+    # --- Feed de alterações (core/change_log.py, services/change_feed.py) ---
+    change_feed_enabled: bool = Field(True, description="Grava o outbox 'change_log' junto com as escritas")
+    # Acima disso, a transação gera um único evento de coleção em vez de um por linha
+    change_feed_max_rows_per_transaction: int = Field(1000, ge=1)
+    # Sem LISTEN/NOTIFY (SQLite), é a latência máxima para ver escritas de outros processos;
+    # no Postgres vale só como rede de segurança
+    change_feed_poll_interval_seconds: float = Field(1.0, gt=0)
+    change_feed_batch_size: int = Field(500, ge=1)
+    # Postgres: quanto um buraco na sequência do outbox segura a leitura das linhas
+    # seguintes (uma transação com id menor ainda pode confirmar). Cobre o intervalo
+    # entre gravar o outbox e o COMMIT, mais a diferença entre os relógios dos workers
+    change_feed_settle_seconds: float = Field(2.0, gt=0)
+    change_feed_subscriber_buffer: int = Field(10_000, ge=1, description="Eventos pendentes antes de desconectar o cliente")
+    change_feed_heartbeat_seconds: float = Field(15.0, gt=0)
+    # Conexões SSE são encerradas depois disso; o navegador reconecta com Last-Event-ID
+    change_feed_sse_max_seconds: float = Field(300.0, gt=0)
+    change_feed_long_poll_max_seconds: float = Field(30.0, gt=0)
+    change_feed_retention_hours: float = Field(24.0, gt=0)
+    change_feed_prune_enabled: bool = True
+    change_feed_prune_interval_seconds: float = Field(600.0, gt=0)
+
+
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
+
+
+settings = get_settings()
@@ -0,0 +1,122 @@
+"""
+Módulo de Contagem para Listagens Paginadas
+
+O COUNT(*) sobre a consulta filtrada custa uma varredura de todas as linhas que
+casam com o filtro. Aqui o cliente escolhe quanto está disposto a pagar:
+
+- exact:     COUNT(*) real, guardado em cache por conjunto de filtros e invalidado
+             quando a tabela recebe escritas (ver core/invalidation.py);
+- estimated: estimativa do planejador do Postgres (EXPLAIN), sem tocar nas linhas;
+             em outros bancos (ex.: SQLite dos testes) cai para a contagem exata;
+- none:      não conta nada (ideal para paginação por cursor).
+"""
+import enum
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from sqlmodel import func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core import invalidation
+from core.config import settings
+from core.replicas import is_cacheable_read
+
+
+class CountMode(str, enum.Enum):
+    exact = "exact"
+    estimated = "estimated"
+    none = "none"
+
+
+class CountCache:
+    """Cache LRU de contagens, com TTL e invalidação por tabela."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._generations: dict = {}
+        self._lock = threading.Lock()
+
+    def generation(self, table: str) -> int:
+        return self._generations.get(table, 0)
+
+    def get(self, key: Hashable) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: int, table: str, generation: int) -> None:
+        with self._lock:
+            # Se houve escrita enquanto contávamos, o valor pode já estar velho: descarta
+            if self._generations.get(table, 0) != generation:
+                return
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, tables: set) -> None:
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+            for key in [k for k in self._entries if k[0] in tables]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# O TTL é a rede de segurança para escritas feitas por outros processos/réplicas
+count_cache = CountCache(settings.count_cache_max_entries, settings.count_cache_ttl_seconds)
+invalidation.subscribe(lambda written: count_cache.invalidate(written.tables))
+
+
+async def count_items(session: AsyncSession, query, mode: CountMode, table: str, filters: dict) -> Optional[int]:
+    """
+    Retorna o total de itens da consulta segundo o modo pedido (ou None para 'none').
+
+    'filters' deve conter os parâmetros que definem o conjunto de linhas (não a página),
+    pois é a partir deles que a chave do cache é montada.
+    """
+    if mode == CountMode.none:
+        return None
+
+    if mode == CountMode.estimated and session.get_bind().dialect.name == "postgresql":
+        return await _estimate_rows(session, query)
+
+    key = (table, tuple(sorted((k, v) for k, v in filters.items() if v is not None)))
+    cached = count_cache.get(key)
+    if cached is not None:
+        return cached
+
+    generation = count_cache.generation(table)
+    total = (await session.exec(select(func.count()).select_from(query.subquery()))).one()
+    if is_cacheable_read(session):
+        count_cache.set(key, total, table, generation)
+    return total
+
+
+async def _estimate_rows(session: AsyncSession, query) -> int:
+    """
+    Usa a estimativa de linhas do planejador (EXPLAIN, sem executar a consulta).
+
+    Para a listagem sem filtros isso equivale a ler pg_class.reltuples ajustado
+    pela seletividade de 'deleted_at IS NULL'; com filtros, o planejador aplica
+    as estatísticas de cada coluna.
+    """
+    connection = await session.connection()
+    compiled = query.compile(dialect=connection.dialect)
+    result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params)
+    plan = result.scalar()
+    return int(plan[0]["Plan"]["Plan Rows"])
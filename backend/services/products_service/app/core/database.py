@@ -1,10 +1,181 @@
-import os
+import asyncio
+import threading
+import time
+from sqlalchemy.engine import make_url
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-DATABASE_URL = os.environ.get("DATABASE_URL")
+from core.config import settings
+# Registra o outbox (evento before_commit) em toda sessão, inclusive a dos scripts e varreduras
+import core.change_log  # noqa: F401
 
-engine = create_engine(DATABASE_URL, echo=True)
+DATABASE_URL = settings.database_url
+
+# Drivers assíncronos equivalentes aos síncronos (o psycopg 3 atende aos dois modos)
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+psycopg"}
+SYNC_DRIVERS = {"sqlite+aiosqlite": "sqlite", "postgresql+psycopg": "postgresql+psycopg"}
+
+def to_async_url(url: str) -> str:
+    """Converte a URL do banco para o driver assíncrono correspondente."""
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.get_backend_name(), parsed.drivername)).render_as_string(
+        hide_password=False
+    )
+
+
+def to_sync_url(url: str) -> str:
+    """O inverso de 'to_async_url': a URL com o driver síncrono do mesmo banco."""
+    parsed = make_url(url)
+    return parsed.set(drivername=SYNC_DRIVERS.get(parsed.drivername, parsed.drivername)).render_as_string(
+        hide_password=False
+    )
+
+
+class PoolMetrics:
+    """Contadores de uso do pool: quantas conexões foram pedidas e quanto se esperou por elas."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+
+pool_metrics = PoolMetrics()
+
+
+class _InstrumentedPoolMixin:
+    """Mede o tempo que cada checkout passa esperando uma conexão livre no pool."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            pool_metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_metrics.record_wait(time.perf_counter() - start, timed_out=False)
+        return connection
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_limits() -> tuple:
+    """
+    (pool_size, max_overflow) de cada worker. Com DB_MAX_CONNECTIONS, o teto é
+    dividido entre os SERVER_WORKERS processos: N workers com o pool padrão
+    multiplicariam as conexões abertas no Postgres.
+    """
+    if not settings.db_max_connections:
+        return settings.db_pool_size, settings.db_max_overflow
+    per_worker = max(1, settings.db_max_connections // max(1, settings.server_workers))
+    pool_size = min(settings.db_pool_size, per_worker)
+    return pool_size, min(settings.db_max_overflow, per_worker - pool_size)
+
+
+def engine_options(url: str, is_async: bool) -> dict:
+    """Monta os argumentos do engine a partir das configurações (pool, timeouts, PgBouncer)."""
+    options = {"echo": settings.db_echo}
+    if make_url(url).get_backend_name() != "postgresql":
+        # SQLite (testes/dev) usa o pool padrão do SQLAlchemy para o seu modo de arquivo/memória
+        return options
+
+    connect_args = {}
+    if settings.db_pgbouncer:
+        # psycopg 3: None desliga os prepared statements automáticos
+        connect_args["prepare_threshold"] = None
+    elif settings.db_statement_timeout_ms:
+        connect_args["options"] = f"-c statement_timeout={settings.db_statement_timeout_ms}"
+
+    pool_size, max_overflow = pool_limits()
+    options.update(
+        poolclass=InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        pool_recycle=settings.db_pool_recycle,
+        connect_args=connect_args,
+    )
+    return options
+
+
+# Engine síncrono: usado pelo create_all, migrações, scripts e benchmarks
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL, is_async=False))
+
+# Engine assíncrono: usado pelas rotas (async def), sem ocupar o threadpool do FastAPI
+async_engine = create_async_engine(to_async_url(DATABASE_URL), **engine_options(DATABASE_URL, is_async=True))
+
+
+def pool_status() -> dict:
+    """Retrato do pool do engine assíncrono (o que atende as requisições) e dos contadores."""
+    pool = async_engine.pool
+    status = {
+        "pool_class": type(pool).__name__,
+        "checkouts_total": pool_metrics.checkouts,
+        "checkout_timeouts_total": pool_metrics.timeouts,
+        "checkout_wait_seconds_total": round(pool_metrics.wait_seconds_total, 6),
+        "checkout_wait_seconds_max": round(pool_metrics.wait_seconds_max, 6),
+    }
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    return status
+
+async def warm_up_pool() -> None:
+    """
+    Abre as conexões do pool no boot, em paralelo, para que as primeiras requisições
+    não paguem o handshake (TCP/TLS/autenticação) com o banco.
+    """
+    pool = async_engine.pool
+    total = pool.size() if isinstance(pool, QueuePool) else 1
+
+    async def open_connection():
+        async with async_engine.connect() as connection:
+            # Segura a conexão até todas abrirem; senão o pool reaproveitaria a mesma
+            await barrier.wait()
+
+    barrier = asyncio.Barrier(total)
+    await asyncio.gather(*(open_connection() for _ in range(total)))
 
 def get_session():
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
+
+# expire_on_commit=False: depois do commit os atributos continuam acessíveis
+# sem disparar um lazy load (que não é permitido fora de um 'await')
+async_session_factory = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+def get_async_session_factory() -> async_sessionmaker:
+    """
+    Fábrica de sessões assíncronas. Rotas que precisam de uma sessão que sobreviva
+    ao fim do handler (ex.: respostas em streaming) dependem dela diretamente.
+    """
+    return async_session_factory
+
+async def get_async_session(session_factory: async_sessionmaker = Depends(get_async_session_factory)):
+    async with session_factory() as session:
+        yield session
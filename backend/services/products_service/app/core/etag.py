@@ -0,0 +1,150 @@
+"""
+Módulo de ETags e Requisições Condicionais
+
+- Recursos individuais: o ETag vem da coluna 'version' da linha (incrementada pelo
+  ORM a cada UPDATE), então dá para responder 304 sem serializar o corpo e, com o
+  cache de leituras, sem nem consultar o banco.
+- Listagens: o ETag combina a versão da coleção (soma das faixas da tabela
+  'collection_version'; cada escrita incrementa uma faixa na mesma transação) com os parâmetros
+  da consulta. Um If-None-Match que bate custa uma única leitura de chave primária,
+  sem tocar nas linhas da listagem.
+- If-Match nas rotas de atualização: controle de concorrência otimista (412 se o
+  recurso mudou desde que o cliente o leu).
+
+A versão da coleção precisa ser lida ANTES das linhas: assim um ETag nunca
+descreve dados mais antigos do que a versão que ele carrega.
+"""
+import hashlib
+import random
+from itertools import chain
+from typing import List, Optional
+
+from fastapi import HTTPException, Request, Response, status
+from sqlalchemy import event, func, update
+from sqlalchemy.orm import Session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.invalidation import mark_rows_written, mark_tables_written
+from models.collection_version_model import COLLECTION_VERSION_SLOTS, VERSIONED_COLLECTIONS, CollectionVersion
+
+# Os clientes devem sempre revalidar (If-None-Match) antes de reutilizar a cópia local
+CACHE_CONTROL = "no-cache"
+
+PRECONDITION_FAILED_DETAIL = "O recurso foi alterado desde a última leitura (ETag diferente)."
+
+_BUMPED_KEY = "bumped_collections"
+
+
+def row_etag(kind: str, row_id: int, version: int) -> str:
+    return f'"{kind}-{row_id}-{version}"'
+
+
+def collection_etag(kind: str, version: int, request: Request) -> str:
+    """ETag de uma listagem: versão da coleção + hash dos parâmetros (ordem irrelevante)."""
+    params = "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+    digest = hashlib.sha1(params.encode()).hexdigest()[:16]
+    return f'"{kind}s-{version}-{digest}"'
+
+
+def _parse_etags(header: str) -> List[str]:
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def if_none_match(request: Request, etag: str) -> bool:
+    """True se o cliente já tem a representação atual (comparação fraca, RFC 9110)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = _parse_etags(header)
+    return "*" in tags or etag in [tag.removeprefix("W/") for tag in tags]
+
+
+def check_if_match(request: Request, etag: str) -> None:
+    """Levanta 412 se o cliente enviou If-Match e nenhum ETag bate (comparação forte)."""
+    header = request.headers.get("if-match")
+    if header is None:
+        return
+    tags = _parse_etags(header)
+    if "*" not in tags and etag not in tags:
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail=PRECONDITION_FAILED_DETAIL)
+
+
+def set_etag_headers(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+
+def json_response(etag: str, body: bytes) -> Response:
+    """Resposta JSON já serializada (ex.: vinda do cache de leituras) com o ETag."""
+    return Response(content=body, media_type="application/json", headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+async def get_collection_version(session: AsyncSession, name: str) -> Optional[int]:
+    """Versão atual da coleção (soma das faixas), ou None se a tabela de versões não tiver as linhas."""
+    query = select(func.sum(CollectionVersion.version)).where(CollectionVersion.name == name)
+    return (await session.exec(query)).first()
+
+
+def bump_collection_versions(session: Session, *tables: str) -> None:
+    """
+    Incrementa a versão das coleções alteradas, uma vez por transação.
+
+    O UPDATE segura o lock da faixa até o commit. No Postgres a faixa é escolhida com
+    'FOR UPDATE SKIP LOCKED', então escritas concorrentes na mesma tabela só esperam
+    umas pelas outras se todas as faixas estiverem ocupadas.
+    Escritas em massa fora do ORM a chamam via 'touch_rows'.
+    """
+    bumped = session.info.setdefault(_BUMPED_KEY, set())
+    pending = [table for table in tables if table in VERSIONED_COLLECTIONS and table not in bumped]
+    if not pending:
+        return
+    connection = session.connection()
+    columns = CollectionVersion.__table__.c
+    for table in pending:
+        bump = update(CollectionVersion.__table__).values(version=columns.version + 1)
+        if connection.dialect.name == "postgresql":
+            free_slot = (
+                select(columns.slot).where(columns.name == table)
+                .order_by(func.random()).limit(1).with_for_update(skip_locked=True).scalar_subquery()
+            )
+            if connection.execute(bump.where(columns.name == table, columns.slot == free_slot)).rowcount:
+                continue
+        # Sem SKIP LOCKED (ou com todas as faixas ocupadas): espera por uma faixa qualquer
+        slot = random.randrange(COLLECTION_VERSION_SLOTS)
+        connection.execute(bump.where(columns.name == table, columns.slot == slot))
+    bumped.update(pending)
+
+
+def versioned_values(table, **values) -> dict:
+    """Valores de um UPDATE fora do ORM, com a 'version' (ETag) da linha incrementada como o ORM faria."""
+    return {**values, "version": table.c.version + 1}
+
+
+async def touch_rows(session: AsyncSession, table: str, rows: Optional[List[dict]] = None) -> None:
+    """
+    Avisos de uma escrita fora do ORM, que o flush não vê: marca as linhas alteradas
+    (sem 'rows', a tabela inteira) para os caches e o feed e incrementa a versão da
+    coleção. A 'version' das linhas vem do próprio comando ('versioned_values').
+    """
+    if rows is None:
+        mark_tables_written(session.sync_session, table)
+    else:
+        mark_rows_written(session.sync_session, table, rows)
+    await session.run_sync(bump_collection_versions, table)
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_after_flush(session, flush_context):
+    tables = {getattr(obj, "__tablename__", None) for obj in chain(session.new, session.dirty, session.deleted)}
+    bump_collection_versions(session, *(table for table in tables if table))
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _reset_bumped(session):
+    session.info.pop(_BUMPED_KEY, None)
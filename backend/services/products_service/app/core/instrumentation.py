@@ -0,0 +1,300 @@
+"""
+Módulo de Instrumentação das Requisições
+
+Mede o custo de cada requisição:
+
+- quantos comandos SQL rodou e quanto tempo passou no banco (eventos
+  'before/after_cursor_execute' em todos os engines);
+- quanto tempo levou a serialização JSON (core/serialization.py).
+
+O resultado vai para o header 'Server-Timing', visível na aba Network do
+navegador, e para o endpoint '/metrics' no formato texto do Prometheus, com
+histogramas por rota: latência, número de queries e tempo de banco. Como os
+demais contadores do serviço, os valores são por processo (worker).
+
+Comandos mais lentos que SLOW_QUERY_THRESHOLD_MS vão para o log com os parâmetros.
+Uma amostra (SLOW_QUERY_EXPLAIN_SAMPLE_RATE) dos SELECTs lentos que leem tabelas é
+reexecutada com EXPLAIN ANALYZE (EXPLAIN QUERY PLAN no SQLite) no mesmo banco em que
+rodou (primário ou réplica), numa conexão separada e em segundo plano, fora da
+transação e do tempo da requisição.
+"""
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+MAX_LOGGED_PARAMETERS_CHARS = 1000
+MAX_PENDING_EXPLAINS = 4
+# O EXPLAIN ANALYZE executa o comando de verdade: só leituras de tabelas, sem trava e
+# sem funções do Postgres (pg_advisory_xact_lock, pg_notify, ...), que têm efeitos
+_READS_TABLE = re.compile(r"\bFROM\b", re.IGNORECASE)
+_HAS_EFFECTS = re.compile(r"\bFOR\s+(NO\s+KEY\s+UPDATE|UPDATE|KEY\s+SHARE|SHARE)\b|\bPG_\w+\s*\(", re.IGNORECASE)
+
+
+class RequestStats:
+    """Acumulado de uma requisição; vive numa ContextVar durante o atendimento."""
+
+    __slots__ = ("query_count", "db_seconds", "serialization_seconds")
+
+    def __init__(self):
+        self.query_count = 0
+        self.db_seconds = 0.0
+        self.serialization_seconds = 0.0
+
+
+# O SQLAlchemy propaga o contexto para o greenlet do AsyncSession, então os eventos
+# do engine enxergam a requisição corrente
+_current_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    return _current_stats.get()
+
+
+def record_serialization(seconds: float) -> None:
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.serialization_seconds += seconds
+
+
+# --- Métricas no formato do Prometheus ---
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class Histogram:
+    """Histograma cumulativo com rótulos (buckets 'le', _sum e _count), como o do Prometheus."""
+
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [contagem por bucket..., soma, total]
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        for key, series in sorted(snapshot.items()):
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', repr(float(bound))),))} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+class MetricsRegistry:
+    """
+    Histogramas das requisições mais coletores: funções que devolvem métricas
+    simples (nome, tipo, ajuda, valor) de outros módulos, como o pool e o cache.
+    """
+
+    def __init__(self):
+        self.request_seconds = Histogram(
+            "http_request_duration_seconds", "Latência das requisições por rota.", LATENCY_BUCKETS,
+        )
+        self.request_queries = Histogram(
+            "http_request_db_queries", "Comandos SQL executados por requisição.", QUERY_COUNT_BUCKETS,
+        )
+        self.request_db_seconds = Histogram(
+            "http_request_db_seconds", "Tempo no banco por requisição.", LATENCY_BUCKETS,
+        )
+        self.slow_queries = 0
+        self._collectors: List[Callable[[], Iterable[tuple]]] = []
+
+    def add_collector(self, collector: Callable[[], Iterable[tuple]]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for histogram in (self.request_seconds, self.request_queries, self.request_db_seconds):
+            lines.extend(histogram.render())
+        samples = [("db_slow_queries_total", "counter", "Comandos SQL acima do limite de lentidão.", self.slow_queries)]
+        for collector in self._collectors:
+            samples.extend(collector())
+        for name, metric_type, help_text, value in samples:
+            if value is None:
+                continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        for histogram in (self.request_seconds, self.request_queries, self.request_db_seconds):
+            histogram.clear()
+        self.slow_queries = 0
+
+
+metrics = MetricsRegistry()
+
+
+# --- Middleware ---
+
+class InstrumentationMiddleware:
+    """
+    Middleware ASGI puro (sem BaseHTTPMiddleware, que custa uma tarefa extra por
+    requisição). Em respostas em streaming, o Server-Timing cobre só o que
+    aconteceu até o início do envio.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                header = (
+                    f'db;desc="{stats.query_count} queries";dur={stats.db_seconds * 1000:.2f}, '
+                    f"serialize;dur={stats.serialization_seconds * 1000:.2f}, total;dur={elapsed_ms:.2f}"
+                )
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_stats.reset(token)
+            # Rótulo pelo molde da rota ('/api/v1/products/{product_id}'), nunca pelo caminho
+            # real: ids na URL criariam uma série por produto
+            route = scope.get("route")
+            labels = {"method": scope["method"], "route": getattr(route, "path", "unmatched")}
+            metrics.request_seconds.observe(time.perf_counter() - started, status=str(status_code), **labels)
+            metrics.request_queries.observe(stats.query_count, **labels)
+            metrics.request_db_seconds.observe(stats.db_seconds, **labels)
+
+
+# --- Eventos do SQLAlchemy e log de queries lentas ---
+
+_explain_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+_pending_explains = 0
+_pending_lock = threading.Lock()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started_stack = conn.info.get("query_started_at")
+    if not started_stack:
+        return
+    elapsed = time.perf_counter() - started_stack.pop()
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.query_count += 1
+        stats.db_seconds += elapsed
+
+    threshold_ms = settings.slow_query_threshold_ms
+    if threshold_ms is None or elapsed * 1000 < threshold_ms or statement.lstrip()[:7].upper() == "EXPLAIN":
+        return
+    metrics.slow_queries += 1
+    logged_parameters = repr(parameters)[:MAX_LOGGED_PARAMETERS_CHARS] if settings.slow_query_log_parameters else "(omitidos)"
+    logger.warning("Query lenta (%.1f ms): %s | parâmetros: %s", elapsed * 1000, statement, logged_parameters)
+
+    if not executemany and _is_explainable(statement) and random.random() < settings.slow_query_explain_sample_rate:
+        _schedule_explain(conn.engine, statement, parameters, elapsed)
+
+
+def _is_explainable(statement: str) -> bool:
+    return (
+        statement.lstrip()[:6].upper() == "SELECT"
+        and _READS_TABLE.search(statement) is not None
+        and _HAS_EFFECTS.search(statement) is None
+    )
+
+
+def _schedule_explain(engine: Engine, statement: str, parameters, elapsed: float) -> None:
+    global _pending_explains
+    with _pending_lock:
+        # Um banco já lento não precisa de uma fila de EXPLAINs concorrendo com ele
+        if _pending_explains >= MAX_PENDING_EXPLAINS:
+            return
+        _pending_explains += 1
+    _explain_executor.submit(_explain, engine, statement, parameters, elapsed)
+
+
+_sync_engines: Dict[str, Engine] = {}
+
+
+def _sync_engine(engine: Engine) -> Engine:
+    """
+    Engine síncrono para o mesmo banco. O de um AsyncEngine só funciona dentro do
+    event loop dele; aqui se abre um próprio (sem pool), criado uma vez por URL.
+    """
+    if not engine.dialect.is_async:
+        return engine
+    from core.database import to_sync_url
+
+    url = to_sync_url(engine.url.render_as_string(hide_password=False))
+    if url not in _sync_engines:
+        _sync_engines[url] = create_engine(url, poolclass=NullPool)
+    return _sync_engines[url]
+
+
+def _explain(engine: Engine, statement: str, parameters, elapsed: float) -> None:
+    global _pending_explains
+    prefix = "EXPLAIN (ANALYZE, BUFFERS) " if engine.dialect.name == "postgresql" else "EXPLAIN QUERY PLAN "
+    try:
+        with _sync_engine(engine).connect() as connection:
+            rows = connection.exec_driver_sql(prefix + statement, parameters).all()
+            connection.rollback()
+        plan = "\n".join(" ".join(str(column) for column in row) for row in rows)
+        logger.warning("Plano da query lenta (%.1f ms):\n%s\n%s", elapsed * 1000, statement, plan)
+    except Exception:
+        logger.exception("Falha no EXPLAIN da query lenta")
+    finally:
+        with _pending_lock:
+            _pending_explains -= 1
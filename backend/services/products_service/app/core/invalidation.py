@@ -0,0 +1,98 @@
+"""
+Módulo de Invalidação por Escrita
+
+Acompanha quais tabelas foram alteradas em cada sessão e, somente após o COMMIT,
+avisa os caches inscritos. Assim nenhuma rota precisa lembrar de invalidar nada
+manualmente: qualquer insert/update/delete feito pelo ORM dispara o aviso.
+
+Escritas em massa feitas com UPDATE/INSERT "core" (fora do flush do ORM) devem
+avisar explicitamente, via 'touch_rows' (core/etag.py): com as linhas alteradas
+('mark_rows_written') ou, quando não se sabe quais mudaram, com a tabela inteira
+('mark_tables_written'), que os inscritos tratam como toda alterada.
+"""
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_WRITE_SET_KEY = "write_set"
+
+
+@dataclass
+class WriteSet:
+    """
+    O que uma transação alterou.
+
+    'rows' guarda, por tabela, uma cópia dos atributos já carregados de cada objeto no
+    momento do flush (depois do commit os objetos podem estar expirados). 'bulk_tables'
+    são as tabelas alteradas sem passar pelo ORM, cujas linhas não são conhecidas.
+    """
+    tables: set = field(default_factory=set)
+    rows: Dict[str, list] = field(default_factory=dict)
+    bulk_tables: set = field(default_factory=set)
+
+
+_subscribers: List[Callable[[WriteSet], None]] = []
+
+
+def subscribe(callback: Callable[[WriteSet], None]) -> None:
+    """Registra uma função chamada com o WriteSet de cada transação, após o commit."""
+    _subscribers.append(callback)
+
+
+def _write_set(session: Session) -> WriteSet:
+    return session.info.setdefault(_WRITE_SET_KEY, WriteSet())
+
+
+def pending_write_set(session: Session) -> Optional[WriteSet]:
+    """O que a transação atual já alterou (até o último flush), sem consumir o registro."""
+    return session.info.get(_WRITE_SET_KEY)
+
+
+def mark_tables_written(session: Session, *tables: str) -> None:
+    """Marca tabelas como alteradas em massa (linhas desconhecidas) na transação atual."""
+    write_set = _write_set(session)
+    write_set.tables.update(tables)
+    write_set.bulk_tables.update(tables)
+
+
+def mark_rows_written(session: Session, table: str, rows: List[dict]) -> None:
+    """Marca linhas conhecidas como alteradas por um comando fora do ORM (ex.: UPDATE ... RETURNING)."""
+    write_set = _write_set(session)
+    write_set.tables.add(table)
+    write_set.rows.setdefault(table, []).extend(rows)
+
+
+def notify_tables_written(tables: set) -> None:
+    """Avisa imediatamente todos os inscritos (útil para escritas fora de uma Session)."""
+    notify(WriteSet(tables=set(tables), bulk_tables=set(tables)))
+
+
+def notify(write_set: WriteSet) -> None:
+    for callback in _subscribers:
+        callback(write_set)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_written_rows(session, flush_context):
+    write_set = _write_set(session)
+    for obj in chain(session.new, session.dirty, session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if table:
+            write_set.tables.add(table)
+            loaded = {key: value for key, value in vars(obj).items() if not key.startswith("_sa_")}
+            write_set.rows.setdefault(table, []).append(loaded)
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_after_commit(session):
+    write_set = session.info.pop(_WRITE_SET_KEY, None)
+    if write_set and write_set.tables:
+        notify(write_set)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop(_WRITE_SET_KEY, None)
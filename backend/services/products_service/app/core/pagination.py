@@ -0,0 +1,93 @@
+"""
+Módulo de Paginação por Cursor (Keyset)
+
+A paginação por OFFSET obriga o banco a ler e descartar todas as linhas das
+páginas anteriores. Aqui o cliente recebe um cursor opaco com a chave de
+ordenação da última linha (+ o 'id' como desempate) e a próxima página é
+buscada com um predicado de "seek" (WHERE coluna > ultimo_valor ...), que o
+banco resolve direto pelo índice, com custo constante em qualquer página.
+"""
+import base64
+import binascii
+import enum
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Optional
+
+from sqlalchemy import and_, or_, tuple_
+
+
+def encode_cursor(sort_by: str, sort_order: str, value: Any, row_id: int) -> str:
+    """Gera o cursor opaco (base64 url-safe) a partir da última linha da página."""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    elif isinstance(value, Decimal):
+        value = str(value)
+    elif isinstance(value, enum.Enum):
+        value = value.value
+    payload = {"s": sort_by, "o": sort_order, "v": value, "id": row_id}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, sort_order: str, column) -> tuple:
+    """
+    Decodifica o cursor e devolve (valor_da_coluna, id).
+
+    Levanta ValueError se o cursor estiver corrompido ou se tiver sido gerado
+    para outra ordenação (sortBy/sortOrder diferentes da requisição atual).
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload["s"] != sort_by or payload["o"] != sort_order:
+            raise ValueError("O cursor não corresponde à ordenação solicitada.")
+        return _coerce(column, payload["v"]), int(payload["id"])
+    except (binascii.Error, json.JSONDecodeError, UnicodeDecodeError,
+            KeyError, TypeError, InvalidOperation) as exc:
+        raise ValueError("Cursor inválido.") from exc
+
+
+def _coerce(column, value: Any) -> Any:
+    """Converte o valor serializado de volta para o tipo Python da coluna."""
+    if value is None:
+        return None
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        # Tipos customizados (ex.: AutoString do SQLModel) já chegam no formato certo pelo JSON
+        return value
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is Decimal:
+        return Decimal(value)
+    return python_type(value)
+
+
+def order_by_keyset(query, column, id_column, descending: bool):
+    """Aplica a ordenação estável (coluna, id) usada tanto pelo offset quanto pelo cursor."""
+    if descending:
+        sort_expr, id_expr = column.desc(), id_column.desc()
+    else:
+        sort_expr, id_expr = column.asc(), id_column.asc()
+    # Colunas que aceitam NULL ficam sempre no fim, igual em Postgres e SQLite
+    if getattr(column, "nullable", False):
+        sort_expr = sort_expr.nulls_last()
+    return query.order_by(sort_expr, id_expr)
+
+
+def apply_keyset(query, column, id_column, descending: bool, last_value: Any, last_id: int):
+    """Adiciona o predicado de seek que posiciona a consulta logo após a última linha vista."""
+    if last_value is None:
+        # Já estamos no bloco de NULLs (sempre no fim): só resta desempatar pelo id
+        tie_break = id_column < last_id if descending else id_column > last_id
+        return query.where(and_(column.is_(None), tie_break))
+
+    # Comparação de tupla (coluna, id) > (v, id): Postgres e SQLite a resolvem como
+    # um range scan no índice composto, ao contrário do "a > x OR (a = x AND ...)"
+    keyset, last_key = tuple_(column, id_column), tuple_(last_value, last_id)
+    seek = keyset < last_key if descending else keyset > last_key
+    if getattr(column, "nullable", False):
+        seek = or_(seek, column.is_(None))
+    return query.where(seek)
@@ -0,0 +1,60 @@
+"""
+Módulo de Tarefas de Fundo
+
+As varreduras (cupons vencidos, reservas de estoque, outbox do feed), a verificação
+das réplicas e a sincronização do filtro de cupons rodam como tarefas asyncio dentro
+de cada worker. Aqui fica o que elas têm em comum:
+
+- 'run_periodically' repete uma rodada a cada N segundos; uma rodada que falha é
+  entregue a 'on_error' (cada serviço conta e loga a sua) e não derruba o laço;
+- 'BackgroundTask' guarda a tarefa do processo: 'start' não sobe uma segunda e
+  'stop' cancela e espera o cancelamento terminar (usado no lifespan do app).
+"""
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+
+async def run_periodically(
+    job: Callable[[], Awaitable],
+    interval_seconds: float,
+    on_error: Callable[[Exception], None],
+    initial_delay: float = 0.0,
+) -> None:
+    """Executa 'job' para sempre, esperando 'interval_seconds' entre uma rodada e a próxima."""
+    if initial_delay:
+        await asyncio.sleep(initial_delay)
+    while True:
+        try:
+            await job()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            on_error(exc)
+        await asyncio.sleep(interval_seconds)
+
+
+class BackgroundTask:
+    """No máximo uma tarefa de fundo por processo para cada instância."""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self, coroutine_factory: Callable[[], Awaitable]) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(coroutine_factory())
+
+    async def stop(self) -> bool:
+        """Cancela a tarefa e espera; devolve False se nenhuma estava rodando."""
+        if self._task is None:
+            return False
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return True
@@ -0,0 +1,365 @@
+"""
+Módulo de Réplicas de Leitura
+
+As leituras "seguras" (listagem e detalhe de produtos e cupons) podem ir para
+réplicas do banco (DB_REPLICA_URLS), tirando carga do primário; todo o resto,
+inclusive qualquer leitura feita dentro de uma escrita, continua no primário.
+
+- Atraso: a cada DB_REPLICA_CHECK_INTERVAL_SECONDS calcula-se o instante até o qual
+  a réplica tem todas as escritas do primário ('fresh_as_of'). Numa réplica de
+  streaming do Postgres, pela posição do WAL: se ela já reproduziu a posição lida no
+  primário, está em dia até o início da verificação; senão, até o último commit
+  reproduzido. Nos outros casos (replicação lógica, cópia de arquivo num ambiente
+  local), pelo outbox 'change_log' (core/change_log.py): compara-se o último 'seq' já
+  assentado do primário (sem buracos recentes) com o da réplica; se ela o tem, está
+  em dia até o início da verificação (no Postgres, menos a janela dos buracos);
+  senão, até a alteração mais antiga que falta.
+- Roteamento: só recebem leituras as réplicas que responderam à última verificação e
+  cujo atraso (agora - fresh_as_of) está abaixo de DB_REPLICA_MAX_LAG_SECONDS. Sem
+  nenhuma assim, a leitura cai no primário. Se as verificações pararem, o atraso
+  cresce sozinho e as réplicas saem do rodízio.
+- Leia-o-que-escreveu: cada requisição que confirmou uma escrita devolve o cookie
+  'rw_after' com o instante dela (leituras por POST, como os /lookup, não), válido por DB_READ_YOUR_WRITES_SECONDS. Enquanto ele existir,
+  esse cliente só lê de réplicas que já tenham esse instante (na prática, do
+  primário até a próxima verificação). O filtro de códigos de cupom
+  (services/coupon_code_filter.py) usa o mesmo cookie, então ele também é emitido
+  sem réplicas enquanto o filtro estiver ligado.
+- Cache: uma leitura de réplica só alimenta os caches se a réplica já tiver todas
+  as escritas confirmadas por este processo; senão gravaria no cache um valor que a
+  invalidação acabou de apagar.
+"""
+import asyncio
+import itertools
+import logging
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import timezone
+from functools import partial
+from typing import List, Optional
+
+from fastapi import Depends, Request
+from sqlalchemy import func, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core import invalidation
+from core.change_log import needs_settling, settled_seq
+from core.config import settings
+from core.database import engine_options, get_async_session_factory, to_async_url
+from core.periodic import BackgroundTask, run_periodically
+from models.change_log_model import ChangeLog
+
+logger = logging.getLogger(__name__)
+
+READ_YOUR_WRITES_COOKIE = "rw_after"
+_REPLICA_KEY = "replica"
+# Tabelas alteradas pela requisição atual (preenchido após cada commit)
+_request_writes: ContextVar[Optional[set]] = ContextVar("request_writes", default=None)
+
+
+@dataclass
+class Replica:
+    """Uma réplica de leitura e o que a última verificação descobriu sobre ela."""
+    name: str
+    session_factory: async_sessionmaker
+    healthy: bool = False
+    # Instante (epoch) até o qual todas as escritas do primário já estão na réplica
+    fresh_as_of: float = 0.0
+    checked_at: Optional[float] = None
+    last_error: Optional[str] = None
+
+    @classmethod
+    def from_url(cls, name: str, url: str) -> "Replica":
+        engine = create_async_engine(to_async_url(url), **engine_options(url, is_async=True))
+        return cls(name, async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False))
+
+    def lag_seconds(self, now: Optional[float] = None) -> float:
+        return (now or time.time()) - self.fresh_as_of
+
+
+class ReplicaRouter:
+    """Escolhe a réplica de cada leitura e mantém o estado das verificações (por worker)."""
+
+    def __init__(self, replicas: Optional[List[Replica]] = None):
+        self.replicas: List[Replica] = []
+        self.configure(replicas or [])
+        self.replica_reads = 0
+        self.primary_reads_after_write = 0
+        self.primary_reads_fallback = 0
+        self.check_failures = 0
+
+    def configure(self, replicas: List[Replica]) -> None:
+        self.replicas = list(replicas)
+        self._next = itertools.count()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def choose(self, written_at: Optional[float] = None) -> Optional[Replica]:
+        """Réplica (em rodízio) que pode atender a leitura, ou None para ler do primário."""
+        now = time.time()
+        candidates = [
+            replica for replica in self.replicas
+            if replica.healthy and replica.lag_seconds(now) <= settings.db_replica_max_lag_seconds
+        ]
+        if written_at is not None:
+            fresh_enough = [replica for replica in candidates if replica.fresh_as_of >= written_at]
+            if not fresh_enough and candidates:
+                self.primary_reads_after_write += 1
+                return None
+            candidates = fresh_enough
+        if not candidates:
+            self.primary_reads_fallback += 1
+            return None
+        self.replica_reads += 1
+        return candidates[next(self._next) % len(candidates)]
+
+    async def check(self, primary_factory: async_sessionmaker) -> None:
+        """Mede o atraso de cada réplica em relação ao primário; réplica que falha sai do rodízio."""
+        started = time.time()
+        async with primary_factory() as session:
+            settles = needs_settling(session.bind.dialect.name)
+            wal_position = None
+            if settles:
+                wal_position = (await session.execute(text("SELECT pg_current_wal_lsn()::text"))).scalar()
+            head = (await session.exec(select(func.max(ChangeLog.id)))).first()
+            if head is not None and settles:
+                horizon = await settled_seq(session, 0)
+                if horizon is not None:
+                    head = min(head, horizon)
+        # Com a janela de buracos, o 'seq' assentado só garante o que foi confirmado antes dela
+        caught_up_at = started - settings.change_feed_settle_seconds if settles else started
+        for replica in self.replicas:
+            try:
+                replica.fresh_as_of = await asyncio.wait_for(
+                    self._fresh_as_of(replica, primary_factory, head, wal_position, started, caught_up_at),
+                    settings.db_replica_check_timeout_seconds,
+                )
+            except Exception as exc:
+                if replica.healthy:
+                    logger.warning("Réplica %s fora do rodízio: %r", replica.name, exc)
+                replica.healthy = False
+                replica.last_error = repr(exc)
+                self.check_failures += 1
+            else:
+                if not replica.healthy:
+                    logger.info("Réplica %s no rodízio (atraso %.2fs)", replica.name, replica.lag_seconds(started))
+                replica.healthy = True
+                replica.last_error = None
+            replica.checked_at = started
+
+    @staticmethod
+    async def _fresh_as_of(
+        replica: Replica, primary_factory: async_sessionmaker, head: Optional[int], wal_position: Optional[str],
+        started: float, caught_up_at: float,
+    ) -> float:
+        async with replica.session_factory() as session:
+            if wal_position is not None:
+                replayed, replayed_at = (await session.execute(
+                    text(
+                        "SELECT pg_last_wal_replay_lsn() >= CAST(:position AS pg_lsn), "
+                        "extract(epoch FROM pg_last_xact_replay_timestamp())"
+                    ),
+                    {"position": wal_position},
+                )).one()
+                # NULL: não é uma réplica de streaming; segue pelo outbox
+                if replayed is not None:
+                    # O WAL é reproduzido na ordem dos commits: tudo antes do último reproduzido já está lá
+                    return started if replayed else min(started, float(replayed_at or 0.0))
+            replica_head = (await session.exec(select(func.max(ChangeLog.id)))).first()
+        if head is None or (replica_head is not None and replica_head >= head):
+            return caught_up_at
+        # Atrasada: está em dia até a alteração mais antiga que ainda não chegou nela
+        async with primary_factory() as session:
+            oldest_missing = (await session.exec(
+                select(func.min(ChangeLog.created_at)).where(ChangeLog.id > (replica_head or 0))
+            )).first()
+        if oldest_missing is None:
+            return caught_up_at
+        return min(caught_up_at, oldest_missing.replace(tzinfo=timezone.utc).timestamp())
+
+    def status(self) -> dict:
+        now = time.time()
+        return {
+            "replicas": [
+                {
+                    "name": replica.name,
+                    "healthy": replica.healthy,
+                    "lagSeconds": round(replica.lag_seconds(now), 3) if replica.checked_at else None,
+                    "checkedAt": replica.checked_at,
+                    "lastError": replica.last_error,
+                }
+                for replica in self.replicas
+            ],
+            "replicaReads": self.replica_reads,
+            "primaryReadsAfterWrite": self.primary_reads_after_write,
+            "primaryReadsFallback": self.primary_reads_fallback,
+            "checkFailures": self.check_failures,
+        }
+
+    def collect(self) -> List[tuple]:
+        if not self.enabled:
+            return []
+        now = time.time()
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        return [
+            ("db_replicas_healthy", "gauge", "Réplicas que responderam à última verificação.", len(healthy)),
+            ("db_replica_max_lag_seconds", "gauge", "Maior atraso entre as réplicas saudáveis.",
+             round(max(replica.lag_seconds(now) for replica in healthy), 3) if healthy else None),
+            ("db_replica_reads_total", "counter", "Leituras atendidas por réplicas.", self.replica_reads),
+            ("db_primary_reads_after_write_total", "counter", "Leituras no primário por leia-o-que-escreveu.",
+             self.primary_reads_after_write),
+            ("db_primary_reads_fallback_total", "counter", "Leituras no primário por falta de réplica em dia.",
+             self.primary_reads_fallback),
+            ("db_replica_check_failures_total", "counter", "Verificações de réplica que falharam.", self.check_failures),
+        ]
+
+    async def dispose(self) -> None:
+        for replica in self.replicas:
+            await replica.session_factory.kw["bind"].dispose()
+
+
+def _replicas_from_settings() -> List[Replica]:
+    urls = [url.strip() for url in settings.db_replica_urls.split(",") if url.strip()]
+    return [Replica.from_url(f"replica-{index}", url) for index, url in enumerate(urls, start=1)]
+
+
+replica_router = ReplicaRouter(_replicas_from_settings())
+
+
+# --- Escritas do próprio processo (proteção do cache) ---
+
+_last_local_write = 0.0
+
+
+def _record_local_write(written: invalidation.WriteSet) -> None:
+    global _last_local_write
+    _last_local_write = time.time()
+    request_writes = _request_writes.get()
+    if request_writes is not None:
+        request_writes.update(written.tables)
+
+
+invalidation.subscribe(_record_local_write)
+
+
+def is_replica_read(session: AsyncSession) -> bool:
+    return _REPLICA_KEY in session.info
+
+
+def is_cacheable_read(session: AsyncSession) -> bool:
+    """Leituras do primário sempre; de réplica, só se ela já tem as escritas confirmadas por este processo."""
+    replica = session.info.get(_REPLICA_KEY)
+    return replica is None or replica.fresh_as_of >= _last_local_write
+
+
+# --- Sessão das leituras seguras ---
+
+def written_at(request: Request) -> Optional[float]:
+    """Instante (epoch) da última escrita deste cliente, pelo cookie 'rw_after' ainda válido."""
+    try:
+        written_at = float(request.cookies.get(READ_YOUR_WRITES_COOKIE, ""))
+    except ValueError:
+        return None
+    # O cookie expira no navegador; aqui só se garante que um valor velho não force o primário
+    return written_at if time.time() - written_at <= _read_your_writes_seconds() else None
+
+
+def _read_your_writes_seconds() -> float:
+    # Depois da janela, o limite de atraso das réplicas (e do filtro de cupons) já garante que eles têm a escrita
+    return max(
+        settings.db_read_your_writes_seconds, settings.db_replica_max_lag_seconds,
+        settings.coupon_filter_max_sync_lag_seconds,
+    )
+
+
+async def get_read_session(
+    request: Request, session_factory: async_sessionmaker = Depends(get_async_session_factory),
+):
+    """
+    Sessão para leituras que toleram um pequeno atraso: de uma réplica em dia, quando
+    houver, ou do primário. Não use em rotas que escrevem.
+    """
+    replica = replica_router.choose(written_at(request)) if replica_router.enabled else None
+    async with (replica.session_factory if replica else session_factory)() as session:
+        if replica:
+            session.info[_REPLICA_KEY] = replica
+        yield session
+
+
+class ReadYourWritesMiddleware:
+    """
+    Marca o cliente com o instante da escrita (cookie 'rw_after') quando a requisição
+    confirmou alguma; o conjunto é mutável para que a rota o preencha mesmo rodando
+    no threadpool (que trabalha numa cópia do contexto).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (replica_router.enabled or settings.coupon_filter_enabled):
+            await self.app(scope, receive, send)
+            return
+
+        written_tables = set()
+        token = _request_writes.set(written_tables)
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400 and written_tables:
+                cookie = (
+                    f"{READ_YOUR_WRITES_COOKIE}={time.time():.3f}; Max-Age={int(_read_your_writes_seconds()) + 1}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            _request_writes.reset(token)
+
+
+# --- Verificações em segundo plano ---
+
+def _check_failed(exc: Exception) -> None:
+    replica_router.check_failures += 1
+    logger.error("Falha ao verificar as réplicas de leitura", exc_info=exc)
+
+
+async def check_replicas(primary_factory: async_sessionmaker) -> None:
+    """Uma rodada de verificação; uma falha no primário é logada e a próxima rodada tenta de novo."""
+    try:
+        await replica_router.check(primary_factory)
+    except asyncio.CancelledError:
+        raise
+    except Exception as exc:
+        _check_failed(exc)
+
+
+async def run_health_checks(primary_factory: async_sessionmaker, interval_seconds: float) -> None:
+    await run_periodically(
+        partial(replica_router.check, primary_factory), interval_seconds, _check_failed, initial_delay=interval_seconds,
+    )
+
+
+_health_checks = BackgroundTask()
+
+
+async def start_health_checks() -> None:
+    """Primeira verificação antes de atender (réplicas já entram no rodízio) e o laço em segundo plano."""
+    if not replica_router.enabled or _health_checks.running:
+        return
+    from core.database import async_session_factory
+
+    # Limitada pelo timeout de cada réplica: uma réplica fora do ar não segura o boot
+    await check_replicas(async_session_factory)
+    _health_checks.start(lambda: run_health_checks(async_session_factory, settings.db_replica_check_interval_seconds))
+
+
+async def stop_health_checks() -> None:
+    if await _health_checks.stop():
+        await replica_router.dispose()
@@ -0,0 +1,60 @@
+"""
+Módulo de Versão do Schema
+
+O schema do banco é responsabilidade das migrações do Alembic (migrations/), não
+da aplicação: os workers não rodam create_all nem refletem tabelas no boot. Na
+inicialização, cada worker só compara a revisão gravada em 'alembic_version' com
+SCHEMA_REVISION, a revisão que este código espera. É uma única consulta de chave
+primária. Se as duas forem diferentes, o worker não sobe.
+
+SCHEMA_REVISION precisa acompanhar a última migração; um teste garante isso
+(tests/test_16_startup.py). Assim o boot não precisa carregar o Alembic nem ler os
+scripts de migração.
+"""
+import os
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+SCHEMA_REVISION = "0010"
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class SchemaRevisionError(RuntimeError):
+    """O banco não está na revisão de schema esperada pelo código."""
+
+
+async def current_revision(engine: AsyncEngine) -> Optional[str]:
+    async with engine.connect() as connection:
+        try:
+            return (await connection.execute(text("SELECT version_num FROM alembic_version"))).scalar()
+        except DBAPIError:
+            # Tabela inexistente: banco nunca migrado
+            return None
+
+
+async def check_schema_revision(engine: AsyncEngine) -> None:
+    revision = await current_revision(engine)
+    if revision != SCHEMA_REVISION:
+        raise SchemaRevisionError(
+            f"Banco na revisão {revision or '(nenhuma)'}, o código espera {SCHEMA_REVISION}. "
+            "Rode 'alembic upgrade head' (ou suba com DB_MIGRATE_ON_START=true). Bancos criados "
+            "pelo antigo create_all, já com todas as tabelas: 'alembic stamp head'."
+        )
+
+
+def upgrade_schema(database_url: Optional[str] = None) -> None:
+    """Aplica as migrações pendentes ('alembic upgrade head'); sem 'database_url', usa a DATABASE_URL das configurações."""
+    from alembic import command
+    from alembic.config import Config
+
+    from core.config import settings
+
+    config = Config(os.path.join(APP_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(APP_DIR, "migrations"))
+    config.attributes["database_url"] = database_url or settings.database_url
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, "head")
@@ -0,0 +1,161 @@
+"""
+Módulo de Busca Textual de Produtos
+
+Substitui o antigo 'LIKE %termo%' (sempre varredura sequencial) por índices reais:
+
+- Postgres: coluna gerada 'search_vector' (tsvector com stemming em português e
+  unaccent) com índice GIN, mais um índice GIN de trigramas (pg_trgm) sobre o nome
+  para tolerar erros de digitação. A relevância combina ts_rank_cd e word_similarity.
+- SQLite (testes/desenvolvimento): tabela virtual FTS5 mantida por triggers, com
+  busca por prefixo e relevância via bm25.
+
+A coluna 'search_vector' não é declarada no modelo 'Product' porque só existe no
+Postgres; ela é criada pela migração de busca (ou pelo hook de create_all abaixo).
+"""
+import re
+from typing import Optional
+
+from sqlalchemy import Float, column, event, false, func, literal_column, table, type_coerce
+
+from models.product_model import Product
+
+SEARCH_CONFIG = "pt_unaccent"
+
+POSTGRES_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # unaccent() não é IMMUTABLE, então não pode ser usado direto em índices
+    """
+    CREATE OR REPLACE FUNCTION immutable_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+    """,
+    f"""
+    DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{SEARCH_CONFIG}') THEN
+            CREATE TEXT SEARCH CONFIGURATION {SEARCH_CONFIG} (COPY = portuguese);
+            ALTER TEXT SEARCH CONFIGURATION {SEARCH_CONFIG}
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+        END IF;
+    END $$
+    """,
+    f"""
+    ALTER TABLE product ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_product_search_vector ON product USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS ix_product_name_trgm ON product USING gin (immutable_unaccent(name) gin_trgm_ops)",
+]
+
+SQLITE_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5(
+        name, description, content='product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS product_fts_ai AFTER INSERT ON product BEGIN
+        INSERT INTO product_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS product_fts_ad AFTER DELETE ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS product_fts_au AFTER UPDATE OF name, description ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO product_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+]
+
+_product_fts = table("product_fts", column("rowid"), column("rank"))
+_search_vector = literal_column("product.search_vector")
+
+
+@event.listens_for(Product.__table__, "after_create")
+def _create_search_structures(target, connection, **kw):
+    """Cria as estruturas de busca quando a tabela nasce via create_all (dev/testes)."""
+    statements = {"postgresql": POSTGRES_SEARCH_DDL, "sqlite": SQLITE_SEARCH_DDL}
+    for statement in statements.get(connection.dialect.name, []):
+        connection.exec_driver_sql(statement)
+
+
+@event.listens_for(Product.__table__, "before_drop")
+def _drop_search_structures(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("DROP TABLE IF EXISTS product_fts")
+
+
+def include_search_object(object, name, type_, reflected, compare_to) -> bool:
+    """Filtro do autogenerate: o FTS5 e suas tabelas-sombra não são modelos e não devem virar diferença."""
+    return not (type_ == "table" and reflected and compare_to is None and name.startswith("product_fts"))
+
+
+def apply_search(query, dialect_name: str, search: str):
+    """Filtra a consulta de produtos pelo termo de busca, usando o índice do banco atual."""
+    if dialect_name == "postgresql":
+        # '<%' (word_similarity) encontra "canetta" em "Caneta Azul" pelo índice de trigramas
+        return query.where(
+            _search_vector.op("@@")(_ts_query(search))
+            | func.immutable_unaccent(search).op("<%")(func.immutable_unaccent(Product.name))
+        )
+
+    if dialect_name == "sqlite":
+        match_expression = _fts5_prefix_query(search)
+        if not match_expression:
+            return query.where(false())
+        return query.join(_product_fts, _product_fts.c.rowid == Product.id).where(
+            literal_column("product_fts").op("MATCH")(match_expression)
+        )
+
+    return query.where(Product.name.contains(search) | Product.description.contains(search))
+
+
+def apply_product_filters(query, dialect_name: str, search: Optional[str], min_price=None, max_price=None):
+    """Filtros de catálogo compartilhados pela listagem e pelas operações em lote."""
+    if search:
+        query = apply_search(query, dialect_name, search)
+    # Filtros de preço usam o preço efetivo (com desconto), que é persistido e indexado
+    if min_price is not None:
+        query = query.where(Product.final_price >= min_price)
+    if max_price is not None:
+        query = query.where(Product.final_price <= max_price)
+    return query
+
+
+def search_relevance(dialect_name: str, search: str) -> Optional[object]:
+    """
+    Expressão de relevância (maior = melhor) para ordenar os resultados de 'apply_search'.
+
+    Retorna None quando o banco não tem busca indexada.
+    """
+    if dialect_name == "postgresql":
+        unaccented_term = func.immutable_unaccent(search)
+        relevance = func.ts_rank_cd(_search_vector, _ts_query(search)) + func.word_similarity(
+            unaccented_term, func.immutable_unaccent(Product.name)
+        )
+    elif dialect_name == "sqlite":
+        # bm25 do FTS5 é "menor = melhor"; invertemos para ficar igual ao Postgres
+        relevance = -_product_fts.c.rank
+    else:
+        return None
+    return type_coerce(relevance, Float).label("relevance")
+
+
+def _ts_query(search: str):
+    return func.websearch_to_tsquery(SEARCH_CONFIG, search)
+
+
+def _fts5_prefix_query(search: str) -> str:
+    """Transforma o texto livre em termos FTS5 entre aspas com prefixo ("cane"* "azu"*)."""
+    terms = re.findall(r"\w+", search)
+    return " ".join(f'"{term}"*' for term in terms)
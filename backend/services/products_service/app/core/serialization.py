@@ -0,0 +1,66 @@
+"""
+Módulo de Serialização JSON
+
+As respostas JSON passam pelo orjson em vez do 'json' da biblioteca padrão. O
+orjson serializa datetime, enum e tipos básicos nativamente. Decimal é convertido
+para string com 'str', o mesmo formato que o Pydantic usa (ex.: "150.00"), então o
+corpo das respostas não muda.
+
+Nas listagens, as linhas já são montadas a partir de colunas tipadas do banco
+(core/utils.py). Com API_SKIP_RESPONSE_VALIDATION (padrão) o handler devolve a
+resposta já serializada e o FastAPI não valida de novo contra o 'response_model',
+que continua servindo para a documentação (OpenAPI). Desligado, o dicionário
+volta para o FastAPI validar e o orjson só faz a codificação final.
+"""
+import time
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+
+from core.config import settings
+from core.instrumentation import record_serialization
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Tipo não serializável em JSON: {type(value).__name__}")
+
+
+def dumps(content: Any, option: int = 0) -> bytes:
+    return orjson.dumps(content, default=_default, option=option)
+
+
+class FastJSONResponse(ORJSONResponse):
+    """Resposta padrão dos routers: orjson, com Decimal como string."""
+
+    def render(self, content: Any) -> bytes:
+        started = time.perf_counter()
+        body = dumps(content)
+        record_serialization(time.perf_counter() - started)
+        return body
+
+
+# Calculados pela própria resposta serializada
+_OWN_HEADERS = {b"content-length", b"content-type"}
+
+
+def respond(content: dict, response: Response):
+    """
+    Devolve 'content' (só tipos básicos, Decimal e datetime) como resposta JSON.
+
+    Com a validação de resposta desligada, serializa direto e copia status e headers
+    (ex.: ETag, cookies) já definidos no 'response' injetado; senão devolve o próprio
+    dicionário para o FastAPI validar contra o response_model da rota.
+    """
+    if not settings.api_skip_response_validation:
+        return content
+    fast_response = FastJSONResponse(content, status_code=response.status_code or 200)
+    # raw_headers, não um dict: cada Set-Cookie é um header repetido
+    fast_response.raw_headers.extend(
+        (name, value) for name, value in response.raw_headers if name not in _OWN_HEADERS
+    )
+    return fast_response
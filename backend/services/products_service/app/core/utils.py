@@ -4,10 +4,14 @@ Módulo de Funções Auxiliares (Utils)
 Este arquivo centraliza lógicas reutilizáveis para manter nosso código
 organizado e evitar repetição (princípio DRY - Don't Repeat Yourself).
 """
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 from decimal import Decimal, ROUND_HALF_UP
 
-from models.product_model import Product, CouponType
+from sqlalchemy import any_, event, case, func, literal
+from sqlalchemy.dialects import postgresql
+
+from models.coupon_model import Coupon, CouponType
+from models.product_model import Product
 from schemas.product_schemas import ProductRead, DiscountDetails
 
 
@@ -40,6 +44,30 @@ def calculate_final_price(product: Product) -> Tuple[Decimal, Optional[DiscountD
     return final_price, discount_details
 
 
+def final_price_expression(price, discount_type, discount_value):
+    """
+    Versão SQL de 'calculate_final_price', para escritas em massa que não passam pelo ORM.
+
+    Recebe expressões/colunas SQL e segue as mesmas regras: desconto percentual ou fixo,
+    ROUND em 2 casas (no Postgres é "half away from zero", como o ROUND_HALF_UP) e
+    piso de 0.01.
+    """
+    discounted = case(
+        (discount_value.is_(None), price),
+        (discount_type == CouponType.percent.value, func.round(price - price * discount_value / 100, 2)),
+        (discount_type == CouponType.fixed.value, func.round(price - discount_value, 2)),
+        else_=price,
+    )
+    return case((discounted < literal(Decimal("0.01")), literal(Decimal("0.01"))), else_=discounted)
+
+
+@event.listens_for(Product, "before_insert")
+@event.listens_for(Product, "before_update")
+def _sync_final_price(mapper, connection, product: Product) -> None:
+    """Mantém a coluna 'final_price' coerente com preço e desconto em toda escrita via ORM."""
+    product.final_price, _ = calculate_final_price(product)
+
+
 def map_product_to_read_schema(product: Product) -> ProductRead:
     """
     Mapeia um objeto do modelo do banco (Product) para o schema de resposta da API (ProductRead).
@@ -60,4 +88,93 @@ def map_product_to_read_schema(product: Product) -> ProductRead:
     })
     
     # Cria e retorna uma instância do schema de resposta com todos os dados corretos
-    return ProductRead(**product_data)
\ No newline at end of file
+    return ProductRead(**product_data)
+
+# --- Mapeamento em lote (listagens e exportações) ---
+
+_PRODUCT_READ_FIELDS = ("id", "name", "description", "price", "stock", "created_at", "deleted_at")
+_PRODUCT_STATE_KEYS = frozenset(_PRODUCT_READ_FIELDS + ("discount_type", "discount_value"))
+_ONE_CENT = 1
+
+
+def _to_cents(value: Decimal) -> Optional[int]:
+    """Converte um Decimal com até 2 casas para centavos inteiros (None se tiver mais casas)."""
+    if value.as_tuple().exponent < -2:
+        return None
+    return int(value * 100)
+
+
+def _final_price_cents(price_cents: int, discount_type: CouponType, value_cents: int) -> int:
+    """
+    Mesmas regras de 'calculate_final_price', só que em aritmética inteira (centavos).
+
+    Percentual: preço_final = p - p*v/100, com p em centavos e v em centésimos de ponto
+    percentual, ou seja p*(10000 - v)/10000 centavos, arredondado "half up" (para longe
+    do zero, como o ROUND_HALF_UP do Decimal). Fixo: p - d, já exato em centavos.
+    """
+    if discount_type == CouponType.percent:
+        numerator = price_cents * (10000 - value_cents)
+        if numerator >= 0:
+            cents = (numerator + 5000) // 10000
+        else:
+            cents = -((-numerator + 5000) // 10000)
+    else:
+        cents = price_cents - value_cents
+    return max(_ONE_CENT, cents)
+
+
+def map_products_to_read_rows(products: List[Product]) -> List[dict]:
+    """
+    Versão em lote de 'map_product_to_read_schema' para páginas e exportações.
+
+    Calcula 'final_price' em centavos inteiros (resultado idêntico ao Decimal) e devolve
+    dicionários simples no formato de 'ProductRead', sem instanciar/validar um schema
+    por linha: a única validação acontece uma vez, na resposta (response_model).
+    """
+    rows = []
+    for product in products:
+        # Ler o __dict__ evita o custo do descriptor do SQLAlchemy em cada atributo;
+        # se algum atributo estiver expirado/não carregado, o getattr faz o load normal
+        state = product.__dict__
+        if not _PRODUCT_STATE_KEYS.issubset(state):
+            state = {name: getattr(product, name) for name in _PRODUCT_STATE_KEYS}
+        row = {name: state.get(name) for name in _PRODUCT_READ_FIELDS}
+        row["is_out_of_stock"] = row["stock"] == 0
+        discount_type, discount_value = state.get("discount_type"), state.get("discount_value")
+
+        if discount_type is None or discount_value is None or discount_type not in (CouponType.percent, CouponType.fixed):
+            row["final_price"] = row["price"]
+            row["discount"] = None
+        else:
+            price_cents, value_cents = _to_cents(row["price"]), _to_cents(discount_value)
+            if price_cents is None or value_cents is None:
+                # Valor fora do formato DECIMAL(10,2): usa o caminho Decimal original
+                row["final_price"], _ = calculate_final_price(product)
+            else:
+                row["final_price"] = Decimal(_final_price_cents(price_cents, discount_type, value_cents)).scaleb(-2)
+            row["discount"] = {"type": discount_type.value, "value": discount_value}
+
+        # Mesma ordem de campos do ProductRead (deleted_at por último)
+        row["deleted_at"] = row.pop("deleted_at")
+        rows.append(row)
+    return rows
+
+
+_COUPON_READ_FIELDS = (
+    "code", "type", "value", "one_shot", "valid_from", "valid_until", "id", "created_at", "deleted_at", "redeemed_at",
+)
+
+
+def column_in(column, values: list, dialect_name: str):
+    """
+    Filtro 'coluna IN (valores)'. No Postgres vira '= ANY(:array)': um único parâmetro
+    e o mesmo SQL para qualquer quantidade de valores (um só plano em cache).
+    """
+    if dialect_name == "postgresql":
+        return column == any_(literal(values, postgresql.ARRAY(column.type)))
+    return column.in_(values)
+
+
+def map_coupons_to_read_rows(coupons: List[Coupon]) -> List[dict]:
+    """Cupons como dicionários no formato (e na ordem de campos) de 'CouponRead'."""
+    return [{name: getattr(coupon, name) for name in _COUPON_READ_FIELDS} for coupon in coupons]
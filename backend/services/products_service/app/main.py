@@ -1,18 +1,59 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware # Importa o middleware de CORS
-from sqlmodel import SQLModel
+from sqlalchemy.orm.exc import StaleDataError
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from core.database import engine
-from api.routes import products, coupons
+from core.cache import response_cache
+from core import coalescing
+from core.config import settings
+from core.database import async_engine, get_async_session, pool_status, warm_up_pool
+from core.instrumentation import InstrumentationMiddleware, metrics
+from core.replicas import ReadYourWritesMiddleware, replica_router, start_health_checks, stop_health_checks
+from core.schema import check_schema_revision
+from core.serialization import FastJSONResponse
+from api.routes import products, coupons, reservations, changes
+# Todos os modelos registrados no mapper antes da primeira consulta (FKs entre eles)
 from models.product_model import Product
 from models.coupon_model import Coupon
+from models.collection_version_model import CollectionVersion
+from models.coupon_redemption_model import CouponRedemption
+from models.stock_reservation_model import StockReservation, StockReservationItem
+from models.change_log_model import ChangeLog
+from services.coupon_expiry import start_scheduler, stop_scheduler, sweep_lag_seconds, sweep_metrics
+from services import change_feed, coupon_code_filter, stock_reservation
 
-def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Inicialização de cada worker: confere a revisão do schema (uma consulta; as
+    tabelas são criadas pelas migrações, ver core/schema.py), abre as conexões do
+    pool, verifica as réplicas de leitura e sobe as varreduras de cupons, de reservas de
+    estoque e do outbox do feed de alterações e o filtro de códigos de cupom. No
+    desligamento, o inverso.
+    """
+    if settings.db_check_schema:
+        await check_schema_revision(async_engine)
+    await warm_up_pool()
+    await start_health_checks()
+    await start_scheduler()
+    await stock_reservation.start_scheduler()
+    await change_feed.start_scheduler()
+    await coupon_code_filter.start_sync()
+    yield
+    await coupon_code_filter.stop_sync()
+    await change_feed.stop_scheduler()
+    await stock_reservation.stop_scheduler()
+    await stop_scheduler()
+    await stop_health_checks()
+    await async_engine.dispose()
 
 app = FastAPI(
     title="Products Service",
-    on_startup=[create_db_and_tables],
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan,
 )
 
 # --- INÍCIO DA CONFIGURAÇÃO DO CORS ---
@@ -29,15 +70,88 @@ app.add_middleware(
     allow_credentials=True,       # Permite cookies (se usarmos no futuro)
     allow_methods=["*"],          # Permite todos os métodos (GET, POST, etc.)
     allow_headers=["*"],          # Permite todos os cabeçalhos
+    # ETag: o frontend o envia no If-Match das edições; Server-Timing: tempos de banco/serialização
+    expose_headers=["ETag", "Server-Timing"],
 )
+# Cookie de leia-o-que-escreveu (só com réplicas configuradas, ver core/replicas.py)
+app.add_middleware(ReadYourWritesMiddleware)
+# Por último: fica por fora de todos os outros e mede a requisição inteira
+app.add_middleware(InstrumentationMiddleware)
 # --- FIM DA CONFIGURAÇÃO DO CORS ---
 
 
 # O resto da aplicação continua como estava
 app.include_router(products.router, prefix="/api/v1")
 app.include_router(coupons.router, prefix="/api/v1")
+app.include_router(reservations.router, prefix="/api/v1")
+app.include_router(changes.router, prefix="/api/v1")
+
+@app.exception_handler(StaleDataError)
+async def stale_data_handler(request: Request, exc: StaleDataError):
+    """Duas requisições alteraram a mesma linha ao mesmo tempo (coluna 'version' mudou no meio)."""
+    return JSONResponse(status_code=409, content={"detail": "O recurso foi alterado por outra requisição. Tente novamente."})
 
 @app.get("/")
 def read_root():
     """Endpoint raiz para verificar se o serviço está no ar."""
-    return {"status": "Products Service is running!"}
\ No newline at end of file
+    return {"status": "Products Service is running!"}
+
+def _pool_and_cache_metrics():
+    pool, cache = pool_status(), response_cache.stats()
+    return [
+        ("db_pool_checked_out", "gauge", "Conexões em uso no pool.", pool.get("checked_out")),
+        ("db_pool_overflow", "gauge", "Conexões além do pool_size abertas agora.", pool.get("overflow")),
+        ("db_pool_checkouts_total", "counter", "Conexões entregues pelo pool.", pool["checkouts_total"]),
+        ("db_pool_checkout_timeouts_total", "counter", "Esperas por conexão que estouraram o timeout.",
+         pool["checkout_timeouts_total"]),
+        ("db_pool_checkout_wait_seconds_total", "counter", "Tempo total esperando conexão livre.",
+         pool["checkout_wait_seconds_total"]),
+        ("read_cache_hits_total", "counter", "Acertos do cache de leituras.", cache["hits"]),
+        ("read_cache_misses_total", "counter", "Faltas do cache de leituras.", cache["misses"]),
+    ]
+
+metrics.add_collector(_pool_and_cache_metrics)
+metrics.add_collector(stock_reservation.reservation_metrics.collect)
+metrics.add_collector(change_feed.feed_metrics.collect)
+metrics.add_collector(replica_router.collect)
+metrics.add_collector(coupon_code_filter.coupon_filter.collect)
+metrics.add_collector(coalescing.collect)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_prometheus_metrics():
+    """Métricas no formato texto do Prometheus (por worker): latência, queries e tempo de banco por rota."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/db-pool")
+def read_db_pool_metrics():
+    """Estado do pool de conexões e contadores de checkout/espera (por worker)."""
+    return pool_status()
+
+
+@app.get("/metrics/replicas")
+def read_replica_metrics():
+    """Réplicas de leitura: saúde, atraso e quantas leituras cada caminho atendeu (por worker)."""
+    return replica_router.status()
+
+
+@app.get("/metrics/coupon-filter")
+def read_coupon_filter_metrics():
+    """Filtro de códigos de cupom: tamanho, falsos positivos e consultas evitadas (por worker)."""
+    return coupon_code_filter.coupon_filter.status()
+
+
+@app.get("/metrics/coalescing")
+def read_coalescing_metrics():
+    """Listagens coalescidas: execuções, requisições que esperaram outra e resultados reaproveitados (por worker)."""
+    return coalescing.coalescing_status()
+
+
+@app.get("/metrics/cache")
+def read_cache_metrics():
+    """Acertos, faltas, evicções e invalidações do cache de leituras (por worker)."""
+    return response_cache.stats()
+
+@app.get("/metrics/coupon-sweep")
+async def read_coupon_sweep_metrics(session: AsyncSession = Depends(get_async_session)):
+    """Contadores da varredura de cupons vencidos e o atraso atual (lagSeconds)."""
+    return {**sweep_metrics.as_dict(), "lagSeconds": await sweep_lag_seconds(session)}
@@ -0,0 +1,55 @@
+# Em migrations/env.py
+
+import os
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+from sqlmodel import SQLModel
+
+# Importa os modelos para que o metadata conheça todas as tabelas (usado pelo --autogenerate)
+from models.product_model import Product  # noqa: F401
+from models.coupon_model import Coupon  # noqa: F401
+from models.collection_version_model import CollectionVersion  # noqa: F401
+from models.coupon_redemption_model import CouponRedemption  # noqa: F401
+from models.stock_reservation_model import StockReservation, StockReservationItem  # noqa: F401
+from models.change_log_model import ChangeLog  # noqa: F401
+from core.search import include_search_object
+
+config = context.config
+# Chamado pela aplicação (core/schema.py), o logging já está configurado e não deve ser trocado
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = SQLModel.metadata
+
+
+def get_url() -> str:
+    return config.attributes.get("database_url") or os.environ.get("DATABASE_URL") or config.get_main_option("sqlalchemy.url")
+
+
+def run_migrations_offline() -> None:
+    """Gera o SQL das migrações sem conectar no banco (alembic upgrade --sql)."""
+    context.configure(
+        url=get_url(),
+        target_metadata=target_metadata,
+        include_object=include_search_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connectable = create_engine(get_url(), poolclass=pool.NullPool)
+    with connectable.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata, include_object=include_search_object)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
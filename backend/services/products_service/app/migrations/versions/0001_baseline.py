@@ -0,0 +1,62 @@
+"""baseline: tabelas product e coupon
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# O tipo ENUM é criado uma única vez (abaixo) e compartilhado pelas duas tabelas
+coupon_type = sa.Enum("fixed", "percent", name="coupontype").with_variant(
+    postgresql.ENUM("fixed", "percent", name="coupontype", create_type=False), "postgresql"
+)
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        postgresql.ENUM("fixed", "percent", name="coupontype").create(op.get_bind(), checkfirst=True)
+
+    op.create_table(
+        "coupon",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("code", sa.String(length=20), nullable=False),
+        sa.Column("type", coupon_type, nullable=False),
+        sa.Column("value", sa.DECIMAL(10, 2), nullable=False),
+        sa.Column("one_shot", sa.Boolean(), nullable=False),
+        sa.Column("valid_from", sa.DateTime(), nullable=False),
+        sa.Column("valid_until", sa.DateTime(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_coupon_code", "coupon", ["code"], unique=True)
+    op.create_index("ix_coupon_created_at_id", "coupon", ["created_at", "id"])
+
+    op.create_table(
+        "product",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("description", sa.String(), nullable=True),
+        sa.Column("price", sa.DECIMAL(10, 2), nullable=False),
+        sa.Column("stock", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(), nullable=True),
+        sa.Column("discount_type", coupon_type, nullable=True),
+        sa.Column("discount_value", sa.DECIMAL(10, 2), nullable=True),
+        sa.Column("coupon_id", sa.Integer(), sa.ForeignKey("coupon.id"), nullable=True),
+    )
+    op.create_index("ix_product_name", "product", ["name"], unique=True)
+    op.create_index("ix_product_created_at_id", "product", ["created_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_table("product")
+    op.drop_table("coupon")
+    if op.get_bind().dialect.name == "postgresql":
+        postgresql.ENUM(name="coupontype").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,62 @@
+"""busca textual indexada de produtos (tsvector + pg_trgm)
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        # Fora do Postgres a busca usa o FTS5 criado junto com a tabela (core/search.py)
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION immutable_unaccent(text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+        AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+        """
+    )
+    op.execute(
+        """
+        DO $$ BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'pt_unaccent') THEN
+                CREATE TEXT SEARCH CONFIGURATION pt_unaccent (COPY = portuguese);
+                ALTER TEXT SEARCH CONFIGURATION pt_unaccent
+                    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+            END IF;
+        END $$
+        """
+    )
+    # Coluna gerada: o Postgres mantém o tsvector sozinho a cada INSERT/UPDATE
+    op.execute(
+        """
+        ALTER TABLE product ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('pt_unaccent', coalesce(name, '')), 'A') ||
+            setweight(to_tsvector('pt_unaccent', coalesce(description, '')), 'B')
+        ) STORED
+        """
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_product_search_vector ON product USING gin (search_vector)")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_product_name_trgm ON product USING gin (immutable_unaccent(name) gin_trgm_ops)"
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP INDEX IF EXISTS ix_product_name_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_product_search_vector")
+    op.execute("ALTER TABLE product DROP COLUMN IF EXISTS search_vector")
+    op.execute("DROP TEXT SEARCH CONFIGURATION IF EXISTS pt_unaccent")
+    op.execute("DROP FUNCTION IF EXISTS immutable_unaccent(text)")
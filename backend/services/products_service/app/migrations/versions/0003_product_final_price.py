@@ -0,0 +1,41 @@
+"""coluna final_price persistida e indexada em product
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+# Mesmas regras de core/utils.calculate_final_price: desconto percentual ou fixo,
+# arredondamento em 2 casas (ROUND do banco é "half away from zero", igual ao
+# ROUND_HALF_UP do Python) e piso de 0.01.
+BACKFILL_SQL = """
+UPDATE product SET final_price = CASE
+    WHEN discount_type = 'percent' AND discount_value IS NOT NULL
+        THEN {greatest}(0.01, ROUND(price - price * discount_value / 100, 2))
+    WHEN discount_type = 'fixed' AND discount_value IS NOT NULL
+        THEN {greatest}(0.01, ROUND(price - discount_value, 2))
+    ELSE price
+END
+"""
+
+
+def upgrade() -> None:
+    op.add_column("product", sa.Column("final_price", sa.DECIMAL(10, 2), nullable=True))
+    greatest = "GREATEST" if op.get_bind().dialect.name == "postgresql" else "MAX"
+    op.execute(BACKFILL_SQL.format(greatest=greatest))
+    with op.batch_alter_table("product") as batch_op:
+        batch_op.alter_column("final_price", existing_type=sa.DECIMAL(10, 2), nullable=False)
+    op.create_index("ix_product_final_price_id", "product", ["final_price", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_product_final_price_id", table_name="product")
+    with op.batch_alter_table("product") as batch_op:
+        batch_op.drop_column("final_price")
@@ -0,0 +1,35 @@
+"""coluna version em product/coupon e tabela collection_version (ETags)
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+VERSIONED_COLLECTIONS = ("product", "coupon")
+
+
+def upgrade() -> None:
+    # server_default preenche as linhas existentes com a versão 1
+    for table in VERSIONED_COLLECTIONS:
+        op.add_column(table, sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+
+    collection_version = op.create_table(
+        "collection_version",
+        sa.Column("name", sa.String(length=50), primary_key=True),
+        sa.Column("version", sa.Integer(), nullable=False),
+    )
+    op.bulk_insert(collection_version, [{"name": name, "version": 0} for name in VERSIONED_COLLECTIONS])
+
+
+def downgrade() -> None:
+    op.drop_table("collection_version")
+    for table in VERSIONED_COLLECTIONS:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column("version")
@@ -0,0 +1,64 @@
+"""ledger coupon_redemption, coupon.redeemed_at e faixas em collection_version
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+COLLECTION_VERSION_SLOTS = 16
+
+
+def upgrade() -> None:
+    op.add_column("coupon", sa.Column("redeemed_at", sa.DateTime(), nullable=True))
+
+    op.create_table(
+        "coupon_redemption",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("coupon_id", sa.Integer(), sa.ForeignKey("coupon.id"), nullable=False),
+        sa.Column("product_id", sa.Integer(), sa.ForeignKey("product.id"), nullable=False),
+        sa.Column("redeemed_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_coupon_redemption_coupon_id", "coupon_redemption", ["coupon_id"])
+    op.create_index("ix_coupon_redemption_product_id", "coupon_redemption", ["product_id"])
+
+    # collection_version passa a ter uma linha por faixa (chave (name, slot)). A versão
+    # atual vai para a faixa 0, então a soma continua igual e nenhum ETag já emitido
+    # volta a valer para dados diferentes.
+    slots = op.create_table(
+        "collection_version_slots",
+        sa.Column("name", sa.String(length=50), primary_key=True),
+        sa.Column("slot", sa.Integer(), primary_key=True),
+        sa.Column("version", sa.Integer(), nullable=False),
+    )
+    op.execute(
+        "INSERT INTO collection_version_slots (name, slot, version) SELECT name, 0, version FROM collection_version"
+    )
+    rows = op.get_bind().execute(sa.text("SELECT name FROM collection_version")).scalars().all()
+    op.bulk_insert(slots, [
+        {"name": name, "slot": slot, "version": 0} for name in rows for slot in range(1, COLLECTION_VERSION_SLOTS)
+    ])
+    op.drop_table("collection_version")
+    op.rename_table("collection_version_slots", "collection_version")
+
+
+def downgrade() -> None:
+    # Concentra a soma na faixa 0 antes de descartar as demais
+    op.execute(
+        "UPDATE collection_version SET version = (SELECT SUM(v.version) FROM collection_version v "
+        "WHERE v.name = collection_version.name) WHERE slot = 0"
+    )
+    op.execute("DELETE FROM collection_version WHERE slot <> 0")
+    with op.batch_alter_table("collection_version", recreate="always") as batch_op:
+        batch_op.drop_column("slot")
+    op.drop_index("ix_coupon_redemption_product_id", table_name="coupon_redemption")
+    op.drop_index("ix_coupon_redemption_coupon_id", table_name="coupon_redemption")
+    op.drop_table("coupon_redemption")
+    with op.batch_alter_table("coupon") as batch_op:
+        batch_op.drop_column("redeemed_at")
@@ -0,0 +1,37 @@
+"""coupon.discounts_released_at e índices parciais da varredura de expiração
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+PENDING_ACTIVE = "deleted_at IS NULL AND discounts_released_at IS NULL"
+PENDING_DELETED = "deleted_at IS NOT NULL AND discounts_released_at IS NULL"
+
+
+def _partial(where: str) -> dict:
+    return {"postgresql_where": sa.text(where), "sqlite_where": sa.text(where)}
+
+
+def upgrade() -> None:
+    # Começa vazia: na primeira rodada a varredura marca os cupons vencidos/deletados
+    # (os que não têm produtos só são marcados, sem UPDATE em product)
+    op.add_column("coupon", sa.Column("discounts_released_at", sa.DateTime(), nullable=True))
+    op.create_index("ix_coupon_valid_until_pending", "coupon", ["valid_until"], **_partial(PENDING_ACTIVE))
+    op.create_index("ix_coupon_deleted_at_pending", "coupon", ["deleted_at"], **_partial(PENDING_DELETED))
+    op.create_index("ix_product_coupon_id", "product", ["coupon_id"], **_partial("coupon_id IS NOT NULL"))
+
+
+def downgrade() -> None:
+    op.drop_index("ix_product_coupon_id", table_name="product")
+    op.drop_index("ix_coupon_deleted_at_pending", table_name="coupon")
+    op.drop_index("ix_coupon_valid_until_pending", table_name="coupon")
+    with op.batch_alter_table("coupon") as batch_op:
+        batch_op.drop_column("discounts_released_at")
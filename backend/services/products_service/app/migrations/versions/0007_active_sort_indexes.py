@@ -0,0 +1,60 @@
+"""índices parciais (coluna, id) das listagens, só com linhas ativas
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+ACTIVE_ROWS = "deleted_at IS NULL"
+PRODUCT_SORT_COLUMNS = ("created_at", "price", "stock", "name", "final_price")
+
+# (nome, tabela, colunas) dos índices completos substituídos pelos parciais
+REPLACED_INDEXES = (
+    ("ix_product_created_at_id", "product", ["created_at", "id"]),
+    ("ix_product_final_price_id", "product", ["final_price", "id"]),
+    ("ix_coupon_created_at_id", "coupon", ["created_at", "id"]),
+)
+
+
+def _active_indexes():
+    for column in PRODUCT_SORT_COLUMNS:
+        yield f"ix_product_active_{column}_id", "product", [column, "id"]
+    yield "ix_coupon_active_created_at_id", "coupon", ["created_at", "id"]
+
+
+def _run(operations) -> None:
+    # No Postgres os índices são criados/removidos com CONCURRENTLY (sem bloquear as
+    # escritas numa tabela grande), o que exige rodar fora da transação da migração
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            operations(postgresql_concurrently=True)
+    else:
+        operations()
+
+
+def upgrade() -> None:
+    def operations(**options):
+        where = {"postgresql_where": sa.text(ACTIVE_ROWS), "sqlite_where": sa.text(ACTIVE_ROWS)}
+        for name, table, columns in _active_indexes():
+            op.create_index(name, table, columns, if_not_exists=True, **where, **options)
+        for name, table, _ in REPLACED_INDEXES:
+            op.drop_index(name, table_name=table, if_exists=True, **options)
+
+    _run(operations)
+
+
+def downgrade() -> None:
+    def operations(**options):
+        for name, table, columns in REPLACED_INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True, **options)
+        for name, table, _ in _active_indexes():
+            op.drop_index(name, table_name=table, if_exists=True, **options)
+
+    _run(operations)
@@ -0,0 +1,49 @@
+"""reservas de estoque: stock_reservation e stock_reservation_item
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+reservation_status = sa.Enum("pending", "committed", "released", "expired", name="reservationstatus",
+                             native_enum=False, length=16)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "stock_reservation",
+        sa.Column("id", sa.String(length=32), primary_key=True),
+        sa.Column("status", reservation_status, nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.Column("closed_at", sa.DateTime(), nullable=True),
+    )
+    pending = sa.text("status = 'pending'")
+    op.create_index(
+        "ix_stock_reservation_expires_at_pending", "stock_reservation", ["expires_at"],
+        postgresql_where=pending, sqlite_where=pending,
+    )
+    op.create_table(
+        "stock_reservation_item",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("reservation_id", sa.String(length=32), sa.ForeignKey("stock_reservation.id"), nullable=False),
+        sa.Column("product_id", sa.Integer(), sa.ForeignKey("product.id"), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_stock_reservation_item_reservation_id", "stock_reservation_item", ["reservation_id"])
+    op.create_index("ix_stock_reservation_item_product_id", "stock_reservation_item", ["product_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_stock_reservation_item_product_id", table_name="stock_reservation_item")
+    op.drop_index("ix_stock_reservation_item_reservation_id", table_name="stock_reservation_item")
+    op.drop_table("stock_reservation_item")
+    op.drop_index("ix_stock_reservation_expires_at_pending", table_name="stock_reservation")
+    op.drop_table("stock_reservation")
@@ -0,0 +1,30 @@
+"""outbox change_log do feed de alterações (/api/v1/changes)
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "change_log",
+        sa.Column("id", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), primary_key=True),
+        sa.Column("topic", sa.String(length=32), nullable=False),
+        sa.Column("data", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sqlite_autoincrement=True,
+    )
+    op.create_index("ix_change_log_created_at", "change_log", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_change_log_created_at", table_name="change_log")
+    op.drop_table("change_log")
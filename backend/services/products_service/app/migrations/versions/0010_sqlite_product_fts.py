@@ -0,0 +1,32 @@
+"""índice FTS5 da busca de produtos em bancos SQLite criados pelas migrações
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # No Postgres a busca veio na 0002; aqui só faltava o FTS5, que antes nascia apenas via create_all
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    from core.search import SQLITE_SEARCH_DDL
+
+    for statement in SQLITE_SEARCH_DDL:
+        op.execute(statement)
+    # Indexa os produtos que já existiam antes dos gatilhos
+    op.execute("INSERT INTO product_fts(product_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for trigger in ("product_fts_au", "product_fts_ad", "product_fts_ai"):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS product_fts")
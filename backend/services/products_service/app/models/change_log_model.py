@@ -0,0 +1,38 @@
+# Em models/change_log_model.py
+
+from typing import Optional
+from datetime import datetime
+import enum
+
+from sqlalchemy import JSON, BigInteger, Column, Integer
+from sqlmodel import Field, SQLModel
+
+
+class ChangeTopic(str, enum.Enum):
+    """Tabelas publicadas no feed de alterações."""
+    product = "product"
+    coupon = "coupon"
+
+
+class ChangeLog(SQLModel, table=True):
+    """
+    Outbox das alterações de produtos e cupons (ver core/change_log.py).
+
+    Cada transação que altera essas tabelas grava aqui, antes do commit, uma linha por
+    registro alterado. O 'id' é o número de sequência do feed (/api/v1/changes): o
+    cliente guarda o último que viu e retoma a partir dele.
+    """
+    __tablename__ = "change_log"
+    # AUTOINCREMENT no SQLite: sem ele, apagar as últimas linhas faria os ids voltarem
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    # BIGINT no Postgres; no SQLite só INTEGER PRIMARY KEY é autoincremento (rowid)
+    id: Optional[int] = Field(
+        default=None, sa_column=Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True),
+    )
+    topic: str = Field(max_length=32, nullable=False)
+    # Chaves do registro alterado (ex.: {"id": 5} ou {"id": 3, "code": "promo10"});
+    # None quando a transação alterou a tabela em massa sem saber quais linhas
+    data: Optional[dict] = Field(default=None, sa_column=Column(JSON, nullable=True))
+    # Indexado: a limpeza apaga pelo tempo de retenção
+    created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False, index=True)
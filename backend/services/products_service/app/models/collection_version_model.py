@@ -0,0 +1,35 @@
+# Em models/collection_version_model.py
+
+from sqlmodel import Field, SQLModel
+from sqlalchemy import event, insert
+
+
+class CollectionVersion(SQLModel, table=True):
+    """
+    Versão de uma coleção inteira, dividida em faixas ('slot').
+
+    Cada escrita na tabela incrementa UMA faixa, na mesma transação; a versão da
+    coleção é a soma das faixas. Se a soma não mudou, nenhuma linha mudou, então ela
+    serve de base para o ETag das listagens. Dividir em faixas evita que todas as
+    escritas da tabela esperem pelo lock de uma única linha até o commit.
+    """
+    __tablename__ = "collection_version"
+
+    name: str = Field(primary_key=True, max_length=50)
+    slot: int = Field(primary_key=True)
+    version: int = Field(default=0, nullable=False)
+
+
+# Tabelas cujas listagens têm ETag
+VERSIONED_COLLECTIONS = ("product", "coupon")
+COLLECTION_VERSION_SLOTS = 16
+
+
+@event.listens_for(CollectionVersion.__table__, "after_create")
+def _seed_collection_versions(target, connection, **kw):
+    """Cria as linhas iniciais; depois disso as escritas só fazem UPDATE (sem corrida no INSERT)."""
+    rows = [
+        {"name": name, "slot": slot, "version": 0}
+        for name in VERSIONED_COLLECTIONS for slot in range(COLLECTION_VERSION_SLOTS)
+    ]
+    connection.execute(insert(target), rows)
@@ -6,14 +6,39 @@ from datetime import datetime
 from decimal import Decimal
 import enum
 
-from sqlalchemy import Column
-from sqlalchemy.types import DECIMAL
+from sqlalchemy import Column, Index, text
+from sqlalchemy.types import DECIMAL, Integer
 
 class CouponType(str, enum.Enum):
     fixed = "fixed"
     percent = "percent"
 
+# Versão da linha, incrementada pelo ORM a cada UPDATE (mesmo esquema do Product)
+_version_column = Column("version", Integer, nullable=False, default=1, server_default="1")
+
 class Coupon(SQLModel, table=True):
+    # Índice da ordenação da listagem (created_at, id), só com os cupons ativos (a
+    # listagem nunca mostra deletados): serve a paginação por cursor. Os demais servem
+    # a varredura de expiração (services/coupon_expiry.py): só contêm cupons cujos
+    # descontos ainda não foram liberados, então ficam pequenos.
+    __table_args__ = (
+        Index(
+            "ix_coupon_active_created_at_id", "created_at", "id",
+            postgresql_where=text("deleted_at IS NULL"), sqlite_where=text("deleted_at IS NULL"),
+        ),
+        Index(
+            "ix_coupon_valid_until_pending", "valid_until",
+            postgresql_where=text("deleted_at IS NULL AND discounts_released_at IS NULL"),
+            sqlite_where=text("deleted_at IS NULL AND discounts_released_at IS NULL"),
+        ),
+        Index(
+            "ix_coupon_deleted_at_pending", "deleted_at",
+            postgresql_where=text("deleted_at IS NOT NULL AND discounts_released_at IS NULL"),
+            sqlite_where=text("deleted_at IS NOT NULL AND discounts_released_at IS NULL"),
+        ),
+    )
+    __mapper_args__ = {"version_id_col": _version_column}
+
     id: Optional[int] = Field(default=None, primary_key=True)
     code: str = Field(unique=True, index=True, max_length=20)
     type: CouponType
@@ -27,4 +52,10 @@ class Coupon(SQLModel, table=True):
     valid_from: datetime
     valid_until: datetime
     created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
-    deleted_at: Optional[datetime] = Field(default=None, nullable=True)
\ No newline at end of file
+    deleted_at: Optional[datetime] = Field(default=None, nullable=True)
+    # Preenchido quando um cupom 'one_shot' é consumido (ver services/coupon_redemption.py)
+    redeemed_at: Optional[datetime] = Field(default=None, nullable=True)
+    # Preenchido quando a varredura já tirou o desconto de todos os produtos deste
+    # cupom vencido/deletado; volta a None se a validade for alterada
+    discounts_released_at: Optional[datetime] = Field(default=None, nullable=True)
+    version: Optional[int] = Field(default=None, sa_column=_version_column)
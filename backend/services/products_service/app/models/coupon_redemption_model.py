@@ -0,0 +1,16 @@
+# Em models/coupon_redemption_model.py
+
+from typing import Optional
+from datetime import datetime
+
+from sqlmodel import Field, SQLModel
+
+
+class CouponRedemption(SQLModel, table=True):
+    """Registro (ledger) de cada uso de um cupom em um produto."""
+    __tablename__ = "coupon_redemption"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    coupon_id: int = Field(foreign_key="coupon.id", index=True)
+    product_id: int = Field(foreign_key="product.id", index=True)
+    redeemed_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
@@ -7,14 +7,60 @@ from decimal import Decimal
 import enum
 
 # Importações necessárias do SQLAlchemy para definir o tipo de coluna
-from sqlalchemy import Column
-from sqlalchemy.types import DECIMAL
+from sqlalchemy import Column, Index, text
+from sqlalchemy.types import DECIMAL, Integer
 
-class CouponType(str, enum.Enum):
-    fixed = "fixed"
-    percent = "percent"
+# Um único enum para o tipo do cupom e o tipo do desconto copiado para o produto
+# (no Postgres os dois usam o mesmo tipo 'coupontype')
+from models.coupon_model import CouponType
+
+class ProductSortBy(str, enum.Enum):
+    """
+    Valores aceitos em ?sortBy= na listagem. Cada coluna tem um índice parcial
+    (coluna, id) só com os produtos ativos, o que serve a ordenação e o cursor.
+    """
+    created_at = "created_at"
+    price = "price"
+    stock = "stock"
+    name = "name"
+    final_price = "final_price"
+    # Chave primária: ordem de inserção, sem índice extra
+    id = "id"
+    # Só com 'search'; sem busca cai em created_at
+    relevance = "relevance"
+
+# A listagem padrão só enxerga produtos ativos: os índices de ordenação ignoram os
+# deletados (menores e sem custo de escrita no soft delete). Com includeDeleted=true
+# a ordenação cai em varredura + sort, aceitável para uma consulta administrativa.
+_ACTIVE_ROWS = "deleted_at IS NULL"
+
+def _active_sort_index(column: str) -> Index:
+    return Index(
+        f"ix_product_active_{column}_id", column, "id",
+        postgresql_where=text(_ACTIVE_ROWS), sqlite_where=text(_ACTIVE_ROWS),
+    )
+
+# Versão da linha: o SQLAlchemy a incrementa em todo UPDATE feito pelo ORM e inclui
+# "WHERE version = <lida>" no comando (controle de concorrência otimista). É a base
+# do ETag do produto (ver core/etag.py).
+_version_column = Column("version", Integer, nullable=False, default=1, server_default="1")
 
 class Product(SQLModel, table=True):
+    # Índices das ordenações aceitas (ProductSortBy): servem a paginação por cursor
+    __table_args__ = (
+        _active_sort_index("created_at"),
+        _active_sort_index("price"),
+        _active_sort_index("stock"),
+        _active_sort_index("name"),
+        _active_sort_index("final_price"),
+        # Produtos com desconto de um cupom (varredura de cupons vencidos)
+        Index(
+            "ix_product_coupon_id", "coupon_id",
+            postgresql_where=text("coupon_id IS NOT NULL"), sqlite_where=text("coupon_id IS NOT NULL"),
+        ),
+    )
+    __mapper_args__ = {"version_id_col": _version_column}
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str = Field(index=True, unique=True)
     description: Optional[str] = Field(default=None)
@@ -36,4 +82,14 @@ class Product(SQLModel, table=True):
         sa_column=Column(DECIMAL(10, 2), nullable=True)
     )
     
-    coupon_id: Optional[int] = Field(default=None, foreign_key="coupon.id", nullable=True)
\ No newline at end of file
+    coupon_id: Optional[int] = Field(default=None, foreign_key="coupon.id", nullable=True)
+
+    # Preço com o desconto já aplicado, persistido para que filtros e ordenação por preço
+    # efetivo usem índice. É recalculado automaticamente a cada insert/update pelo ORM
+    # (ver core/utils.py); escritas em massa fora do ORM precisam recalcular também.
+    final_price: Optional[Decimal] = Field(
+        default=None,
+        sa_column=Column(DECIMAL(10, 2), nullable=False)
+    )
+
+    version: Optional[int] = Field(default=None, sa_column=_version_column)
@@ -0,0 +1,50 @@
+# Em models/stock_reservation_model.py
+
+from typing import Optional
+from datetime import datetime
+import enum
+
+from sqlalchemy import Column, Enum, Index, text
+from sqlmodel import Field, SQLModel
+
+
+class ReservationStatus(str, enum.Enum):
+    pending = "pending"
+    committed = "committed"
+    released = "released"
+    expired = "expired"
+
+
+class StockReservation(SQLModel, table=True):
+    """
+    Reserva de estoque. O estoque sai do produto na criação; 'committed' confirma a
+    baixa, 'released'/'expired' devolvem as quantidades (ver services/stock_reservation.py).
+    """
+    __tablename__ = "stock_reservation"
+    # Só as reservas pendentes, por vencimento: é o que a varredura de expiração lê
+    __table_args__ = (
+        Index(
+            "ix_stock_reservation_expires_at_pending", "expires_at",
+            postgresql_where=text("status = 'pending'"), sqlite_where=text("status = 'pending'"),
+        ),
+    )
+
+    # Identificador opaco (uuid4 em hex): o cliente o recebe para confirmar/liberar
+    id: str = Field(primary_key=True, max_length=32)
+    # VARCHAR em vez de um tipo ENUM do Postgres: novos estados não exigem ALTER TYPE
+    status: ReservationStatus = Field(
+        default=ReservationStatus.pending,
+        sa_column=Column(Enum(ReservationStatus, native_enum=False, length=16), nullable=False),
+    )
+    created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+    expires_at: datetime = Field(nullable=False)
+    closed_at: Optional[datetime] = Field(default=None, nullable=True)
+
+
+class StockReservationItem(SQLModel, table=True):
+    __tablename__ = "stock_reservation_item"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    reservation_id: str = Field(foreign_key="stock_reservation.id", index=True, max_length=32)
+    product_id: int = Field(foreign_key="product.id", index=True)
+    quantity: int = Field(gt=0)
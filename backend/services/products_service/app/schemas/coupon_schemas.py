@@ -4,10 +4,29 @@ from typing import Optional, List
 import re
 
 from pydantic import validator
-from sqlmodel import SQLModel
+from sqlmodel import Field, SQLModel
 
 # Importa nosso Enum do arquivo de modelo para manter a consistência
 from models.coupon_model import CouponType
+from schemas.product_schemas import LOOKUP_MAX_KEYS
+
+RESERVED_CODES = ["admin", "auth", "null", "undefined"]
+
+
+def normalize_coupon_code(v: str) -> str:
+    """Valida o formato do código e o devolve normalizado (minúsculas); ValueError se inválido."""
+    if not (4 <= len(v) <= 20):
+        raise ValueError("O código deve ter entre 4 e 20 caracteres.")
+    if not re.match("^[a-zA-Z0-9]+$", v):
+        raise ValueError("O código deve conter apenas caracteres alfanuméricos.")
+
+    normalized_code = v.strip().lower()
+
+    if normalized_code in RESERVED_CODES:
+        raise ValueError(f"O código '{normalized_code}' é uma palavra reservada.")
+
+    return normalized_code
+
 
 class CouponBase(SQLModel):
     """Schema base para cupons, com todas as validações de negócio."""
@@ -20,18 +39,7 @@ class CouponBase(SQLModel):
 
     @validator("code")
     def validate_and_normalize_code(cls, v):
-        if not (4 <= len(v) <= 20):
-            raise ValueError("O código deve ter entre 4 e 20 caracteres.")
-        if not re.match("^[a-zA-Z0-9]+$", v):
-            raise ValueError("O código deve conter apenas caracteres alfanuméricos.")
-        
-        normalized_code = v.strip().lower()
-        
-        reserved_words = ["admin", "auth", "null", "undefined"]
-        if normalized_code in reserved_words:
-            raise ValueError(f"O código '{normalized_code}' é uma palavra reservada.")
-            
-        return normalized_code
+        return normalize_coupon_code(v)
 
     @validator("value")
     def validate_value_based_on_type(cls, v, values):
@@ -65,6 +73,8 @@ class CouponRead(CouponBase):
     id: int
     created_at: datetime
     deleted_at: Optional[datetime] = None
+    # Só para cupons 'one_shot': quando o único uso foi consumido
+    redeemed_at: Optional[datetime] = None
 
 
 class CouponUpdate(SQLModel):
@@ -82,11 +92,26 @@ class PaginatedMetadata(SQLModel):
     """Schema para os metadados de paginação."""
     page: int
     limit: int
-    totalItems: int
-    totalPages: int
+    # None quando a listagem é pedida com count=none
+    totalItems: Optional[int] = None
+    totalPages: Optional[int] = None
+    # Cursor para a próxima página (paginação por keyset); None na última página
+    nextCursor: Optional[str] = None
 
 
 class CouponPage(SQLModel):
     """Schema para a resposta da página de cupons."""
     data: List[CouponRead]
-    meta: PaginatedMetadata
\ No newline at end of file
+    meta: PaginatedMetadata
+
+class CouponLookup(SQLModel):
+    """Códigos como o cliente os tem; são normalizados como no cadastro."""
+    codes: List[str] = Field(..., min_length=1, max_length=LOOKUP_MAX_KEYS)
+
+
+class CouponLookupResult(SQLModel):
+    """Resultado da busca em lote: encontrados, inexistentes, deletados e códigos em formato inválido."""
+    data: List[CouponRead]
+    missing: List[str]
+    deleted: List[str]
+    invalid: List[str]
@@ -3,7 +3,7 @@
 from typing import List, Optional
 from datetime import datetime
 from decimal import Decimal
-from sqlmodel import SQLModel
+from sqlmodel import Field, SQLModel
 
 class DiscountDetails(SQLModel):
     type: str
@@ -38,9 +38,25 @@ class ProductRead(SQLModel):
 class PaginatedMetadata(SQLModel):
     page: int
     limit: int
-    totalItems: int
-    totalPages: int
+    # None quando a listagem é pedida com count=none
+    totalItems: Optional[int] = None
+    totalPages: Optional[int] = None
+    # Cursor para a próxima página (paginação por keyset); None na última página
+    nextCursor: Optional[str] = None
 
 class ProductPage(SQLModel):
     data: List[ProductRead]
-    meta: PaginatedMetadata
\ No newline at end of file
+    meta: PaginatedMetadata
+
+# Limite de chaves por chamada dos endpoints de busca em lote (/lookup)
+LOOKUP_MAX_KEYS = 5000
+
+class ProductLookup(SQLModel):
+    ids: List[int] = Field(..., min_length=1, max_length=LOOKUP_MAX_KEYS)
+
+class ProductLookupResult(SQLModel):
+    # Na ordem pedida, sem repetições
+    data: List[ProductRead]
+    # Ids que não existem / que foram deletados (soft delete)
+    missing: List[int]
+    deleted: List[int]
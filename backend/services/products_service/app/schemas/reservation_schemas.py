@@ -0,0 +1,46 @@
+# Em schemas/reservation_schemas.py
+
+from typing import List, Optional
+from datetime import datetime
+
+from pydantic import Field
+from sqlmodel import SQLModel
+
+from core.config import settings
+from models.stock_reservation_model import ReservationStatus
+
+MAX_RESERVATION_ITEMS = 100
+
+
+class ReservationItemCreate(SQLModel):
+    product_id: int
+    quantity: int = Field(gt=0)
+
+
+class StockReserve(SQLModel):
+    """Reserva de um único produto (POST /products/{id}/reserve)."""
+    quantity: int = Field(gt=0)
+    # Validade da reserva; sem ela vale STOCK_RESERVATION_TTL_SECONDS
+    ttl_seconds: Optional[int] = Field(None, ge=1, le=settings.stock_reservation_max_ttl_seconds)
+
+
+class ReservationCreate(SQLModel):
+    """Reserva de vários produtos de uma vez: todos os itens ou nenhum."""
+    items: List[ReservationItemCreate] = Field(min_length=1, max_length=MAX_RESERVATION_ITEMS)
+    ttl_seconds: Optional[int] = Field(None, ge=1, le=settings.stock_reservation_max_ttl_seconds)
+
+
+class ReservationItemRead(SQLModel):
+    product_id: int
+    quantity: int
+    # Estoque do produto logo após a reserva (só na resposta da criação)
+    remaining_stock: Optional[int] = None
+
+
+class ReservationRead(SQLModel):
+    id: str
+    status: ReservationStatus
+    created_at: datetime
+    expires_at: datetime
+    closed_at: Optional[datetime] = None
+    items: List[ReservationItemRead]
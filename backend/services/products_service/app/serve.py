@@ -0,0 +1,68 @@
+"""
+Ponto de entrada de produção
+
+Sobe a API com o uvicorn em vários processos (um por núcleo por padrão), com o
+loop do uvloop e o parser HTTP do httptools, todos configurados por variáveis de
+ambiente (SERVER_* e DB_* em core/config.py):
+
+    python serve.py                            # produção (imagem Docker)
+    SERVER_WORKERS=4 python serve.py
+    SERVER_RELOAD=true python serve.py         # desenvolvimento, com recarga
+
+Cada worker é um processo com o próprio event loop e o próprio pool de conexões.
+Com DB_MAX_CONNECTIONS o pool de cada um é dimensionado para que a soma caiba no
+limite do Postgres (ver 'pool_limits' em core/database.py). No SIGTERM o uvicorn
+para de aceitar conexões e espera as requisições em andamento por até
+SERVER_GRACEFUL_SHUTDOWN_SECONDS antes de rodar o shutdown da aplicação.
+"""
+import logging
+import os
+
+import uvicorn
+
+from core.config import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def resolve_workers() -> int:
+    return settings.server_workers or os.cpu_count() or 1
+
+
+def main() -> None:
+    workers = 1 if settings.server_reload else resolve_workers()
+    # Os workers são processos novos que leem a configuração do ambiente: exporta o
+    # número resolvido para o dimensionamento do pool valer também com SERVER_WORKERS=0
+    os.environ["SERVER_WORKERS"] = str(workers)
+    if workers > 1 and settings.cache_backend == "memory":
+        # O cache em memória é por processo: uma escrita num worker não invalidaria a
+        # cópia dos outros, que serviriam a versão antiga até o TTL
+        logger.warning("CACHE_BACKEND=memory não é compartilhado entre %d workers; cache desligado "
+                       "(use CACHE_BACKEND=redis).", workers)
+        os.environ["CACHE_BACKEND"] = "none"
+
+    if settings.db_migrate_on_start:
+        # Uma vez, no processo pai: os workers só conferem a revisão ao subir
+        from core.schema import upgrade_schema
+        upgrade_schema()
+
+    uvicorn.run(
+        "main:app",
+        host=settings.server_host,
+        port=settings.server_port,
+        workers=workers,
+        reload=settings.server_reload,
+        loop="uvloop",
+        http="httptools",
+        lifespan="on",
+        backlog=settings.server_backlog,
+        timeout_keep_alive=settings.server_keepalive_seconds,
+        timeout_graceful_shutdown=settings.server_graceful_shutdown_seconds,
+        limit_concurrency=settings.server_limit_concurrency,
+        # Atrás de um proxy: X-Forwarded-For/Proto dos IPs em FORWARDED_ALLOW_IPS
+        proxy_headers=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""
+Serviço do Feed de Alterações
+
+Distribui as linhas do outbox 'change_log' (core/change_log.py) para os clientes de
+/api/v1/changes, em vez de cada cliente consultar a listagem de tempos em tempos.
+
+Cada worker tem UM ChangeFeed, compartilhado por todos os clientes conectados a ele:
+
+- no Postgres, uma conexão dedicada faz LISTEN no canal 'change_feed'; o NOTIFY
+  emitido por cada transação acorda o feed, que lê as linhas novas UMA vez e as
+  entrega a todos os inscritos em memória. Mil clientes, uma consulta por commit;
+- sem LISTEN (SQLite, PgBouncer em modo 'transaction') o feed consulta a tabela a
+  cada CHANGE_FEED_POLL_INTERVAL_SECONDS; no Postgres essa consulta continua como
+  rede de segurança caso um NOTIFY se perca numa reconexão;
+- escritas do próprio processo acordam o feed na hora, sem esperar o intervalo.
+
+O feed só roda enquanto houver inscritos. Um cliente lento que acumule mais de
+CHANGE_FEED_SUBSCRIBER_BUFFER eventos é desconectado e retoma a partir do último
+'seq' que recebeu, lendo do banco.
+
+Linhas mais velhas que CHANGE_FEED_RETENTION_HOURS são apagadas por uma limpeza
+periódica, dentro da API ou como processo:
+
+    python -m services.change_feed --prune
+"""
+import argparse
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Deque, Iterable, List, Optional, Set
+
+from sqlalchemy import delete, func
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import select
+
+from core.change_log import FEED_KEYS, NOTIFY_CHANNEL, needs_settling, settled_seq
+from core.config import settings
+from core.invalidation import WriteSet, subscribe as subscribe_to_writes
+from core.periodic import BackgroundTask, run_periodically
+from models.change_log_model import ChangeLog
+
+logger = logging.getLogger(__name__)
+
+LISTEN_RECONNECT_SECONDS = 5.0
+
+
+class FeedMetrics:
+    """Contadores do feed (por processo), expostos em /metrics."""
+
+    def __init__(self):
+        self.subscribers = 0
+        self.db_reads = 0
+        self.events_dispatched = 0
+        self.disconnected_slow = 0
+        self.pruned_total = 0
+        self.errors = 0
+
+    def collect(self) -> List[tuple]:
+        return [
+            ("change_feed_subscribers", "gauge", "Clientes conectados ao feed de alterações.", self.subscribers),
+            ("change_feed_db_reads_total", "counter", "Leituras do outbox feitas pelo feed compartilhado.", self.db_reads),
+            ("change_feed_events_dispatched_total", "counter", "Eventos lidos do outbox e distribuídos.",
+             self.events_dispatched),
+            ("change_feed_slow_subscribers_total", "counter", "Clientes desconectados por acumular eventos.",
+             self.disconnected_slow),
+            ("change_feed_pruned_total", "counter", "Linhas antigas apagadas do outbox.", self.pruned_total),
+            ("change_feed_errors_total", "counter", "Falhas do feed e da limpeza do outbox.", self.errors),
+        ]
+
+
+feed_metrics = FeedMetrics()
+
+
+# --- Leituras do outbox ---
+
+def _to_event(row) -> dict:
+    return {"seq": row.id, "topic": row.topic, "data": row.data, "created_at": row.created_at}
+
+
+async def fetch_changes(
+    session_factory: async_sessionmaker, after: int, limit: int, topics: Optional[Iterable[str]] = None,
+) -> List[dict]:
+    """Eventos com 'seq' maior que 'after', em ordem (sem passar de um buraco recente)."""
+    query = select(ChangeLog.id, ChangeLog.topic, ChangeLog.data, ChangeLog.created_at).where(ChangeLog.id > after)
+    if topics:
+        query = query.where(ChangeLog.topic.in_(list(topics)))
+    async with session_factory() as session:
+        if needs_settling(session.bind.dialect.name):
+            horizon = await settled_seq(session, after)
+            if horizon is not None:
+                query = query.where(ChangeLog.id <= horizon)
+        rows = (await session.exec(query.order_by(ChangeLog.id).limit(limit))).all()
+    return [_to_event(row) for row in rows]
+
+
+async def head_seq(session_factory: async_sessionmaker) -> int:
+    """Último 'seq' que já pode ser entregue (0 com o outbox vazio)."""
+    async with session_factory() as session:
+        head = (await session.exec(select(func.max(ChangeLog.id)))).first() or 0
+        if head and needs_settling(session.bind.dialect.name):
+            horizon = await settled_seq(session, 0)
+            if horizon is not None:
+                head = min(head, horizon)
+        return head
+
+
+async def oldest_seq(session_factory: async_sessionmaker) -> Optional[int]:
+    """Primeiro 'seq' ainda retido; um cursor anterior a ele perdeu eventos para a limpeza."""
+    async with session_factory() as session:
+        return (await session.exec(select(func.min(ChangeLog.id)))).first()
+
+
+# --- Distribuição ---
+
+class Subscription:
+    """Fila de um cliente: recebe os eventos lidos pelo feed, já filtrados por tópico."""
+
+    def __init__(self, topics: Optional[Iterable[str]], buffer: int):
+        self.topics = set(topics) if topics else None
+        self.overflowed = False
+        self._buffer = buffer
+        self._events: Deque[dict] = deque()
+        self._ready = asyncio.Event()
+
+    def push(self, events: List[dict]) -> None:
+        if self.overflowed:
+            return
+        selected = [event for event in events if self.topics is None or event["topic"] in self.topics]
+        if not selected:
+            return
+        if len(self._events) + len(selected) > self._buffer:
+            # O cliente não acompanha: descarta a fila e o desconecta; ele retoma pelo banco
+            self.overflowed = True
+            self._events.clear()
+            feed_metrics.disconnected_slow += 1
+        else:
+            self._events.extend(selected)
+        self._ready.set()
+
+    async def get(self, timeout: float) -> List[dict]:
+        """Eventos pendentes; espera até 'timeout' segundos se não houver nenhum."""
+        if not self._events and not self.overflowed:
+            try:
+                await asyncio.wait_for(self._ready.wait(), max(timeout, 0))
+            except asyncio.TimeoutError:
+                return []
+        self._ready.clear()
+        events = list(self._events)
+        self._events.clear()
+        return events
+
+
+class ChangeFeed:
+    """Leitor compartilhado do outbox de um worker (um por event loop e fábrica de sessões)."""
+
+    def __init__(self, session_factory: async_sessionmaker):
+        self.session_factory = session_factory
+        self.loop = asyncio.get_running_loop()
+        self.last_seq = 0
+        # time.monotonic() até onde tudo o que foi confirmado já foi entregue (0 = nenhuma leitura)
+        self.last_read_at = 0.0
+        self._subscriptions: Set[Subscription] = set()
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def subscribe(self, topics: Optional[Iterable[str]] = None) -> Subscription:
+        async with self._lock:
+            if self._task is None:
+                # O ponto de partida é lido ANTES de o inscrito consultar o banco por
+                # conta própria: o que ele não vir na consulta, o feed entrega
+                self.last_seq = await head_seq(self.session_factory)
+                self._task = asyncio.create_task(self._run())
+            subscription = Subscription(topics, settings.change_feed_subscriber_buffer)
+            self._subscriptions.add(subscription)
+            feed_metrics.subscribers += 1
+            return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        if subscription not in self._subscriptions:
+            return
+        self._subscriptions.discard(subscription)
+        feed_metrics.subscribers -= 1
+        if not self._subscriptions:
+            self.close()
+
+    def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def wake(self) -> None:
+        """Pede uma leitura imediata; pode ser chamada de qualquer thread."""
+        try:
+            self.loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            # Event loop já encerrado
+            pass
+
+    async def _run(self) -> None:
+        listener = asyncio.create_task(self._listen()) if self._can_listen() else None
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), settings.change_feed_poll_interval_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                try:
+                    await self._dispatch_new()
+                except Exception:
+                    feed_metrics.errors += 1
+                    logger.exception("Falha ao ler o outbox do feed de alterações")
+        finally:
+            if listener is not None:
+                listener.cancel()
+
+    async def _dispatch_new(self) -> None:
+        batch_size = settings.change_feed_batch_size
+        read_started = time.monotonic()
+        while True:
+            events = await fetch_changes(self.session_factory, self.last_seq, batch_size)
+            feed_metrics.db_reads += 1
+            if events:
+                self.last_seq = events[-1]["seq"]
+                feed_metrics.events_dispatched += len(events)
+                for subscription in list(self._subscriptions):
+                    subscription.push(events)
+            if len(events) < batch_size:
+                # Tudo o que foi confirmado antes da leitura já está nas filas dos inscritos;
+                # no Postgres, só o que já passou da janela de buracos
+                self.last_read_at = read_started - (settings.change_feed_settle_seconds if self._settles() else 0.0)
+                return
+
+    def _settles(self) -> bool:
+        engine = self.session_factory.kw.get("bind")
+        return engine is not None and needs_settling(engine.dialect.name)
+
+    def _can_listen(self) -> bool:
+        engine = self.session_factory.kw.get("bind")
+        return engine is not None and engine.dialect.name == "postgresql" and not settings.db_pgbouncer
+
+    async def _listen(self) -> None:
+        """LISTEN numa conexão própria (fora do pool), reconectando se ela cair."""
+        import psycopg
+
+        url = self.session_factory.kw["bind"].url
+        conninfo = url.set(drivername="postgresql").render_as_string(hide_password=False)
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(conninfo, autocommit=True) as connection:
+                    await connection.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                    # Um NOTIFY pode ter se perdido enquanto a conexão estava caída
+                    self._wakeup.set()
+                    async for _ in connection.notifies():
+                        self._wakeup.set()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                feed_metrics.errors += 1
+                logger.warning("LISTEN do feed de alterações caiu; usando só a consulta periódica", exc_info=True)
+            await asyncio.sleep(LISTEN_RECONNECT_SECONDS)
+
+
+_feed: Optional[ChangeFeed] = None
+
+
+def get_change_feed(session_factory: async_sessionmaker) -> ChangeFeed:
+    """O feed do processo; um novo se a fábrica de sessões ou o event loop mudarem (ex.: testes)."""
+    global _feed
+    if _feed is None or _feed.session_factory is not session_factory or _feed.loop is not asyncio.get_running_loop():
+        _feed = ChangeFeed(session_factory)
+    return _feed
+
+
+def close_change_feed() -> None:
+    if _feed is not None:
+        _feed.close()
+
+
+def _wake_on_local_writes(write_set: WriteSet) -> None:
+    if _feed is not None and write_set.tables.intersection(FEED_KEYS):
+        _feed.wake()
+
+
+subscribe_to_writes(_wake_on_local_writes)
+
+
+# --- Limpeza do outbox ---
+
+async def prune_change_log(session_factory: async_sessionmaker, now: Optional[datetime] = None) -> int:
+    """Apaga, em lotes, as linhas mais velhas que a retenção. Devolve quantas apagou."""
+    cutoff = (now or datetime.utcnow()) - timedelta(hours=settings.change_feed_retention_hours)
+    batch_size = settings.change_feed_batch_size
+    pruned = 0
+    while True:
+        async with session_factory() as session:
+            chunk = select(ChangeLog.id).where(ChangeLog.created_at < cutoff).order_by(ChangeLog.id).limit(batch_size)
+            result = await session.exec(
+                delete(ChangeLog).where(ChangeLog.id.in_(chunk.scalar_subquery()))
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+        pruned += result.rowcount
+        feed_metrics.pruned_total += result.rowcount
+        if result.rowcount < batch_size:
+            return pruned
+
+
+def _prune_failed(exc: Exception) -> None:
+    feed_metrics.errors += 1
+    logger.error("Falha na limpeza do outbox do feed de alterações", exc_info=exc)
+
+
+async def run_scheduler(session_factory: async_sessionmaker, interval_seconds: float) -> None:
+    """Laço da limpeza; erros são contados e logados, sem derrubar o processo."""
+    await run_periodically(partial(prune_change_log, session_factory), interval_seconds, _prune_failed)
+
+
+_scheduler = BackgroundTask()
+
+
+async def start_scheduler() -> None:
+    """Sobe a limpeza como tarefa de fundo do processo da API (se habilitada)."""
+    if not settings.change_feed_prune_enabled:
+        return
+    from core.database import async_session_factory
+
+    _scheduler.start(lambda: run_scheduler(async_session_factory, settings.change_feed_prune_interval_seconds))
+
+
+async def stop_scheduler() -> None:
+    close_change_feed()
+    await _scheduler.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Limpeza do outbox do feed de alterações.")
+    parser.add_argument("--prune", action="store_true", help="executa uma única limpeza e sai")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    from core.database import async_session_factory
+
+    if args.prune:
+        print({"pruned": asyncio.run(prune_change_log(async_session_factory))})
+    else:
+        asyncio.run(run_scheduler(async_session_factory, settings.change_feed_prune_interval_seconds))
@@ -0,0 +1,369 @@
+"""
+Serviço do Filtro de Códigos de Cupom
+
+Códigos de cupom inválidos (digitados errado, ou um robô testando códigos) chegavam
+todos ao banco: nenhum cache guarda um 404. Cada worker agora mantém em memória:
+
+- um filtro de Bloom com TODOS os códigos já cadastrados (ativos e deletados; o
+  código é único na tabela inteira, então o conjunto só cresce). Um código fora do
+  filtro certamente não existe e recebe 404 sem consulta. Um código dentro dele
+  provavelmente existe, com uma taxa de falsos positivos de
+  COUPON_FILTER_FALSE_POSITIVE_RATE enquanto o filtro estiver dentro da capacidade;
+- um cache negativo (LRU com TTL) dos códigos que passaram pelo filtro mas não
+  existem (falsos positivos) ou foram deletados: a segunda tentativa também não
+  chega ao banco.
+
+O filtro é montado com uma leitura dos códigos no boot e atualizado a cada escrita:
+as do próprio processo chegam pelo aviso pós-commit (core/invalidation.py), as dos
+outros workers pelo feed de alterações (services/change_feed.py). Uma alteração em
+massa, uma fila estourada ou o filtro acima da capacidade disparam uma reconstrução.
+
+O filtro só é usado enquanto estiver em dia: se o feed ficar mais de
+COUPON_FILTER_MAX_SYNC_LAG_SECONDS sem ler o outbox (banco fora, feed desligado),
+as consultas voltam ao banco até ele se recuperar. Mesmo em dia, o filtro só sabe
+dos cupons confirmados até a última leitura do feed ('synced_at'), então:
+
+- as escritas (aplicar um cupom num produto, sozinho ou em lote) sempre consultam o
+  banco: um cupom recém-criado em outro worker nunca é recusado por elas;
+- as leituras (detalhe e /lookup) só respondem sem consulta se o cliente não
+  escreveu nada depois de 'synced_at' (cookie 'rw_after', core/replicas.py): quem
+  acabou de criar o cupom, em qualquer worker, sempre o encontra. Para os demais
+  clientes vale o mesmo atraso de uma réplica: até o feed entregar o cupom (o
+  NOTIFY no Postgres, até CHANGE_FEED_POLL_INTERVAL_SECONDS no SQLite).
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import select
+
+from core.config import settings
+from core.invalidation import WriteSet, subscribe as subscribe_to_writes
+from core.periodic import BackgroundTask
+from models.change_log_model import ChangeTopic
+from models.coupon_model import Coupon
+from services.change_feed import get_change_feed
+
+logger = logging.getLogger(__name__)
+
+# Um filtro novo nasce com folga para o dobro dos códigos atuais (e nunca menos que isto)
+MIN_CAPACITY = 1024
+REBUILD_BATCH_SIZE = 5000
+
+
+class BloomFilter:
+    """Filtro de Bloom com k posições por chave (hash duplo sobre um BLAKE2b de 128 bits)."""
+
+    def __init__(self, capacity: int, false_positive_rate: float):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.entries = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str) -> None:
+        added = False
+        for position in self._positions(key):
+            mask = 1 << (position & 7)
+            if not self._bits[position >> 3] & mask:
+                self._bits[position >> 3] |= mask
+                added = True
+        # Conta só chaves novas (ou quase: uma chave nova que colide em todos os bits não conta)
+        if added:
+            self.entries += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def expected_false_positive_rate(self) -> float:
+        return (1 - math.exp(-self.hashes * self.entries / self.size)) ** self.hashes
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self._bits)
+
+
+class NegativeCache:
+    """Códigos que não existem (ou não estão ativos): LRU com TTL, por processo."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, key: str) -> None:
+        with self._lock:
+            self._entries[key] = time.monotonic() + self.ttl_seconds
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is None:
+                return False
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return False
+            self._entries.move_to_end(key)
+            return True
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class CouponCodeFilter:
+    """
+    Filtro + cache negativo de um worker. As rotas de leitura chamam 'is_known_absent'
+    antes de consultar um código; todas chamam 'record_lookup' com o resultado da consulta.
+    """
+
+    def __init__(self):
+        self.filter: Optional[BloomFilter] = None
+        self.negative = NegativeCache(
+            settings.coupon_negative_cache_max_entries, settings.coupon_negative_cache_ttl_seconds,
+        )
+        # time.monotonic() até onde o filtro comprovadamente tem todas as escritas
+        self.synced_at = 0.0
+        # Muda a cada código adicionado: uma consulta que começou antes não grava no cache negativo
+        self.generation = 0
+        self.rebuild_requested = False
+        self.rejections = 0
+        self.negative_hits = 0
+        self.db_hits = 0
+        self.db_misses = 0
+        self.rebuilds = 0
+        self.errors = 0
+
+    @property
+    def ready(self) -> bool:
+        return (
+            self.filter is not None
+            and time.monotonic() - self.synced_at <= settings.coupon_filter_max_sync_lag_seconds
+        )
+
+    def covers(self, written_at: Optional[float]) -> bool:
+        """Se o filtro está em dia e já tem as escritas feitas até 'written_at' (epoch; None = nenhuma)."""
+        if not self.ready:
+            return False
+        # synced_at é monotônico; o cookie traz o relógio de parede
+        return written_at is None or written_at <= time.time() - (time.monotonic() - self.synced_at)
+
+    def might_exist(self, code: str, written_at: Optional[float] = None) -> bool:
+        """False se o código certamente não existia até a última sincronização (e o cliente não escreveu depois dela)."""
+        if not self.covers(written_at) or code in self.filter:
+            return True
+        self.rejections += 1
+        return False
+
+    def is_known_absent(self, code: str, written_at: Optional[float] = None) -> bool:
+        """True se a consulta de um cupom ATIVO com este código certamente não acharia nada (para leituras)."""
+        if not self.might_exist(code, written_at):
+            return True
+        if self.covers(written_at) and code in self.negative:
+            self.negative_hits += 1
+            return True
+        return False
+
+    def record_lookup(self, code: str, found: bool, generation: Optional[int] = None) -> None:
+        """
+        Resultado de uma consulta de cupom por código.
+        Com 'generation' (lida antes da consulta), um código ausente vai para o cache
+        negativo; só passe-a para leituras do primário, já que uma réplica atrasada
+        pode ainda não ter um cupom recém-criado.
+        """
+        if self.filter is None:
+            return
+        if found:
+            self.db_hits += 1
+            return
+        self.db_misses += 1
+        if generation is not None and generation == self.generation:
+            self.negative.add(code)
+
+    # --- Atualização ---
+
+    def add_code(self, code: str) -> None:
+        self.generation += 1
+        self.negative.discard(code)
+        if self.filter is not None:
+            self.filter.add(code)
+            if self.filter.entries > self.filter.capacity:
+                self.rebuild_requested = True
+
+    def apply_local_writes(self, written: WriteSet) -> None:
+        if Coupon.__tablename__ not in written.tables:
+            return
+        if Coupon.__tablename__ in written.bulk_tables:
+            self.rebuild_requested = True
+            return
+        for row in written.rows.get(Coupon.__tablename__, []):
+            code = row.get("code")
+            if code is None:
+                continue
+            if row.get("deleted_at") is not None:
+                # Deletado: continua no filtro, mas a próxima consulta nem chega ao banco
+                self.generation += 1
+                self.negative.add(code)
+            else:
+                self.add_code(code)
+
+    def apply_changes(self, events: Iterable[dict]) -> None:
+        """Eventos do feed (escritas de qualquer worker, inclusive este)."""
+        for event in events:
+            data = event["data"]
+            if data is None:
+                self.rebuild_requested = True
+            elif data.get("code") is not None:
+                # Não se sabe se foi criação, edição ou deleção: a deleção cai no cache negativo na 1ª consulta
+                self.add_code(data["code"])
+
+    async def rebuild(self, session_factory: async_sessionmaker) -> None:
+        """Lê todos os códigos (em blocos pela chave primária) e troca o filtro de uma vez."""
+        started_at = time.monotonic()
+        async with session_factory() as session:
+            total = (await session.exec(select(func.count()).select_from(Coupon))).one()
+            bloom = BloomFilter(max(2 * total, MIN_CAPACITY), settings.coupon_filter_false_positive_rate)
+            last_id = 0
+            while True:
+                query = select(Coupon.id, Coupon.code).where(Coupon.id > last_id).order_by(Coupon.id)
+                rows = (await session.exec(query.limit(REBUILD_BATCH_SIZE))).all()
+                for _, code in rows:
+                    bloom.add(code)
+                if len(rows) < REBUILD_BATCH_SIZE:
+                    break
+                last_id = rows[-1][0]
+        # Escritas que chegaram durante a leitura ficam na fila do feed e são aplicadas em seguida
+        self.filter = bloom
+        self.synced_at = started_at
+        self.generation += 1
+        self.negative.clear()
+        self.rebuild_requested = False
+        self.rebuilds += 1
+
+    def reset(self) -> None:
+        """Volta ao estado inicial, sem filtro e com os contadores zerados."""
+        self.__init__()
+
+    # --- Métricas ---
+
+    @property
+    def queries_avoided(self) -> int:
+        return self.rejections + self.negative_hits
+
+    def false_positive_rate(self) -> Optional[float]:
+        """Dos códigos inexistentes que chegaram ao filtro, a fração que ele deixou passar."""
+        false_positives = self.db_misses + self.negative_hits
+        absent = false_positives + self.rejections
+        return false_positives / absent if absent else None
+
+    def status(self) -> dict:
+        bloom = self.filter
+        return {
+            "ready": self.ready,
+            "entries": bloom.entries if bloom else 0,
+            "capacity": bloom.capacity if bloom else 0,
+            "sizeBytes": bloom.size_bytes if bloom else 0,
+            "hashes": bloom.hashes if bloom else 0,
+            "expectedFalsePositiveRate": bloom.expected_false_positive_rate() if bloom else None,
+            "falsePositiveRate": self.false_positive_rate(),
+            "queriesAvoided": self.queries_avoided,
+            "filterRejections": self.rejections,
+            "negativeCacheHits": self.negative_hits,
+            "negativeCacheEntries": len(self.negative),
+            "dbHits": self.db_hits,
+            "dbMisses": self.db_misses,
+            "rebuilds": self.rebuilds,
+            "errors": self.errors,
+        }
+
+    def collect(self) -> List[tuple]:
+        bloom = self.filter
+        return [
+            ("coupon_filter_entries", "gauge", "Códigos no filtro de cupons.", bloom.entries if bloom else 0),
+            ("coupon_filter_queries_avoided_total", "counter",
+             "Consultas de cupom evitadas (filtro + cache negativo).", self.queries_avoided),
+            ("coupon_filter_rejections_total", "counter", "Códigos descartados pelo filtro.", self.rejections),
+            ("coupon_negative_cache_hits_total", "counter", "Códigos descartados pelo cache negativo.",
+             self.negative_hits),
+            ("coupon_filter_db_misses_total", "counter", "Consultas que o filtro deixou passar e não acharam o cupom.",
+             self.db_misses),
+            ("coupon_filter_false_positive_rate", "gauge", "Fração dos códigos inexistentes que passou pelo filtro.",
+             self.false_positive_rate()),
+            ("coupon_filter_rebuilds_total", "counter", "Reconstruções do filtro.", self.rebuilds),
+            ("coupon_filter_errors_total", "counter", "Falhas ao montar ou sincronizar o filtro.", self.errors),
+        ]
+
+
+coupon_filter = CouponCodeFilter()
+subscribe_to_writes(coupon_filter.apply_local_writes)
+
+
+# --- Sincronização em segundo plano ---
+
+async def run_sync(session_factory: async_sessionmaker) -> None:
+    """
+    Inscreve-se no feed ANTES de ler os códigos (o que a leitura não vir, o feed
+    entrega), monta o filtro e segue aplicando os eventos. Reconstrói do zero quando
+    preciso; erros são contados e logados, sem derrubar o processo.
+    """
+    feed = get_change_feed(session_factory)
+    poll_interval = settings.change_feed_poll_interval_seconds
+    while True:
+        subscription = None
+        try:
+            subscription = await feed.subscribe([ChangeTopic.coupon.value])
+            await coupon_filter.rebuild(session_factory)
+            while not subscription.overflowed and not coupon_filter.rebuild_requested:
+                coupon_filter.apply_changes(await subscription.get(poll_interval))
+                # Sem 'await' desde o get: tudo o que o feed leu até last_read_at já foi aplicado
+                coupon_filter.synced_at = max(coupon_filter.synced_at, feed.last_read_at)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            coupon_filter.errors += 1
+            logger.exception("Falha ao sincronizar o filtro de códigos de cupom")
+            await asyncio.sleep(poll_interval)
+        finally:
+            if subscription is not None:
+                feed.unsubscribe(subscription)
+
+
+_sync = BackgroundTask()
+
+
+async def start_sync() -> None:
+    """Sobe a sincronização do filtro (precisa do outbox do feed de alterações)."""
+    if not (settings.coupon_filter_enabled and settings.change_feed_enabled):
+        return
+    from core.database import async_session_factory
+
+    _sync.start(lambda: run_sync(async_session_factory))
+
+
+async def stop_sync() -> None:
+    if await _sync.stop():
+        coupon_filter.reset()
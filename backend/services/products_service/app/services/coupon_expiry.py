@@ -0,0 +1,230 @@
+"""
+Serviço de Expiração de Cupons (varredura agendada)
+
+Ao aplicar um cupom, o produto recebe uma cópia do tipo/valor do desconto. Quando o
+cupom vence ('valid_until') ou é deletado, essa cópia ficava para sempre. Esta
+varredura periódica tira o desconto desses produtos:
+
+1. busca, em lotes, os cupons vencidos/deletados cujos descontos ainda não foram
+   liberados (índices parciais 'ix_coupon_valid_until_pending' e
+   'ix_coupon_deleted_at_pending');
+2. limpa o desconto dos produtos de cada cupom em blocos (UPDATE ... RETURNING,
+   uma transação por bloco), recalculando o 'final_price' para o preço cheio;
+3. marca o cupom com 'discounts_released_at'.
+
+É idempotente: se cair no meio, a próxima execução continua de onde parou. Com
+várias réplicas, só uma varre por vez (advisory lock do Postgres); as outras pulam
+a rodada. Roda como tarefa asyncio dentro da API (COUPON_SWEEP_ENABLED) ou como
+processo separado:
+
+    python -m services.coupon_expiry            # laço contínuo
+    python -m services.coupon_expiry --once     # uma rodada (ex.: cron)
+"""
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from functools import partial
+from typing import List, Optional
+
+from sqlalchemy import func, text, update
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.config import settings
+from core.etag import touch_rows, versioned_values
+from core.periodic import BackgroundTask, run_periodically
+from models.coupon_model import Coupon
+from models.product_model import Product
+
+logger = logging.getLogger(__name__)
+
+# Chave do pg_try_advisory_lock ("CUPO" em ASCII); a mesma em todas as réplicas
+SWEEP_LOCK_KEY = 0x4355504F
+
+
+class SweepMetrics:
+    """Contadores da varredura (por processo), expostos em /metrics/coupon-sweep."""
+
+    def __init__(self):
+        self.runs = 0
+        self.skipped_locked = 0
+        self.errors = 0
+        self.coupons_released_total = 0
+        self.products_cleared_total = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_duration_seconds: Optional[float] = None
+
+    def as_dict(self) -> dict:
+        return {
+            "runs": self.runs,
+            "skippedLocked": self.skipped_locked,
+            "errors": self.errors,
+            "couponsReleasedTotal": self.coupons_released_total,
+            "productsClearedTotal": self.products_cleared_total,
+            "lastRunAt": self.last_run_at.isoformat() if self.last_run_at else None,
+            "lastDurationSeconds": self.last_duration_seconds,
+        }
+
+
+sweep_metrics = SweepMetrics()
+_local_lock = asyncio.Lock()
+
+
+async def _due_coupon_ids(session: AsyncSession, cutoff: datetime, limit: int) -> List[int]:
+    # Duas consultas, uma por índice parcial, em vez de um OR que nenhum dos dois atende
+    expired = (
+        select(Coupon.id)
+        .where(Coupon.deleted_at == None, Coupon.discounts_released_at == None, Coupon.valid_until < cutoff)
+        .order_by(Coupon.valid_until).limit(limit)
+    )
+    deleted = (
+        select(Coupon.id)
+        .where(Coupon.deleted_at != None, Coupon.discounts_released_at == None, Coupon.deleted_at < cutoff)
+        .order_by(Coupon.deleted_at).limit(limit)
+    )
+    ids = list((await session.exec(expired)).all()) + list((await session.exec(deleted)).all())
+    return ids[:limit]
+
+
+async def _clear_products(session_factory: async_sessionmaker, coupon_id: int, batch_size: int) -> int:
+    """Tira o desconto dos produtos do cupom, um bloco por transação. Devolve quantos mudaram."""
+    cleared = 0
+    while True:
+        async with session_factory() as session:
+            chunk = (
+                select(Product.id).where(Product.coupon_id == coupon_id).limit(batch_size).scalar_subquery()
+            )
+            statement = (
+                update(Product)
+                .where(Product.id.in_(chunk), Product.coupon_id == coupon_id)
+                .values(versioned_values(
+                    Product.__table__, discount_type=None, discount_value=None, coupon_id=None,
+                    final_price=Product.price,
+                ))
+                .returning(Product.id)
+                .execution_options(synchronize_session=False)
+            )
+            changed = (await session.exec(statement)).scalars().all()
+            if not changed:
+                return cleared
+            await touch_rows(session, Product.__tablename__, [{"id": product_id} for product_id in changed])
+            await session.commit()
+            cleared += len(changed)
+
+
+async def _release_coupons(session_factory: async_sessionmaker, now: datetime) -> None:
+    cutoff = now - timedelta(seconds=settings.coupon_sweep_grace_seconds)
+    batch_size = settings.coupon_sweep_batch_size
+    while True:
+        async with session_factory() as session:
+            coupon_ids = await _due_coupon_ids(session, cutoff, batch_size)
+        for coupon_id in coupon_ids:
+            sweep_metrics.products_cleared_total += await _clear_products(session_factory, coupon_id, batch_size)
+            async with session_factory() as session:
+                # 'discounts_released_at' não faz parte da resposta da API: versão/ETag não mudam
+                await session.exec(
+                    update(Coupon)
+                    .where(Coupon.id == coupon_id, Coupon.discounts_released_at == None)
+                    .values(discounts_released_at=now)
+                    .execution_options(synchronize_session=False)
+                )
+                await session.commit()
+            sweep_metrics.coupons_released_total += 1
+        if len(coupon_ids) < batch_size:
+            return
+
+
+async def sweep_once(session_factory: async_sessionmaker, engine: AsyncEngine, now: Optional[datetime] = None) -> bool:
+    """
+    Executa uma rodada da varredura. Devolve False se outra réplica estava varrendo.
+
+    No Postgres a exclusão entre réplicas usa um advisory lock de sessão, mantido numa
+    conexão própria durante a rodada (com PgBouncer em modo 'transaction' o lock de
+    sessão não é confiável: rode a varredura como processo separado apontando para o
+    banco direto). Nos demais bancos vale só o lock local do processo.
+    """
+    async with _local_lock:
+        started = time.perf_counter()
+        async with engine.connect() as lock_connection:
+            is_postgres = lock_connection.dialect.name == "postgresql"
+            if is_postgres:
+                # Sem transação aberta: a conexão só segura o lock, não fica "idle in transaction"
+                await lock_connection.execution_options(isolation_level="AUTOCOMMIT")
+                acquired = await lock_connection.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": SWEEP_LOCK_KEY})
+                if not acquired:
+                    sweep_metrics.skipped_locked += 1
+                    return False
+            try:
+                await _release_coupons(session_factory, now or datetime.utcnow())
+            finally:
+                if is_postgres:
+                    await lock_connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": SWEEP_LOCK_KEY})
+        sweep_metrics.runs += 1
+        sweep_metrics.last_run_at = datetime.utcnow()
+        sweep_metrics.last_duration_seconds = round(time.perf_counter() - started, 6)
+        return True
+
+
+async def sweep_lag_seconds(session: AsyncSession, now: Optional[datetime] = None) -> float:
+    """
+    Atraso da varredura: há quanto tempo o cupom pendente mais antigo já deveria ter
+    sido liberado (vencimento/deleção + folga). Zero quando não há nada pendente.
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(seconds=settings.coupon_sweep_grace_seconds)
+    oldest_expired = (await session.exec(
+        select(func.min(Coupon.valid_until))
+        .where(Coupon.deleted_at == None, Coupon.discounts_released_at == None, Coupon.valid_until < cutoff)
+    )).first()
+    oldest_deleted = (await session.exec(
+        select(func.min(Coupon.deleted_at))
+        .where(Coupon.deleted_at != None, Coupon.discounts_released_at == None, Coupon.deleted_at < cutoff)
+    )).first()
+    oldest = min((value for value in (oldest_expired, oldest_deleted) if value is not None), default=None)
+    return 0.0 if oldest is None else round((cutoff - oldest).total_seconds(), 3)
+
+
+def _sweep_failed(exc: Exception) -> None:
+    sweep_metrics.errors += 1
+    logger.error("Falha na varredura de cupons vencidos", exc_info=exc)
+
+
+async def run_scheduler(session_factory: async_sessionmaker, engine: AsyncEngine, interval_seconds: float) -> None:
+    """Laço da varredura; erros são contados e logados, sem derrubar o processo."""
+    await run_periodically(partial(sweep_once, session_factory, engine), interval_seconds, _sweep_failed)
+
+
+_scheduler = BackgroundTask()
+
+
+async def start_scheduler() -> None:
+    """Sobe a varredura como tarefa de fundo do processo da API (se habilitada)."""
+    if not settings.coupon_sweep_enabled:
+        return
+    from core.database import async_engine, async_session_factory
+
+    _scheduler.start(
+        lambda: run_scheduler(async_session_factory, async_engine, settings.coupon_sweep_interval_seconds)
+    )
+
+
+async def stop_scheduler() -> None:
+    await _scheduler.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Varredura de cupons vencidos/deletados.")
+    parser.add_argument("--once", action="store_true", help="executa uma única rodada e sai")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    from core.database import async_engine, async_session_factory
+
+    if args.once:
+        asyncio.run(sweep_once(async_session_factory, async_engine))
+        print(sweep_metrics.as_dict())
+    else:
+        asyncio.run(run_scheduler(async_session_factory, async_engine, settings.coupon_sweep_interval_seconds))
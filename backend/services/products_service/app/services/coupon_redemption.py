@@ -0,0 +1,56 @@
+"""
+Serviço de Resgate de Cupons
+
+Cupons 'one_shot' só podem ser usados uma vez. Checar "já foi usado?" com um SELECT
+e gravar depois não basta: numa promoção relâmpago, várias requisições passam pela
+checagem antes de qualquer uma confirmar. Aqui o consumo é um único UPDATE
+condicional:
+
+    UPDATE coupon SET redeemed_at = ... WHERE id = ... AND redeemed_at IS NULL RETURNING id
+
+O banco garante que só uma transação vê a linha ainda livre: as concorrentes esperam
+o lock DAQUELA linha e, quando a vencedora confirma, o WHERE deixa de casar (se ela
+desfizer, a próxima leva). Cupons diferentes não disputam lock nenhum, e cupons de
+uso múltiplo nem tocam a linha do cupom: só ganham um registro no ledger.
+
+O resgate acontece na transação do chamador, então se a aplicação do desconto falhar
+o cupom volta a ficar livre no rollback.
+"""
+from datetime import datetime
+
+from sqlalchemy import update
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.etag import touch_rows, versioned_values
+from models.coupon_model import Coupon
+from models.coupon_redemption_model import CouponRedemption
+
+
+class CouponAlreadyRedeemedError(Exception):
+    """O cupom 'one_shot' já foi consumido por outra aplicação."""
+
+
+async def redeem_coupon(session: AsyncSession, coupon: Coupon, product_id: int) -> CouponRedemption:
+    """Consome o cupom para o produto e registra o resgate (sem commit)."""
+    now = datetime.utcnow()
+    if coupon.one_shot:
+        table = Coupon.__table__
+        claim = (
+            update(table)
+            .where(table.c.id == coupon.id, table.c.redeemed_at == None, table.c.deleted_at == None)
+            .values(versioned_values(table, redeemed_at=now))
+            .returning(table.c.version)
+        )
+        claimed = (await session.exec(claim)).first()
+        if claimed is None:
+            raise CouponAlreadyRedeemedError(coupon.code)
+
+        # Mantém o objeto da sessão coerente sem marcá-lo como alterado
+        set_committed_value(coupon, "redeemed_at", now)
+        set_committed_value(coupon, "version", claimed.version)
+        await touch_rows(session, Coupon.__tablename__, [{"id": coupon.id, "code": coupon.code}])
+
+    redemption = CouponRedemption(coupon_id=coupon.id, product_id=product_id, redeemed_at=now)
+    session.add(redemption)
+    return redemption
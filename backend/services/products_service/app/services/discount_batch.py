@@ -0,0 +1,151 @@
+"""
+Serviço de Descontos em Lote
+
+Aplica ou remove descontos em muitos produtos de uma vez, selecionados por uma lista
+de ids ou pelos mesmos filtros da listagem (search, minPrice, maxPrice). Cada bloco
+de até DISCOUNT_BATCH_SIZE produtos vira um único UPDATE ... RETURNING em sua própria
+transação, com as mesmas regras das rotas individuais:
+
+- só recebe desconto quem ainda não tem um (os demais contam como 'conflicted',
+  o equivalente ao 409 da rota individual);
+- o 'final_price' é recalculado no próprio UPDATE por 'final_price_expression'
+  (arredondamento em 2 casas e piso de 0.01, como 'calculate_final_price');
+- produtos inexistentes ou deletados contam como 'skipped'.
+
+Como os comandos não passam pelo ORM, a versão das linhas (ETag), a versão da
+coleção e a invalidação dos caches são tratadas aqui explicitamente.
+"""
+from datetime import datetime
+from decimal import Decimal
+from typing import AsyncIterator, List, Optional
+
+from sqlalchemy import insert, literal, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.etag import touch_rows, versioned_values
+from core.search import apply_product_filters
+from core.utils import final_price_expression
+from models.coupon_model import Coupon, CouponType
+from models.coupon_redemption_model import CouponRedemption
+from models.product_model import Product
+
+DISCOUNT_BATCH_SIZE = 1000
+MAX_REPORTED_IDS = 1000
+
+
+class BatchDiscountResult:
+    """Acumula o resumo da operação ao longo dos blocos."""
+
+    def __init__(self):
+        self.matched = 0
+        self.applied = 0
+        self.conflicted: List[int] = []
+        self.skipped: List[int] = []
+
+    def as_dict(self) -> dict:
+        return {
+            "matched": self.matched,
+            "applied": self.applied,
+            "conflicted": len(self.conflicted),
+            "skipped": len(self.skipped),
+            "conflictedIds": self.conflicted[:MAX_REPORTED_IDS],
+            "skippedIds": self.skipped[:MAX_REPORTED_IDS],
+        }
+
+
+async def _iter_id_chunks(
+    session: AsyncSession, product_ids: Optional[List[int]], search: Optional[str],
+    min_price: Optional[float], max_price: Optional[float],
+) -> AsyncIterator[List[int]]:
+    """Blocos de ids a processar: da lista recebida ou dos produtos ativos que casam com o filtro."""
+    if product_ids is not None:
+        unique_ids = sorted(set(product_ids))
+        for start in range(0, len(unique_ids), DISCOUNT_BATCH_SIZE):
+            yield unique_ids[start:start + DISCOUNT_BATCH_SIZE]
+        return
+
+    dialect_name = session.get_bind().dialect.name
+    query = select(Product.id).where(Product.deleted_at == None)
+    query = apply_product_filters(query, dialect_name, search, min_price, max_price).order_by(Product.id)
+    last_id = 0
+    while True:
+        # Keyset por id: o UPDATE do bloco anterior pode mudar o final_price (e o filtro
+        # de preço), mas nunca faz um produto ser visitado duas vezes
+        chunk = list((await session.exec(query.where(Product.id > last_id).limit(DISCOUNT_BATCH_SIZE))).all())
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1]
+
+
+async def _apply_chunk(session: AsyncSession, chunk: List[int], statement, result: BatchDiscountResult, conflict_filter):
+    """Roda o UPDATE do bloco e classifica os ids que ficaram de fora (o commit fica com o chamador)."""
+    changed = set((await session.exec(statement.where(Product.id.in_(chunk)).returning(Product.id))).scalars().all())
+    if changed:
+        await touch_rows(session, Product.__tablename__, [{"id": product_id} for product_id in changed])
+
+    remaining = [product_id for product_id in chunk if product_id not in changed]
+    if remaining:
+        conflicted = set()
+        if conflict_filter is not None:
+            query = select(Product.id).where(Product.id.in_(remaining), Product.deleted_at == None, conflict_filter)
+            conflicted = set((await session.exec(query)).all())
+        result.conflicted.extend(product_id for product_id in remaining if product_id in conflicted)
+        result.skipped.extend(product_id for product_id in remaining if product_id not in conflicted)
+
+    result.matched += len(chunk)
+    result.applied += len(changed)
+    return changed
+
+
+async def apply_discount_batch(
+    session: AsyncSession, *, discount_type: CouponType, discount_value: Decimal, coupon: Optional[Coupon] = None,
+    product_ids: Optional[List[int]] = None, search: Optional[str] = None,
+    min_price: Optional[float] = None, max_price: Optional[float] = None,
+) -> dict:
+    """Aplica o desconto (percentual ou de um cupom de uso múltiplo) aos produtos selecionados."""
+    result = BatchDiscountResult()
+    statement = (
+        update(Product)
+        .where(Product.deleted_at == None, Product.discount_type == None)
+        .values(versioned_values(
+            Product.__table__,
+            discount_type=discount_type,
+            discount_value=discount_value,
+            coupon_id=coupon.id if coupon else None,
+            final_price=final_price_expression(Product.price, literal(discount_type.value), literal(discount_value)),
+        ))
+        .execution_options(synchronize_session=False)
+    )
+    async for chunk in _iter_id_chunks(session, product_ids, search, min_price, max_price):
+        applied = await _apply_chunk(session, chunk, statement, result, Product.discount_type != None)
+        if coupon and applied:
+            # Mesmo ledger da aplicação individual (services/coupon_redemption.py)
+            now = datetime.utcnow()
+            await session.exec(insert(CouponRedemption).values([
+                {"coupon_id": coupon.id, "product_id": product_id, "redeemed_at": now} for product_id in sorted(applied)
+            ]))
+        await session.commit()
+    return result.as_dict()
+
+
+async def remove_discount_batch(
+    session: AsyncSession, *, product_ids: Optional[List[int]] = None, search: Optional[str] = None,
+    min_price: Optional[float] = None, max_price: Optional[float] = None,
+) -> dict:
+    """Remove o desconto dos produtos selecionados; quem não tem desconto conta como 'skipped'."""
+    result = BatchDiscountResult()
+    statement = (
+        update(Product)
+        .where(Product.deleted_at == None, Product.discount_type != None)
+        .values(versioned_values(
+            Product.__table__, discount_type=None, discount_value=None, coupon_id=None, final_price=Product.price,
+        ))
+        .execution_options(synchronize_session=False)
+    )
+    async for chunk in _iter_id_chunks(session, product_ids, search, min_price, max_price):
+        # Não há conflito possível na remoção: o que não mudou foi pulado
+        await _apply_chunk(session, chunk, statement, result, conflict_filter=None)
+        await session.commit()
+    return result.as_dict()
@@ -0,0 +1,65 @@
+"""
+Verificador de Consistência do 'final_price'
+
+Compara o valor persistido em 'product.final_price' com o resultado de
+'calculate_final_price' (a regra de negócio oficial), em lotes por id para
+não carregar o catálogo inteiro na memória. Com --fix, corrige as divergências.
+
+Uso (a partir de app/):
+    python -m services.final_price_check          # só relata
+    python -m services.final_price_check --fix    # relata e corrige
+"""
+import argparse
+from decimal import Decimal
+from typing import List, NamedTuple
+
+from sqlmodel import Session, select
+
+from core.utils import calculate_final_price
+from models.product_model import Product
+
+
+class FinalPriceMismatch(NamedTuple):
+    product_id: int
+    stored: Decimal
+    expected: Decimal
+
+
+def find_final_price_mismatches(session: Session, batch_size: int = 1000, fix: bool = False) -> List[FinalPriceMismatch]:
+    """Percorre todos os produtos (inclusive deletados) e devolve as divergências encontradas."""
+    mismatches: List[FinalPriceMismatch] = []
+    last_id = 0
+    while True:
+        query = select(Product).where(Product.id > last_id).order_by(Product.id).limit(batch_size)
+        products = session.exec(query).all()
+        if not products:
+            break
+        for product in products:
+            expected, _ = calculate_final_price(product)
+            if product.final_price != expected:
+                mismatches.append(FinalPriceMismatch(product.id, product.final_price, expected))
+                if fix:
+                    # O hook before_update recalcula o valor; basta marcar o objeto como alterado
+                    product.final_price = expected
+                    session.add(product)
+        if fix:
+            session.commit()
+        last_id = products[-1].id
+        session.expunge_all()
+    return mismatches
+
+
+if __name__ == "__main__":
+    from core.database import engine
+
+    parser = argparse.ArgumentParser(description="Verifica product.final_price contra calculate_final_price")
+    parser.add_argument("--fix", action="store_true", help="corrige os valores divergentes")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    with Session(engine) as cli_session:
+        found = find_final_price_mismatches(cli_session, args.batch_size, args.fix)
+    for mismatch in found:
+        print(f"produto {mismatch.product_id}: armazenado={mismatch.stored} esperado={mismatch.expected}")
+    print(f"{len(found)} divergência(s){' corrigida(s)' if args.fix and found else ''}.")
+    raise SystemExit(1 if found and not args.fix else 0)
@@ -0,0 +1,264 @@
+"""
+Serviço de Importação e Exportação em Massa de Produtos
+
+- Importação: lê o corpo da requisição em streaming (CSV ou NDJSON), valida cada
+  linha com 'ProductCreate' e grava em lotes com um único INSERT multi-linhas
+  '... ON CONFLICT (name) DO UPDATE' por lote. Linhas inválidas são reportadas
+  individualmente sem derrubar o restante do lote, inclusive as que só o banco
+  recusa: se o lote falhar, ele é regravado linha a linha (um SAVEPOINT por linha). Um nome que pertence a um
+  produto deletado (soft delete) o restaura, como POST /products/{id}/restore, e
+  conta em 'restored'.
+- Exportação: percorre o catálogo com um cursor do lado do servidor (yield_per),
+  então a memória fica constante independentemente do tamanho do catálogo.
+"""
+import csv
+import enum
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+
+import orjson
+from pydantic import ValidationError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.etag import touch_rows, versioned_values
+from core.serialization import dumps
+from core.utils import column_in, final_price_expression
+from models.product_model import Product
+from schemas.product_schemas import ProductCreate
+
+BULK_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+EXPORT_COLUMNS = [
+    "id", "name", "description", "price", "stock", "final_price",
+    "discount_type", "discount_value", "created_at", "deleted_at",
+]
+
+_INSERT_BY_DIALECT = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+class BulkImportResult:
+    """Acumula o resumo da importação ao longo dos lotes."""
+
+    def __init__(self):
+        self.processed = 0
+        self.upserted = 0
+        self.restored = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+
+    def add_error(self, line: int, detail) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "errors": detail})
+
+    def as_dict(self) -> dict:
+        return {
+            "processed": self.processed,
+            "upserted": self.upserted,
+            "restored": self.restored,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errorsTruncated": self.failed > len(self.errors),
+        }
+
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Quebra o corpo recebido em pedaços em linhas de texto, sem juntá-lo inteiro na memória."""
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8-sig").rstrip("\r") + "\n"
+    if pending.strip():
+        yield pending.decode("utf-8-sig").rstrip("\r") + "\n"
+
+
+async def _iter_ndjson_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    line_number = 0
+    async for line in _iter_lines(chunks):
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield line_number, None, f"JSON inválido: {exc.msg}"
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, "Cada linha deve ser um objeto JSON."
+            continue
+        yield line_number, row, None
+
+
+async def _iter_csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    header: Optional[List[str]] = None
+    record, record_line, line_number = "", 0, 0
+    async for line in _iter_lines(chunks):
+        line_number += 1
+        if not record:
+            record_line = line_number
+        record += line
+        # Campo entre aspas com quebra de linha: o registro continua na próxima linha
+        if record.count('"') % 2 == 1:
+            continue
+        values = next(csv.reader(io.StringIO(record)), [])
+        record = ""
+        if not values:
+            continue
+        if header is None:
+            header = [column.strip() for column in values]
+            continue
+        if len(values) != len(header):
+            yield record_line, None, f"Esperadas {len(header)} colunas, encontradas {len(values)}."
+            continue
+        # Células vazias viram None (ex.: descrição em branco)
+        yield record_line, {key: (value if value != "" else None) for key, value in zip(header, values)}, None
+    if record:
+        yield record_line, None, "Registro CSV com aspas não fechadas."
+
+
+async def import_products(session: AsyncSession, chunks: AsyncIterator[bytes], content_format: str) -> dict:
+    """Importa produtos do corpo em streaming e devolve o resumo com os erros por linha."""
+    rows = _iter_csv_rows(chunks) if content_format == "csv" else _iter_ndjson_rows(chunks)
+    result = BulkImportResult()
+    batch: Dict[str, Tuple[int, dict]] = {}
+
+    async for line_number, row, parse_error in rows:
+        result.processed += 1
+        if parse_error:
+            result.add_error(line_number, parse_error)
+            continue
+        try:
+            product = ProductCreate.model_validate(row)
+        except ValidationError as exc:
+            result.add_error(line_number, exc.errors(include_url=False, include_context=False))
+            continue
+        # O mesmo nome repetido no lote: vale a última ocorrência (ON CONFLICT não
+        # aceita atualizar a mesma linha duas vezes no mesmo comando)
+        batch.pop(product.name, None)
+        batch[product.name] = (line_number, product.model_dump())
+        if len(batch) >= BULK_BATCH_SIZE:
+            await _upsert_batch(session, batch, result)
+            batch = {}
+
+    if batch:
+        await _upsert_batch(session, batch, result)
+    return result.as_dict()
+
+
+async def _upsert_batch(session: AsyncSession, batch: Dict[str, Tuple[int, dict]], result: BulkImportResult) -> None:
+    rows = list(batch.values())
+    try:
+        try:
+            async with session.begin_nested():
+                restored = await _upsert_rows(session, [data for _, data in rows])
+            result.upserted += len(rows)
+            result.restored += restored
+        except SQLAlchemyError:
+            # Alguma linha o banco recusa (ex.: valor fora da precisão da coluna): grava
+            # uma a uma, cada qual no seu SAVEPOINT, e só as recusadas viram erro
+            for line_number, data in rows:
+                try:
+                    async with session.begin_nested():
+                        restored = await _upsert_rows(session, [data])
+                except SQLAlchemyError as exc:
+                    result.add_error(line_number, f"Recusada pelo banco: {exc.__class__.__name__}")
+                    continue
+                result.upserted += 1
+                result.restored += restored
+        await touch_rows(session, Product.__tablename__)
+        await session.commit()
+    except SQLAlchemyError as exc:
+        await session.rollback()
+        detail = f"Falha ao gravar o lote: {exc.__class__.__name__}"
+        for line_number, _ in rows:
+            result.add_error(line_number, detail)
+
+
+async def _upsert_rows(session: AsyncSession, rows: List[dict]) -> int:
+    """Um INSERT ... ON CONFLICT (name) DO UPDATE; devolve quantos produtos deletados foram restaurados."""
+    dialect_name = session.get_bind().dialect.name
+    now = datetime.utcnow()
+    values = [{**data, "created_at": now, "final_price": data["price"]} for data in rows]
+
+    statement = _INSERT_BY_DIALECT[dialect_name](Product).values(values)
+    excluded = statement.excluded
+    statement = statement.on_conflict_do_update(
+        index_elements=[Product.name],
+        set_=versioned_values(
+            Product.__table__,
+            description=excluded.description,
+            price=excluded.price,
+            stock=excluded.stock,
+            # Produto existente pode ter desconto ativo: recalcula sobre o novo preço
+            final_price=final_price_expression(excluded.price, Product.discount_type, Product.discount_value),
+            # O nome é único na tabela inteira: reimportar um produto deletado o restaura
+            deleted_at=None,
+        ),
+    )
+    restored = (await session.exec(
+        select(func.count()).select_from(Product).where(
+            column_in(Product.name, [data["name"] for data in rows], dialect_name), Product.deleted_at != None,
+        )
+    )).one()
+    await session.exec(statement)
+    return restored
+
+
+async def export_products(
+    session: AsyncSession, content_format: str, include_deleted: bool
+) -> AsyncIterator[Union[str, bytes]]:
+    """Gera o catálogo em CSV ou NDJSON, lendo do banco em blocos via cursor do servidor."""
+    query = select(Product).order_by(Product.id).execution_options(yield_per=BULK_BATCH_SIZE)
+    if not include_deleted:
+        query = query.where(Product.deleted_at == None)
+
+    if content_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        yield buffer.getvalue()
+
+    result = await session.stream_scalars(query)
+    async for products in result.partitions():
+        if content_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for product in products:
+                writer.writerow([_export_value(value) for value in export_row(product).values()])
+            chunk = buffer.getvalue()
+        else:
+            # orjson: datetime e enum nativos, Decimal como string (mesmos valores do CSV)
+            chunk = b"".join(dumps(export_row(product), orjson.OPT_APPEND_NEWLINE) for product in products)
+        # Objetos já exportados não precisam continuar no identity map da sessão
+        session.expunge_all()
+        yield chunk
+
+
+_EXPORT_KEYS = frozenset(EXPORT_COLUMNS)
+
+
+def export_row(product: Product) -> dict:
+    """Colunas exportadas do produto, lidas do __dict__ (sem o descriptor do SQLAlchemy por atributo)."""
+    state = product.__dict__
+    if not _EXPORT_KEYS.issubset(state):
+        # Atributo expirado/não carregado: o getattr faz o load normal
+        return {column: getattr(product, column) for column in EXPORT_COLUMNS}
+    return {column: state[column] for column in EXPORT_COLUMNS}
+
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
@@ -0,0 +1,344 @@
+"""
+Serviço de Reservas de Estoque
+
+Antes, 'stock' só mudava pelo PATCH /products/{id}: o cliente lê o estoque, subtrai
+e grava o total. Dois checkouts simultâneos leem o mesmo valor e um deles se perde,
+e nada impede vender mais do que havia. Aqui cada baixa é um único UPDATE
+condicional:
+
+    UPDATE product SET stock = stock - :n WHERE id = :id AND stock >= :n RETURNING stock
+
+Como no resgate de cupons (services/coupon_redemption.py), o banco serializa as
+transações na linha do produto: quando a vencedora confirma, o WHERE é reavaliado
+com o estoque novo e quem não cabe mais recebe zero linhas, nunca um estoque negativo.
+
+Fluxo:
+
+1. reserva: o estoque sai do produto na hora e a reserva fica 'pending' até
+   'expires_at'. Num lote, todos os itens entram na mesma transação, em ordem de id
+   (dois lotes com os mesmos produtos travam as linhas na mesma ordem, sem deadlock);
+   se um item não couber, nada é reservado;
+2. confirmação ('committed'): a baixa vira definitiva;
+3. liberação ('released') ou vencimento ('expired', pela varredura): as
+   quantidades voltam para os produtos.
+
+As transições de estado também são UPDATEs condicionais ('WHERE status = pending'),
+então confirmar e liberar a mesma reserva ao mesmo tempo não devolve estoque já
+vendido. Repetir a mesma operação é idempotente.
+
+Como o estoque reservado já saiu de 'stock', 'is_out_of_stock' (stock == 0) mostra
+o que ainda está disponível para novas reservas.
+
+Nenhuma função faz commit: a rota confirma ou desfaz a transação. A varredura roda
+como tarefa asyncio dentro da API (STOCK_RESERVATION_SWEEP_ENABLED) ou como processo:
+
+    python -m services.stock_reservation            # laço contínuo
+    python -m services.stock_reservation --once     # uma rodada (ex.: cron)
+"""
+import argparse
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.config import settings
+from core.etag import touch_rows, versioned_values
+from core.periodic import BackgroundTask, run_periodically
+from models.product_model import Product
+from models.stock_reservation_model import ReservationStatus, StockReservation, StockReservationItem
+
+logger = logging.getLogger(__name__)
+
+
+class ProductUnavailableError(Exception):
+    """O produto não existe ou está deletado."""
+
+    def __init__(self, product_id: int):
+        super().__init__(product_id)
+        self.product_id = product_id
+
+
+class InsufficientStockError(Exception):
+    """O estoque do produto não cobre a quantidade pedida."""
+
+    def __init__(self, product_id: int, available: int):
+        super().__init__(product_id, available)
+        self.product_id = product_id
+        self.available = available
+
+
+class ReservationNotFoundError(Exception):
+    """Não existe reserva com esse id."""
+
+
+class ReservationNotPendingError(Exception):
+    """A reserva já foi encerrada com outro estado (ex.: confirmar uma reserva vencida)."""
+
+    def __init__(self, status: ReservationStatus):
+        super().__init__(status)
+        self.status = status
+
+
+class ReservationMetrics:
+    """Contadores das reservas (por processo), expostos em /metrics."""
+
+    def __init__(self):
+        self.reserved_total = 0
+        self.rejected_total = 0
+        self.committed_total = 0
+        self.released_total = 0
+        self.expired_total = 0
+        self.sweep_runs = 0
+        self.sweep_errors = 0
+
+    def collect(self) -> List[tuple]:
+        return [
+            ("stock_reservations_created_total", "counter", "Reservas de estoque criadas.", self.reserved_total),
+            ("stock_reservations_rejected_total", "counter", "Reservas recusadas por falta de estoque.", self.rejected_total),
+            ("stock_reservations_committed_total", "counter", "Reservas confirmadas.", self.committed_total),
+            ("stock_reservations_released_total", "counter", "Reservas liberadas pelo cliente.", self.released_total),
+            ("stock_reservations_expired_total", "counter", "Reservas vencidas devolvidas pela varredura.", self.expired_total),
+            ("stock_reservation_sweep_errors_total", "counter", "Falhas da varredura de reservas.", self.sweep_errors),
+        ]
+
+
+reservation_metrics = ReservationMetrics()
+
+
+def _merge_items(items: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Soma quantidades repetidas do mesmo produto e ordena por id (ordem fixa de lock)."""
+    merged: Dict[int, int] = {}
+    for product_id, quantity in items:
+        merged[product_id] = merged.get(product_id, 0) + quantity
+    return sorted(merged.items())
+
+
+async def _classify_failure(session: AsyncSession, product_id: int, quantity: int) -> Exception:
+    row = (await session.exec(select(Product.stock, Product.deleted_at).where(Product.id == product_id))).first()
+    if row is None or row.deleted_at is not None:
+        return ProductUnavailableError(product_id)
+    return InsufficientStockError(product_id, row.stock)
+
+
+async def reserve_stock(
+    session: AsyncSession, items: Iterable[Tuple[int, int]], ttl_seconds: Optional[int] = None,
+) -> Tuple[StockReservation, Dict[int, int]]:
+    """
+    Reserva todos os itens (produto, quantidade) ou nenhum (sem commit).
+
+    Devolve a reserva e o estoque restante de cada produto. Em falta de estoque, ou
+    produto inexistente/deletado, levanta o erro correspondente: o chamador deve fazer
+    rollback para devolver o que já tiver sido baixado nesta transação.
+    """
+    now = datetime.utcnow()
+    table = Product.__table__
+    remaining: Dict[int, int] = {}
+    merged = _merge_items(items)
+    for product_id, quantity in merged:
+        decrement = (
+            update(table)
+            .where(table.c.id == product_id, table.c.deleted_at == None, table.c.stock >= quantity)
+            .values(versioned_values(table, stock=table.c.stock - quantity))
+            .returning(table.c.stock)
+        )
+        row = (await session.exec(decrement)).first()
+        if row is None:
+            reservation_metrics.rejected_total += 1
+            raise await _classify_failure(session, product_id, quantity)
+        remaining[product_id] = row.stock
+
+    reservation = StockReservation(
+        id=uuid.uuid4().hex,
+        status=ReservationStatus.pending,
+        created_at=now,
+        expires_at=now + timedelta(seconds=ttl_seconds or settings.stock_reservation_ttl_seconds),
+    )
+    session.add(reservation)
+    session.add_all(
+        StockReservationItem(reservation_id=reservation.id, product_id=product_id, quantity=quantity)
+        for product_id, quantity in merged
+    )
+    await touch_rows(session, Product.__tablename__, [{"id": product_id} for product_id in remaining])
+    reservation_metrics.reserved_total += 1
+    return reservation, remaining
+
+
+async def get_reservation(session: AsyncSession, reservation_id: str) -> Tuple[StockReservation, List[StockReservationItem]]:
+    reservation = await session.get(StockReservation, reservation_id)
+    if reservation is None:
+        raise ReservationNotFoundError(reservation_id)
+    query = (
+        select(StockReservationItem)
+        .where(StockReservationItem.reservation_id == reservation_id)
+        .order_by(StockReservationItem.product_id)
+    )
+    return reservation, list((await session.exec(query)).all())
+
+
+async def _close(
+    session: AsyncSession, reservation_id: str, status: ReservationStatus, now: datetime, only_unexpired: bool,
+) -> bool:
+    """Move a reserva de 'pending' para 'status'. False se ela já não estava pendente (ou venceu)."""
+    table = StockReservation.__table__
+    condition = [table.c.id == reservation_id, table.c.status == ReservationStatus.pending]
+    if only_unexpired:
+        condition.append(table.c.expires_at > now)
+    closed = await session.exec(
+        update(table).where(*condition).values(status=status, closed_at=now).returning(table.c.id)
+    )
+    return closed.first() is not None
+
+
+async def _restore_stock(session: AsyncSession, reservation_id: str) -> List[int]:
+    """Devolve as quantidades da reserva aos produtos (também aos deletados, que podem ser restaurados)."""
+    items = (await session.exec(
+        select(StockReservationItem.product_id, StockReservationItem.quantity)
+        .where(StockReservationItem.reservation_id == reservation_id)
+        .order_by(StockReservationItem.product_id)
+    )).all()
+    table = Product.__table__
+    for product_id, quantity in items:
+        await session.exec(
+            update(table)
+            .where(table.c.id == product_id)
+            .values(versioned_values(table, stock=table.c.stock + quantity))
+        )
+    product_ids = [product_id for product_id, _ in items]
+    await touch_rows(session, Product.__tablename__, [{"id": product_id} for product_id in product_ids])
+    return product_ids
+
+
+async def _current_status(session: AsyncSession, reservation_id: str) -> ReservationStatus:
+    status = (await session.exec(
+        select(StockReservation.status).where(StockReservation.id == reservation_id)
+    )).first()
+    if status is None:
+        raise ReservationNotFoundError(reservation_id)
+    return status
+
+
+async def commit_reservation(session: AsyncSession, reservation_id: str, now: Optional[datetime] = None) -> None:
+    """
+    Confirma a baixa (sem commit). Confirmar de novo não faz nada.
+
+    Uma reserva pendente mas já vencida (a varredura ainda não passou) é encerrada
+    como 'expired' aqui mesmo, com o estoque devolvido, e a confirmação é recusada:
+    o chamador deve fazer commit antes de tratar o ReservationNotPendingError.
+    """
+    now = now or datetime.utcnow()
+    if await _close(session, reservation_id, ReservationStatus.committed, now, only_unexpired=True):
+        reservation_metrics.committed_total += 1
+        return
+    status = await _current_status(session, reservation_id)
+    if status == ReservationStatus.committed:
+        return
+    if status == ReservationStatus.pending:
+        await expire_reservation(session, reservation_id, now)
+        status = ReservationStatus.expired
+    raise ReservationNotPendingError(status)
+
+
+async def release_reservation(session: AsyncSession, reservation_id: str, now: Optional[datetime] = None) -> None:
+    """Cancela a reserva e devolve o estoque (sem commit). Liberar de novo (ou uma vencida) não faz nada."""
+    now = now or datetime.utcnow()
+    if await _close(session, reservation_id, ReservationStatus.released, now, only_unexpired=False):
+        await _restore_stock(session, reservation_id)
+        reservation_metrics.released_total += 1
+        return
+    status = await _current_status(session, reservation_id)
+    if status == ReservationStatus.committed:
+        raise ReservationNotPendingError(status)
+
+
+async def expire_reservation(session: AsyncSession, reservation_id: str, now: datetime) -> bool:
+    """Encerra uma reserva pendente como 'expired' e devolve o estoque (sem commit)."""
+    if not await _close(session, reservation_id, ReservationStatus.expired, now, only_unexpired=False):
+        return False
+    await _restore_stock(session, reservation_id)
+    reservation_metrics.expired_total += 1
+    return True
+
+
+async def sweep_expired_reservations(session_factory: async_sessionmaker, now: Optional[datetime] = None) -> int:
+    """
+    Devolve o estoque das reservas pendentes vencidas, em lotes (índice parcial
+    'ix_stock_reservation_expires_at_pending'), uma transação por reserva.
+
+    Não precisa de advisory lock: a transição condicional garante que, com várias
+    réplicas varrendo ao mesmo tempo, cada reserva é devolvida uma única vez.
+    """
+    now = now or datetime.utcnow()
+    batch_size = settings.stock_reservation_sweep_batch_size
+    expired = 0
+    while True:
+        async with session_factory() as session:
+            due_ids = (await session.exec(
+                select(StockReservation.id)
+                .where(StockReservation.status == ReservationStatus.pending, StockReservation.expires_at <= now)
+                .order_by(StockReservation.expires_at).limit(batch_size)
+            )).all()
+        for reservation_id in due_ids:
+            async with session_factory() as session:
+                if await expire_reservation(session, reservation_id, now):
+                    expired += 1
+                await session.commit()
+        if len(due_ids) < batch_size:
+            reservation_metrics.sweep_runs += 1
+            return expired
+
+
+async def _sweep_and_log(session_factory: async_sessionmaker) -> None:
+    started = time.perf_counter()
+    expired = await sweep_expired_reservations(session_factory)
+    if expired:
+        logger.info("Reservas vencidas devolvidas: %d (%.1f ms)", expired, (time.perf_counter() - started) * 1000)
+
+
+def _sweep_failed(exc: Exception) -> None:
+    reservation_metrics.sweep_errors += 1
+    logger.error("Falha na varredura de reservas de estoque vencidas", exc_info=exc)
+
+
+async def run_scheduler(session_factory: async_sessionmaker, interval_seconds: float) -> None:
+    """Laço da varredura; erros são contados e logados, sem derrubar o processo."""
+    await run_periodically(partial(_sweep_and_log, session_factory), interval_seconds, _sweep_failed)
+
+
+_scheduler = BackgroundTask()
+
+
+async def start_scheduler() -> None:
+    """Sobe a varredura como tarefa de fundo do processo da API (se habilitada)."""
+    if not settings.stock_reservation_sweep_enabled:
+        return
+    from core.database import async_session_factory
+
+    _scheduler.start(
+        lambda: run_scheduler(async_session_factory, settings.stock_reservation_sweep_interval_seconds)
+    )
+
+
+async def stop_scheduler() -> None:
+    await _scheduler.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Varredura de reservas de estoque vencidas.")
+    parser.add_argument("--once", action="store_true", help="executa uma única rodada e sai")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    from core.database import async_session_factory
+
+    if args.once:
+        print({"expired": asyncio.run(sweep_expired_reservations(async_session_factory))})
+    else:
+        asyncio.run(run_scheduler(async_session_factory, settings.stock_reservation_sweep_interval_seconds))
@@ -1,37 +1,64 @@
 # Em tests/conftest.py
 
+import os
 import pytest
 from typing import Generator
 from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.main import app
-from app.core.database import get_session
+# A configuração exige DATABASE_URL; os testes nunca usam esse engine (as rotas
+# recebem a sessão do override abaixo), então um SQLite em memória basta.
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+# As varreduras (cupons, reservas, outbox) são disparadas explicitamente pelos testes que as usam
+os.environ.setdefault("COUPON_SWEEP_ENABLED", "false")
+os.environ.setdefault("STOCK_RESERVATION_SWEEP_ENABLED", "false")
+os.environ.setdefault("CHANGE_FEED_PRUNE_ENABLED", "false")
 
-# CORREÇÃO: Usamos um banco de dados SQLite em memória para os testes.
-# Ele é criado do zero a cada execução do pytest e depois some.
-DATABASE_URL_TEST = "sqlite:///:memory:"
+# CORREÇÃO: Importamos pelos mesmos caminhos usados pela aplicação (pythonpath = .),
+# senão o override abaixo aponta para uma cópia diferente de 'get_async_session_factory'.
+from main import app
+from core.database import get_async_session_factory
+from core import coalescing
+from core.cache import response_cache
+from core.counting import count_cache
 
-# O parâmetro 'connect_args' é específico para o SQLite e necessário
-# para que ele funcione corretamente com o FastAPI em múltiplas threads.
-engine = create_engine(DATABASE_URL_TEST, connect_args={"check_same_thread": False})
+# Cada teste ganha um banco SQLite novo em um arquivo temporário. O mesmo arquivo é
+# aberto por um engine síncrono (create_all e verificações diretas nos testes) e por
+# um engine assíncrono (aiosqlite), que é o que as rotas usam.
+# NullPool: cada requisição abre sua própria conexão, dentro do event loop do TestClient.
+
+@pytest.fixture(name="database_path")
+def database_path_fixture(tmp_path) -> str:
+    return str(tmp_path / "test.db")
+
+@pytest.fixture(name="async_engine")
+def async_engine_fixture(database_path: str):
+    return create_async_engine(f"sqlite+aiosqlite:///{database_path}", poolclass=NullPool)
 
 @pytest.fixture(name="session")
-def session_fixture() -> Generator[Session, None, None]:
+def session_fixture(database_path: str) -> Generator[Session, None, None]:
     # Cria as tabelas antes de cada teste
+    engine = create_engine(f"sqlite:///{database_path}", connect_args={"check_same_thread": False})
     SQLModel.metadata.create_all(engine)
     with Session(engine) as session:
         yield session
-    # Apaga as tabelas após cada teste
-    SQLModel.metadata.drop_all(engine)
+    engine.dispose()
+    # O banco é descartado junto com o diretório temporário; só os caches em memória
+    # precisam ser limpos manualmente
+    count_cache.clear()
+    response_cache.clear()
+    coalescing.clear()
 
 @pytest.fixture(name="client")
-def client_fixture(session: Session) -> Generator[TestClient, None, None]:
-    def get_session_override():
-        return session
+def client_fixture(session: Session, async_engine) -> Generator[TestClient, None, None]:
+    session_factory = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
 
-    app.dependency_overrides[get_session] = get_session_override
+    # 'get_async_session' depende desta fábrica, então sobrescrevê-la basta para todas as rotas
+    app.dependency_overrides[get_async_session_factory] = lambda: session_factory
     
     yield TestClient(app)
     
-    app.dependency_overrides.clear()
\ No newline at end of file
+    app.dependency_overrides.clear()
@@ -0,0 +1,65 @@
+# Em: tests/test_03_cursor_pagination.py
+
+from fastapi.testclient import TestClient
+from datetime import datetime, timedelta
+
+
+def test_products_cursor_pagination_matches_offset(client: TestClient):
+    """
+    Percorre o catálogo inteiro seguindo 'nextCursor' e verifica que o resultado
+    é o mesmo da paginação por 'page', inclusive com preços repetidos (desempate por id).
+    """
+    for i in range(7):
+        response = client.post(
+            "/api/v1/products/",
+            json={"name": f"Produto {i}", "price": str(10 + i % 3), "stock": i},
+        )
+        assert response.status_code == 201
+
+    params = {"limit": 3, "sortBy": "price", "sortOrder": "asc"}
+    by_page = []
+    for page in range(1, 4):
+        by_page += [p["id"] for p in client.get("/api/v1/products/", params={**params, "page": page}).json()["data"]]
+
+    by_cursor, cursor = [], None
+    while True:
+        query = {**params, "cursor": cursor} if cursor else params
+        body = client.get("/api/v1/products/", params=query).json()
+        by_cursor += [p["id"] for p in body["data"]]
+        cursor = body["meta"]["nextCursor"]
+        if not cursor:
+            break
+
+    assert len(by_cursor) == 7
+    assert by_cursor == by_page
+
+    # Cursor gerado para outra ordenação deve ser rejeitado
+    first = client.get("/api/v1/products/", params=params).json()
+    response = client.get(
+        "/api/v1/products/",
+        params={"limit": 3, "sortBy": "stock", "cursor": first["meta"]["nextCursor"]},
+    )
+    assert response.status_code == 400
+    assert client.get("/api/v1/products/", params={"cursor": "lixo"}).status_code == 400
+
+
+def test_coupons_cursor_pagination(client: TestClient):
+    valid_from = datetime.utcnow()
+    for i in range(5):
+        response = client.post(
+            "/api/v1/coupons/",
+            json={
+                "code": f"cupom{i}",
+                "type": "fixed",
+                "value": 5,
+                "valid_from": valid_from.isoformat(),
+                "valid_until": (valid_from + timedelta(days=1)).isoformat(),
+            },
+        )
+        assert response.status_code == 201
+
+    first = client.get("/api/v1/coupons/", params={"limit": 2}).json()
+    second = client.get("/api/v1/coupons/", params={"limit": 2, "cursor": first["meta"]["nextCursor"]}).json()
+    assert [c["code"] for c in second["data"]] == [
+        c["code"] for c in client.get("/api/v1/coupons/", params={"limit": 2, "page": 2}).json()["data"]
+    ]
@@ -0,0 +1,54 @@
+# Em: tests/test_04_count_modes.py
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+
+def _create_products(client: TestClient, names):
+    for name in names:
+        response = client.post("/api/v1/products/", json={"name": name, "price": "10.00", "stock": 1})
+        assert response.status_code == 201
+
+
+def test_count_none_and_estimated(client: TestClient):
+    _create_products(client, ["Caneta", "Caderno", "Lápis"])
+
+    meta = client.get("/api/v1/products/", params={"count": "none"}).json()["meta"]
+    assert meta["totalItems"] is None
+    assert meta["totalPages"] is None
+
+    # No SQLite não há estatísticas do planejador: 'estimated' cai para a contagem exata
+    meta = client.get("/api/v1/products/", params={"count": "estimated", "limit": 2}).json()["meta"]
+    assert meta["totalItems"] == 3
+    assert meta["totalPages"] == 2
+
+    assert client.get("/api/v1/products/", params={"count": "aproximado"}).status_code == 422
+    assert client.get("/api/v1/coupons/", params={"count": "none"}).json()["meta"]["totalItems"] is None
+
+
+def test_exact_count_is_cached_and_invalidated_on_write(client: TestClient, async_engine):
+    _create_products(client, ["Caneta azul", "Caneta preta", "Borracha"])
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+
+    params = {"search": "Caneta"}
+    assert client.get("/api/v1/products/", params=params).json()["meta"]["totalItems"] == 2
+    counted = sum("count(" in sql.lower() for sql in statements)
+    assert client.get("/api/v1/products/", params=params).json()["meta"]["totalItems"] == 2
+    # A segunda chamada com os mesmos filtros não roda outro COUNT
+    assert sum("count(" in sql.lower() for sql in statements) == counted
+
+    # Escrita na tabela invalida o cache
+    _create_products(client, ["Caneta verde"])
+    assert client.get("/api/v1/products/", params=params).json()["meta"]["totalItems"] == 3
+
+    product_id = client.get("/api/v1/products/", params=params).json()["data"][0]["id"]
+    assert client.delete(f"/api/v1/products/{product_id}").status_code == 204
+    assert client.get("/api/v1/products/", params=params).json()["meta"]["totalItems"] == 2
+
+    event.remove(async_engine.sync_engine, "before_cursor_execute", record)
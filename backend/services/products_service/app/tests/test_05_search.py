@@ -0,0 +1,52 @@
+# Em: tests/test_05_search.py
+
+from fastapi.testclient import TestClient
+
+
+def test_search_is_accent_insensitive_and_ranked(client: TestClient):
+    """
+    No SQLite dos testes a busca usa o FTS5 (stand-in do tsvector/pg_trgm do Postgres):
+    ignora acentos, casa por prefixo e ordena por relevância com sortBy=relevance.
+    """
+    products = [
+        ("Café Especial", "Grãos torrados"),
+        ("Caneca", "Ideal para café"),
+        ("Cafeteira Elétrica", "Faz café coado"),
+        ("Chá Verde", "Sem cafeína"),
+    ]
+    for name, description in products:
+        response = client.post(
+            "/api/v1/products/",
+            json={"name": name, "description": description, "price": "20.00", "stock": 5},
+        )
+        assert response.status_code == 201
+
+    names = {p["name"] for p in client.get("/api/v1/products/", params={"search": "cafe"}).json()["data"]}
+    assert names == {"Café Especial", "Caneca", "Cafeteira Elétrica", "Chá Verde"}
+
+    response = client.get("/api/v1/products/", params={"search": "eletrica"})
+    assert [p["name"] for p in response.json()["data"]] == ["Cafeteira Elétrica"]
+    assert response.json()["meta"]["totalItems"] == 1
+
+    # Relevância + cursor: percorrer de 1 em 1 devolve a mesma ordem da página cheia
+    params = {"search": "cafe especial", "sortBy": "relevance"}
+    full = [p["name"] for p in client.get("/api/v1/products/", params=params).json()["data"]]
+    assert full[0] == "Café Especial"
+
+    walked, cursor = [], None
+    while True:
+        query = {**params, "limit": 1, **({"cursor": cursor} if cursor else {})}
+        body = client.get("/api/v1/products/", params=query).json()
+        walked += [p["name"] for p in body["data"]]
+        cursor = body["meta"]["nextCursor"]
+        if not cursor:
+            break
+    assert walked == full
+
+    # Texto sem nenhum termo pesquisável não quebra a consulta
+    assert client.get("/api/v1/products/", params={"search": "!!"}).json()["data"] == []
+
+    # Índice acompanha updates (trigger do FTS5)
+    product_id = client.get("/api/v1/products/", params={"search": "cha"}).json()["data"][0]["id"]
+    client.patch(f"/api/v1/products/{product_id}", json={"name": "Mate Gelado"})
+    assert client.get("/api/v1/products/", params={"search": "mate"}).json()["data"][0]["id"] == product_id
@@ -0,0 +1,49 @@
+# Em: tests/test_06_final_price.py
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+from sqlmodel import Session
+
+from models.product_model import Product
+from services.final_price_check import find_final_price_mismatches
+
+
+def test_price_filters_and_sorting_use_final_price(client: TestClient, session: Session):
+    ids = {}
+    for name, price in [("Mesa", "200.00"), ("Cadeira", "120.00"), ("Banco", "90.00")]:
+        response = client.post("/api/v1/products/", json={"name": name, "price": price, "stock": 3})
+        ids[name] = response.json()["id"]
+
+    # Mesa: 200 - 50% = 100, fica abaixo da Cadeira pelo preço efetivo
+    assert client.post(f"/api/v1/products/{ids['Mesa']}/discount/percent", json={"value": 50}).status_code == 200
+
+    now = datetime.utcnow()
+    client.post("/api/v1/coupons/", json={
+        "code": "menos100", "type": "fixed", "value": 100,
+        "valid_from": (now - timedelta(days=1)).isoformat(), "valid_until": (now + timedelta(days=1)).isoformat(),
+    })
+    # Banco: 90 - 100 fica no piso de 0.01
+    assert client.post(f"/api/v1/products/{ids['Banco']}/discount/coupon", json={"code": "menos100"}).status_code == 200
+
+    body = client.get("/api/v1/products/", params={"sortBy": "final_price", "sortOrder": "asc"}).json()
+    assert [(p["name"], p["final_price"]) for p in body["data"]] == [
+        ("Banco", "0.01"), ("Mesa", "100.00"), ("Cadeira", "120.00"),
+    ]
+
+    body = client.get("/api/v1/products/", params={"minPrice": 50, "maxPrice": 110}).json()
+    assert [p["name"] for p in body["data"]] == ["Mesa"]
+
+    # Alterar o preço base recalcula o valor persistido
+    client.patch(f"/api/v1/products/{ids['Mesa']}", json={"price": "300.00"})
+    assert session.get(Product, ids["Mesa"]).final_price == Decimal("150.00")
+
+    # O verificador encontra (e corrige) valores adulterados fora do ORM
+    assert find_final_price_mismatches(session) == []
+    session.exec(update(Product).where(Product.id == ids["Cadeira"]).values(final_price=Decimal("1.00")))
+    session.commit()
+    mismatches = find_final_price_mismatches(session, batch_size=1, fix=True)
+    assert [(m.product_id, m.expected) for m in mismatches] == [(ids["Cadeira"], Decimal("120.00"))]
+    assert find_final_price_mismatches(session) == []
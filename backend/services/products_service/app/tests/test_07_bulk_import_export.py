@@ -0,0 +1,105 @@
+# Em: tests/test_07_bulk_import_export.py
+
+import csv
+import io
+import json
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, text
+
+
+def test_bulk_import_csv_and_ndjson_with_row_errors(client: TestClient):
+    csv_body = (
+        "name,description,price,stock\n"
+        'Parafuso,"Aço inox,\nrosca fina",0.50,1000\n'
+        "Porca,,0.30,abc\n"
+        "Arruela,Zincada,0.10,500\n"
+        "Quebrada,1,2\n"
+    )
+    response = client.post("/api/v1/products/bulk", content=csv_body, headers={"Content-Type": "text/csv"})
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary["processed"] == 4
+    assert summary["upserted"] == 2
+    assert [error["line"] for error in summary["errors"]] == [4, 6]
+
+    # Produto já existente com desconto: o upsert atualiza o preço e recalcula o final_price
+    parafuso = client.get("/api/v1/products/", params={"search": "parafuso"}).json()["data"][0]
+    assert parafuso["description"] == "Aço inox,\nrosca fina"
+    client.post(f"/api/v1/products/{parafuso['id']}/discount/percent", json={"value": 10})
+
+    ndjson_body = "\n".join([
+        json.dumps({"name": "Parafuso", "description": "Novo", "price": "1.00", "stock": 10}),
+        "{quebrado",
+        json.dumps({"name": "Bucha", "price": "0.25", "stock": 80}),
+    ])
+    response = client.post(
+        "/api/v1/products/bulk", content=ndjson_body, headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.json()["upserted"] == 2
+    assert response.json()["errors"][0]["line"] == 2
+
+    body = client.get("/api/v1/products/", params={"sortBy": "name", "sortOrder": "asc"}).json()
+    assert body["meta"]["totalItems"] == 3
+    parafuso = next(p for p in body["data"] if p["name"] == "Parafuso")
+    assert parafuso["price"] == "1.00"
+    assert parafuso["final_price"] == "0.90"
+    assert parafuso["discount"]["type"] == "percent"
+    assert client.get("/api/v1/products/", params={"maxPrice": 0.95, "sortBy": "name", "sortOrder": "asc"}).json()[
+        "data"
+    ][-1]["name"] == "Parafuso"
+
+    assert client.post("/api/v1/products/bulk", content="x", headers={"Content-Type": "text/plain"}).status_code == 415
+
+
+def test_bulk_import_restores_soft_deleted_products(client: TestClient):
+    product_id = client.post("/api/v1/products/", json={"name": "Martelo", "price": "40.00", "stock": 2}).json()["id"]
+    assert client.delete(f"/api/v1/products/{product_id}").status_code == 204
+    assert client.get("/api/v1/products/").json()["data"] == []
+
+    body = "name,price,stock\nMartelo,45.00,7\nSerrote,30.00,1\n"
+    summary = client.post("/api/v1/products/bulk", content=body, headers={"Content-Type": "text/csv"}).json()
+    assert (summary["upserted"], summary["restored"], summary["failed"]) == (2, 1, 0)
+
+    # A linha volta ao catálogo com os dados importados, e não fica escondida
+    martelo = client.get(f"/api/v1/products/{product_id}").json()
+    assert (martelo["price"], martelo["stock"]) == ("45.00", 7)
+    assert sorted(row["name"] for row in client.get("/api/v1/products/").json()["data"]) == ["Martelo", "Serrote"]
+
+
+def test_export_streams_whole_catalog(client: TestClient):
+    lines = [json.dumps({"name": f"Item {i:03d}", "price": "9.90", "stock": i}) for i in range(25)]
+    client.post("/api/v1/products/bulk", content="\n".join(lines), headers={"Content-Type": "application/x-ndjson"})
+    deleted_id = client.get("/api/v1/products/", params={"limit": 1}).json()["data"][0]["id"]
+    client.delete(f"/api/v1/products/{deleted_id}")
+
+    response = client.get("/api/v1/products/export", params={"format": "ndjson"})
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == 24
+    assert rows[0]["price"] == "9.90"
+
+    response = client.get("/api/v1/products/export", params={"format": "csv", "includeDeleted": True})
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 25
+    assert {row["name"] for row in rows} == {f"Item {i:03d}" for i in range(25)}
+
+
+def test_bulk_import_reports_only_the_rows_the_database_rejects(client: TestClient, session: Session):
+    # Uma restrição que só o banco conhece (como a precisão de uma coluna no Postgres)
+    session.exec(text(
+        "CREATE TRIGGER product_rejects_name BEFORE INSERT ON product WHEN NEW.name = 'Recusado' "
+        "BEGIN SELECT RAISE(ABORT, 'nome recusado'); END"
+    ))
+    session.commit()
+
+    body = "name,price,stock\n" + "".join(
+        f"{'Recusado' if i == 3 else f'Item {i}'},1.00,1\n" for i in range(6)
+    )
+    summary = client.post("/api/v1/products/bulk", content=body, headers={"Content-Type": "text/csv"}).json()
+    assert (summary["upserted"], summary["failed"]) == (5, 1)
+    # Cabeçalho na linha 1: a quarta linha de dados é a 5
+    assert [error["line"] for error in summary["errors"]] == [5]
+    assert summary["errors"][0]["errors"].startswith("Recusada pelo banco")
+    assert client.get("/api/v1/products/", params={"count": "exact"}).json()["meta"]["totalItems"] == 5
@@ -0,0 +1,45 @@
+# Em: tests/test_08_batch_mapping.py
+
+import random
+from datetime import datetime
+from decimal import Decimal
+
+from core.utils import map_product_to_read_schema, map_products_to_read_rows
+from models.product_model import CouponType, Product
+from schemas.product_schemas import ProductRead
+
+
+def _product(i, price, discount_type=None, discount_value=None, stock=5):
+    return Product(
+        id=i, name=f"P{i}", price=Decimal(price), stock=stock, created_at=datetime(2024, 1, 1),
+        discount_type=discount_type, discount_value=None if discount_value is None else Decimal(discount_value),
+    )
+
+
+def test_batch_mapper_matches_per_row_mapper():
+    """O caminho em centavos inteiros precisa bater exatamente com o Decimal + ROUND_HALF_UP."""
+    products = [
+        _product(1, "0.05", CouponType.percent, "50.00"),   # 0.025 -> 0.03 (empate arredonda para cima)
+        _product(2, "10.00", CouponType.fixed, "15.00"),    # negativo -> piso de 0.01
+        _product(3, "33.33", CouponType.percent, "33.00"),  # 22.3311 -> 22.33
+        _product(4, "12.50", stock=0),                      # sem desconto, fora de estoque
+        _product(5, "99.99", CouponType.percent, "12.345"), # mais de 2 casas: cai no caminho Decimal
+    ]
+    rng = random.Random(7)
+    for i in range(6, 3000):
+        discount_type = rng.choice([None, CouponType.percent, CouponType.fixed])
+        value = None
+        if discount_type == CouponType.percent:
+            value = str(Decimal(rng.randint(1, 8000)).scaleb(-2))
+        elif discount_type == CouponType.fixed:
+            value = str(Decimal(rng.randint(1, 100000)).scaleb(-2))
+        products.append(_product(i, str(Decimal(rng.randint(1, 100000)).scaleb(-2)), discount_type, value, rng.randint(0, 2)))
+
+    rows = map_products_to_read_rows(products)
+    for product, row in zip(products, rows):
+        expected = map_product_to_read_schema(product)
+        assert ProductRead.model_validate(row).model_dump_json() == expected.model_dump_json()
+
+    assert rows[0]["final_price"] == Decimal("0.03")
+    assert rows[1]["final_price"] == Decimal("0.01")
+    assert rows[3]["is_out_of_stock"] is True
@@ -0,0 +1,184 @@
+# Em: tests/test_09_read_cache.py
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from core import cache
+from core.cache import CachedResponse, MemoryCacheBackend, RedisCacheBackend, ResponseCache, response_cache
+from core.invalidation import WriteSet
+
+
+@pytest.fixture(name="statements")
+def statements_fixture(async_engine):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+
+def _create_coupon(client: TestClient, code: str):
+    valid_from = datetime.utcnow() - timedelta(days=1)
+    response = client.post("/api/v1/coupons/", json={
+        "code": code, "type": "percent", "value": 10, "one_shot": False,
+        "valid_from": valid_from.isoformat(), "valid_until": (valid_from + timedelta(days=30)).isoformat(),
+    })
+    assert response.status_code == 201
+
+
+def test_product_reads_are_cached_and_invalidated_on_writes(client: TestClient, statements):
+    product_id = client.post("/api/v1/products/", json={"name": "Caneta", "price": "10.00", "stock": 5}).json()["id"]
+
+    first = client.get(f"/api/v1/products/{product_id}")
+    statements.clear()
+    second = client.get(f"/api/v1/products/{product_id}")
+    # O acerto no cache não toca o banco e devolve exatamente o mesmo corpo
+    assert statements == []
+    assert second.status_code == 200
+    assert second.content == first.content
+    assert second.json()["final_price"] == "10.00"
+
+    assert client.patch(f"/api/v1/products/{product_id}", json={"price": "20.00"}).status_code == 200
+    assert client.get(f"/api/v1/products/{product_id}").json()["final_price"] == "20.00"
+
+    assert client.post(f"/api/v1/products/{product_id}/discount/percent", json={"value": 50}).status_code == 200
+    assert client.get(f"/api/v1/products/{product_id}").json()["final_price"] == "10.00"
+
+    assert client.delete(f"/api/v1/products/{product_id}/discount").status_code == 204
+    assert client.get(f"/api/v1/products/{product_id}").json()["discount"] is None
+
+    assert client.delete(f"/api/v1/products/{product_id}").status_code == 204
+    assert client.get(f"/api/v1/products/{product_id}").status_code == 404
+
+    stats = client.get("/metrics/cache").json()
+    assert stats["backend"] == "memory"
+    assert stats["hits"] >= 1
+    assert stats["invalidations"] >= 4
+
+
+def test_coupon_reads_are_cached_and_invalidated(client: TestClient, statements):
+    _create_coupon(client, "PROMO10")
+    assert client.get("/api/v1/coupons/promo10").json()["value"] == "10.00"
+
+    statements.clear()
+    assert client.get("/api/v1/coupons/PROMO10").status_code == 200
+    assert statements == []
+
+    assert client.patch("/api/v1/coupons/promo10", json={"value": 15}).json()["value"] == "15.00"
+    assert client.get("/api/v1/coupons/promo10").json()["value"] == "15.00"
+
+    assert client.delete("/api/v1/coupons/promo10").status_code == 204
+    assert client.get("/api/v1/coupons/promo10").status_code == 404
+
+
+def test_bulk_import_invalidates_all_products(client: TestClient):
+    product_id = client.post("/api/v1/products/", json={"name": "Lápis", "price": "2.00", "stock": 1}).json()["id"]
+    assert client.get(f"/api/v1/products/{product_id}").json()["stock"] == 1
+
+    body = "name,price,stock\nLápis,2.00,40\n"
+    assert client.post("/api/v1/products/bulk", content=body, headers={"Content-Type": "text/csv"}).status_code == 200
+    assert client.get(f"/api/v1/products/{product_id}").json()["stock"] == 40
+
+
+def test_memory_backend_counts_evictions_and_expirations():
+    async def scenario():
+        backend = MemoryCacheBackend(max_entries=2)
+        local_cache = ResponseCache(backend, ttl_seconds=60)
+        for key in ("product:1", "product:2", "product:3"):
+            await local_cache.set(key, CachedResponse('"v1"', b"{}"), await local_cache.begin_read())
+        assert await local_cache.get("product:1") is None
+        assert await local_cache.get("product:3") == CachedResponse('"v1"', b"{}")
+        assert backend.evictions == 1
+
+        await backend.set("product:4", b"{}", ttl_seconds=0)
+        assert await local_cache.get("product:4") is None
+        assert backend.expirations == 1
+
+        # Leitura que começou antes de uma escrita não pode gravar o valor antigo
+        token = await local_cache.begin_read()
+        local_cache.invalidate(WriteSet(tables={"product"}, rows={"product": [{"id": 5}]}))
+        await local_cache.set("product:5", CachedResponse('"v1"', b"velho"), token)
+        assert await local_cache.get("product:5") is None
+        return local_cache.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["hits"] == 1
+    assert stats["staleWritesSkipped"] == 1
+
+
+class FakeRedis:
+    """Substituto em memória com a mesma interface assíncrona do redis-py usada pelo backend."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, name):
+        return self.data.get(name)
+
+    async def set(self, name, value, ex=None):
+        self.data[name] = value
+
+    async def incr(self, name):
+        self.data[name] = str(int(self.data.get(name, 0)) + 1).encode()
+        return int(self.data[name])
+
+    async def eval(self, script, numkeys, key, generation_key, value, ex, generation):
+        # Só o script de RedisCacheBackend.set: grava se a geração não mudou
+        assert script == RedisCacheBackend.SET_IF_GENERATION and numkeys == 2
+        if (self.data.get(generation_key) or b"").decode() != generation:
+            return 0
+        self.data[key] = value
+        return 1
+
+    async def delete(self, *names):
+        for name in names:
+            self.data.pop(name, None)
+
+    async def scan_iter(self, match):
+        prefix = match.rstrip("*")
+        for name in list(self.data):
+            if name.startswith(prefix):
+                yield name
+
+
+def test_redis_protocol_backend(client: TestClient, monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(response_cache, "backend", RedisCacheBackend(fake))
+
+    product_id = client.post("/api/v1/products/", json={"name": "Régua", "price": "5.00", "stock": 3}).json()["id"]
+    client.get(f"/api/v1/products/{product_id}")
+    assert f"products-service:{cache.product_cache_key(product_id)}" in fake.data
+
+    # A invalidação roda dentro do commit da sessão assíncrona
+    assert client.patch(f"/api/v1/products/{product_id}", json={"stock": 9}).status_code == 200
+    assert fake.data == {"products-service:generation": b"2"}
+    assert client.get(f"/api/v1/products/{product_id}").json()["stock"] == 9
+    assert client.get("/metrics/cache").json()["backend"] == "redis"
+
+
+def test_redis_backend_refuses_reads_older_than_another_workers_write():
+    async def scenario():
+        fake = FakeRedis()
+        reader = ResponseCache(RedisCacheBackend(fake), ttl_seconds=60)
+        writer = ResponseCache(RedisCacheBackend(fake), ttl_seconds=60)
+
+        # O worker A lê do banco; o B confirma uma escrita e invalida antes de A gravar
+        token = await reader.begin_read()
+        writer.invalidate(WriteSet(tables={"product"}, rows={"product": [{"id": 7}]}))
+        await asyncio.sleep(0)
+        await reader.set("product:7", CachedResponse('"v1"', b"velho"), token)
+        assert await writer.get("product:7") is None
+        assert reader.stale_writes_skipped == 1
+
+        # Uma leitura que começa depois da escrita volta a gravar
+        await reader.set("product:7", CachedResponse('"v2"', b"novo"), await reader.begin_read())
+        assert await writer.get("product:7") == CachedResponse('"v2"', b"novo")
+
+    asyncio.run(scenario())
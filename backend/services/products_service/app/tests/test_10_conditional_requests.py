@@ -0,0 +1,94 @@
+# Em: tests/test_10_conditional_requests.py
+
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+
+def test_product_etag_not_modified_and_if_match(client: TestClient):
+    product_id = client.post("/api/v1/products/", json={"name": "Caneta", "price": "10.00", "stock": 5}).json()["id"]
+
+    response = client.get(f"/api/v1/products/{product_id}")
+    etag = response.headers["etag"]
+    assert etag == f'"product-{product_id}-1"'
+    assert response.headers["cache-control"] == "no-cache"
+
+    # Duas vezes: a segunda vem do cache de leituras, o ETag tem que ser o mesmo
+    for _ in range(2):
+        not_modified = client.get(f"/api/v1/products/{product_id}", headers={"If-None-Match": etag})
+        assert not_modified.status_code == 304
+        assert not_modified.content == b""
+        assert not_modified.headers["etag"] == etag
+
+    # If-Match com um ETag velho não altera nada
+    stale = client.patch(f"/api/v1/products/{product_id}", json={"stock": 1}, headers={"If-Match": '"product-1-99"'})
+    assert stale.status_code == 412
+
+    updated = client.patch(f"/api/v1/products/{product_id}", json={"stock": 7}, headers={"If-Match": etag})
+    assert updated.status_code == 200
+    new_etag = updated.headers["etag"]
+    assert new_etag == f'"product-{product_id}-2"'
+
+    # Quem ainda tem o ETag antigo recebe o corpo novo; o antigo já não vale para If-Match
+    fresh = client.get(f"/api/v1/products/{product_id}", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.json()["stock"] == 7
+    assert client.patch(f"/api/v1/products/{product_id}", json={"stock": 8}, headers={"If-Match": etag}).status_code == 412
+
+    # Mudanças de desconto também mudam a versão
+    client.post(f"/api/v1/products/{product_id}/discount/percent", json={"value": 10})
+    assert client.get(f"/api/v1/products/{product_id}", headers={"If-None-Match": new_etag}).status_code == 200
+
+
+def test_list_etag_skips_row_queries(client: TestClient, async_engine):
+    client.post("/api/v1/products/", json={"name": "Lápis", "price": "2.00", "stock": 1})
+    params = {"limit": 5, "sortBy": "name", "sortOrder": "asc"}
+    etag = client.get("/api/v1/products/", params=params).headers["etag"]
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    # Ordem dos parâmetros não importa
+    reordered = {"sortOrder": "asc", "sortBy": "name", "limit": 5}
+    response = client.get("/api/v1/products/", params=reordered, headers={"If-None-Match": etag})
+    event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+    assert response.status_code == 304
+    # Só a leitura da versão da coleção
+    assert len(statements) == 1
+    assert "collection_version" in statements[0]
+
+    # Outros parâmetros, outro ETag
+    assert client.get("/api/v1/products/", params={"limit": 6}, headers={"If-None-Match": etag}).status_code == 200
+
+    # Qualquer escrita na tabela (inclusive em massa) muda a versão da coleção
+    client.post("/api/v1/products/", json={"name": "Borracha", "price": "1.00", "stock": 1})
+    changed = client.get("/api/v1/products/", params=params, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    etag = changed.headers["etag"]
+    body = "name,price,stock\nLápis,3.00,1\n"
+    client.post("/api/v1/products/bulk", content=body, headers={"Content-Type": "text/csv"})
+    assert client.get("/api/v1/products/", params=params, headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_coupon_etags(client: TestClient):
+    now = datetime.utcnow()
+    client.post("/api/v1/coupons/", json={
+        "code": "promo20", "type": "percent", "value": 20,
+        "valid_from": (now - timedelta(days=1)).isoformat(), "valid_until": (now + timedelta(days=1)).isoformat(),
+    })
+    etag = client.get("/api/v1/coupons/promo20").headers["etag"]
+    assert client.get("/api/v1/coupons/promo20", headers={"If-None-Match": etag}).status_code == 304
+
+    list_etag = client.get("/api/v1/coupons/").headers["etag"]
+    assert client.get("/api/v1/coupons/", headers={"If-None-Match": list_etag}).status_code == 304
+
+    assert client.patch("/api/v1/coupons/promo20", json={"value": 25}, headers={"If-Match": '"x"'}).status_code == 412
+    updated = client.patch("/api/v1/coupons/promo20", json={"value": 25}, headers={"If-Match": etag})
+    assert updated.status_code == 200
+    assert updated.headers["etag"] != etag
+    assert client.get("/api/v1/coupons/", headers={"If-None-Match": list_etag}).status_code == 200
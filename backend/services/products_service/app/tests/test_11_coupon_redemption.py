@@ -0,0 +1,76 @@
+# Em: tests/test_11_coupon_redemption.py
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from models.coupon_redemption_model import CouponRedemption
+from models.product_model import Product
+
+CONCURRENT_APPLICATIONS = 400
+
+
+def _create_coupon(client: TestClient, code: str, one_shot: bool):
+    now = datetime.utcnow()
+    response = client.post("/api/v1/coupons/", json={
+        "code": code, "type": "fixed", "value": 5, "one_shot": one_shot,
+        "valid_from": (now - timedelta(days=1)).isoformat(), "valid_until": (now + timedelta(days=1)).isoformat(),
+    })
+    assert response.status_code == 201
+
+
+def _create_products(client: TestClient, count: int):
+    body = "name,price,stock\n" + "".join(f"Produto {i},50.00,10\n" for i in range(count))
+    response = client.post("/api/v1/products/bulk", content=body, headers={"Content-Type": "text/csv"})
+    assert response.json()["upserted"] == count
+
+
+def test_one_shot_coupon_is_consumed_exactly_once_under_concurrency(client: TestClient, session: Session):
+    _create_coupon(client, "relampago", one_shot=True)
+    _create_coupon(client, "geral10", one_shot=False)
+    _create_products(client, CONCURRENT_APPLICATIONS)
+    product_ids = session.exec(select(Product.id).order_by(Product.id)).all()
+
+    # Metade dos produtos disputa o cupom de uso único; a outra metade usa um cupom comum
+    def apply(index_and_id):
+        index, product_id = index_and_id
+        code = "relampago" if index % 2 == 0 else "geral10"
+        response = client.post(f"/api/v1/products/{product_id}/discount/coupon", json={"code": code})
+        return code, response.status_code
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(apply, enumerate(product_ids)))
+
+    one_shot = [status for code, status in results if code == "relampago"]
+    assert one_shot.count(200) == 1
+    assert one_shot.count(409) == len(one_shot) - 1
+    # O cupom comum não é afetado pela disputa
+    assert all(status == 200 for code, status in results if code == "geral10")
+
+    coupon = client.get("/api/v1/coupons/relampago").json()
+    assert coupon["redeemed_at"] is not None
+    assert client.get("/api/v1/coupons/geral10").json()["redeemed_at"] is None
+
+    session.expire_all()
+    redemptions = session.exec(select(CouponRedemption)).all()
+    assert len(redemptions) == CONCURRENT_APPLICATIONS // 2 + 1
+    discounted = session.exec(select(Product).where(Product.coupon_id != None)).all()
+    assert len(discounted) == CONCURRENT_APPLICATIONS // 2 + 1
+
+
+def test_failed_application_releases_one_shot_coupon(client: TestClient):
+    _create_coupon(client, "unico", one_shot=True)
+    first = client.post("/api/v1/products/", json={"name": "A", "price": "10.00", "stock": 1}).json()["id"]
+    second = client.post("/api/v1/products/", json={"name": "B", "price": "10.00", "stock": 1}).json()["id"]
+
+    # O produto já tem desconto: a aplicação falha antes de consumir o cupom
+    client.post(f"/api/v1/products/{first}/discount/percent", json={"value": 10})
+    assert client.post(f"/api/v1/products/{first}/discount/coupon", json={"code": "unico"}).status_code == 409
+    assert client.get("/api/v1/coupons/unico").json()["redeemed_at"] is None
+
+    assert client.post(f"/api/v1/products/{second}/discount/coupon", json={"code": "unico"}).status_code == 200
+    # Remover o desconto não devolve o uso
+    assert client.delete(f"/api/v1/products/{second}/discount").status_code == 204
+    assert client.post(f"/api/v1/products/{second}/discount/coupon", json={"code": "unico"}).status_code == 409
@@ -0,0 +1,90 @@
+# Em: tests/test_12_batch_discounts.py
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from core.utils import calculate_final_price
+from models.coupon_redemption_model import CouponRedemption
+from models.product_model import Product
+
+
+def _create_product(client: TestClient, name: str, price: str) -> int:
+    return client.post("/api/v1/products/", json={"name": name, "price": price, "stock": 3}).json()["id"]
+
+
+def _create_coupon(client: TestClient, code: str, coupon_type: str, value: int, one_shot: bool = False):
+    now = datetime.utcnow()
+    response = client.post("/api/v1/coupons/", json={
+        "code": code, "type": coupon_type, "value": value, "one_shot": one_shot,
+        "valid_from": (now - timedelta(days=1)).isoformat(), "valid_until": (now + timedelta(days=1)).isoformat(),
+    })
+    assert response.status_code == 201
+
+
+def test_batch_percent_by_ids_reports_conflicts_and_skips(client: TestClient, session: Session):
+    cheap = _create_product(client, "Borracha", "10.00")
+    odd = _create_product(client, "Caneta", "19.99")
+    discounted = _create_product(client, "Lápis", "4.00")
+    deleted = _create_product(client, "Régua", "6.00")
+    client.post(f"/api/v1/products/{discounted}/discount/percent", json={"value": 10})
+    client.delete(f"/api/v1/products/{deleted}")
+    # Lê antes para o cache de leituras ter a versão sem desconto
+    client.get(f"/api/v1/products/{cheap}")
+
+    response = client.post("/api/v1/products/discounts/apply", json={
+        "productIds": [cheap, odd, discounted, deleted, 9999, cheap], "percent": 15,
+    })
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary["matched"] == 5
+    assert summary["applied"] == 2
+    assert summary["conflictedIds"] == [discounted]
+    assert sorted(summary["skippedIds"]) == [deleted, 9999]
+
+    # Mesmo resultado de 'calculate_final_price' e caches invalidados
+    assert client.get(f"/api/v1/products/{cheap}").json()["final_price"] == "8.50"
+    assert client.get(f"/api/v1/products/{odd}").json()["final_price"] == "16.99"
+    for product in session.exec(select(Product).where(Product.id.in_([cheap, odd]))).all():
+        assert product.final_price == calculate_final_price(product)[0]
+        assert product.version == 2
+
+
+def test_batch_coupon_by_filter_and_batch_removal(client: TestClient, session: Session):
+    ids = [_create_product(client, f"Caderno {i}", price) for i, price in enumerate(["90.00", "150.00", "300.00"])]
+    _create_product(client, "Mochila", "120.00")
+    _create_coupon(client, "menos100", "fixed", 100)
+
+    response = client.post("/api/v1/products/discounts/apply", json={
+        "filter": {"search": "Caderno", "maxPrice": 200}, "couponCode": "MENOS100",
+    })
+    assert response.json()["applied"] == 2
+
+    # Piso de 0.01 no preço final
+    data = client.get(f"/api/v1/products/{ids[0]}").json()
+    assert data["final_price"] == "0.01"
+    assert data["discount"]["type"] == "fixed"
+    assert client.get(f"/api/v1/products/{ids[1]}").json()["final_price"] == "50.00"
+    assert client.get(f"/api/v1/products/{ids[2]}").json()["discount"] is None
+    assert len(session.exec(select(CouponRedemption)).all()) == 2
+
+    removed = client.post("/api/v1/products/discounts/remove", json={"filter": {"search": "Caderno"}}).json()
+    assert removed["applied"] == 2
+    assert removed["skipped"] == 1
+    data = client.get(f"/api/v1/products/{ids[0]}").json()
+    assert data["discount"] is None
+    assert Decimal(data["final_price"]) == Decimal("90.00")
+
+
+def test_batch_validation(client: TestClient):
+    _create_coupon(client, "unico", "percent", 10, one_shot=True)
+    product_id = _create_product(client, "Estojo", "20.00")
+    url = "/api/v1/products/discounts/apply"
+
+    assert client.post(url, json={"productIds": [product_id]}).status_code == 422
+    assert client.post(url, json={"productIds": [product_id], "filter": {}, "percent": 10}).status_code == 422
+    assert client.post(url, json={"productIds": [product_id], "percent": 90}).status_code == 422
+    assert client.post(url, json={"productIds": [product_id], "couponCode": "naoexiste"}).status_code == 404
+    assert client.post(url, json={"productIds": [product_id], "couponCode": "unico"}).status_code == 400
@@ -0,0 +1,97 @@
+# Em: tests/test_13_coupon_expiry.py
+
+import asyncio
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.coupon_model import Coupon
+from models.product_model import Product
+from services.coupon_expiry import sweep_metrics, sweep_once
+
+
+def _create_coupon(client: TestClient, code: str):
+    now = datetime.utcnow()
+    response = client.post("/api/v1/coupons/", json={
+        "code": code, "type": "percent", "value": 20,
+        "valid_from": (now - timedelta(days=1)).isoformat(), "valid_until": (now + timedelta(days=1)).isoformat(),
+    })
+    assert response.status_code == 201
+
+
+def _apply(client: TestClient, code: str, names):
+    ids = []
+    for name in names:
+        product_id = client.post("/api/v1/products/", json={"name": name, "price": "100.00", "stock": 1}).json()["id"]
+        assert client.post(f"/api/v1/products/{product_id}/discount/coupon", json={"code": code}).status_code == 200
+        ids.append(product_id)
+    return ids
+
+
+def _sweep(async_engine, now=None) -> bool:
+    session_factory = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+    return asyncio.run(sweep_once(session_factory, async_engine, now=now))
+
+
+def test_sweep_clears_expired_and_deleted_coupons(client: TestClient, session: Session, async_engine):
+    _create_coupon(client, "vencido")
+    _create_coupon(client, "apagado")
+    _create_coupon(client, "valido")
+    expired_ids = _apply(client, "vencido", ["A", "B", "C"])
+    deleted_ids = _apply(client, "apagado", ["D"])
+    valid_ids = _apply(client, "valido", ["E"])
+    # Coloca no cache a versão com desconto
+    assert client.get(f"/api/v1/products/{expired_ids[0]}").json()["discount"] is not None
+
+    # Simula o vencimento (a API não aceita criar cupons já vencidos)
+    session.exec(update(Coupon).where(Coupon.code == "vencido").values(valid_until=datetime.utcnow() - timedelta(hours=1)))
+    session.commit()
+    assert client.delete("/api/v1/coupons/apagado").status_code == 204
+
+    # Antes da varredura: o cupom vencido já passou da folga e está atrasado
+    assert client.get("/metrics/coupon-sweep").json()["lagSeconds"] > 3000
+
+    released_before = sweep_metrics.coupons_released_total
+    # O cupom deletado agora ainda está dentro da folga: fica para a próxima rodada
+    assert _sweep(async_engine) is True
+    assert sweep_metrics.coupons_released_total == released_before + 1
+    for product_id in expired_ids:
+        data = client.get(f"/api/v1/products/{product_id}").json()
+        assert data["discount"] is None
+        assert data["final_price"] == "100.00"
+    assert client.get(f"/api/v1/products/{deleted_ids[0]}").json()["discount"] is not None
+
+    later = datetime.utcnow() + timedelta(minutes=5)
+    _sweep(async_engine, now=later)
+    assert client.get(f"/api/v1/products/{deleted_ids[0]}").json()["discount"] is None
+    assert client.get(f"/api/v1/products/{valid_ids[0]}").json()["discount"] is not None
+    assert client.get("/metrics/coupon-sweep").json()["lagSeconds"] == 0
+
+    # Idempotente: outra rodada não encontra nada para fazer
+    cleared = sweep_metrics.products_cleared_total
+    _sweep(async_engine, now=later)
+    assert sweep_metrics.products_cleared_total == cleared
+
+    session.expire_all()
+    assert session.exec(select(Product).where(Product.coupon_id != None)).all()[0].id == valid_ids[0]
+
+
+def test_extending_validity_puts_coupon_back_under_watch(client: TestClient, session: Session, async_engine):
+    _create_coupon(client, "renovado")
+    session.exec(update(Coupon).where(Coupon.code == "renovado").values(valid_until=datetime.utcnow() - timedelta(hours=1)))
+    session.commit()
+    _sweep(async_engine)
+    session.expire_all()
+    assert session.exec(select(Coupon).where(Coupon.code == "renovado")).one().discounts_released_at is not None
+
+    now = datetime.utcnow()
+    response = client.patch("/api/v1/coupons/renovado", json={
+        "valid_from": (now - timedelta(days=1)).isoformat(), "valid_until": (now + timedelta(days=2)).isoformat(),
+    })
+    assert response.status_code == 200
+    session.expire_all()
+    assert session.exec(select(Coupon).where(Coupon.code == "renovado")).one().discounts_released_at is None
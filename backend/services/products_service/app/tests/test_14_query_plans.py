@@ -0,0 +1,98 @@
+# Em: tests/test_14_query_plans.py
+
+import os
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, text
+from sqlmodel import Session
+
+from models.coupon_model import Coupon
+from models.product_model import Product, ProductSortBy
+
+# O padrão mantém a suíte rápida; para reproduzir o cenário de produção rode com
+# QUERY_PLAN_ROWS=1000000 (o planejador escolhe os mesmos índices)
+SEED_ROWS = int(os.environ.get("QUERY_PLAN_ROWS", "20000"))
+INDEXED_SORTS = [sort for sort in ProductSortBy if sort not in (ProductSortBy.id, ProductSortBy.relevance)]
+
+
+def _seed(session: Session):
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    rows = []
+    for i in range(SEED_ROWS):
+        price = Decimal(rng.randint(100, 100_000)) / 100
+        rows.append({
+            "name": f"Produto {i:07d}", "price": price, "final_price": price, "stock": rng.randint(0, 500),
+            "created_at": start + timedelta(seconds=i), "version": 1,
+            # ~10% deletados: ficam fora dos índices parciais
+            "deleted_at": start if i % 10 == 0 else None,
+        })
+    session.connection().execute(Product.__table__.insert(), rows)
+    session.connection().execute(Coupon.__table__.insert(), [{
+        "code": f"cupom{i:06d}", "type": "fixed", "value": Decimal("1.00"), "one_shot": False,
+        "valid_from": start, "valid_until": start + timedelta(days=365), "created_at": start + timedelta(seconds=i),
+        "deleted_at": start if i % 10 == 0 else None, "version": 1,
+    } for i in range(SEED_ROWS // 10)])
+    session.commit()
+    # Estatísticas para o planejador, como o autovacuum faria no Postgres
+    session.connection().execute(text("ANALYZE"))
+    session.commit()
+
+
+@pytest.fixture(name="plans")
+def plans_fixture(client: TestClient, session: Session, async_engine):
+    """Devolve uma função que faz a requisição e o EXPLAIN QUERY PLAN da consulta da página."""
+    _seed(session)
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and "ORDER BY" in statement:
+            captured.append((statement, parameters))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+
+    def request(url: str, params: dict):
+        captured.clear()
+        response = client.get(url, params=params)
+        assert response.status_code == 200, response.text
+        statement, parameters = captured[-1]
+        rows = session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", tuple(parameters)).all()
+        return response.json(), " | ".join(row[-1] for row in rows)
+
+    yield request
+    event.remove(async_engine.sync_engine, "before_cursor_execute", capture)
+
+
+def test_every_sort_uses_its_partial_index(plans):
+    for sort in INDEXED_SORTS:
+        for order in ("asc", "desc"):
+            params = {"limit": 20, "count": "none", "sortBy": sort.value, "sortOrder": order}
+            first, plan = plans("/api/v1/products/", params)
+            assert f"ix_product_active_{sort.value}_id" in plan, (sort, plan)
+            assert "TEMP B-TREE" not in plan, (sort, plan)
+
+            # A página seguinte (seek pelo cursor) continua no mesmo índice
+            _, plan = plans("/api/v1/products/", {**params, "cursor": first["meta"]["nextCursor"]})
+            assert f"ix_product_active_{sort.value}_id" in plan, (sort, plan)
+            assert "TEMP B-TREE" not in plan, (sort, plan)
+
+
+def test_id_sort_and_coupon_listing_avoid_sorting(plans):
+    _, plan = plans("/api/v1/products/", {"limit": 20, "count": "none", "sortBy": "id"})
+    assert "TEMP B-TREE" not in plan, plan
+
+    first, plan = plans("/api/v1/coupons/", {"limit": 20, "count": "none"})
+    assert "ix_coupon_active_created_at_id" in plan, plan
+    _, plan = plans("/api/v1/coupons/", {"limit": 20, "count": "none", "cursor": first["meta"]["nextCursor"]})
+    assert "ix_coupon_active_created_at_id" in plan, plan
+
+
+def test_unknown_sort_is_rejected(client: TestClient):
+    response = client.get("/api/v1/products/", params={"sortBy": "description"})
+    assert response.status_code == 422
+    # 'relevance' sem busca continua caindo na ordenação padrão
+    assert client.get("/api/v1/products/", params={"sortBy": "relevance"}).status_code == 200
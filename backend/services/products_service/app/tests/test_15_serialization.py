@@ -0,0 +1,82 @@
+# Em: tests/test_15_serialization.py
+
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import Response
+from fastapi.testclient import TestClient
+
+from core.config import settings
+from core.serialization import respond
+
+
+@pytest.fixture(name="catalog")
+def catalog_fixture(client: TestClient):
+    now = datetime.utcnow()
+    client.post("/api/v1/coupons/", json={
+        "code": "menos10", "type": "fixed", "value": 10, "one_shot": True,
+        "valid_from": (now - timedelta(days=1)).isoformat(), "valid_until": (now + timedelta(days=1)).isoformat(),
+    })
+    ids = [
+        client.post("/api/v1/products/", json={"name": name, "price": price, "stock": stock}).json()["id"]
+        for name, price, stock in [("Café", "150.00", 3), ("Chá", "19.99", 0), ("Açúcar", "7.5", 9)]
+    ]
+    client.post(f"/api/v1/products/{ids[0]}/discount/percent", json={"value": 12.5})
+    client.post(f"/api/v1/products/{ids[1]}/discount/coupon", json={"code": "menos10"})
+    client.delete(f"/api/v1/products/{ids[2]}")
+    return ids
+
+
+def _bodies(client: TestClient, monkeypatch, url: str, params: dict) -> tuple:
+    responses = []
+    for skip in (True, False):
+        monkeypatch.setattr(settings, "api_skip_response_validation", skip)
+        response = client.get(url, params=params)
+        assert response.status_code == 200
+        responses.append(response)
+    return responses
+
+
+def test_fast_path_matches_validated_responses(client: TestClient, catalog, monkeypatch):
+    fast, validated = _bodies(client, monkeypatch, "/api/v1/products/", {"includeDeleted": True, "sortBy": "name"})
+    # Mesmo corpo, byte a byte, e mesmos headers de cache
+    assert fast.content == validated.content
+    assert fast.headers["etag"] == validated.headers["etag"]
+    assert fast.headers["cache-control"] == validated.headers["cache-control"]
+
+    data = {row["name"]: row for row in fast.json()["data"]}
+    assert data["Café"]["final_price"] == "131.25"
+    assert data["Café"]["discount"] == {"type": "percent", "value": "12.50"}
+    assert data["Chá"]["final_price"] == "9.99"
+    assert data["Açúcar"]["price"] == "7.50"
+    assert data["Açúcar"]["deleted_at"] is not None
+
+    fast, validated = _bodies(client, monkeypatch, "/api/v1/coupons/", {})
+    assert fast.content == validated.content
+    assert fast.json()["data"][0]["value"] == "10.00"
+    assert fast.json()["data"][0]["redeemed_at"] is not None
+
+
+def test_ndjson_export_keeps_money_as_strings(client: TestClient, catalog):
+    lines = client.get("/api/v1/products/export", params={"format": "ndjson"}).text.splitlines()
+    assert [line.count('"price":') for line in lines] == [1, 1]
+    assert '"price":"150.00"' in lines[0]
+    assert '"discount_type":"percent"' in lines[0]
+    assert '"discount_value":"12.50"' in lines[0]
+
+
+def test_fast_path_keeps_repeated_headers(monkeypatch):
+    monkeypatch.setattr(settings, "api_skip_response_validation", True)
+    injected = Response()
+    del injected.headers["content-length"]
+    injected.headers["ETag"] = '"v3"'
+    injected.set_cookie("primeiro", "1")
+    injected.set_cookie("segundo", "2")
+
+    fast = respond({"ok": True}, injected)
+    assert [value for name, value in fast.raw_headers if name == b"set-cookie"] == [
+        value for name, value in injected.raw_headers if name == b"set-cookie"
+    ]
+    assert len(fast.headers.getlist("set-cookie")) == 2
+    assert fast.headers["etag"] == '"v3"'
+    assert fast.headers.getlist("content-length") == [str(len(fast.body))]
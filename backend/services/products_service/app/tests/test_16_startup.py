@@ -0,0 +1,113 @@
+# Em: tests/test_16_startup.py
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from alembic import command
+from fastapi.testclient import TestClient
+from sqlmodel import SQLModel, create_engine
+
+from core.schema import APP_DIR, SCHEMA_REVISION, SchemaRevisionError
+from core.search import include_search_object
+from main import app
+
+# Boot de um worker num processo novo, contando os comandos SQL do lifespan (evento
+# 'before_cursor_execute' em todos os engines). Os tempos ficam em benchmarks/bench_startup.py.
+_STARTUP_SCRIPT = """
+import json
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from fastapi.testclient import TestClient
+import main
+statements = []
+event.listen(Engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+with TestClient(main.app) as client:
+    started = list(statements)
+    assert client.get("/").status_code == 200
+print(json.dumps(started))
+"""
+# Tarefas de fundo que leem tabelas por conta própria (testadas em seus próprios testes)
+_BACKGROUND_TASKS_OFF = {
+    "COUPON_SWEEP_ENABLED": "false", "STOCK_RESERVATION_SWEEP_ENABLED": "false",
+    "CHANGE_FEED_PRUNE_ENABLED": "false", "COUPON_FILTER_ENABLED": "false",
+}
+
+
+def _alembic_config(database_url: str) -> Config:
+    config = Config(os.path.join(APP_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(APP_DIR, "migrations"))
+    config.attributes["database_url"] = database_url
+    config.attributes["configure_logger"] = False
+    return config
+
+
+@pytest.fixture(name="migrated_url")
+def migrated_url_fixture(tmp_path) -> str:
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+    command.upgrade(_alembic_config(url), "head")
+    return url
+
+
+def test_schema_revision_is_the_latest_migration():
+    head = ScriptDirectory.from_config(_alembic_config("sqlite://")).get_current_head()
+    assert SCHEMA_REVISION == head, "Atualize SCHEMA_REVISION em core/schema.py para a nova migração"
+
+
+def test_migrations_build_exactly_the_models_schema(migrated_url: str):
+    engine = create_engine(migrated_url)
+    with engine.connect() as connection:
+        context = MigrationContext.configure(connection, opts={"include_object": include_search_object})
+        differences = compare_metadata(context, SQLModel.metadata)
+    engine.dispose()
+    assert differences == []
+
+
+def test_migrations_build_the_search_index(migrated_url: str):
+    engine = create_engine(migrated_url)
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO product (name, price, final_price, stock, created_at) "
+            "VALUES ('Caneta Azul', 5, 5, 1, '2026-01-01')"
+        )
+        matches = connection.exec_driver_sql("SELECT rowid FROM product_fts WHERE product_fts MATCH 'caneta'").all()
+    engine.dispose()
+    assert len(matches) == 1
+
+
+def test_worker_refuses_to_start_on_unmigrated_database():
+    # O engine da aplicação nos testes aponta para um SQLite em memória, sem migrações
+    with pytest.raises(SchemaRevisionError):
+        with TestClient(app):
+            pass
+
+
+def _startup_statements(database_url: str) -> list:
+    env = {**os.environ, "DATABASE_URL": database_url, **_BACKGROUND_TASKS_OFF}
+    completed = subprocess.run(
+        [sys.executable, "-c", _STARTUP_SCRIPT], cwd=APP_DIR, env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert completed.returncode == 0, completed.stderr
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def test_startup_only_checks_the_schema_revision(migrated_url: str):
+    empty = _startup_statements(migrated_url)
+    # Uma consulta de chave primária: sem create_all, reflexão de tabelas ou Alembic
+    assert empty == ["SELECT version_num FROM alembic_version"]
+
+    # O boot não faz trabalho por linha: com um catálogo, os mesmos comandos
+    engine = create_engine(migrated_url)
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO product (name, price, final_price, stock, created_at) VALUES (?, 5, 5, 1, '2026-01-01')",
+            [(f"Produto {i}",) for i in range(2000)],
+        )
+    engine.dispose()
+    assert _startup_statements(migrated_url) == empty
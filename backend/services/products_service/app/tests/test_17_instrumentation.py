@@ -0,0 +1,85 @@
+# Em: tests/test_17_instrumentation.py
+
+import logging
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+
+from core.config import settings
+from core.instrumentation import _explain_executor, _is_explainable, _sync_engines, metrics
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics():
+    metrics.clear()
+    yield
+    metrics.clear()
+
+
+def _server_timing(response) -> dict:
+    header = response.headers["server-timing"]
+    return {match[0]: match for match in re.findall(r'(\w+);(?:desc="(\d+) queries";)?dur=([\d.]+)', header)}
+
+
+def test_server_timing_counts_queries_of_the_request(client: TestClient):
+    product_id = client.post("/api/v1/products/", json={"name": "Mate", "price": "8.00", "stock": 2}).json()["id"]
+
+    timing = _server_timing(client.get("/api/v1/products/", params={"count": "exact"}))
+    # Versão da coleção + COUNT + página
+    assert int(timing["db"][1]) == 3
+    assert float(timing["total"][2]) >= float(timing["db"][2])
+    assert "serialize" in timing
+
+    # Segunda leitura do mesmo produto sai do cache de leituras, sem SQL
+    client.get(f"/api/v1/products/{product_id}")
+    assert int(_server_timing(client.get(f"/api/v1/products/{product_id}"))["db"][1]) == 0
+
+
+def test_prometheus_metrics_use_route_templates(client: TestClient):
+    product_id = client.post("/api/v1/products/", json={"name": "Erva", "price": "5.00", "stock": 1}).json()["id"]
+    client.get(f"/api/v1/products/{product_id}")
+    client.get("/api/v1/products/999999")
+
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    route = 'method="GET",route="/api/v1/products/{product_id}"'
+    assert f'http_request_duration_seconds_count{{{route},status="200"}} 1' in body
+    assert f'http_request_duration_seconds_count{{{route},status="404"}} 1' in body
+    assert f'http_request_db_queries_bucket{{{route},le="+Inf"}} 2' in body
+    assert f"/api/v1/products/{product_id}" not in body
+    assert "# TYPE db_pool_checkouts_total counter" in body
+
+
+def test_slow_query_log_with_sampled_explain(client: TestClient, database_path: str, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "slow_query_threshold_ms", 0.000001)
+    monkeypatch.setattr(settings, "slow_query_explain_sample_rate", 1.0)
+
+    with caplog.at_level(logging.WARNING, logger="core.instrumentation"):
+        client.get("/api/v1/products/", params={"search": "cafe", "count": "none"})
+        _explain_executor.submit(lambda: None).result()
+
+    slow = [record.getMessage() for record in caplog.records if record.getMessage().startswith("Query lenta")]
+    assert any("FROM product" in message and "parâmetros:" in message for message in slow)
+    plans = [record.getMessage() for record in caplog.records if record.getMessage().startswith("Plano da query lenta")]
+    assert plans and all("SCAN" in plan or "SEARCH" in plan for plan in plans)
+    assert metrics.slow_queries >= len(slow)
+    # Reexecutado no banco em que a query rodou (o do teste), não no engine global da aplicação
+    assert any(url.endswith(database_path) for url in _sync_engines)
+
+
+def test_explain_only_reruns_plain_table_reads():
+    assert _is_explainable("SELECT product.id FROM product WHERE product.price > ?")
+    assert _is_explainable("  select count(*) from coupon")
+    for statement in [
+        "SELECT 1",
+        "SELECT pg_advisory_xact_lock(%(key)s)",
+        "SELECT pg_notify(%(channel)s, '')",
+        "SELECT pg_try_advisory_lock(%(key)s)",
+        "SELECT slot FROM collection_version ORDER BY random() LIMIT 1 FOR UPDATE SKIP LOCKED",
+        "SELECT id FROM stock_reservation FOR NO KEY UPDATE",
+        "SELECT pg_last_wal_replay_lsn() FROM pg_stat_replication",
+        "UPDATE product SET stock = stock - 1 FROM coupon",
+    ]:
+        assert not _is_explainable(statement), statement
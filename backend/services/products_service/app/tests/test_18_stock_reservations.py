@@ -0,0 +1,135 @@
+# Em: tests/test_18_stock_reservations.py
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.product_model import Product
+from models.stock_reservation_model import StockReservation
+from services.stock_reservation import sweep_expired_reservations
+
+HOT_PRODUCT_STOCK = 25
+CONCURRENT_RESERVATIONS = 120
+
+
+def _create_product(client: TestClient, name: str, stock: int) -> int:
+    response = client.post("/api/v1/products/", json={"name": name, "price": "10.00", "stock": stock})
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def _stock(client: TestClient, product_id: int) -> int:
+    return client.get(f"/api/v1/products/{product_id}").json()["stock"]
+
+
+def test_hot_product_is_never_oversold(client: TestClient):
+    product_id = _create_product(client, "Console", HOT_PRODUCT_STOCK)
+
+    def reserve(_):
+        return client.post(f"/api/v1/products/{product_id}/reserve", json={"quantity": 1}).status_code
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        statuses = list(pool.map(reserve, range(CONCURRENT_RESERVATIONS)))
+
+    assert statuses.count(201) == HOT_PRODUCT_STOCK
+    assert statuses.count(409) == CONCURRENT_RESERVATIONS - HOT_PRODUCT_STOCK
+    product = client.get(f"/api/v1/products/{product_id}").json()
+    assert product["stock"] == 0
+    assert product["is_out_of_stock"] is True
+
+
+def test_batch_reservation_is_all_or_nothing(client: TestClient):
+    first = _create_product(client, "Teclado", 5)
+    second = _create_product(client, "Mouse", 1)
+
+    response = client.post("/api/v1/reservations/", json={"items": [
+        {"product_id": first, "quantity": 2}, {"product_id": second, "quantity": 2},
+    ]})
+    assert response.status_code == 409
+    assert "disponível: 1" in response.json()["detail"]
+    # O primeiro item já tinha sido baixado na transação: o rollback o devolve
+    assert _stock(client, first) == 5 and _stock(client, second) == 1
+
+    response = client.post("/api/v1/reservations/", json={"items": [
+        {"product_id": second, "quantity": 1}, {"product_id": first, "quantity": 2}, {"product_id": first, "quantity": 1},
+    ]})
+    assert response.status_code == 201
+    reservation = response.json()
+    assert reservation["status"] == "pending"
+    # Itens do mesmo produto somados, em ordem de id
+    assert [(item["product_id"], item["quantity"], item["remaining_stock"]) for item in reservation["items"]] == [
+        (first, 3, 2), (second, 1, 0),
+    ]
+    assert client.get(f"/api/v1/products/{second}").json()["is_out_of_stock"] is True
+
+    unknown = client.post("/api/v1/reservations/", json={"items": [{"product_id": 9999, "quantity": 1}]})
+    assert unknown.status_code == 404
+    assert client.post("/api/v1/reservations/", json={"items": []}).status_code == 422
+
+
+def test_commit_and_release_are_idempotent(client: TestClient):
+    product_id = _create_product(client, "Monitor", 10)
+    committed = client.post(f"/api/v1/products/{product_id}/reserve", json={"quantity": 4}).json()["id"]
+    released = client.post(f"/api/v1/products/{product_id}/reserve", json={"quantity": 3}).json()["id"]
+    assert _stock(client, product_id) == 3
+
+    for _ in range(2):
+        response = client.post(f"/api/v1/reservations/{committed}/commit")
+        assert response.status_code == 200
+        assert response.json()["status"] == "committed"
+    assert client.post(f"/api/v1/reservations/{committed}/release").status_code == 409
+
+    for _ in range(2):
+        response = client.post(f"/api/v1/reservations/{released}/release")
+        assert response.status_code == 200
+        assert response.json()["status"] == "released"
+    assert client.post(f"/api/v1/reservations/{released}/commit").status_code == 409
+
+    # Só a reserva liberada devolveu o estoque, uma única vez
+    assert _stock(client, product_id) == 6
+    assert client.get("/api/v1/reservations/nao-existe").status_code == 404
+
+
+def test_expired_reservations_are_swept_back_to_stock(client: TestClient, session: Session, async_engine):
+    product_id = _create_product(client, "Cadeira", 4)
+    expiring = client.post(f"/api/v1/products/{product_id}/reserve", json={"quantity": 2, "ttl_seconds": 60}).json()
+    kept = client.post(f"/api/v1/products/{product_id}/reserve", json={"quantity": 1, "ttl_seconds": 3600}).json()
+    assert _stock(client, product_id) == 1
+
+    session_factory = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+    later = datetime.utcnow() + timedelta(minutes=5)
+    assert asyncio.run(sweep_expired_reservations(session_factory, now=later)) == 1
+    # Uma segunda rodada não encontra mais nada
+    assert asyncio.run(sweep_expired_reservations(session_factory, now=later)) == 0
+
+    assert _stock(client, product_id) == 3
+    assert client.get(f"/api/v1/reservations/{expiring['id']}").json()["status"] == "expired"
+    assert client.post(f"/api/v1/reservations/{expiring['id']}/commit").status_code == 409
+    assert client.get(f"/api/v1/reservations/{kept['id']}").json()["status"] == "pending"
+
+    session.expire_all()
+    statuses = {row.id: row.status.value for row in session.exec(select(StockReservation)).all()}
+    assert statuses == {expiring["id"]: "expired", kept["id"]: "pending"}
+
+
+def test_commit_after_expiry_returns_stock_without_sweep(client: TestClient, session: Session):
+    product_id = _create_product(client, "Mesa", 2)
+    reservation_id = client.post(f"/api/v1/products/{product_id}/reserve", json={"quantity": 2}).json()["id"]
+    # Vence a reserva direto no banco, antes de qualquer varredura
+    reservation = session.get(StockReservation, reservation_id)
+    reservation.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    session.add(reservation)
+    session.commit()
+
+    response = client.post(f"/api/v1/reservations/{reservation_id}/commit")
+    assert response.status_code == 409
+    assert client.get(f"/api/v1/reservations/{reservation_id}").json()["status"] == "expired"
+    assert _stock(client, product_id) == 2
+
+    session.expire_all()
+    assert session.get(Product, product_id).stock == 2
@@ -0,0 +1,156 @@
+# Em: tests/test_19_change_feed.py
+
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.change_log import gap_safe_horizon, settled_seq
+from core.config import settings
+from models.change_log_model import ChangeLog
+from models.product_model import Product
+from services.change_feed import prune_change_log
+
+
+def _changes(client: TestClient, **params):
+    response = client.get("/api/v1/changes", params={"wait": 0, **params})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.splitlines()]
+    return events, int(response.headers["X-Change-Seq"])
+
+
+def _create_coupon(client: TestClient, code: str):
+    now = datetime.utcnow()
+    response = client.post("/api/v1/coupons/", json={
+        "code": code, "type": "percent", "value": 10,
+        "valid_from": (now - timedelta(days=1)).isoformat(), "valid_until": (now + timedelta(days=1)).isoformat(),
+    })
+    assert response.status_code == 201
+
+
+def test_writes_are_logged_in_the_same_transaction(client: TestClient, session: Session):
+    product_id = client.post("/api/v1/products/", json={"name": "Fone", "price": "80.00", "stock": 3}).json()["id"]
+    client.patch(f"/api/v1/products/{product_id}", json={"stock": 4})
+    _create_coupon(client, "feed10")
+    client.post(f"/api/v1/products/{product_id}/discount/coupon", json={"code": "feed10"})
+    # Falha de negócio: nada é gravado, nem no outbox
+    assert client.post("/api/v1/products/", json={"name": "Fone", "price": "1.00", "stock": 1}).status_code == 409
+
+    events, seq = _changes(client, after=0)
+    assert [(event["topic"], event["data"]) for event in events] == [
+        ("product", {"id": product_id}),
+        ("product", {"id": product_id}),
+        ("coupon", {"id": 1, "code": "feed10"}),
+        # Aplicar o cupom altera o produto e, como ele não é de uso único, nada no cupom
+        ("product", {"id": product_id}),
+    ]
+    assert [event["seq"] for event in events] == sorted(event["seq"] for event in events)
+    assert seq == events[-1]["seq"]
+
+    # Retomando do cursor, só o que veio depois; filtro por tópico
+    client.delete(f"/api/v1/products/{product_id}/discount")
+    newer, _ = _changes(client, after=seq)
+    assert [(event["topic"], event["data"]) for event in newer] == [("product", {"id": product_id})]
+    assert _changes(client, after=0, topic="coupon")[0] == [events[2]]
+
+    # Importação em massa: um único evento de coleção ("recarregue tudo")
+    body = "name,price,stock\n" + "".join(f"Massa {i},5.00,1\n" for i in range(20))
+    client.post("/api/v1/products/bulk", content=body, headers={"Content-Type": "text/csv"})
+    bulk, _ = _changes(client, after=newer[-1]["seq"])
+    assert [(event["topic"], event["data"]) for event in bulk] == [("product", None)]
+
+    session.expire_all()
+    assert len(session.exec(select(ChangeLog)).all()) == len(events) + 2
+
+
+def test_long_poll_wakes_up_on_write(client: TestClient):
+    _, head = _changes(client)
+    assert head == 0
+    result = {}
+
+    def long_poll():
+        started = time.perf_counter()
+        result["response"] = client.get("/api/v1/changes", params={"after": head, "wait": 10})
+        result["elapsed"] = time.perf_counter() - started
+
+    poller = threading.Thread(target=long_poll)
+    poller.start()
+    time.sleep(0.3)
+    client.post("/api/v1/products/", json={"name": "Relógio", "price": "99.00", "stock": 1})
+    poller.join(timeout=15)
+
+    events = [json.loads(line) for line in result["response"].text.splitlines()]
+    assert [event["topic"] for event in events] == ["product"]
+    # Acordado pela escrita, não pelo fim da espera
+    assert result["elapsed"] < 5
+
+    empty = client.get("/api/v1/changes", params={"after": events[-1]["seq"], "wait": 0.2})
+    assert empty.text == "" and empty.headers["X-Change-Seq"] == str(events[-1]["seq"])
+
+
+def test_sse_stream_resumes_from_last_event_id(client: TestClient, monkeypatch):
+    monkeypatch.setattr(settings, "change_feed_sse_max_seconds", 0.5)
+    for name in ("A", "B", "C"):
+        client.post("/api/v1/products/", json={"name": name, "price": "1.00", "stock": 1})
+
+    headers = {"Accept": "text/event-stream", "Last-Event-ID": "1"}
+    with client.stream("GET", "/api/v1/changes", headers=headers) as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        body = "".join(response.iter_text())
+
+    messages = [block for block in body.split("\n\n") if block.startswith("id:")]
+    assert [message.splitlines()[0] for message in messages] == ["id: 2", "id: 3"]
+    assert messages[0].splitlines()[1] == "event: product"
+    assert json.loads(messages[0].splitlines()[2].removeprefix("data: "))["seq"] == 2
+
+
+def test_pruned_cursor_asks_client_to_reload(client: TestClient, async_engine):
+    client.post("/api/v1/products/", json={"name": "Velho", "price": "1.00", "stock": 1})
+    client.post("/api/v1/products/", json={"name": "Novo", "price": "1.00", "stock": 1})
+
+    session_factory = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+    later = datetime.utcnow() + timedelta(hours=settings.change_feed_retention_hours, minutes=1)
+    assert asyncio.run(prune_change_log(session_factory, now=later)) == 2
+
+    client.post("/api/v1/products/", json={"name": "Recente", "price": "1.00", "stock": 1})
+    response = client.get("/api/v1/changes", params={"after": 1, "wait": 0})
+    assert response.status_code == 410
+    assert response.headers["X-Change-Seq"] == "3"
+    # Um cliente em dia com o feed não é afetado
+    assert [event["seq"] for event in _changes(client, after=2)[0]] == [3]
+
+
+def test_readers_stop_before_recent_gaps(session: Session, async_engine):
+    # Ids confirmados fora de ordem (Postgres): o 3 ainda não apareceu, o 4 acabou de ser gravado
+    old = datetime.utcnow() - timedelta(minutes=1)
+    for seq, created_at in [(1, old), (2, old), (4, datetime.utcnow())]:
+        session.add(ChangeLog(id=seq, topic="product", data={"id": seq}, created_at=created_at))
+    session.commit()
+    session_factory = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def horizon(after: int):
+        async with session_factory() as async_session:
+            return await settled_seq(async_session, after)
+
+    assert asyncio.run(horizon(0)) == 2
+    assert asyncio.run(horizon(2)) == 2
+    # O buraco foi preenchido: a leitura segue até o fim
+    session.add(ChangeLog(id=3, topic="product", data={"id": 3}, created_at=datetime.utcnow()))
+    session.commit()
+    assert asyncio.run(horizon(0)) == 4
+    # Buraco antigo (transação desfeita) não segura nada; sem linhas recentes, não há teto
+    session.add(ChangeLog(id=6, topic="product", data={"id": 6}, created_at=old))
+    session.commit()
+    assert asyncio.run(horizon(0)) == 6
+    assert asyncio.run(horizon(4)) is None
+
+    assert gap_safe_horizon(10, [(11, True), (13, False), (15, True)]) == 13
+    assert gap_safe_horizon(10, []) == 10
@@ -0,0 +1,103 @@
+# Em: tests/test_20_read_replicas.py
+
+import asyncio
+import sqlite3
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.config import settings
+from core.replicas import READ_YOUR_WRITES_COOKIE, Replica, replica_router
+from main import app
+
+# Réplica local: um segundo arquivo SQLite, "replicado" com a API de backup do sqlite3
+# só quando o teste manda. Entre uma cópia e outra, ela fica atrasada de verdade.
+
+
+@pytest.fixture(name="replica")
+def replica_fixture(tmp_path, database_path: str, session):
+    replica_path = tmp_path / "replica.db"
+    engine = create_async_engine(f"sqlite+aiosqlite:///{replica_path}", poolclass=NullPool)
+    replica = Replica("local", async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False))
+    replica.path = replica_path
+    _replicate(database_path, replica)
+    replica_router.configure([replica])
+    yield replica
+    replica_router.configure([])
+
+
+def _replicate(database_path: str, replica: Replica) -> None:
+    with sqlite3.connect(database_path) as source, sqlite3.connect(replica.path) as target:
+        source.backup(target)
+
+
+def _check(async_engine) -> None:
+    primary_factory = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+    asyncio.run(replica_router.check(primary_factory))
+
+
+def _name(client: TestClient, product_id: int) -> str:
+    response = client.get(f"/api/v1/products/{product_id}")
+    assert response.status_code == 200
+    listed = client.get("/api/v1/products/").json()["data"]
+    assert [row["name"] for row in listed if row["id"] == product_id] == [response.json()["name"]]
+    return response.json()["name"]
+
+
+def test_reads_use_the_replica_and_writers_read_their_writes(
+    client: TestClient, replica: Replica, database_path: str, async_engine,
+):
+    product_id = client.post("/api/v1/products/", json={"name": "Fone", "price": "80.00", "stock": 3}).json()["id"]
+    assert READ_YOUR_WRITES_COOKIE in client.cookies
+    _replicate(database_path, replica)
+    _check(async_engine)
+    assert replica.healthy and replica.lag_seconds() < 1
+
+    reader = TestClient(app)
+    assert _name(reader, product_id) == "Fone"
+
+    # Escrita que ainda não chegou na réplica (atraso pequeno: ela continua no rodízio)
+    assert client.patch(f"/api/v1/products/{product_id}", json={"name": "Fone Pro"}).status_code == 200
+    _check(async_engine)
+    assert replica.healthy and replica.lag_seconds() < settings.db_replica_max_lag_seconds
+
+    reads_before = replica_router.replica_reads
+    # Outro cliente lê da réplica (valor antigo); quem escreveu lê do primário
+    assert _name(reader, product_id) == "Fone"
+    assert replica_router.replica_reads > reads_before
+    assert _name(client, product_id) == "Fone Pro"
+
+    # A leitura atrasada não ficou no cache: com a réplica em dia, todos veem o novo nome
+    _replicate(database_path, replica)
+    _check(async_engine)
+    assert _name(reader, product_id) == "Fone Pro"
+    assert _name(TestClient(app), product_id) == "Fone Pro"
+
+
+def test_lagging_or_unreachable_replica_falls_back_to_primary(
+    client: TestClient, replica: Replica, async_engine, monkeypatch,
+):
+    product_id = client.post("/api/v1/products/", json={"name": "Caneta", "price": "5.00", "stock": 3}).json()["id"]
+    reader = TestClient(app)
+
+    # Atrasada além do limite: o produto não existe na réplica, mas a leitura vai ao primário
+    monkeypatch.setattr(settings, "db_replica_max_lag_seconds", 0.05)
+    time.sleep(0.1)
+    _check(async_engine)
+    assert replica.healthy and replica.lag_seconds() > 0.05
+    fallbacks_before = replica_router.primary_reads_fallback
+    assert _name(reader, product_id) == "Caneta"
+    assert replica_router.primary_reads_fallback > fallbacks_before
+    monkeypatch.undo()
+
+    # Fora do ar (o arquivo some e a réplica abre vazia): sai do rodízio
+    replica.path.unlink()
+    _check(async_engine)
+    assert not replica.healthy
+    assert replica_router.status()["replicas"][0]["lastError"]
+    assert _name(reader, product_id) == "Caneta"
+    assert client.get("/metrics/replicas").json()["replicas"][0]["healthy"] is False
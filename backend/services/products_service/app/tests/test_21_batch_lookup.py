@@ -0,0 +1,81 @@
+# Em: tests/test_21_batch_lookup.py
+
+import re
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from core.replicas import READ_YOUR_WRITES_COOKIE, Replica, replica_router
+from schemas.product_schemas import LOOKUP_MAX_KEYS
+
+
+def _query_count(response) -> int:
+    return int(re.search(r'db;desc="(\d+) queries"', response.headers["server-timing"]).group(1))
+
+
+def _create_coupon(client: TestClient, code: str):
+    now = datetime.utcnow()
+    response = client.post("/api/v1/coupons/", json={
+        "code": code, "type": "fixed", "value": 5,
+        "valid_from": (now - timedelta(days=1)).isoformat(), "valid_until": (now + timedelta(days=1)).isoformat(),
+    })
+    assert response.status_code == 201
+
+
+def test_product_lookup_in_one_query(client: TestClient):
+    ids = [
+        client.post("/api/v1/products/", json={"name": f"Item {i}", "price": "10.00", "stock": i}).json()["id"]
+        for i in range(5)
+    ]
+    client.post(f"/api/v1/products/{ids[1]}/discount/percent", json={"value": 10})
+    client.delete(f"/api/v1/products/{ids[3]}")
+
+    response = client.post("/api/v1/products/lookup", json={"ids": [ids[4], ids[1], 999, ids[3], ids[4], ids[0]]})
+    assert response.status_code == 200
+    body = response.json()
+    # Ordem pedida, sem repetição; o mapeamento é o mesmo do GET individual
+    assert [row["id"] for row in body["data"]] == [ids[4], ids[1], ids[0]]
+    assert body["data"][1] == client.get(f"/api/v1/products/{ids[1]}").json()
+    assert body["missing"] == [999]
+    assert body["deleted"] == [ids[3]]
+    assert _query_count(response) == 1
+
+    assert client.post("/api/v1/products/lookup", json={"ids": []}).status_code == 422
+    assert client.post("/api/v1/products/lookup", json={"ids": list(range(LOOKUP_MAX_KEYS + 1))}).status_code == 422
+
+
+def test_coupon_lookup_normalizes_codes(client: TestClient):
+    for code in ("promo10", "frete20", "velho30"):
+        _create_coupon(client, code)
+    client.delete("/api/v1/coupons/velho30")
+
+    response = client.post("/api/v1/coupons/lookup", json={
+        "codes": ["FRETE20", "promo10", "Promo10", "nada9999", "velho30", "ab", "admin", "com espaço"],
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert [row["code"] for row in body["data"]] == ["frete20", "promo10"]
+    assert body["missing"] == ["nada9999"]
+    assert body["deleted"] == ["velho30"]
+    assert body["invalid"] == ["ab", "admin", "com espaço"]
+    assert _query_count(response) == 1
+
+    # Só códigos inválidos: nem consulta o banco
+    response = client.post("/api/v1/coupons/lookup", json={"codes": ["x"]})
+    assert response.json() == {"data": [], "missing": [], "deleted": [], "invalid": ["x"]}
+    assert _query_count(response) == 0
+
+
+def test_lookup_is_a_read_for_read_your_writes(client: TestClient, async_engine):
+    # Com réplicas configuradas, só quem escreveu ganha o cookie (o POST de consulta não)
+    replica_router.configure([Replica("unused", async_sessionmaker(async_engine))])
+    try:
+        product_id = client.post("/api/v1/products/", json={"name": "Caneta", "price": "5.00", "stock": 1}).json()["id"]
+        assert READ_YOUR_WRITES_COOKIE in client.cookies
+
+        reader = TestClient(client.app)
+        assert reader.post("/api/v1/products/lookup", json={"ids": [product_id]}).status_code == 200
+        assert READ_YOUR_WRITES_COOKIE not in reader.cookies
+    finally:
+        replica_router.configure([])
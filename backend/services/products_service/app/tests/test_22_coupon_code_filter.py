@@ -0,0 +1,163 @@
+# Em: tests/test_22_coupon_code_filter.py
+
+import asyncio
+import json
+import re
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from core.config import settings
+from core.replicas import READ_YOUR_WRITES_COOKIE
+from main import app
+from services.coupon_code_filter import coupon_filter, run_sync
+
+# Sem o lifespan, nada monta o filtro: cada teste o monta (ou sincroniza) e o desfaz no fim
+
+
+def _query_count(response) -> int:
+    return int(re.search(r'db;desc="(\d+) queries"', response.headers["server-timing"]).group(1))
+
+
+def _coupon(code: str) -> dict:
+    now = datetime.utcnow()
+    return {
+        "code": code, "type": "fixed", "value": 5,
+        "valid_from": (now - timedelta(days=1)).isoformat(), "valid_until": (now + timedelta(days=1)).isoformat(),
+    }
+
+
+def _write_elsewhere(database_path: str, code: Optional[str] = None) -> None:
+    # Outro worker: grava direto no arquivo, sem passar pelos avisos deste processo
+    now = datetime.utcnow()
+    with sqlite3.connect(database_path) as connection:
+        if code:
+            connection.execute(
+                "INSERT INTO coupon (code, type, value, one_shot, valid_from, valid_until, created_at, version)"
+                " VALUES (?, 'fixed', 5, 0, ?, ?, ?, 1)",
+                (code, now - timedelta(days=1), now + timedelta(days=1), now),
+            )
+        connection.execute(
+            "INSERT INTO change_log (topic, data, created_at) VALUES ('coupon', ?, ?)",
+            (json.dumps({"id": 1, "code": code}) if code else None, now),
+        )
+
+
+@pytest.fixture(name="session_factory")
+def session_factory_fixture(client: TestClient, async_engine):
+    yield async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+    coupon_filter.reset()
+
+
+def test_unknown_codes_are_rejected_without_queries(client: TestClient, session_factory):
+    assert client.post("/api/v1/coupons/", json=_coupon("promo10")).status_code == 201
+    asyncio.run(coupon_filter.rebuild(session_factory))
+    assert coupon_filter.ready
+
+    response = client.get("/api/v1/coupons/naoexiste")
+    assert response.status_code == 404
+    assert _query_count(response) == 0
+    # Também no lote (vai para 'missing')
+    response = client.post("/api/v1/coupons/lookup", json={"codes": ["naoexiste", "outro999"]})
+    assert response.json()["missing"] == ["naoexiste", "outro999"]
+    assert _query_count(response) == 0
+    # Aplicar o cupom num produto é uma escrita: sempre consulta o banco
+    product_id = client.post("/api/v1/products/", json={"name": "Caneca", "price": "20.00", "stock": 1}).json()["id"]
+    response = client.post(f"/api/v1/products/{product_id}/discount/coupon", json={"code": "naoexiste"})
+    assert response.status_code == 404 and _query_count(response) > 0
+
+    # Criados depois da montagem (escritas deste processo) entram no filtro na hora
+    assert client.get("/api/v1/coupons/promo10").status_code == 200
+    assert client.post("/api/v1/coupons/", json=_coupon("frete20")).status_code == 201
+    assert TestClient(app).get("/api/v1/coupons/frete20").status_code == 200
+    assert coupon_filter.queries_avoided == 3
+    assert client.get("/metrics/coupon-filter").json()["filterRejections"] == 3
+
+
+def test_false_positives_and_deletions_go_to_the_negative_cache(client: TestClient, session_factory):
+    assert client.post("/api/v1/coupons/", json=_coupon("velho30")).status_code == 201
+    asyncio.run(coupon_filter.rebuild(session_factory))
+    # Força um falso positivo: o filtro diz "talvez", o banco diz que não
+    coupon_filter.filter.add("fantasma")
+
+    response = client.get("/api/v1/coupons/fantasma")
+    assert response.status_code == 404 and _query_count(response) == 1
+    response = client.get("/api/v1/coupons/fantasma")
+    assert response.status_code == 404 and _query_count(response) == 0
+    status = client.get("/metrics/coupon-filter").json()
+    assert (status["dbMisses"], status["negativeCacheHits"]) == (1, 1)
+    assert status["falsePositiveRate"] == 1.0
+
+    # Criar o código tira-o do cache negativo; deletar um cupom põe o código lá
+    assert client.post("/api/v1/coupons/", json=_coupon("fantasma")).status_code == 201
+    assert client.get("/api/v1/coupons/fantasma").status_code == 200
+    assert client.delete("/api/v1/coupons/velho30").status_code == 204
+    # Quem deletou acabou de escrever e confere no banco; os outros clientes, não
+    response = client.get("/api/v1/coupons/velho30")
+    assert response.status_code == 404 and _query_count(response) == 1
+    response = TestClient(app).get("/api/v1/coupons/velho30")
+    assert response.status_code == 404 and _query_count(response) == 0
+    # O lote não usa o cache negativo: continua distinguindo deletado de inexistente
+    assert client.post("/api/v1/coupons/lookup", json={"codes": ["velho30"]}).json()["deleted"] == ["velho30"]
+    # Mas alimenta: um falso positivo que o lote não achou deixa de ir ao banco na leitura única
+    coupon_filter.filter.add("sombra")
+    assert client.post("/api/v1/coupons/lookup", json={"codes": ["sombra"]}).json()["missing"] == ["sombra"]
+    response = TestClient(app).get("/api/v1/coupons/sombra")
+    assert response.status_code == 404 and _query_count(response) == 0
+
+
+def test_coupons_created_by_other_workers_are_never_refused_by_writes(
+    client: TestClient, session_factory, database_path: str,
+):
+    asyncio.run(coupon_filter.rebuild(session_factory))
+    product_ids = [
+        client.post("/api/v1/products/", json={"name": name, "price": "30.00", "stock": 2}).json()["id"]
+        for name in ("Garrafa", "Copo")
+    ]
+    # Outro worker cria o cupom; o feed deste ainda não o entregou
+    _write_elsewhere(database_path, "remoto5")
+    assert "remoto5" not in coupon_filter.filter
+
+    response = client.post(f"/api/v1/products/{product_ids[0]}/discount/coupon", json={"code": "remoto5"})
+    assert response.status_code == 200
+    response = client.post("/api/v1/products/discounts/apply", json={"couponCode": "remoto5", "productIds": product_ids[1:]})
+    assert response.status_code == 200
+    # Quem criou o cupom (cookie 'rw_after' mais novo que a sincronização) o encontra em qualquer worker
+    creator = TestClient(app, cookies={READ_YOUR_WRITES_COOKIE: f"{time.time():.3f}"})
+    assert creator.get("/api/v1/coupons/remoto5").status_code == 200
+    assert creator.post("/api/v1/coupons/lookup", json={"codes": ["remoto5"]}).json()["missing"] == []
+
+
+def test_filter_follows_writes_from_other_processes(
+    client: TestClient, session_factory, database_path: str, monkeypatch,
+):
+    monkeypatch.setattr(settings, "change_feed_poll_interval_seconds", 0.05)
+
+    async def wait_for(condition):
+        for _ in range(100):
+            if condition():
+                return
+            await asyncio.sleep(0.02)
+        raise AssertionError("o filtro não sincronizou")
+
+    async def scenario():
+        task = asyncio.create_task(run_sync(session_factory))
+        try:
+            await wait_for(lambda: coupon_filter.ready)
+            _write_elsewhere(database_path, "remoto1")
+            await wait_for(lambda: "remoto1" in coupon_filter.filter)
+            # Alteração em massa: o filtro é reconstruído
+            rebuilds = coupon_filter.rebuilds
+            _write_elsewhere(database_path)
+            await wait_for(lambda: coupon_filter.rebuilds > rebuilds and coupon_filter.ready)
+        finally:
+            task.cancel()
+
+    asyncio.run(scenario())
+    assert client.get("/api/v1/coupons/remoto1").status_code == 200
@@ -0,0 +1,96 @@
+# Em: tests/test_23_request_coalescing.py
+
+import asyncio
+import re
+import time
+
+import httpx
+from fastapi.testclient import TestClient
+
+from api.routes import products as products_routes
+from api.routes.products import product_list_flight
+from core.config import settings
+from core.replicas import READ_YOUR_WRITES_COOKIE
+from main import app
+
+
+def _query_count(response) -> int:
+    return int(re.search(r'db;desc="(\d+) queries"', response.headers["server-timing"]).group(1))
+
+
+async def _herd(url: str, clients: int, **kwargs) -> list:
+    # Todos no mesmo event loop, como os clientes de um worker durante um pico
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await asyncio.gather(*(client.get(url, **kwargs) for _ in range(clients)))
+
+
+def test_identical_concurrent_lists_share_one_execution(client: TestClient):
+    for i in range(3):
+        client.post("/api/v1/products/", json={"name": f"Promo {i}", "price": "10.00", "stock": 5})
+    executions = product_list_flight.executions
+
+    responses = asyncio.run(_herd("/api/v1/products/?limit=2&sortOrder=DESC", 20))
+    assert {response.status_code for response in responses} == {200}
+    assert len({response.content for response in responses}) == 1
+    assert len({response.headers["etag"] for response in responses}) == 1
+    # Uma execução (versão, COUNT e página); as outras 19 requisições não consultaram o banco
+    assert product_list_flight.executions == executions + 1
+    assert sorted(_query_count(response) for response in responses)[:-1] == [0] * 19
+    assert client.get("/metrics/coalescing").json()["products.list"]["coalesced"] >= 19
+
+    # Mesmo erro para todos (cursor inválido)
+    responses = asyncio.run(_herd("/api/v1/products/?cursor=lixo", 5))
+    assert {response.status_code for response in responses} == {400}
+
+
+def test_held_result_is_invalidated_by_product_writes(client: TestClient, monkeypatch):
+    monkeypatch.setitem(settings.coalescing_routes, "products.list", 60.0)
+    client.post("/api/v1/products/", json={"name": "Caneta", "price": "5.00", "stock": 1})
+
+    first = client.get("/api/v1/products/")
+    held = client.get("/api/v1/products/")
+    assert held.content == first.content and _query_count(held) == 0
+
+    # Revalidação continua funcionando sobre o resultado guardado
+    assert client.get("/api/v1/products/", headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+
+    client.post("/api/v1/products/", json={"name": "Lápis", "price": "2.00", "stock": 1})
+    fresh = client.get("/api/v1/products/")
+    assert _query_count(fresh) > 0
+    assert [row["name"] for row in fresh.json()["data"]] == ["Lápis", "Caneta"]
+    assert fresh.headers["etag"] != first.headers["etag"]
+
+
+def test_clients_that_just_wrote_skip_older_executions(client: TestClient, monkeypatch):
+    monkeypatch.setitem(settings.coalescing_routes, "products.list", 60.0)
+    client.post("/api/v1/products/", json={"name": "Caneta", "price": "5.00", "stock": 1})
+    page = products_routes._product_page
+
+    async def slow_page(*args):
+        await asyncio.sleep(0.2)
+        return await page(*args)
+
+    monkeypatch.setattr(products_routes, "_product_page", slow_page)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            leader = asyncio.create_task(http.get("/api/v1/products/"))
+            await asyncio.sleep(0.05)
+            # Escreveu em outro worker depois de a execução em andamento começar: não a aproveita
+            cookies = {READ_YOUR_WRITES_COOKIE: f"{time.time():.3f}"}
+            writer = asyncio.create_task(http.get("/api/v1/products/", cookies=cookies))
+            follower = asyncio.create_task(http.get("/api/v1/products/"))
+            responses = await asyncio.gather(leader, writer, follower)
+            # Nem o resultado guardado, que é de antes da escrita
+            cookies = {READ_YOUR_WRITES_COOKIE: f"{time.time():.3f}"}
+            responses.append(await http.get("/api/v1/products/", cookies=cookies))
+            return responses
+
+    executions = product_list_flight.executions
+    leader, writer, follower, after_hold = asyncio.run(scenario())
+    assert {response.status_code for response in (leader, writer, follower, after_hold)} == {200}
+    assert _query_count(follower) == 0
+    assert _query_count(writer) > 0 and _query_count(after_hold) > 0
+    assert product_list_flight.executions == executions + 3
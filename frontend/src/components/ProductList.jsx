@@ -2,6 +2,7 @@ import React, { useState } from 'react';
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { api } from '../lib/api';
 import { useDebounce } from '../hooks/useDebounce';
+import { useChangeFeed } from '../hooks/useChangeFeed';
 import { ProductFormModal } from './ProductFormModal';
 import { ConfirmationDialog } from './ConfirmationDialog';
 import { DiscountFormModal } from './DiscountFormModal';
@@ -47,7 +48,11 @@ export function ProductList() {
     queryKey: ['products', debouncedSearchTerm, page],
     queryFn: fetchProducts,
     keepPreviousData: true,
+    // O feed de alterações (abaixo) já avisa quando a lista muda
+    refetchOnWindowFocus: false,
   });
+  // Produtos e cupons: mudar um cupom pode mudar o preço final exibido
+  useChangeFeed(['products'], ['product', 'coupon']);
 
   const deleteMutation = useMutation({
     mutationFn: deleteProduct,
@@ -0,0 +1,36 @@
+// Em: src/hooks/useChangeFeed.js
+import { useEffect } from 'react';
+import { useQueryClient } from '@tanstack/react-query';
+
+const API_URL = import.meta.env.VITE_API_URL ?? 'http://localhost:8001/api/v1';
+
+// Escuta o feed de alterações do backend (SSE em /changes) e invalida as queries
+// indicadas quando algo muda, em vez de consultar a listagem periodicamente.
+// O EventSource reconecta sozinho e retoma do último evento (Last-Event-ID).
+export function useChangeFeed(queryKey, topics, delay = 300) {
+  const queryClient = useQueryClient();
+  const key = JSON.stringify(queryKey);
+  const topicList = topics.join(',');
+
+  useEffect(() => {
+    const params = new URLSearchParams();
+    topicList.split(',').forEach((topic) => params.append('topic', topic));
+    const source = new EventSource(`${API_URL}/changes?${params.toString()}`);
+
+    // Agrupa rajadas de eventos (ex.: desconto em lote) em uma única recarga
+    let timer = null;
+    const refresh = () => {
+      clearTimeout(timer);
+      timer = setTimeout(() => queryClient.invalidateQueries({ queryKey: JSON.parse(key) }), delay);
+    };
+
+    topicList.split(',').forEach((topic) => source.addEventListener(topic, refresh));
+    // O cursor ficou velho demais: recarrega tudo
+    source.addEventListener('reset', refresh);
+
+    return () => {
+      clearTimeout(timer);
+      source.close();
+    };
+  }, [queryClient, key, topicList, delay]);
+}